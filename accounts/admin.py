@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib import messages
+from .principal import invalidate_principal
 from .models import Business, BusinessSettings, ApiCredential, CustomAddons, PasswordResetOTP, SquareCredentials, StripeCredentials, PayPalCredentials, ThumbtackProfile, CleanerProfile
 
 
@@ -12,6 +13,9 @@ class BusinessAdmin(admin.ModelAdmin):
     
     def approve_businesses(self, request, queryset):
         updated = queryset.update(isApproved=True, isActive=True)
+        # queryset.update() skips post_save, so clear cached principals here
+        for user_id in queryset.values_list('user_id', flat=True):
+            invalidate_principal(user_id)
         self.message_user(
             request,
             f'{updated} business(es) have been approved and activated.',
@@ -21,6 +25,9 @@ class BusinessAdmin(admin.ModelAdmin):
     
     def reject_businesses(self, request, queryset):
         updated = queryset.update(isApproved=False, isActive=False)
+        # queryset.update() skips post_save, so clear cached principals here
+        for user_id in queryset.values_list('user_id', flat=True):
+            invalidate_principal(user_id)
         self.message_user(
             request,
             f'{updated} business(es) have been rejected and deactivated.',
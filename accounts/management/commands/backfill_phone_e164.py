@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from accounts.phone import backfill_phone_e164
+from ai_agent.models import Chat
+from automation.models import Lead
+from customer.models import Customer
+
+class Command(BaseCommand):
+    help = 'Recomputes the normalized phone_e164 column used for phone lookups on chats, leads and customers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows updated per query')
+
+    def handle(self, *args, **options):
+        for model, field_name in ((Chat, 'clientPhoneNumber'), (Lead, 'phone_number'), (Customer, 'phone_number')):
+            self.stdout.write(f'Backfilling {model.__name__}...')
+            updated = backfill_phone_e164(model, field_name, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Updated {updated} {model.__name__} rows'))
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -4,6 +4,8 @@ from django.contrib import messages
 from django.utils import timezone
 import pytz
 
+from .principal import get_request_principal, get_url_name, get_url_kwargs
+
 
 class BusinessApprovalMiddleware:
     """
@@ -18,8 +20,10 @@ class BusinessApprovalMiddleware:
         # if not request.user.is_authenticated or request.user.is_staff or request.user.is_superuser:
         #     return self.get_response(request)
             
+        principal = get_request_principal(request)
+
         # Skip for cleaner users - they'll be handled by CleanerAccessMiddleware
-        if request.user.groups.filter(name='Cleaner').exists():
+        if principal.is_cleaner:
             return self.get_response(request)
             
         # List of URLs that should be accessible without approval
@@ -34,28 +38,17 @@ class BusinessApprovalMiddleware:
         ]
         
         # Also skip if URL is exempt or is admin URL
-        try:
-            current_url = resolve(request.path_info).url_name
-            if current_url in exempt_urls or request.path.startswith('/admin'):
-                return self.get_response(request)
-        except:
-            # If URL can't be resolved, just continue
-            pass
+        # (an unresolvable URL just continues)
+        current_url = get_url_name(request)
+        if current_url in exempt_urls or request.path.startswith('/admin'):
+            return self.get_response(request)
             
         # Check if user has a business
-        if hasattr(request.user, 'business_set') and request.user.business_set.exists():
-            business = request.user.business_set.first()
-            
+        if principal.has_business:
             # If business is not approved, redirect to approval_pending
-            try:
-                current_url = resolve(request.path_info).url_name
-                if not business.isApproved and current_url != 'approval_pending':
-                    messages.warning(request, "You haven’t subscribed to a plan yet. Start with our Trial Plan to unlock full access to all features and get started right away!")
-                    return redirect('accounts:approval_pending')
-                else:
-                    pass
-            except:
-                pass
+            if not principal.business_approved and current_url != 'approval_pending':
+                messages.warning(request, "You haven’t subscribed to a plan yet. Start with our Trial Plan to unlock full access to all features and get started right away!")
+                return redirect('accounts:approval_pending')
         
         # Business owner with approved business - allow access to all pages
         return self.get_response(request)
@@ -73,8 +66,10 @@ class CleanerAccessMiddleware:
         if not request.user.is_authenticated or request.user.is_staff or request.user.is_superuser:
             return self.get_response(request)
         
+        principal = get_request_principal(request)
+
         # Only process for cleaner users with 'Cleaner' group
-        if not request.user.groups.filter(name='Cleaner').exists():
+        if not principal.is_cleaner:
             return self.get_response(request)
         
         # IMPORTANT: Explicitly block register-business URL for cleaners
@@ -84,20 +79,19 @@ class CleanerAccessMiddleware:
             print("BLOCKED: Cleaner attempted to access register-business page")
             
             # If user has a cleaner profile, redirect to their detail page
-            if hasattr(request.user, 'cleaner_profile') and hasattr(request.user.cleaner_profile, 'cleaner'):
-                cleaner_id = str(request.user.cleaner_profile.cleaner.id)
-                return redirect(f'/cleaners/{cleaner_id}/')
+            if principal.has_cleaner_profile:
+                return redirect(f'/cleaners/{principal.cleaner_id}/')
             # Otherwise redirect to home
             return redirect('/')
         
         # Handle users with Cleaner group but no cleaner_profile yet
-        if not hasattr(request.user, 'cleaner_profile'):
+        if not principal.has_cleaner_profile:
             # Don't redirect to register business page, this would be wrong for cleaners
             # Instead let them access public pages
             return self.get_response(request)
         
         # At this point, we know the user is a cleaner with a profile
-        cleaner_id = str(request.user.cleaner_profile.cleaner.id)
+        cleaner_id = str(principal.cleaner_id)
         
         # List of URLs that are always accessible
         exempt_urls = [
@@ -122,25 +116,21 @@ class CleanerAccessMiddleware:
             '/docs/'
         ]
         
-        try:
-            current_url = resolve(request.path_info).url_name
-
+        # Path-based checks below still apply if URL resolution fails
+        current_url = get_url_name(request)
 
-            # If on exempt URL, allow access
-            if current_url in exempt_urls:
-                print("ALLOWED: Cleaner accessed exempt URL")
+        # If on exempt URL, allow access
+        if current_url in exempt_urls:
+            print("ALLOWED: Cleaner accessed exempt URL")
+            return self.get_response(request)
+        
+        # Check for cleaner detail pages - cleaner can only see their own page
+        if current_url in ['cleaner_detail', 'cleaner_monthly_schedule']:
+            url_cleaner_id = get_url_kwargs(request).get('cleaner_id')
+            if str(url_cleaner_id) == cleaner_id:
                 return self.get_response(request)
-            
-            # Check for cleaner detail pages - cleaner can only see their own page
-            if current_url in ['cleaner_detail', 'cleaner_monthly_schedule']:
-                url_cleaner_id = resolve(request.path_info).kwargs.get('cleaner_id')
-                if str(url_cleaner_id) == cleaner_id:
-                    return self.get_response(request)
-                else:
-                    return redirect(f'/cleaners/{cleaner_id}/')
-        except Exception as e:
-            # Continue with path-based checks if URL resolution fails
-            pass
+            else:
+                return redirect(f'/cleaners/{cleaner_id}/')
         
         # Check if in allowed paths
         for path in allowed_paths:
@@ -201,19 +191,9 @@ class TimezoneMiddleware:
         self.get_response = get_response
         
     def __call__(self, request):
-        # Default timezone is UTC
-        user_timezone = pytz.UTC
-        
-        if request.user.is_authenticated:
-            # For business users
-            if hasattr(request.user, 'business_set') and request.user.business_set.exists():
-                business = request.user.business_set.first()
-                user_timezone = business.get_timezone()
-            
-            # For cleaner users
-            elif hasattr(request.user, 'cleaner_profile') and hasattr(request.user.cleaner_profile, 'business'):
-                business = request.user.cleaner_profile.business
-                user_timezone = business.get_timezone()
+        # Business users get their business timezone, cleaners their
+        # employer's, and everyone else UTC
+        user_timezone = get_request_principal(request).timezone
         
         # Set the timezone for this thread/request
         timezone.activate(user_timezone)
@@ -0,0 +1,90 @@
+"""
+Phone number matching for chats, leads and customers.
+
+Chat, Lead and Customer keep a `phone_e164` column next to their raw phone
+field, normalized on save and indexed (with the business where the model
+has one), so a lookup is one index probe whatever format the number was
+typed in. Use filter_by_phone / find_by_phone instead of filtering on the
+raw phone fields.
+"""
+import re
+
+from django.db import models
+
+
+def normalize_phone(phone):
+    """
+    Canonical E.164 form of a phone number, e.g. '+15555555555'.
+
+    Same rules as Lead.clean_phone_number: 10-digit numbers are US/Canada,
+    a leading 00 is an international prefix. Returns None when there are no
+    digits to work with.
+    """
+    if not phone:
+        return None
+
+    digits = re.sub(r'\D', '', str(phone))
+    if not digits:
+        return None
+
+    if len(digits) == 10:
+        return f"+1{digits}"
+    if digits.startswith('00'):
+        return f"+{digits[2:]}"
+    return f"+{digits}"
+
+
+class PhoneIndexedModel(models.Model):
+    """
+    Adds `phone_e164`, kept in sync with the field named by PHONE_FIELD.
+    Subclasses declare the index that fits their lookups.
+    """
+    PHONE_FIELD = None
+
+    phone_e164 = models.CharField(max_length=20, null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.phone_e164 = normalize_phone(getattr(self, self.PHONE_FIELD))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.PHONE_FIELD in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_e164'}
+        super().save(*args, **kwargs)
+
+
+def filter_by_phone(queryset, phone):
+    """Rows of `queryset` whose phone matches `phone`, in any format."""
+    normalized = normalize_phone(phone)
+    if normalized is None:
+        return queryset.none()
+    return queryset.filter(phone_e164=normalized)
+
+
+def find_by_phone(queryset, phone, business=None):
+    """First row of `queryset` (optionally within `business`) matching `phone`."""
+    if business is not None:
+        queryset = queryset.filter(business=business)
+    return filter_by_phone(queryset, phone).first()
+
+
+def backfill_phone_e164(model, field_name, batch_size=1000):
+    """
+    Recompute phone_e164 for every row of `model` from `field_name`.
+    Returns the number of rows changed. Works on historical models too.
+    """
+    changed = []
+    updated = 0
+    for pk, phone, current in model._default_manager.values_list('pk', field_name, 'phone_e164').iterator(chunk_size=batch_size):
+        normalized = normalize_phone(phone)
+        if normalized != current:
+            changed.append(model(pk=pk, phone_e164=normalized))
+        if len(changed) >= batch_size:
+            model._default_manager.bulk_update(changed, ['phone_e164'])
+            updated += len(changed)
+            changed = []
+    if changed:
+        model._default_manager.bulk_update(changed, ['phone_e164'])
+        updated += len(changed)
+    return updated
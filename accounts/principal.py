@@ -0,0 +1,150 @@
+import time
+from datetime import timedelta
+
+import pytz
+from django.core.cache import cache
+from django.urls import resolve, Resolver404
+from django.utils import timezone
+
+
+PRINCIPAL_CACHE_TIMEOUT = 60 * 10
+# Rebuilt at least this often, since invalidate_principal() only reaches
+# other processes (web workers, the django-q cluster) through a shared cache
+PRINCIPAL_CACHE_MAX_AGE = 60
+
+
+def _principal_cache_key(user_id):
+    return f"request_principal:{user_id}"
+
+
+class RequestPrincipal:
+    """
+    Everything the middleware stack needs to know about the current user:
+    role, business, timezone, approval flag and active subscription.
+
+    Resolved once per request and backed by a per-user cache entry, which is
+    invalidated by the signals in accounts/signals.py whenever the user's
+    business, subscription, cleaner profile or groups change, and rebuilt
+    at least every PRINCIPAL_CACHE_MAX_AGE seconds.
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.is_cleaner = data.get('is_cleaner', False)
+        self.is_owner = data.get('is_owner', False)
+        self.cleaner_id = data.get('cleaner_id')
+        self.business_id = data.get('business_id')
+        self.business_approved = data.get('business_approved', False)
+        self.timezone_name = data.get('timezone_name')
+        self.subscription_id = data.get('subscription_id')
+        self.subscription_grace_ends_at = data.get('subscription_grace_ends_at')
+
+    @property
+    def has_business(self):
+        return self.business_id is not None
+
+    @property
+    def has_cleaner_profile(self):
+        return self.cleaner_id is not None
+
+    @property
+    def timezone(self):
+        if not self.timezone_name:
+            return pytz.UTC
+        try:
+            return pytz.timezone(self.timezone_name)
+        except pytz.exceptions.UnknownTimeZoneError:
+            return pytz.UTC
+
+    @property
+    def has_active_subscription(self):
+        if self.subscription_id is None:
+            return False
+        # The grace period is time based, so it is re-checked on every request
+        if self.subscription_grace_ends_at and self.subscription_grace_ends_at < timezone.now():
+            return False
+        return True
+
+    @classmethod
+    def build(cls, user):
+        """Load the principal for an authenticated user from the database."""
+        group_names = set(user.groups.values_list('name', flat=True))
+        data = {
+            'is_cleaner': 'Cleaner' in group_names,
+            'is_owner': 'Owner' in group_names,
+        }
+
+        from .models import Business, CleanerProfile
+
+        cleaner_profile = CleanerProfile.objects.filter(user=user).select_related('business').first()
+        if cleaner_profile:
+            data['cleaner_id'] = cleaner_profile.cleaner_id
+
+        business = Business.objects.filter(user=user).order_by('id').first()
+        if business is None and cleaner_profile:
+            # Cleaners work in their employer's timezone
+            data['timezone_name'] = cleaner_profile.business.timezone
+
+        if business is not None:
+            data['business_id'] = business.id
+            data['business_approved'] = business.isApproved
+            data['timezone_name'] = business.timezone
+
+            subscription = business.active_subscription()
+            if subscription:
+                data['subscription_id'] = subscription.id
+                if subscription.end_date:
+                    data['subscription_grace_ends_at'] = subscription.end_date + timedelta(days=2)
+
+        return cls(data)
+
+    def to_cache(self):
+        return dict(self.__dict__)
+
+
+ANONYMOUS_PRINCIPAL = RequestPrincipal()
+
+
+def get_request_principal(request):
+    """Return the RequestPrincipal for this request, resolving it at most once."""
+    principal = getattr(request, '_principal', None)
+    if principal is not None:
+        return principal
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        principal = ANONYMOUS_PRINCIPAL
+    else:
+        key = _principal_cache_key(user.pk)
+        data = cache.get(key)
+        if data is None or time.time() - data.get('loaded_at', 0) >= PRINCIPAL_CACHE_MAX_AGE:
+            principal = RequestPrincipal.build(user)
+            cache.set(key, dict(principal.to_cache(), loaded_at=time.time()), PRINCIPAL_CACHE_TIMEOUT)
+        else:
+            principal = RequestPrincipal(data)
+
+    request._principal = principal
+    return principal
+
+
+def invalidate_principal(user_id):
+    """Drop the cached principal for a user so the next request rebuilds it."""
+    if user_id is not None:
+        cache.delete(_principal_cache_key(user_id))
+
+
+def get_url_name(request):
+    """Resolve the current path once per request and return its URL name."""
+    if not hasattr(request, '_resolved_url_match'):
+        try:
+            request._resolved_url_match = resolve(request.path_info)
+        except Resolver404:
+            request._resolved_url_match = None
+    match = request._resolved_url_match
+    return match.url_name if match else None
+
+
+def get_url_kwargs(request):
+    get_url_name(request)
+    match = request._resolved_url_match
+    return match.kwargs if match else {}
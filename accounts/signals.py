@@ -1,5 +1,5 @@
 from .models import ApiCredential
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from retell_agent.api import RetellAgentAPI
 from retell_agent.models import RetellAgent
@@ -7,6 +7,8 @@ from django.contrib.auth.models import Group, Permission, User
 from django.contrib.contenttypes.models import ContentType
 from accounts.models import Business, CleanerProfile, ApiCredential
 from automation.models import Cleaners
+from subscription.models import BusinessSubscription
+from .principal import invalidate_principal
 from django.apps import apps
 from dotenv import load_dotenv
 import os
@@ -79,4 +81,50 @@ def send_welcome_email(sender, instance, created, **kwargs):
                 username=instance.user.username
             )
         except Exception as e:
-            print(f"Failed to enqueue welcome email task: {e}")
\ No newline at end of file
+            print(f"Failed to enqueue welcome email task: {e}")
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Business)
+def invalidate_business_principal(sender, instance, **kwargs):
+    """
+    Drop the cached request principal when a business changes
+    """
+    invalidate_principal(instance.user_id)
+
+
+@receiver(post_save, sender=BusinessSubscription)
+@receiver(post_delete, sender=BusinessSubscription)
+def invalidate_subscription_principal(sender, instance, **kwargs):
+    """
+    Drop the cached request principal when a subscription changes
+    """
+    user_id = Business.objects.filter(pk=instance.business_id).values_list('user_id', flat=True).first()
+    invalidate_principal(user_id)
+
+
+@receiver(post_save, sender=CleanerProfile)
+@receiver(post_delete, sender=CleanerProfile)
+def invalidate_cleaner_principal(sender, instance, **kwargs):
+    """
+    Drop the cached request principal when a cleaner profile changes
+    """
+    invalidate_principal(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_group_principal(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop the cached request principal when group membership changes
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_principal(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        for user_id in pk_set:
+            invalidate_principal(user_id)
+    elif action == 'pre_clear':
+        # Clearing from the group side doesn't provide pk_set, so look the
+        # members up before they are removed
+        for user_id in User.objects.filter(groups=instance).values_list('pk', flat=True):
+            invalidate_principal(user_id)
@@ -0,0 +1,185 @@
+"""
+Buffered activity logging.
+
+Page visits and tracked model changes are high-volume, low-value-per-row
+writes, so instead of inserting an ActivityLog row on the request path they
+are queued in memory and written with bulk_create in batches. A batch is
+flushed when it reaches ACTIVITY_LOG_BATCH_SIZE events or when the oldest
+event is ACTIVITY_LOG_FLUSH_INTERVAL seconds old, either on a background
+thread or, with ACTIVITY_LOG_FLUSH_MODE = 'django_q', as a django-q task.
+
+Page visits can also be sampled per path with ACTIVITY_LOG_PATH_RULES, a list
+of (regex, sample_rate) pairs where the first match wins.
+"""
+import atexit
+import logging
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ActivityBuffer:
+    """Process-wide queue of pending ActivityLog rows."""
+
+    def __init__(self):
+        self._events = []
+        self._lock = threading.Lock()
+        self._first_event_at = None
+        self._timer = None
+
+    @property
+    def batch_size(self):
+        return _setting('ACTIVITY_LOG_BATCH_SIZE', 100)
+
+    @property
+    def flush_interval(self):
+        return _setting('ACTIVITY_LOG_FLUSH_INTERVAL', 5)
+
+    def add(self, **fields):
+        """Queue one ActivityLog row; `fields` are ActivityLog field values."""
+        fields.setdefault('timestamp', timezone.now())
+
+        with self._lock:
+            self._events.append(fields)
+            if self._first_event_at is None:
+                self._first_event_at = time.monotonic()
+
+            full = len(self._events) >= self.batch_size
+            overdue = time.monotonic() - self._first_event_at >= self.flush_interval
+            if full or overdue:
+                batch = self._take()
+            else:
+                batch = None
+                self._schedule()
+
+        if batch:
+            dispatch_batch(batch)
+
+    def flush(self):
+        """Write everything queued so far."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            write_activity_batch(batch)
+
+    def __len__(self):
+        return len(self._events)
+
+    def _take(self):
+        batch, self._events = self._events, []
+        self._first_event_at = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _schedule(self):
+        # Make sure a quiet process still flushes its last few events
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+            batch = self._take()
+        if batch:
+            dispatch_batch(batch)
+
+
+def dispatch_batch(batch):
+    """Hand a batch to the configured writer without blocking the caller."""
+    if _setting('ACTIVITY_LOG_FLUSH_MODE', 'thread') == 'django_q':
+        try:
+            from django_q.tasks import async_task
+            async_task('admin_dashbaord.activity_buffer.write_activity_batch', batch)
+            return
+        except Exception as e:
+            logger.error(f"Failed to enqueue activity batch, writing in background: {e}")
+
+    writer = threading.Thread(target=_write_in_background, args=(batch,))
+    writer.daemon = True
+    writer.start()
+
+
+def _write_in_background(batch):
+    from django.db import connection
+
+    try:
+        write_activity_batch(batch)
+    finally:
+        # Writer threads get their own connection; don't leak it
+        connection.close()
+
+
+def write_activity_batch(batch):
+    """Insert a list of ActivityLog field dicts in one bulk_create."""
+    from .models import ActivityLog
+
+    try:
+        ActivityLog.objects.bulk_create(
+            [ActivityLog(**fields) for fields in batch],
+            batch_size=500,
+        )
+    except Exception as e:
+        logger.error(f"Failed to write {len(batch)} activity log entries: {e}")
+
+
+def should_log_path(path):
+    """Apply ACTIVITY_LOG_PATH_RULES sampling to a page visit."""
+    for pattern, sample_rate in _compiled_path_rules():
+        if pattern.match(path):
+            break
+    else:
+        sample_rate = _setting('ACTIVITY_LOG_SAMPLE_RATE', 1.0)
+
+    if sample_rate >= 1:
+        return True
+    if sample_rate <= 0:
+        return False
+    return random.random() < sample_rate
+
+
+_path_rules = None
+
+
+def _compiled_path_rules():
+    global _path_rules
+    if _path_rules is None:
+        _path_rules = [
+            (re.compile(pattern), rate)
+            for pattern, rate in _setting('ACTIVITY_LOG_PATH_RULES', [])
+        ]
+    return _path_rules
+
+
+activity_buffer = ActivityBuffer()
+
+
+def record_activity(**fields):
+    """Queue an ActivityLog row, or write it immediately when buffering is off."""
+    # Store ids rather than model instances so batches stay cheap to pickle
+    if 'user' in fields:
+        fields['user_id'] = fields.pop('user').pk
+    if 'content_type' in fields:
+        content_type = fields.pop('content_type')
+        fields['content_type_id'] = content_type.pk if content_type else None
+
+    if not _setting('ACTIVITY_LOG_BUFFERED', True):
+        write_activity_batch([fields])
+        return
+    activity_buffer.add(**fields)
+
+
+atexit.register(activity_buffer.flush)
@@ -7,8 +7,7 @@ from django.conf import settings
 import threading
 import inspect
 
-# Import the ActivityLog model
-from admin_dashbaord.models import ActivityLog
+from admin_dashbaord.activity_buffer import record_activity
 
 # Thread local storage to store the current user
 _thread_locals = threading.local()
@@ -152,8 +151,8 @@ def log_activity(instance, activity_type, user=None):
     if activity_type == 'update' and hasattr(instance, '_changed_fields'):
         metadata['changed_fields'] = instance._changed_fields
     
-    # Create the activity log
-    ActivityLog.objects.create(
+    # Queue the activity log (buffered and written in batches)
+    record_activity(
         user=user,
         activity_type=activity_type,
         description=description,
@@ -3,7 +3,7 @@ from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import User, AnonymousUser
 from django.contrib.contenttypes.models import ContentType
 from django.urls import resolve
-from .models import ActivityLog
+from .activity_buffer import record_activity, should_log_path
 
 class UserActivityMiddleware(MiddlewareMixin):
     """
@@ -29,6 +29,10 @@ class UserActivityMiddleware(MiddlewareMixin):
         # Skip if user is not authenticated
         if not request.user.is_authenticated:
             return None
+
+        # Apply per-path sampling rules
+        if not should_log_path(request.path):
+            return None
         
         # Get the URL name if available
         try:
@@ -55,8 +59,8 @@ class UserActivityMiddleware(MiddlewareMixin):
         description = f"Visited {view_name} page"
         
         
-        # Log the activity
-        ActivityLog.objects.create(
+        # Log the activity (buffered and written in batches)
+        record_activity(
             user=request.user,
             activity_type='other',  # Page visit is considered 'other'
             description=description,
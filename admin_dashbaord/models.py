@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -28,7 +29,8 @@ class ActivityLog(models.Model):
     activity_type = models.CharField(max_length=20, choices=ACTIVITY_TYPES)
     description = models.TextField()
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the activity happens, not when a buffered batch is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     
     # For linking to specific objects (optional)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
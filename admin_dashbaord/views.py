@@ -1664,8 +1664,7 @@ def api_analytics(request):
 
   
     try:
-        retell_calls = RetellAPIService.list_calls(start_date=start_date, end_date=end_date)
-        total_retell_calls = len(retell_calls)
+        total_retell_calls = RetellAPIService.calls_queryset(start_date=start_date, end_date=end_date).count()
        
     except Exception as e:
         print(f"Error fetching Retell calls: {e}")
@@ -1833,12 +1832,11 @@ def business_analytics_api(request, business_id):
     # Get Retell calls for this business
     try:
         # Filter calls for this specific business
-        retell_calls = RetellAPIService.list_calls(
+        total_retell_calls = RetellAPIService.calls_queryset(
             start_date=start_date, 
             end_date=end_date,
             business=business
-        )
-        total_retell_calls = len(retell_calls)
+        ).count()
     except Exception as e:
         print(f"Error fetching Retell calls: {e}")
         total_retell_calls = 0
@@ -3,7 +3,7 @@ from django.utils.html import format_html
 import json
 
 # Register your models here.
-from .models import Chat, Messages, AgentConfiguration
+from .models import Chat, Messages, AgentConfiguration, InboundSMS
 
 class MessagesInline(admin.TabularInline):
     model = Messages
@@ -77,6 +77,13 @@ class AgentConfigurationAdmin(admin.ModelAdmin):
     list_display = ('id', 'business', 'agent_name')
     search_fields = ('business__businessName', 'agent_name')
 
+class InboundSMSAdmin(admin.ModelAdmin):
+    list_display = ('id', 'fromNumber', 'business', 'status', 'attempts', 'receivedAt', 'finishedAt')
+    list_filter = ('status', 'receivedAt')
+    search_fields = ('fromNumber', 'messageSid', 'business__businessName')
+    readonly_fields = ('receivedAt', 'startedAt', 'finishedAt')
+
 admin.site.register(Chat, ChatAdmin)
 admin.site.register(Messages, MessagesAdmin)
-admin.site.register(AgentConfiguration, AgentConfigurationAdmin)
\ No newline at end of file
+admin.site.register(AgentConfiguration, AgentConfigurationAdmin)
+admin.site.register(InboundSMS, InboundSMSAdmin)
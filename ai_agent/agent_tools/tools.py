@@ -96,6 +96,7 @@ class BookAppointmentTool(BaseTool):
         """Book an appointment with explicit parameters"""
         from ..api_views import book_appointment
         from ..models import Chat
+        from ..memory import update_summary
         
         try:
             # Get or create chat
@@ -151,9 +152,8 @@ class BookAppointmentTool(BaseTool):
                 "customAddons": customAddons if customAddons else {}
             }
             
-            # Update chat summary with booking data
-            chat.summary = booking_data
-            chat.save()
+            # Update chat summary with booking data, keeping the conversation memory
+            update_summary(chat, booking_data, replace=True)
             
             # Call book_appointment which reads from chat.summary
             result = book_appointment(
@@ -220,6 +220,7 @@ class CalculateTotalTool(BaseTool):
         """Calculate total cost with explicit parameters"""
         from ..api_views import calculate_total
         from ..models import Chat
+        from ..memory import update_summary
         
         try:
             # Get or create chat
@@ -266,10 +267,7 @@ class CalculateTotalTool(BaseTool):
             }
             
             # Update chat summary with calculation data
-            current_summary = chat.summary if chat.summary else {}
-            current_summary.update(calc_data)
-            chat.summary = current_summary
-            chat.save()
+            update_summary(chat, calc_data)
             
             # Call calculate_total which reads from chat.summary
             result = calculate_total(
@@ -1,13 +1,16 @@
 from accounts.models import BusinessSettings, Business
+from accounts.phone import filter_by_phone
 from bookings.models import Booking
 from datetime import datetime, timedelta
 import json
 from automation.api_views import get_cleaners_for_business, find_available_cleaner, is_slot_available, find_alternate_slots
+from automation.availability import AvailabilityEngine
 from automation.utils import calculateAmount, getServiceType
 from django.utils import timezone
 import traceback
 import pytz
 from .models import Chat
+from .memory import update_summary
 from accounts.timezone_utils import parse_business_datetime, convert_from_utc
 from customer.utils import create_customer
 from bookings.utils import get_service_details
@@ -16,12 +19,13 @@ from decimal import Decimal
 from notification.services import NotificationService
 
 
-def calculate_total(business, client_phone_number=None, session_key=None):
+def calculate_total(business, client_phone_number=None, session_key=None, chat=None):
     try:
-        if session_key:
+        # The caller may pass the chat it already resolved
+        if chat is None and session_key:
             chat = Chat.objects.get(business=business, sessionKey=session_key)
-        elif client_phone_number:
-            chat = Chat.objects.get(clientPhoneNumber=client_phone_number, business=business)
+        elif chat is None and client_phone_number:
+            chat = filter_by_phone(Chat.objects.filter(business=business), client_phone_number).get()
 
         # Parse summary if it's a string
         if isinstance(chat.summary, str):
@@ -96,12 +100,13 @@ def check_availability(business, date_string):
 
 
         cleaners = get_cleaners_for_business(business, assignment_check_null=True)
+        engine = AvailabilityEngine(cleaners, res["data"]["utc_datetime"].date())
         
-        is_available, _ = is_slot_available(cleaners, res["data"]["utc_datetime"])
+        is_available, _ = is_slot_available(cleaners, res["data"]["utc_datetime"], engine=engine)
         
         alternative_slots = []
         if not is_available:
-            alt_slots, _ = find_alternate_slots(cleaners, res["data"]["utc_datetime"], max_alternates=3)
+            alt_slots, _ = find_alternate_slots(cleaners, res["data"]["utc_datetime"], max_alternates=3, engine=engine)
             alternative_slots = alt_slots
         
         formatted_datetime = res["data"]["utc_datetime"].strftime('%Y-%m-%d %H:%M')
@@ -119,12 +124,13 @@ def check_availability(business, date_string):
         return {"success": False, "error": str(e)}
 
 
-def book_appointment(business, client_phone_number=None, session_key=None):
+def book_appointment(business, client_phone_number=None, session_key=None, chat=None):
     try:
-        if session_key:
+        # The caller may pass the chat it already resolved
+        if chat is None and session_key:
             chat = Chat.objects.get(business=business, sessionKey=session_key)
-        elif client_phone_number:
-            chat = Chat.objects.get(clientPhoneNumber=client_phone_number, business=business)
+        elif chat is None and client_phone_number:
+            chat = filter_by_phone(Chat.objects.filter(business=business), client_phone_number).get()
         
        
         
@@ -268,10 +274,7 @@ def book_appointment(business, client_phone_number=None, session_key=None):
         
         # Update chat summary with booking ID
         try:
-            updated_summary = chat.summary.copy() if isinstance(chat.summary, dict) else {}
-            updated_summary['bookingId'] = newBooking.bookingId
-            chat.summary = updated_summary
-            chat.save()
+            update_summary(chat, {'bookingId': newBooking.bookingId})
         except Exception as e:
             print(f"[ERROR] Failed to update chat summary with booking ID: {str(e)}")
             
@@ -308,11 +311,12 @@ def reschedule_appointment(booking_id, new_date_time, reason=None):
         res = parse_business_datetime(new_date_time, booking.business)
     
         # Check availability using UTC datetime
-        is_available, _ = is_slot_available(cleaners, res['data']['utc_datetime'])
+        engine = AvailabilityEngine(cleaners, res['data']['utc_datetime'].date())
+        is_available, _ = is_slot_available(cleaners, res['data']['utc_datetime'], engine=engine)
         
         alternative_slots = []
         if not is_available:
-            alt_slots, _ = find_alternate_slots(cleaners, res['data']['utc_datetime'], max_alternates=3)
+            alt_slots, _ = find_alternate_slots(cleaners, res['data']['utc_datetime'], max_alternates=3, engine=engine)
             alternative_slots = alt_slots
 
             return {
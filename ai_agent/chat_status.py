@@ -0,0 +1,120 @@
+"""
+Chat status engine.
+
+Decides whether a chat is pending, booked or not_interested after each
+exchange. Deterministic signals are checked first:
+
+- a booking created from the chat (Chat.summary['bookingId']) -> booked,
+  or not_interested once that booking is cancelled
+- opt-out keywords or phrases in a new customer message -> not_interested
+
+Only when none of them apply does it ask a small model, and then only about
+the messages since the last classification (Chat.statusMessageId), at most
+once per CHAT_STATUS_DEBOUNCE_SECONDS per chat.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Chat, Messages
+
+
+STATUSES = ('pending', 'booked', 'not_interested')
+
+# Carrier opt-out keywords, matched against the whole message
+OPT_OUT_KEYWORDS = {'stop', 'stopall', 'stop all', 'unsubscribe', 'cancel', 'end', 'quit', 'optout', 'opt out', 'revoke'}
+OPT_OUT_PHRASES = re.compile(
+    r"\b(not interested|no longer interested|no thanks?,? i'?m good|stop (texting|messaging|contacting)"
+    r"|remove me|take me off|do not (text|contact|message)|don'?t (text|contact|message)"
+    r"|leave me alone|wrong number)\b",
+    re.IGNORECASE,
+)
+
+SYSTEM_PROMPT = """You track the status of an SMS conversation between a cleaning business' booking assistant and a potential customer.
+
+You are given the status so far and the newest messages. Respond with exactly one word:
+pending -> the conversation is ongoing or unresolved
+booked -> the customer has confirmed a booking
+not_interested -> the customer is not interested
+
+Return only the word."""
+
+
+def is_opt_out(text):
+    text = (text or '').strip()
+    normalized = re.sub(r'[^a-z ]', '', text.lower()).strip()
+    return normalized in OPT_OUT_KEYWORDS or bool(OPT_OUT_PHRASES.search(text))
+
+
+def booking_status(chat):
+    """booked / not_interested from the booking made in this chat, or None."""
+    booking_id = chat.summary.get('bookingId') if isinstance(chat.summary, dict) else None
+    if not booking_id:
+        return None
+
+    from bookings.models import Booking
+    cancelled = Booking.objects.filter(bookingId=booking_id, cancelled_at__isnull=False).exists()
+    return 'not_interested' if cancelled else 'booked'
+
+
+def classify_chat_status(chat, force=False):
+    """
+    Update and return chat.status from the messages added since the last
+    classification. `force` skips the model-call debounce.
+    """
+    new_messages = list(
+        Messages.objects.filter(chat=chat, id__gt=chat.statusMessageId or 0)
+        .order_by('id')
+        .values_list('id', 'role', 'message')
+    )
+    current = chat.status or 'pending'
+
+    status = booking_status(chat)
+    if status is None and any(role == 'user' and is_opt_out(message) for _, role, message in new_messages):
+        status = 'not_interested'
+
+    if status is None:
+        if not new_messages:
+            return current
+        if current == 'booked' or not any(role == 'user' for _, role, _ in new_messages):
+            # Nothing the customer said could change the status
+            status = current
+        else:
+            debounce_key = f"chat_status:debounce:{chat.id}"
+            if not force and not cache.add(debounce_key, 1, getattr(settings, 'CHAT_STATUS_DEBOUNCE_SECONDS', 60)):
+                # Classified moments ago; these messages are picked up next time
+                return current
+            status = ask_model(current, new_messages)
+            if status == 'pending' and current in ('call_sent', 'follow_up_call_sent'):
+                # Keep track of the follow-up calls already made
+                status = current
+
+    last_id = new_messages[-1][0] if new_messages else chat.statusMessageId
+    Chat.objects.filter(pk=chat.pk).update(status=status, statusMessageId=last_id, updatedAt=timezone.now())
+    chat.status = status
+    chat.statusMessageId = last_id
+    return status
+
+
+def ask_model(current, new_messages):
+    from .utils import client
+
+    max_messages = getattr(settings, 'CHAT_STATUS_MAX_MESSAGES', 20)
+    transcript = "\n".join(
+        f"{'Customer' if role == 'user' else 'Assistant'}: {message}"
+        for _, role, message in new_messages[-max_messages:]
+        if role in ('user', 'assistant')
+    )
+    response = client.chat.completions.create(
+        model=getattr(settings, 'CHAT_STATUS_MODEL', 'gpt-4o-mini'),
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Status so far: {current}\n\nNewest messages:\n{transcript}"},
+        ],
+        temperature=0,
+        max_tokens=5,
+    )
+    status = response.choices[0].message.content.strip().lower()
+    return status if status in STATUSES else 'pending'
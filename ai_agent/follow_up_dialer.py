@@ -0,0 +1,191 @@
+"""
+Follow-up calls to leads whose chats went quiet.
+
+A chat that has been pending for FOLLOW_UP_STALE_MINUTES gets a follow-up
+call from the business's Retell voice agent. Each run:
+
+- selects the stale pending chats of businesses that use calls, each with
+  its business, the voice agent number and the uncalled lead with the same
+  phone number, in batches of FOLLOW_UP_DIALER_BATCH (keyset on chat id, so
+  a chat that failed is not retried within the same run);
+- places the calls on a bounded pool through one shared Retell client,
+  with at most FOLLOW_UP_CALLS_PER_BUSINESS calls in flight per business;
+- marks the leads and chats of a batch in bulk once its calls are placed.
+
+A run stops taking new batches after FOLLOW_UP_DIALER_TIME_BUDGET seconds,
+inside the django-q task timeout; the rest is picked up by the next run.
+"""
+import threading
+import time
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from retell import Retell
+
+from automation.models import Lead
+from leadsAutomation.pools import submit
+from retell_agent.models import RetellAgent
+from subscription.models import UsageTracker
+from .chat_status import classify_chat_status
+from .models import Chat
+from .prompts import format_lead_details
+
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _lock:
+        if _client is None:
+            _client = Retell(api_key=settings.RETELL_API_KEY)
+        return _client
+
+
+def eligible_chats(after_id=0, limit=None):
+    """
+    Stale pending chats with a lead to call and a voice agent number to call
+    from, annotated with `follow_up_lead_id` and `agent_number`.
+    """
+    cutoff = timezone.now() - timedelta(minutes=getattr(settings, 'FOLLOW_UP_STALE_MINUTES', 10))
+    leads = Lead.objects.filter(
+        business=OuterRef('business'),
+        phone_e164=OuterRef('phone_e164'),
+        follow_up_call_sent=False,
+    ).order_by('id')
+    agents = RetellAgent.objects.filter(
+        business=OuterRef('business'),
+        agent_number__isnull=False,
+    ).exclude(agent_number='').order_by('id')
+
+    chats = (
+        Chat.objects.filter(
+            status='pending',
+            phone_e164__isnull=False,
+            updatedAt__lte=cutoff,
+            business__useCall=True,
+            id__gt=after_id,
+        )
+        .annotate(
+            follow_up_lead_id=Subquery(leads.values('id')[:1]),
+            agent_number=Subquery(agents.values('agent_number')[:1]),
+        )
+        .filter(follow_up_lead_id__isnull=False, agent_number__isnull=False)
+        .select_related('business')
+        .order_by('id')
+    )
+    return chats[:limit or getattr(settings, 'FOLLOW_UP_DIALER_BATCH', 200)]
+
+
+def run():
+    """Place the follow-up calls that are due. Returns counts by outcome."""
+    results = {'processed': 0, 'calls_made': 0, 'errors': 0, 'skipped': 0}
+    deadline = time.monotonic() + getattr(settings, 'FOLLOW_UP_DIALER_TIME_BUDGET', 240)
+    after_id = 0
+
+    while time.monotonic() < deadline:
+        chats = list(eligible_chats(after_id))
+        if not chats:
+            break
+        after_id = chats[-1].id
+
+        leads = Lead.objects.in_bulk([chat.follow_up_lead_id for chat in chats])
+        pairs = [(chat, leads[chat.follow_up_lead_id]) for chat in chats if chat.follow_up_lead_id in leads]
+        for key, count in dial_batch(pairs).items():
+            results[key] += count
+        print(f"[TASK] Follow-up dialer: batch up to chat {after_id} done, totals {results}")
+    else:
+        print(f"[TASK] Follow-up dialer: time budget used, stopping after chat {after_id}")
+
+    return results
+
+
+def dial_batch(pairs):
+    """Call the (chat, lead) pairs of one batch and record the outcomes."""
+    lanes_per_business = max(1, getattr(settings, 'FOLLOW_UP_CALLS_PER_BUSINESS', 2))
+    by_business = defaultdict(list)
+    for chat, lead in pairs:
+        by_business[chat.business_id].append((chat, lead))
+
+    # Each lane dials its share of one business's calls one after another
+    lanes = []
+    for business_pairs in by_business.values():
+        lanes.extend(business_pairs[i::lanes_per_business] for i in range(lanes_per_business))
+
+    workers = getattr(settings, 'FOLLOW_UP_DIALER_WORKERS', 8)
+    outcomes = []
+    for future in [submit('follow-up-dialer', workers, _dial_lane, lane) for lane in lanes if lane]:
+        outcomes.extend(future.result())
+
+    return _record(outcomes)
+
+
+def _dial_lane(pairs):
+    return [_dial(chat, lead) for chat, lead in pairs]
+
+
+def _dial(chat, lead):
+    """Returns (outcome, chat, lead, error) for one pair."""
+    try:
+        # Catch up on messages the status engine debounced
+        if classify_chat_status(chat, force=True) != 'pending':
+            print(f"[TASK] Skipping chat ID: {chat.id} - Status is now {chat.status}")
+            return 'skipped', chat, lead, None
+
+        print(f"[TASK] Making call from {chat.agent_number} to {lead.phone_e164} for chat ID: {chat.id}")
+        get_client().call.create_phone_call(
+            from_number=chat.agent_number,
+            to_number=lead.phone_e164,
+            retell_llm_dynamic_variables={
+                'name': lead.name,
+                'details': format_lead_details(lead),
+                'service': 'cleaning'
+            }
+        )
+        return 'called', chat, lead, None
+    except Exception as e:
+        print(f"[TASK] Error making call for chat ID: {chat.id}: {str(e)}")
+        print(traceback.format_exc())
+        return 'failed', chat, lead, str(e)
+
+
+def _record(outcomes):
+    now = timezone.now()
+    called = [(chat, lead) for outcome, chat, lead, _ in outcomes if outcome == 'called']
+    failed = [(lead, error) for outcome, _, lead, error in outcomes if outcome == 'failed']
+
+    if called:
+        Lead.objects.filter(id__in=[lead.id for _, lead in called]).update(
+            follow_up_call_sent=True,
+            follow_up_call_sent_at=now,
+            follow_up_call_status='initiated',
+            follow_up_call_error_message=None,
+        )
+        Chat.objects.filter(id__in=[chat.id for chat, _ in called]).update(status='follow_up_call_sent', updatedAt=now)
+
+        calls_by_business = defaultdict(int)
+        businesses = {}
+        for chat, _ in called:
+            calls_by_business[chat.business_id] += 1
+            businesses[chat.business_id] = chat.business
+        for business_id, count in calls_by_business.items():
+            UsageTracker.increment_metric(businesses[business_id], 'voice_calls', count)
+
+    if failed:
+        # The chat stays pending, so the call is retried on the next run
+        for lead, error in failed:
+            lead.follow_up_call_status = 'failed'
+            lead.follow_up_call_error_message = error
+        Lead.objects.bulk_update([lead for lead, _ in failed], ['follow_up_call_status', 'follow_up_call_error_message'])
+
+    return {
+        'processed': len(called) + len(failed),
+        'calls_made': len(called),
+        'errors': len(failed),
+        'skipped': len(outcomes) - len(called) - len(failed),
+    }
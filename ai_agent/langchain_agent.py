@@ -8,14 +8,15 @@ from typing import List, Dict, Any, Optional
 import os
 import json
 from datetime import datetime
-import functools
-import inspect
+import threading
+import time
 import traceback
+from collections import OrderedDict
 
 from langchain.agents import AgentExecutor
 from langchain.agents.openai_functions_agent.base import OpenAIFunctionsAgent
 from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from langchain.prompts import MessagesPlaceholder
+from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
 from langchain.memory import ConversationBufferMemory
 from langchain_openai import ChatOpenAI
 
@@ -25,6 +26,8 @@ from django.utils import timezone
 from accounts.models import Business
 from .models import Chat, Messages, AgentConfiguration
 from .business_context import get_business_context, get_available_service_names
+from .memory import ConversationMemory
+from .prompts import get_static_prompt, invalidate_prompts, prompt_version, turn_context
 from .agent_tools.tools import (
     CheckAvailabilityTool,
     BookAppointmentTool,
@@ -56,20 +59,20 @@ class LangChainAgent:
         self.client_phone_number = client_phone_number
         self.session_key = session_key
         
-        # Load business information
-        try:
-            self.business = Business.objects.get(businessId=business_id)
-        except Business.DoesNotExist:
-            raise ValueError(f"Business with ID {business_id} not found")
+        # The per-business parts (LLM client, tools, compiled prompt, agent)
+        # come warm from the registry; only the chat, its memory and the
+        # conversation-bound tools are built per instance
+        self.business_agent = agent_registry.get(business_id)
+        self.business = self.business_agent.business
         
         # Get or create chat
         self.chat = self._get_or_create_chat()
         
         # Initialize LangChain components
-        self.llm = self._initialize_llm()
+        self.llm = self.business_agent.llm
         self.memory = self._initialize_memory()
         self.tools = self._initialize_tools()
-        self.agent = self._initialize_agent()
+        self.agent = self.business_agent.agent
         self.agent_executor = self._initialize_agent_executor()
     
     def _get_or_create_chat(self) -> Chat:
@@ -107,92 +110,98 @@ class LangChainAgent:
         
         return chat
     
-    def _initialize_llm(self) -> ChatOpenAI:
-        """Initialize the LLM with appropriate settings."""
-        api_key = os.getenv('OPENAI_API_KEY')
-        model_name = getattr(settings, 'OPENAI_MODEL_NAME', 'gpt-4o')
-        
-        return ChatOpenAI(
-            temperature=0.7,
-            model=model_name,
-            api_key=api_key,
-            max_tokens=1024,
-        )
-    
     def _initialize_memory(self) -> ConversationBufferMemory:
-        """Initialize conversation memory and load existing messages."""
+        """
+        Initialize conversation memory with the rolling summary of the chat
+        and its most recent messages (see ai_agent.memory).
+        """
         memory = ConversationBufferMemory(
             memory_key="chat_history",
+            input_key="input",
             return_messages=True
         )
         
-        # Load existing messages from database
-        messages = Messages.objects.filter(chat=self.chat).order_by('createdAt')
+        self.conversation_memory = ConversationMemory(self.chat).load()
+        
+        if self.conversation_memory.summary:
+            memory.chat_memory.add_message(SystemMessage(
+                content=f"Summary of the earlier conversation: {self.conversation_memory.summary}"
+            ))
         
-        for msg in messages:
-            if msg.role == 'user':
-                memory.chat_memory.add_user_message(msg.message)
-            elif msg.role == 'assistant':
-                memory.chat_memory.add_ai_message(msg.message)
+        for msg in self.conversation_memory.messages:
+            if msg['role'] == 'user':
+                memory.chat_memory.add_user_message(msg['content'])
+            elif msg['role'] == 'assistant':
+                memory.chat_memory.add_ai_message(msg['content'])
             # Skip tool messages as they're handled internally
         
         return memory
     
     def _initialize_tools(self) -> List:
-        """Initialize the tools for the agent."""
-        print(f"[DEBUG] Initializing tools for business: {self.business.businessName} (ID: {self.business.businessId})")
-        
-        # Create the tools with business context
-        check_availability_tool = CheckAvailabilityTool(business=self.business)
-        book_appointment_tool = BookAppointmentTool(
-            business=self.business,
-            client_phone_number=self.client_phone_number,
-            session_key=self.session_key
-        )
-        get_current_time_tool = GetCurrentTimeTool(business=self.business)
-        calculate_total_tool = CalculateTotalTool(
-            business=self.business,
-            client_phone_number=self.client_phone_number,
-            session_key=self.session_key
-        )
-        reschedule_appointment_tool = RescheduleAppointmentTool()
-        cancel_appointment_tool = CancelAppointmentTool()
-        
-        print(f"[DEBUG] Created tools: {[tool.name for tool in [check_availability_tool, book_appointment_tool, get_current_time_tool, calculate_total_tool, reschedule_appointment_tool, cancel_appointment_tool]]}")
-        
-        return [
-            check_availability_tool,
-            book_appointment_tool,
-            get_current_time_tool,
-            calculate_total_tool,
-            reschedule_appointment_tool,
-            cancel_appointment_tool
+        """Bind the booking and pricing tools to this conversation."""
+        conversation_tools = [
+            BookAppointmentTool(
+                business=self.business,
+                client_phone_number=self.client_phone_number,
+                session_key=self.session_key
+            ),
+            CalculateTotalTool(
+                business=self.business,
+                client_phone_number=self.client_phone_number,
+                session_key=self.session_key
+            ),
         ]
+        bound = {tool.name: tool for tool in conversation_tools}
+        
+        # Same tools, in the same order, that the cached agent was built with
+        return [bound.get(tool.name, tool) for tool in self.business_agent.tools]
 
     def _get_system_prompt(self) -> str:
+        """Render the system prompt for this agent's business."""
+        return self.build_system_prompt(self.business, chat=getattr(self, 'chat', None))
+
+    def _turn_context(self) -> str:
+        """Date, time and lead details for this turn (see ai_agent.prompts)."""
+        return turn_context(self.chat)
+
+    @staticmethod
+    def build_system_prompt(business: Business, current_date: Optional[str] = None,
+                            current_time: Optional[str] = None, chat: Optional[Chat] = None) -> str:
         """
-        Generate a dynamic system prompt based on business details and agent configuration.
-        This customizes the agent's behavior for each business.
+        The full system prompt as the model sees it: the cached static
+        prompt followed by this turn's context.
+        """
+        static_prompt = LangChainAgent.get_static_prompt(business)
+        return f"{static_prompt.text}\n\n{turn_context(chat, current_date, current_time)}"
+
+    @staticmethod
+    def get_static_prompt(business: Business):
+        """The business' static prompt, rendered once per configuration change."""
+        return get_static_prompt('langchain', business.businessId, lambda: LangChainAgent.build_static_prompt(business))
+
+    @staticmethod
+    def build_static_prompt(business: Business) -> str:
+        """
+        Generate the system prompt from business details and agent configuration.
+        This customizes the agent's behavior for each business. It must not
+        depend on anything that changes between turns; that goes in
+        ai_agent.prompts.turn_context.
         """
         # Get agent config from database
         try:
-            agent_config = AgentConfiguration.objects.get(business=self.business, is_active=True)
+            agent_config = AgentConfiguration.objects.get(business=business, is_active=True)
             agent_name = agent_config.agent_name or 'Sarah'
             custom_instructions = agent_config.custom_instructions or ''
         except AgentConfiguration.DoesNotExist:
             agent_name = 'Sarah'
             custom_instructions = ''
         
-        # Get current date and time
-        current_date = timezone.now().strftime("%Y-%m-%d")
-        current_time = timezone.now().strftime("%H:%M")
-        
         # Get business context (pricing, services, addons)
-        business_context = get_business_context(self.business)
+        business_context = get_business_context(business)
         
         # Get available services for dynamic prompt
         try:
-            available_services = get_available_service_names(self.business.settings)
+            available_services = get_available_service_names(business.settings)
             if available_services:
                 if len(available_services) == 1:
                     services_text = available_services[0]
@@ -206,9 +215,7 @@ class LangChainAgent:
             services_text = "our cleaning services"
         
         # Build the system prompt
-        system_prompt = f"""You are {agent_name}, a friendly and warm booking assistant for {self.business.businessName}.
-
-Today's date is {current_date} and the current time is {current_time}.
+        system_prompt = f"""You are {agent_name}, a friendly and warm booking assistant for {business.businessName}.
 
 ##YOUR PERSONALITY AND APPROACH
 You're a real person who genuinely cares about helping customers. You're:
@@ -221,11 +228,11 @@ You're a real person who genuinely cares about helping customers. You're:
 ##HOW TO START CONVERSATIONS
 When someone first reaches out, greet them warmly and make them feel welcome:
 - Start with a friendly greeting like "Hi there!" or "Hello!"
-- Introduce yourself: "I'm {agent_name} from {self.business.businessName}"
+- Introduce yourself: "I'm {agent_name} from {business.businessName}"
 - Ask how you can help them today
 - Examples:
-  * "Hi! I'm {agent_name} from {self.business.businessName}. How can I help you today?"
-  * "Hello! Thanks for reaching out to {self.business.businessName}. I'm {agent_name}. Are you looking for cleaning services or do you have questions about what we offer?"
+  * "Hi! I'm {agent_name} from {business.businessName}. How can I help you today?"
+  * "Hello! Thanks for reaching out to {business.businessName}. I'm {agent_name}. Are you looking for cleaning services or do you have questions about what we offer?"
 
 ##UNDERSTANDING WHAT CUSTOMERS WANT
 Listen carefully and figure out what they need:
@@ -293,7 +300,7 @@ Then: "And what's the square footage? Just an estimate is fine!"
 "All set! Your cleaning is confirmed for [date] at [time]. Your booking ID is [ID]. You'll get a confirmation email at [email]."
 
 ##PRIMARY KNOWLEDGE SOURCE
-Answer questions about cleaning services using ONLY the information provided in this prompt. DO NOT make up information or use general knowledge about cleaning that hasn't been explicitly provided by {self.business.businessName}.
+Answer questions about cleaning services using ONLY the information provided in this prompt. DO NOT make up information or use general knowledge about cleaning that hasn't been explicitly provided by {business.businessName}.
 
 ##WORKING WITH LEAD INFORMATION
 If you have pre-filled lead details, use them smartly:
@@ -334,7 +341,7 @@ You talk like a real person, not a robot:
 - Keep it simple and clean
 
 ##IMPORTANT GUIDELINES
-Stay in character as {agent_name}, a real person working for {self.business.businessName}:
+Stay in character as {agent_name}, a real person working for {business.businessName}:
 - You're human, not an AI - never break character
 - Only share information you've been given about the business
 - Keep conversations focused on cleaning services and bookings
@@ -459,37 +466,12 @@ Keep it friendly, clear, and make them feel good about their decision!
         
         return system_prompt
     
-    def _initialize_agent(self) -> OpenAIFunctionsAgent:
-        """Initialize the OpenAI Functions agent."""
-        print(f"[DEBUG] Initializing agent for business: {self.business.businessName} (ID: {self.business.businessId})")
-        
-        # Get system prompt
-        system_prompt = self._get_system_prompt()
-        print(f"[DEBUG] System prompt length: {len(system_prompt)}")
-        
-        # Create the prompt
-        prompt = OpenAIFunctionsAgent.create_prompt(
-            system_message=SystemMessage(content=system_prompt),
-            extra_prompt_messages=[MessagesPlaceholder(variable_name="chat_history")]
-        )
-        
-        # Create the agent
-        agent = OpenAIFunctionsAgent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=prompt
-        )
-        
-        print(f"[DEBUG] Agent created successfully")
-        
-        return agent
-    
-    def _initialize_agent_executor(self) -> AgentExecutor:
+    def _initialize_agent_executor(self, agent: Optional[OpenAIFunctionsAgent] = None) -> AgentExecutor:
         """Initialize the agent executor."""
         print(f"[DEBUG] Initializing agent executor")
         
         return AgentExecutor(
-            agent=self.agent,
+            agent=agent or self.agent,
             tools=self.tools,
             memory=self.memory,
             verbose=True,
@@ -498,12 +480,14 @@ Keep it friendly, clear, and make them feel good about their decision!
             early_stopping_method="generate"
         )
     
-    def process_message(self, user_message: str) -> str:
+    def process_message(self, user_message: str, raise_errors: bool = False) -> str:
         """
         Process a user message and return the agent's response.
         
         Args:
             user_message: The message from the user
+            raise_errors: Re-raise agent errors instead of returning an apology,
+                leaving no trace of the message so the caller can retry it
             
         Returns:
             The agent's response
@@ -511,7 +495,7 @@ Keep it friendly, clear, and make them feel good about their decision!
         print(f"[DEBUG] Running agent with message: '{user_message}'")
         
         # Save user message to database
-        Messages.objects.create(
+        saved_message = Messages.objects.create(
             chat=self.chat,
             role='user',
             message=user_message
@@ -519,7 +503,7 @@ Keep it friendly, clear, and make them feel good about their decision!
         
         try:
             # Process with LangChain agent
-            response = self.agent_executor.run(user_message)
+            response = self.agent_executor.run(input=user_message, turn_context=self._turn_context())
             
             print(f"[DEBUG] Agent response: {response}")
             
@@ -530,6 +514,8 @@ Keep it friendly, clear, and make them feel good about their decision!
                 message=response
             )
             
+            self.conversation_memory.schedule_summary_update()
+            
             return response
             
         except Exception as e:
@@ -537,6 +523,11 @@ Keep it friendly, clear, and make them feel good about their decision!
             print(f"[DEBUG] Error running agent: {str(e)}")
             print(f"[DEBUG] Traceback: {error_traceback}")
             
+            if raise_errors:
+                # The retry saves the message again
+                saved_message.delete()
+                raise
+            
             # Save error as system message
             Messages.objects.create(
                 chat=self.chat,
@@ -547,6 +538,45 @@ Keep it friendly, clear, and make them feel good about their decision!
             # Return a user-friendly error message
             return "I'm sorry, I encountered an error processing your request. Please try again later."
     
+    def stream_message(self, user_message: str, mode: str = 'live'):
+        """
+        Process a user message, yielding (event, data) pairs as the reply is
+        generated: 'token' for each piece of text, 'tool_start' / 'tool_end'
+        around tool calls, then 'done' with the full response or 'error'.
+        
+        The exchange is saved once the reply is complete, after the last
+        event has been yielded (see ai_agent.streaming).
+        """
+        from .streaming import stream_agent_reply
+        
+        executor = self._initialize_agent_executor(self.business_agent.streaming_agent)
+        return stream_agent_reply(self, executor, user_message, mode)
+    
+    def save_exchange(self, user_message: str, response: Optional[str], mode: str = 'live', error: Optional[str] = None):
+        """Save a streamed exchange the way process_message saves it."""
+        Messages.objects.create(
+            chat=self.chat,
+            role='user',
+            message=user_message,
+            mode=mode
+        )
+        
+        if error is not None:
+            Messages.objects.create(
+                chat=self.chat,
+                role='tool',
+                message=f"Error processing message: {error}"
+            )
+            return
+        
+        Messages.objects.create(
+            chat=self.chat,
+            role='assistant',
+            message=response,
+            mode=mode
+        )
+        self.conversation_memory.schedule_summary_update()
+    
     @staticmethod
     def get_or_create_chat(business_id, client_phone_number, session_key):
         """
@@ -593,3 +623,133 @@ Keep it friendly, clear, and make them feel good about their decision!
             print(f"[DEBUG] Error getting or creating chat: {str(e)}")
             traceback.print_exc()
             return None
+
+
+class BusinessAgent:
+    """
+    The parts of a LangChainAgent that depend only on the business: the LLM
+    client, the business-scoped tools and the OpenAIFunctionsAgent with its
+    compiled prompt. Shared by every conversation of the business.
+    """
+    
+    def __init__(self, business: Business, version=None):
+        print(f"[DEBUG] Building agent for business: {business.businessName} (ID: {business.businessId})")
+        self.business = business
+        self.version = version
+        self.built_at = time.monotonic()
+        
+        self.llm = self._initialize_llm()
+        self.tools = [
+            CheckAvailabilityTool(business=business),
+            BookAppointmentTool(business=business),
+            GetCurrentTimeTool(business=business),
+            CalculateTotalTool(business=business),
+            RescheduleAppointmentTool(),
+            CancelAppointmentTool()
+        ]
+        self.prompt = self._compile_prompt()
+        self.agent = OpenAIFunctionsAgent(
+            llm=self.llm,
+            tools=self.tools,
+            prompt=self.prompt
+        )
+        self._streaming_agent = None
+    
+    @property
+    def streaming_agent(self) -> OpenAIFunctionsAgent:
+        """The same agent on a streaming LLM, built on first use."""
+        if self._streaming_agent is None:
+            self._streaming_agent = OpenAIFunctionsAgent(
+                llm=self._initialize_llm(streaming=True),
+                tools=self.tools,
+                prompt=self.prompt
+            )
+        return self._streaming_agent
+    
+    def _initialize_llm(self, streaming: bool = False) -> ChatOpenAI:
+        """Initialize the LLM with appropriate settings."""
+        api_key = os.getenv('OPENAI_API_KEY')
+        model_name = getattr(settings, 'OPENAI_MODEL_NAME', 'gpt-4o')
+        
+        return ChatOpenAI(
+            temperature=0.7,
+            model=model_name,
+            api_key=api_key,
+            max_tokens=1024,
+            streaming=streaming,
+        )
+    
+    def _compile_prompt(self) -> ChatPromptTemplate:
+        """
+        Build the agent prompt around the business' static system prompt.
+        The per-turn context is a variable placed after the history, so the
+        system prompt and history are a stable prefix from turn to turn.
+        """
+        static_prompt = LangChainAgent.get_static_prompt(self.business)
+        print(f"[DEBUG] System prompt length: {len(static_prompt.text)} (digest {static_prompt.digest})")
+        
+        # Business data and instructions may contain braces; the prompt has no variables
+        template = static_prompt.text.replace('{', '{{').replace('}', '}}')
+        
+        return ChatPromptTemplate.from_messages([
+            ("system", template),
+            MessagesPlaceholder(variable_name="chat_history"),
+            ("system", "{turn_context}"),
+            HumanMessagePromptTemplate.from_template("{input}"),
+            MessagesPlaceholder(variable_name="agent_scratchpad"),
+        ])
+
+
+class AgentRegistry:
+    """
+    Process-local LRU of BusinessAgents keyed by businessId, bounded by
+    LANGCHAIN_AGENT_CACHE_SIZE.
+    
+    Entries are checked against the business' prompt version (see
+    ai_agent.prompts), which invalidate() bumps when the agent configuration
+    or business settings change (see ai_agent.signals), and rebuilt at least
+    every LANGCHAIN_AGENT_MAX_AGE seconds in case the shared cache is
+    per-process.
+    """
+    
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, business_id: str) -> BusinessAgent:
+        version = prompt_version(business_id)
+        max_age = getattr(settings, 'LANGCHAIN_AGENT_MAX_AGE', 300)
+        
+        with self._lock:
+            entry = self._entries.get(business_id)
+            if entry is not None and entry.version == version and time.monotonic() - entry.built_at < max_age:
+                self._entries.move_to_end(business_id)
+                return entry
+        
+        try:
+            business = Business.objects.get(businessId=business_id)
+        except Business.DoesNotExist:
+            raise ValueError(f"Business with ID {business_id} not found")
+        
+        # Built outside the lock; a concurrent build for the same business just wins or loses
+        entry = BusinessAgent(business, version)
+        
+        with self._lock:
+            self._entries[business_id] = entry
+            self._entries.move_to_end(business_id)
+            while len(self._entries) > getattr(settings, 'LANGCHAIN_AGENT_CACHE_SIZE', 64):
+                self._entries.popitem(last=False)
+        return entry
+    
+    def invalidate(self, business_id: str):
+        """Drop the cached prompts and agent for a business in every worker."""
+        invalidate_prompts(business_id)
+        with self._lock:
+            self._entries.pop(business_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+agent_registry = AgentRegistry()
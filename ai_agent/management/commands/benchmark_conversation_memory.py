@@ -0,0 +1,50 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Business
+from ai_agent.memory import ConversationMemory
+from ai_agent.models import Chat, Messages
+
+
+class Command(BaseCommand):
+    help = 'Times loading prompt history with windowed memory against replaying the full transcript, as a chat grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[20, 100, 200, 500], help='Chat lengths to measure')
+        parser.add_argument('--runs', type=int, default=20, help='Loads averaged per measurement')
+
+    def handle(self, *args, **options):
+        # The chats are throwaway; nothing written here is kept
+        with transaction.atomic():
+            user = User.objects.create(username='memory-benchmark', email='memory-benchmark@example.com')
+            business = Business.objects.create(user=user, businessName='Memory benchmark')
+
+            self.stdout.write('messages  windowed ms  sent  full-replay ms  sent')
+            for size in options['sizes']:
+                chat = Chat.objects.create(business=business, clientPhoneNumber=f"+1555{size:07d}", status='pending')
+                Messages.objects.bulk_create([
+                    Messages(chat=chat, role='user' if i % 2 == 0 else 'assistant', message=f"message {i}")
+                    for i in range(size)
+                ])
+
+                windowed_ms, memory = self.time_it(options['runs'], lambda: ConversationMemory(chat).load())
+                full_ms, transcript = self.time_it(
+                    options['runs'],
+                    lambda: list(Messages.objects.filter(chat=chat).order_by('createdAt').values_list('role', 'message')),
+                )
+                self.stdout.write(
+                    f"{size:8d}  {windowed_ms:11.2f}  {len(memory.messages):4d}  {full_ms:14.2f}  {len(transcript):4d}"
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
+
+    def time_it(self, runs, func):
+        started = time.perf_counter()
+        for _ in range(runs):
+            result = func()
+        return (time.perf_counter() - started) / runs * 1000, result
@@ -0,0 +1,215 @@
+"""
+Windowed conversation memory for the AI agents.
+
+Instead of replaying a whole chat on every turn, an agent gets the most
+recent messages verbatim plus a rolling summary of everything before them.
+The summary lives on Chat.summary under MEMORY_KEY as
+{'text': ..., 'throughId': <id of the last message folded into it>}.
+
+Loading costs one indexed query for the unsummarized tail of the chat,
+newest first and capped at AI_MEMORY_WINDOW + AI_MEMORY_SUMMARY_BATCH rows,
+and the verbatim part is trimmed to AI_MEMORY_TOKEN_BUDGET. Once more than
+AI_MEMORY_WINDOW + AI_MEMORY_SUMMARY_BATCH messages are unsummarized, the
+oldest ones are folded into the summary in the background by
+update_chat_summary, so the prompt stays the same size however long the
+chat gets.
+"""
+import os
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Chat, Messages
+
+
+MEMORY_KEY = 'conversationMemory'
+MEMORY_ROLES = ('user', 'assistant', 'tool')
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a cleaning business' booking assistant and a customer.
+
+Update the summary with the new messages below. Keep every fact that matters for serving the customer: their name and contact details, address, property details, the services, dates and prices discussed, bookings made or changed (with booking IDs), and anything they asked for or still need. Drop small talk. Write plain sentences, at most 200 words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text
+    return len(text) // 4 + 1 if text else 0
+
+
+def memory_state(chat):
+    summary = chat.summary if isinstance(chat.summary, dict) else {}
+    state = summary.get(MEMORY_KEY)
+    return state if isinstance(state, dict) else {}
+
+
+class ConversationMemory:
+    """The summary and recent messages of a chat, as sent to the model."""
+
+    def __init__(self, chat, window=None, batch=None, token_budget=None):
+        self.chat = chat
+        self.window = window or getattr(settings, 'AI_MEMORY_WINDOW', 20)
+        self.batch = batch or getattr(settings, 'AI_MEMORY_SUMMARY_BATCH', 10)
+        self.token_budget = token_budget or getattr(settings, 'AI_MEMORY_TOKEN_BUDGET', 3000)
+
+        state = memory_state(chat)
+        self.summary = state.get('text') or ''
+        self.through_id = state.get('throughId') or 0
+        self.messages = []
+        self.needs_summary = False
+
+    def load(self):
+        """
+        Read the unsummarized tail of the chat and keep the newest messages
+        that fit the token budget. Returns self.
+        """
+        limit = self.window + self.batch
+        rows = list(
+            Messages.objects.filter(chat=self.chat, role__in=MEMORY_ROLES, id__gt=self.through_id)
+            .order_by('-id')
+            .values('id', 'role', 'message', 'createdAt')[:limit]
+        )
+        self.needs_summary = len(rows) >= limit
+
+        budget = self.token_budget - estimate_tokens(self.summary)
+        kept = []
+        for row in rows:
+            cost = estimate_tokens(row['message'])
+            if kept and cost > budget:
+                break
+            budget -= cost
+            kept.append({
+                'id': row['id'],
+                'role': row['role'],
+                'content': row['message'],
+                'createdAt': row['createdAt'],
+            })
+
+        kept.reverse()
+        self.messages = kept
+        return self
+
+    def schedule_summary_update(self):
+        """Fold old messages into the summary off the request path, if due."""
+        if not self.needs_summary:
+            return
+        try:
+            from django_q.tasks import async_task
+            async_task('ai_agent.memory.update_chat_summary', self.chat.id)
+        except Exception as e:
+            print(f"[ERROR] Failed to queue conversation summary for chat {self.chat.id}: {str(e)}")
+
+
+def update_chat_summary(chat_id, window=None):
+    """
+    Fold every unsummarized message older than the verbatim window into
+    the chat's rolling summary. Returns the number of messages folded.
+    """
+    window = window or getattr(settings, 'AI_MEMORY_WINDOW', 20)
+    chunk_budget = getattr(settings, 'AI_MEMORY_TOKEN_BUDGET', 3000)
+
+    try:
+        chat = Chat.objects.get(id=chat_id)
+    except Chat.DoesNotExist:
+        return 0
+
+    state = memory_state(chat)
+    summary = state.get('text') or ''
+    through_id = state.get('throughId') or 0
+
+    pending = list(
+        Messages.objects.filter(chat=chat, role__in=MEMORY_ROLES, id__gt=through_id)
+        .order_by('id')
+        .values_list('id', 'role', 'message')
+    )
+    to_fold = pending[:-window] if len(pending) > window else []
+    if not to_fold:
+        return 0
+
+    try:
+        # Summarize in chunks so a long backlog never exceeds the budget
+        chunk, used = [], 0
+        for row in to_fold:
+            cost = estimate_tokens(row[2])
+            if chunk and used + cost > chunk_budget:
+                summary = summarize(summary, chunk)
+                through_id = chunk[-1][0]
+                chunk, used = [], 0
+            chunk.append(row)
+            used += cost
+        summary = summarize(summary, chunk)
+        through_id = chunk[-1][0]
+    except Exception as e:
+        print(f"[ERROR] Error summarizing chat {chat_id}: {str(e)}")
+        traceback.print_exc()
+        if through_id == (state.get('throughId') or 0):
+            return 0
+
+    save_memory_state(chat_id, summary, through_id)
+    return len([row for row in to_fold if row[0] <= through_id])
+
+
+def save_memory_state(chat_id, text, through_id):
+    """Store the rolling summary without clobbering other Chat.summary keys."""
+    with transaction.atomic():
+        chat = Chat.objects.select_for_update().get(id=chat_id)
+        summary = dict(chat.summary) if isinstance(chat.summary, dict) else {}
+        current = summary.get(MEMORY_KEY) or {}
+        if (current.get('throughId') or 0) > through_id:
+            # A newer summary was written meanwhile
+            return
+        summary[MEMORY_KEY] = {'text': text, 'throughId': through_id}
+        chat.summary = summary
+        chat.save(update_fields=['summary'])
+
+
+def update_summary(chat, changes, replace=False):
+    """
+    Write `changes` into Chat.summary under a row lock and save only that
+    field, so a rolling summary stored meanwhile is not overwritten. With
+    `replace`, every other booking key is dropped but the rolling summary is
+    still kept.
+    """
+    with transaction.atomic():
+        locked = Chat.objects.select_for_update().get(pk=chat.pk)
+        summary = locked.summary if isinstance(locked.summary, dict) else {}
+        if replace:
+            summary = preserve_memory(summary, dict(changes))
+        else:
+            summary = {**summary, **changes}
+        locked.summary = summary
+        locked.save(update_fields=['summary'])
+
+    chat.summary = locked.summary
+
+
+def preserve_memory(old_summary, new_summary):
+    """Carry the rolling summary over when Chat.summary is replaced wholesale."""
+    if isinstance(old_summary, dict) and MEMORY_KEY in old_summary and isinstance(new_summary, dict):
+        new_summary = {**new_summary, MEMORY_KEY: old_summary[MEMORY_KEY]}
+    return new_summary
+
+
+def summarize(summary, rows):
+    """Ask the model to extend `summary` with `rows` of (id, role, message)."""
+    from langchain_openai import ChatOpenAI
+
+    transcript = "\n".join(
+        f"{'Customer' if role == 'user' else 'Assistant' if role == 'assistant' else 'Tool'}: {message}"
+        for _, role, message in rows
+    )
+    llm = ChatOpenAI(
+        temperature=0,
+        model=getattr(settings, 'AI_MEMORY_SUMMARY_MODEL', 'gpt-4o-mini'),
+        api_key=os.getenv('OPENAI_API_KEY'),
+        max_tokens=400,
+    )
+    response = llm.invoke(SUMMARY_PROMPT.format(summary=summary or "(none yet)", messages=transcript))
+    return response.content.strip()
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0045_thumbtackprofile_business_info_last_refresh_and_more'),
+        ('ai_agent', '0017_remove_agentconfiguration_prompt_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboundSMS',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('messageSid', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('fromNumber', models.CharField(max_length=20)),
+                ('toNumber', models.CharField(blank=True, max_length=20)),
+                ('body', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('receivedAt', models.DateTimeField(auto_now_add=True)),
+                ('startedAt', models.DateTimeField(blank=True, null=True)),
+                ('finishedAt', models.DateTimeField(blank=True, null=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbound_sms', to='accounts.business')),
+            ],
+            options={
+                'verbose_name': 'Inbound SMS',
+                'verbose_name_plural': 'Inbound SMS',
+                'indexes': [models.Index(fields=['business', 'fromNumber', 'status'], name='ai_agent_in_busines_070837_idx'), models.Index(fields=['status', 'receivedAt'], name='ai_agent_in_status_7bb6fa_idx')],
+            },
+        ),
+    ]
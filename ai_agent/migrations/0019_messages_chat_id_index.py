@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0018_inboundsms'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='messages',
+            index=models.Index(fields=['chat', 'id'], name='ai_agent_me_chat_id_ea4f90_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0019_messages_chat_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='statusMessageId',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_agent', '0021_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='summaryMessageId',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
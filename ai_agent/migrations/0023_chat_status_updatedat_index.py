@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0045_thumbtackprofile_business_info_last_refresh_and_more'),
+        ('ai_agent', '0022_chat_summarymessageid'),
+        ('automation', '0029_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['status', 'updatedAt'], name='ai_agent_ch_status_bf632b_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils import timezone
 
+from accounts.phone import PhoneIndexedModel
+
 
 CHAT_ROLE_CHOICES = (
     ('user', 'User'),
@@ -21,6 +23,13 @@ MODE_CHOICES = (
     ('test', 'Test')
 )
 
+INBOUND_SMS_STATUS_CHOICES = (
+    ('pending', 'Pending'),
+    ('processing', 'Processing'),
+    ('done', 'Done'),
+    ('failed', 'Failed')
+)
+
 class Messages(models.Model):
     chat = models.ForeignKey('Chat', on_delete=models.CASCADE, related_name='messages', null=True, blank=True)
     role = models.CharField(max_length=20, choices=CHAT_ROLE_CHOICES)
@@ -31,10 +40,18 @@ class Messages(models.Model):
 
     createdAt = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Tail of a chat's history, see ai_agent.memory
+            models.Index(fields=['chat', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.role}: {self.message}"
 
-class Chat(models.Model):
+class Chat(PhoneIndexedModel):
+    PHONE_FIELD = 'clientPhoneNumber'
+
     lead = models.ForeignKey('automation.Lead', on_delete=models.CASCADE, null=True, blank=True)
     clientPhoneNumber = models.CharField(max_length=15, null=True, blank=True) #If chat is initiated from lead
     sessionKey = models.CharField(max_length=255, null=True, blank=True, unique=True) #If chat is initiated from session
@@ -43,9 +60,17 @@ class Chat(models.Model):
     summary = models.JSONField(null=True, blank=True, default=dict)
 
     status = models.CharField(max_length=20, choices=CHAT_STATUS_CHOICES)
+    statusMessageId = models.BigIntegerField(null=True, blank=True)  # Last message considered by ai_agent.chat_status
+    summaryMessageId = models.BigIntegerField(null=True, blank=True)  # Last message covered by ai_agent.summary_extraction
 
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'phone_e164']),
+            models.Index(fields=['status', 'updatedAt']),
+        ]
     
     def __str__(self):
         return f"{self.clientPhoneNumber} - {self.business.businessName}"
@@ -64,4 +89,35 @@ class AgentConfiguration(models.Model):
     
     def __str__(self):
         return f"Agent Config for {self.business.businessName}"
-    
\ No newline at end of file
+    
+
+
+class InboundSMS(models.Model):
+    """
+    Durable queue entry for an inbound Twilio SMS. The webhook stores the
+    text before acknowledging Twilio; ai_agent.sms_pipeline processes it.
+    """
+    business = models.ForeignKey('accounts.Business', on_delete=models.CASCADE, related_name='inbound_sms')
+    messageSid = models.CharField(max_length=64, null=True, blank=True, unique=True)
+    fromNumber = models.CharField(max_length=20)
+    toNumber = models.CharField(max_length=20, blank=True)
+    body = models.TextField(blank=True)
+
+    status = models.CharField(max_length=20, choices=INBOUND_SMS_STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    receivedAt = models.DateTimeField(auto_now_add=True)
+    startedAt = models.DateTimeField(null=True, blank=True)
+    finishedAt = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Inbound SMS"
+        verbose_name_plural = "Inbound SMS"
+        indexes = [
+            models.Index(fields=['business', 'fromNumber', 'status']),
+            models.Index(fields=['status', 'receivedAt']),
+        ]
+
+    def __str__(self):
+        return f"{self.fromNumber} -> {self.business_id} ({self.status})"
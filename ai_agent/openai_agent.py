@@ -14,8 +14,13 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404
 
 from accounts.models import Business, CustomAddons
+from accounts.phone import filter_by_phone
 from bookings.models import Booking
 from .models import Chat, Messages, AgentConfiguration
+from .memory import ConversationMemory, update_summary
+from .prompts import get_static_prompt, turn_context
+from .summary_extraction import empty_summary, extract_booking_summary, extract_fields, format_transcript
+from .tool_runner import ToolContext, run_tool_calls
 from .api_views import check_availability, book_appointment, get_current_time, calculate_total, reschedule_appointment, cancel_appointment
 from .utils import convert_date_str_to_date
 import re
@@ -150,8 +155,27 @@ class OpenAIAgent:
     
     @staticmethod
     def get_dynamic_system_prompt(business_id):
-        """Generate a dynamic system prompt based on the business and agent configuration
-        stored in the database. Falls back to default prompt if no configuration exists.
+        """Get the business' system prompt, rendered once per configuration
+        change and cached (see ai_agent.prompts).
+        
+        Args:
+            business_id: The ID of the business to get the prompt for
+            
+        Returns:
+            String containing the system prompt, or 0 if no configuration exists
+        """
+        try:
+            static_prompt = get_static_prompt('openai', business_id, lambda: OpenAIAgent.build_static_prompt(business_id))
+            return static_prompt.text or 0
+        except Exception as e:
+            print(f"Error getting system prompt: {str(e)}")
+            print(traceback.format_exc())
+            return 0
+    
+    @staticmethod
+    def build_static_prompt(business_id):
+        """Generate the system prompt from the business and agent configuration
+        stored in the database. Nothing in it may change between turns.
         
         Args:
             business_id: The ID of the business to generate the prompt for
@@ -318,10 +342,7 @@ class OpenAIAgent:
         except Business.DoesNotExist:
             # Business doesn't exist, return 0 to indicate this
             return 0
-        except Exception as e:
-            print(f"Error generating dynamic system prompt: {str(e)}")
-            print(traceback.format_exc())
-            return 0
+        # Any other error propagates so that it is not cached as "no prompt"
     
     @staticmethod
     def get_or_create_chat(business_id, client_phone_number, session_key):
@@ -398,12 +419,31 @@ class OpenAIAgent:
             return None
     
     @staticmethod
-    def get_chat_messages(client_phone_number, session_key):
+    def resolve_chat(client_phone_number, session_key):
+        """Get the most recent chat for a phone number or session key
+        
+        Args:
+            client_phone_number: The phone number of the client
+            session_key: The session key of the client
+        Returns:
+            Chat object, or None if there is none
+        """
+        if client_phone_number:
+            chats = filter_by_phone(Chat.objects.all(), client_phone_number)
+        elif session_key:
+            chats = Chat.objects.filter(sessionKey=session_key)
+        else:
+            return None
+        return chats.order_by('-createdAt').first()
+    
+    @staticmethod
+    def get_chat_messages(client_phone_number, session_key, chat=None):
         """Get all messages for a chat session
         
         Args:
             client_phone_number: The phone number of the client
             session_key: The session key of the client
+            chat: Optional chat already resolved by the caller
         Returns:
             List of message dictionaries or empty list if error
         """
@@ -411,38 +451,10 @@ class OpenAIAgent:
             print(f"[DEBUG] get_chat_messages called with client_phone_number={client_phone_number}, session_key={session_key}")
             
             # Get the chat object
-            if client_phone_number:
-                # Check if multiple chats exist for this phone number
-                chats = Chat.objects.filter(clientPhoneNumber=client_phone_number)
-                if chats.count() > 1:
-                    print(f"[WARNING] Found {chats.count()} chats for phone number {client_phone_number} in get_chat_messages. Using the most recent one.")
-                    # Log the chat IDs for debugging
-                    for i, chat in enumerate(chats):
-                        print(f"[DEBUG] Chat {i+1}: ID={chat.id}, Created={chat.createdAt}")
-                    
-                    # Get the most recent chat
-                    chat = chats.order_by('-createdAt').first()
-                elif chats.count() == 0:
-                    print(f"[DEBUG] No chat found for phone number: {client_phone_number}")
-                    return []
-                else:
-                    chat = chats.first()
-            else:
-                # Check if multiple chats exist for this session key
-                chats = Chat.objects.filter(sessionKey=session_key)
-                if chats.count() > 1:
-                    print(f"[WARNING] Found {chats.count()} chats for session key {session_key} in get_chat_messages. Using the most recent one.")
-                    # Log the chat IDs for debugging
-                    for i, chat in enumerate(chats):
-                        print(f"[DEBUG] Chat {i+1}: ID={chat.id}, Created={chat.createdAt}")
-                    
-                    # Get the most recent chat
-                    chat = chats.order_by('-createdAt').first()
-                elif chats.count() == 0:
-                    print(f"[DEBUG] No chat found for session key: {session_key}")
-                    return []
-                else:
-                    chat = chats.first()
+            chat = chat or OpenAIAgent.resolve_chat(client_phone_number, session_key)
+            if chat is None:
+                print(f"[DEBUG] No chat found for phone number {client_phone_number} or session key {session_key}")
+                return []
             
             print(f"[DEBUG] Getting messages for chat ID={chat.id}")
             
@@ -479,12 +491,15 @@ class OpenAIAgent:
             return []
     
     @staticmethod
-    def format_messages_for_openai(messages, system_prompt):
+    def format_messages_for_openai(messages, system_prompt, summary=None, context=None):
         """Format messages for OpenAI API
         
         Args:
             messages: List of message dictionaries
             system_prompt: System prompt to use
+            summary: Optional summary of the conversation before `messages`
+            context: Optional per-turn context, placed before the newest user message
+                so that everything before it stays the same from turn to turn
             
         Returns:
             List of message dictionaries formatted for OpenAI API
@@ -494,6 +509,11 @@ class OpenAIAgent:
             formatted_messages = [
                 {"role": "system", "content": system_prompt}
             ]
+            if summary:
+                formatted_messages.append({
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation: {summary}"
+                })
             
             # Add all user and assistant messages, convert tool messages to assistant
             for msg in messages:
@@ -522,6 +542,12 @@ class OpenAIAgent:
                                 "content": content
                             })
             
+            if context:
+                position = len(formatted_messages)
+                if formatted_messages[-1]['role'] == 'user':
+                    position -= 1
+                formatted_messages.insert(position, {"role": "system", "content": context})
+            
             return formatted_messages
             
         except Exception as e:
@@ -530,7 +556,7 @@ class OpenAIAgent:
             return [{"role": "system", "content": system_prompt}]
     
     @staticmethod
-    def execute_tool_call(tool_name, tool_args_raw, client_phone_number, business, session_key=None):
+    def execute_tool_call(tool_name, tool_args_raw, client_phone_number, business, session_key=None, chat=None):
         """Execute a tool call from the OpenAI API
         
         Args:
@@ -539,6 +565,7 @@ class OpenAIAgent:
             client_phone_number: The phone number of the client
             business: The business object
             session_key: Optional session key for web chat
+            chat: Optional chat already resolved for this turn
             
         Returns:
             String with the result of the tool call
@@ -601,67 +628,20 @@ class OpenAIAgent:
                 print(f"[DEBUG] Using client_phone_number={client_phone_number}, session_key={session_key}")
                 
                 try:
-                    # Handle potential multiple chats
-                    if client_phone_number:
-                        chats = Chat.objects.filter(clientPhoneNumber=client_phone_number)
-                        if chats.count() > 1:
-                            print(f"[WARNING] Found {chats.count()} chats for phone number {client_phone_number} in calculateTotal. Using the most recent one.")
-                            chat = chats.order_by('-createdAt').first()
-                        elif chats.count() == 0:
-                            return json.dumps({
-                                "success": False,
-                                "message": "No chat found for this phone number. Please try again."
-                            }, cls=DecimalEncoder)
-                        else:
-                            chat = chats.first()
-                    elif session_key:
-                        chats = Chat.objects.filter(sessionKey=session_key)
-                        if chats.count() > 1:
-                            print(f"[WARNING] Found {chats.count()} chats for session key {session_key} in calculateTotal. Using the most recent one.")
-                            chat = chats.order_by('-createdAt').first()
-                        elif chats.count() == 0:
-                            return json.dumps({
-                                "success": False,
-                                "message": "No chat found for this session. Please try again."
-                            }, cls=DecimalEncoder)
-                        else:
-                            chat = chats.first()
-                    else:
+                    chat = chat or OpenAIAgent.resolve_chat(client_phone_number, session_key)
+                    if chat is None:
                         return json.dumps({
                             "success": False,
-                            "message": "No client identifier found. Please try again."
+                            "message": "No chat found for this conversation. Please try again."
                         }, cls=DecimalEncoder)
                     
-                    # Get chat messages and format for summary extraction
-                    messages = OpenAIAgent.get_chat_messages(client_phone_number, session_key)
-                    formatted_messages = []
-                    for msg in messages:
-                        if isinstance(msg, dict) and 'role' in msg:
-                            # Handle different message formats
-                            content = msg.get('content') or msg.get('message')
-                            if content:
-                                formatted_messages.append({
-                                    'role': msg['role'],
-                                    'content': content
-                                })
-                        
-                    # Extract summary from conversation
-                    summary = OpenAIAgent.extract_conversation_summary(formatted_messages, business.businessId)
-                
-                    
-                    # Save summary to chat object
-                    chat.summary = summary
-                    chat.save()
+                    # Bring the booking details up to date with the messages since the last extraction
+                    extract_booking_summary(chat)
                 
                   
                     
-                    # Get the chat using either phone number or session key
-                    if client_phone_number:
-                        # Call the calculate_total function from api_views.py
-                        result = calculate_total(business, client_phone_number=client_phone_number)
-                    else:
-                        # For session-based chats, we need to retrieve the chat and then call calculate_total
-                        result = calculate_total(business, session_key=session_key)
+                    # Call the calculate_total function from api_views.py with the chat resolved above
+                    result = calculate_total(business, client_phone_number=client_phone_number, session_key=session_key, chat=chat)
                     
                     return json.dumps(result, cls=DecimalEncoder)
                 except Exception as e:
@@ -675,78 +655,22 @@ class OpenAIAgent:
             elif tool_name == 'bookAppointment':
                 # Extract summary from conversation
                 try:
-                    # Handle potential multiple chats
-                    if client_phone_number:
-                        chats = Chat.objects.filter(clientPhoneNumber=client_phone_number)
-                        if chats.count() > 1:
-                            print(f"[WARNING] Found {chats.count()} chats for phone number {client_phone_number} in bookAppointment. Using the most recent one.")
-                            chat = chats.order_by('-createdAt').first()
-                        elif chats.count() == 0:
-                            return json.dumps({
-                                "success": False,
-                                "message": "No chat found for this phone number. Please try again."
-                            })
-                        else:
-                            chat = chats.first()
-                    elif session_key:
-                        chats = Chat.objects.filter(sessionKey=session_key)
-                        if chats.count() > 1:
-                            print(f"[WARNING] Found {chats.count()} chats for session key {session_key} in bookAppointment. Using the most recent one.")
-                            chat = chats.order_by('-createdAt').first()
-                        elif chats.count() == 0:
-                            return json.dumps({
-                                "success": False,
-                                "message": "No chat found for this session. Please try again."
-                            })
-                        else:
-                            chat = chats.first()
-                    else:
+                    chat = chat or OpenAIAgent.resolve_chat(client_phone_number, session_key)
+                    if chat is None:
                         return json.dumps({
                             "success": False,
-                            "message": "No client identifier found. Please try again."
+                            "message": "No chat found for this conversation. Please try again."
                         })
                     
-                    # Get chat messages and format for summary extraction
-                    messages = OpenAIAgent.get_chat_messages(client_phone_number, session_key)
-                    formatted_messages = []
-                    for msg in messages:
-                        if isinstance(msg, dict) and 'role' in msg:
-                            # Handle different message formats
-                            content = msg.get('content') or msg.get('message')
-                            if content:
-                                formatted_messages.append({
-                                    'role': msg['role'],
-                                    'content': content
-                                })
-                        
-                    # Extract summary from conversation
-                    summary = OpenAIAgent.extract_conversation_summary(formatted_messages, business.businessId)
-                    
-                  
-                    # Save summary to chat object
-                    chat.summary = summary
-                    chat.save()
+                    # Bring the booking details up to date with the messages since the last extraction
+                    extract_booking_summary(chat)
                     
                  
                    
-                    if client_phone_number:
-                        result = book_appointment(business, client_phone_number=client_phone_number)
-                        
-                    elif session_key:
-                        result = book_appointment(business, session_key=session_key)
-
-
-                    else:
-                        result = {
-                            "success": False,
-                            "error": "No phone number or session key available"
-                        }
+                    result = book_appointment(business, client_phone_number=client_phone_number, session_key=session_key, chat=chat)
                     if result.get('success') and result.get('booking_id'):
                         # Update summary with booking ID
-                        if not isinstance(chat.summary, dict):
-                            chat.summary = {}
-                        chat.summary['bookingId'] = result.get('booking_id')
-                        chat.save()
+                        update_summary(chat, {'bookingId': result.get('booking_id')})
                         print(f"[DEBUG] Updated chat summary with booking ID: {result.get('booking_id')}")
                 
                     return json.dumps(result)
@@ -950,7 +874,7 @@ class OpenAIAgent:
         return tools
     
     @staticmethod
-    def process_ai_response(response, client_phone_number, business, session_key=None):
+    def process_ai_response(response, client_phone_number, business, session_key=None, chat=None):
         """Process the AI response from OpenAI API
         
         Args:
@@ -958,6 +882,7 @@ class OpenAIAgent:
             client_phone_number: The phone number of the client
             business: The business object
             session_key: The session key for web chat (added parameter)
+            chat: Optional chat already resolved by the caller
             
         Returns:
             Dictionary with response content and any tool call results
@@ -972,33 +897,19 @@ class OpenAIAgent:
             if tool_calls:
                 print(f"[DEBUG] Found {len(tool_calls)} tool calls in response")
                 
-                # Process each tool call
-                tool_call_results = []
-                for tool_call in tool_calls:
-                    try:
-                        # Execute the tool call
-                        result = OpenAIAgent.execute_tool_call(
-                            tool_call.function.name,
-                            tool_call.function.arguments,
-                            client_phone_number,
-                            business,
-                            session_key  # Pass session_key to execute_tool_call
-                        )
-                        
-                        # Add to results
-                        tool_call_results.append({
-                            'tool_call_id': tool_call.id,
-                            'result': result
-                        })
-                    except Exception as e:
-                        print(f"[ERROR] Error executing tool call: {str(e)}")
-                        traceback.print_exc()
-                        tool_call_results.append({
-                            'tool_call_id': tool_call.id,
-                            'result': json.dumps({
-                                "error": f"Error executing tool call: {str(e)}"
-                            })
-                        })
+                # Resolve the chat once for every tool of this turn
+                chat = chat or OpenAIAgent.resolve_chat(client_phone_number, session_key)
+                print(f"[DEBUG] Using chat ID={chat.id if chat else 'None'} in process_ai_response")
+                context = ToolContext(business, chat, client_phone_number, session_key)
+                
+                # Independent tool calls run concurrently (see ai_agent.tool_runner)
+                tool_call_results = run_tool_calls(
+                    tool_calls,
+                    context,
+                    lambda name, arguments, ctx: OpenAIAgent.execute_tool_call(
+                        name, arguments, ctx.client_phone_number, ctx.business, ctx.session_key, chat=ctx.chat
+                    )
+                )
                 
                 # Now we need to generate a follow-up response based on the tool results
                 # First, prepare the messages for the follow-up call
@@ -1023,51 +934,7 @@ class OpenAIAgent:
                 """
                 messages.append({"role": "system", "content": system_prompt})
                 
-                # Get the chat using either phone number or session key
                 try:
-                    # Handle getting the chat based on available identifiers
-                    print(f"[DEBUG] process_ai_response trying to get chat with client_phone_number={client_phone_number} or session_key={session_key}")
-                    
-                    # Ensure we have access to the models
-                    from .models import Chat, Messages, AgentConfiguration
-                    print(f"[DEBUG] Successfully imported models")
-                    
-                    if client_phone_number:
-                        # Handle potential multiple chats with the same phone number
-                        chats = Chat.objects.filter(clientPhoneNumber=client_phone_number)
-                        print(f"[DEBUG] Found {chats.count()} chats with phone number {client_phone_number}")
-                        if chats.count() > 1:
-                            print(f"[WARNING] Found {chats.count()} chats for phone number {client_phone_number} in process_ai_response. Using the most recent one.")
-                            chat = chats.order_by('-createdAt').first()
-                            # Print chat details for debugging
-                            print(f"[DEBUG] Selected chat ID={chat.id}, created={chat.createdAt}, clientPhone={chat.clientPhoneNumber}, sessionKey={chat.sessionKey}")
-                        elif chats.count() == 0:
-                            chat = None
-                            print(f"[WARNING] No chat found for phone number {client_phone_number}")
-                        else:
-                            chat = chats.first()
-                            print(f"[DEBUG] Selected chat ID={chat.id}, created={chat.createdAt}, clientPhone={chat.clientPhoneNumber}, sessionKey={chat.sessionKey}")
-                    elif session_key:
-                        # Handle potential multiple chats with the same session key
-                        chats = Chat.objects.filter(sessionKey=session_key)
-                        print(f"[DEBUG] Found {chats.count()} chats with session key {session_key}")
-                        if chats.count() > 1:
-                            print(f"[WARNING] Found {chats.count()} chats for session key {session_key} in process_ai_response. Using the most recent one.")
-                            chat = chats.order_by('-createdAt').first()
-                            # Print chat details for debugging
-                            print(f"[DEBUG] Selected chat ID={chat.id}, created={chat.createdAt}, clientPhone={chat.clientPhoneNumber}, sessionKey={chat.sessionKey}")
-                        elif chats.count() == 0:
-                            chat = None
-                            print(f"[WARNING] No chat found for session key {session_key}")
-                        else:
-                            chat = chats.first()
-                            print(f"[DEBUG] Selected chat ID={chat.id}, created={chat.createdAt}, clientPhone={chat.clientPhoneNumber}, sessionKey={chat.sessionKey}")
-                    else:
-                        chat = None
-                        print("[WARNING] No client phone number or session key provided in process_ai_response.")
-                        
-                    print(f"[DEBUG] Using chat ID={chat.id if chat else 'None'} in process_ai_response")
-                
                     # Add context about the current conversation state to help the AI continue properly
                     if chat and hasattr(chat, 'summary') and chat.summary:
                         # Extract relevant context from the chat summary
@@ -1099,7 +966,7 @@ class OpenAIAgent:
                         messages.append({"role": "system", "content": context_prompt})
                         
                 except Exception as e:
-                    print(f"[ERROR] Error retrieving chat in process_ai_response: {str(e)}")
+                    print(f"[ERROR] Error adding conversation context in process_ai_response: {str(e)}")
                     traceback.print_exc()
                 
                 # Add the original assistant message with tool calls
@@ -1127,7 +994,6 @@ class OpenAIAgent:
                 try:
                     # Call OpenAI again to generate a response based on the tool results
                     print(f"[DEBUG] Calling OpenAI to generate response based on tool results")
-                    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
                     follow_up_response = client.chat.completions.create(
                         model="gpt-4o",
                         messages=messages,
@@ -1172,7 +1038,9 @@ class OpenAIAgent:
     @staticmethod
     def extract_conversation_summary(chat_history, business_id=None):
         """
-        Extract key information from the conversation history for booking purposes using OpenAI LLM.
+        Extract key information from a whole conversation for booking purposes using OpenAI LLM.
+        For a saved chat, use ai_agent.summary_extraction.extract_booking_summary, which only
+        sends the messages since the last extraction.
         
         Args:
             chat_history: List of message dictionaries with 'role' and 'content' or 'message' keys
@@ -1180,166 +1048,21 @@ class OpenAIAgent:
         Returns:
             Dictionary with extracted customer information
         """
-        
-
-
-        # Initialize empty summary with default values
-        summary = {
-            'firstName': '',
-            'lastName': '',
-            'email': '',
-            'phoneNumber': '',
-            'address1': '',
-            'city': '',
-            'state': '',
-            'zipCode': '',
-            'squareFeet': '',
-            'bedrooms': '',
-            'bathrooms': '',
-            'serviceType': '',
-            'appointmentDateTime': '',
-            'convertedDateTime': '',
-            'otherRequests': '',
-            'detailSummary': '',
-            "addonDishes": '',
-            "addonLaundryLoads": '',
-            "addonWindowCleaning": '',
-            "addonPetsCleaning": '',
-            "addonFridgeCleaning": '',
-            "addonOvenCleaning": '',
-            "addonBaseboard": '',
-            "addonBlinds": '',
-            "addonGreenCleaning": '',
-            "addonCabinetsCleaning": '',
-            "addonPatioSweeping": '',
-            "addonGarageSweeping": '',
-            'bookingId': ''
-        }
-        
-
+        custom_addons = []
         if business_id:
-            business = Business.objects.get(businessId=business_id)
-            customAddons = CustomAddons.objects.filter(business=business)
-            custom_addon_fields = "\n".join([f'            - {addon.addonDataName}: Quantity of {addon.addonName} Addon' for addon in customAddons])
-            for addon in customAddons:
-                summary[addon.addonDataName] = ''
-
-        try:
-            print(f"[DEBUG] Starting conversation summary extraction at {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')}")
-            
-            # Filter to only include user and assistant messages - process all messages without limit
-            filtered_messages = []
-            for msg in chat_history:  # Process all messages
-                # Handle different message formats
-                if isinstance(msg, dict):
-                    role = msg.get('role')
-                    # Try to get content from either 'content' or 'message' key
-                    content = msg.get('content') or msg.get('message')
-                    
-                    if role and content:
-                        filtered_messages.append({'role': role, 'content': content})
-                        
-            # Log the message processing results
-            print(f"[DEBUG] Processed {len(chat_history)} messages into {len(filtered_messages)} filtered messages")
-            
-            # Skip if conversation is too short
-            if len(filtered_messages) < 2:
-                print(f"[DEBUG] Conversation too short to extract summary: {len(filtered_messages)} messages")
-                return summary
-                
-            # Join messages into a single text for analysis, but with clear role indicators
-            conversation_text = ""
-            for msg in filtered_messages:
-                role = "Customer" if msg['role'] == 'user' else "Agent"
-                conversation_text += f"{role}: {msg['content']}\n"
-            
-            print(f"[DEBUG] Extracting summary from conversation: {len(conversation_text)} chars, {len(filtered_messages)} messages")
-            
-            # Create a detailed system prompt for OpenAI to extract comprehensive information
-            system_prompt = f"""
-            You are an AI assistant for Cleaning Biz, a professional cleaning service. Your task is to extract specific customer booking information from this conversation.
-            Analyze the entire conversation history carefully and extract all relevant details.
-            
-            Respond ONLY with a valid JSON object containing these keys (leave empty if not found):
-            - firstName: Customer's first name
-            - lastName: Customer's last name empty if not found
-            - email: Customer's email address
-            - phoneNumber: Customer's phone number with country code without any spaces or dashes
-            - address1: Street address (just the street part, no city/state/zip)
-            - city: City name
-            - state: State
-            - zipCode: 5-digit or 9-digit zip code
-            - squareFeet: Square footage of the property as a Decimal string
-            - bedrooms: Number of bedrooms as a Decimal string
-            - bathrooms: Number of bathrooms as a Decimal string
-            - serviceType: Type of service requested (e.g., "regular cleaning", "deep cleaning", "move-in")
-            - appointmentDateTime: Appointment date and time in ANY format mentioned in the conversation
-            - convertedDateTime: Convert Appointment date and time to a standard format (YYYY-MM-DD HH:MM) Current Time is: {get_current_time()}
-            - otherRequests: Any special requests or notes
-            - detailSummary: Summary of the Whole conversation
-            - addonDishes: Quantity of Dishes Addon
-            - addonLaundryLoads: Quantity of Laundry Loads Addon
-            - addonWindowCleaning: Quantity of Window Cleaning Addon
-            - addonPetsCleaning: Quantity of Pets Cleaning Addon
-            - addonFridgeCleaning: Quantity of Fridge Cleaning Addon
-            - addonOvenCleaning: Quantity of Oven Cleaning Addon
-            - addonBaseboard: Quantity of Baseboard Addon
-            - addonBlinds: Quantity of Blinds Addon
-            - addonGreenCleaning: Quantity of Green Cleaning Addon
-            - addonCabinetsCleaning: Quantity of Cabinets Cleaning Addon
-            - addonPatioSweeping: Quantity of Patio Sweeping Addon
-            - addonGarageSweeping: Quantity of Garage Sweeping Addon
-            {custom_addon_fields}
-            
-            - bookingId: Booking ID if available
-
-            ONLY return a valid JSON object. No explanations or additional text.
-            If you cannot determine a value, leave it as an empty string.
-            """
-            
-            # Initialize OpenAI client
-            client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-            
-            # Call OpenAI API for extraction with full token allocation for comprehensive extraction
-            response = client.chat.completions.create(
-                model="gpt-4o",  # Using the most capable model for accurate extraction
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": conversation_text}
-                ],
-                temperature=0.1,  # Low temperature for more deterministic extraction
-             
-                response_format={"type": "json_object"}
-            )
-            
-            print(f"[DEBUG] Extraction API call completed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')}")
-            
-            # Extract the response content
-            extracted_info = response.choices[0].message.content
-            print(f"[DEBUG] Raw extraction response: {extracted_info[:200]}...")
-            
-            try:
-                # Parse the JSON response
-                extracted_data = json.loads(extracted_info)
-                
-                # Update summary with extracted data
-                for key, value in extracted_data.items():
-                    if key in summary and value:
-                        summary[key] = value
-          
-                return summary
-                
-            except json.JSONDecodeError as e:
-                print(f"[ERROR] Error parsing extracted information: {str(e)}")
-                print(f"[ERROR] Raw extraction response: {extracted_info}")
-            
-        except Exception as e:
-            print(f"[ERROR] Error extracting conversation summary: {str(e)}")
-            print(traceback.format_exc())
-        
+            custom_addons = list(CustomAddons.objects.filter(business__businessId=business_id))
         
+        rows = [
+            (msg.get('role'), msg.get('content') or msg.get('message'))
+            for msg in chat_history
+            if isinstance(msg, dict)
+        ]
+        rows = [(role, content) for role, content in rows if role and content]
+        if len(rows) < 2:
+            print(f"[DEBUG] Conversation too short to extract summary: {len(rows)} messages")
+            return empty_summary(custom_addons)
         
-        return summary
+        return extract_fields({}, format_transcript(rows), custom_addons) or empty_summary(custom_addons)
 
 
 # Django views for OpenAI chat
@@ -1470,11 +1193,13 @@ def chat_api(request):
         # Get the system prompt
         system_prompt = OpenAIAgent.get_dynamic_system_prompt(business_id)
       
-        # Get all messages for this chat
-        messages = OpenAIAgent.get_chat_messages(client_phone_number, session_key)
+        # Get the conversation summary and the most recent messages for this chat
+        memory = ConversationMemory(chat).load()
         
         # Format messages for OpenAI
-        formatted_messages = OpenAIAgent.format_messages_for_openai(messages, system_prompt)
+        formatted_messages = OpenAIAgent.format_messages_for_openai(
+            memory.messages, system_prompt, memory.summary, context=turn_context(chat)
+        )
         
         # Call OpenAI API
         try:
@@ -1488,7 +1213,7 @@ def chat_api(request):
             
             # Process the response
             business = Business.objects.get(businessId=business_id)
-            ai_response = OpenAIAgent.process_ai_response(response, client_phone_number, business, session_key)
+            ai_response = OpenAIAgent.process_ai_response(response, client_phone_number, business, session_key, chat=chat)
             
             # Save the assistant message - only if ai_response is not None or empty
             if ai_response:
@@ -1499,6 +1224,7 @@ def chat_api(request):
                     message=ai_response['content'],
                     mode=mode
                 )
+                memory.schedule_summary_update()
 
                 # Add the assistant message to formatted_messages for summary extraction
                 formatted_messages.append({
@@ -1631,7 +1357,7 @@ def delete_chat(request, client_phone_number):
     """
     try:
         # Get the chat object
-        chat = Chat.objects.get(clientPhoneNumber=client_phone_number)
+        chat = filter_by_phone(Chat.objects.all(), client_phone_number).get()
         
         # Delete all messages for this chat
         Messages.objects.filter(chat=chat).delete()
@@ -0,0 +1,107 @@
+"""
+Compiled system prompts for the AI agents.
+
+The business part of a prompt (persona, instructions, pricing, services and
+add-ons) only changes when a Business, AgentConfiguration, BusinessSettings
+or CustomAddons row is saved, so it is rendered once per business and cached
+under a per-business version that ai_agent.signals bumps on those saves.
+The bump only reaches other processes through a shared cache; with the
+default process-local cache a prompt is kept at most LANGCHAIN_AGENT_MAX_AGE
+seconds, the same age at which cached agents are rebuilt.
+
+What changes from turn to turn (the current date and time, the lead the
+chat was started for) is rendered by turn_context() and sent as a separate
+message after the conversation history. The long static prefix is then
+byte-identical on every turn, which lets provider-side prompt caching match
+it.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+VERSION_CACHE_KEY = 'ai_agent:prompt_version:{}'
+PROMPT_CACHE_KEY = 'ai_agent:prompt:{}:{}:{}'
+
+
+class CompiledPrompt:
+    """The static prompt of one business, with the version it was built for."""
+
+    def __init__(self, text, version):
+        self.text = text
+        self.version = version
+        self.digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def prompt_version(business_id):
+    key = VERSION_CACHE_KEY.format(business_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_prompts(business_id):
+    """Make every worker rebuild the prompts of a business on next use."""
+    cache.set(VERSION_CACHE_KEY.format(business_id), time.time_ns(), None)
+
+
+def prompt_ttl():
+    """How long a compiled prompt is kept: capped when the cache is per process."""
+    ttl = getattr(settings, 'AI_PROMPT_CACHE_TTL', 60 * 60 * 24)
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith(('LocMemCache', 'DummyCache')):
+        ttl = min(ttl, getattr(settings, 'LANGCHAIN_AGENT_MAX_AGE', 300))
+    return ttl
+
+
+def get_static_prompt(kind, business_id, build):
+    """
+    The cached static prompt of `kind` for a business. `build` is called
+    with no arguments on a miss and returns the prompt text.
+    """
+    version = prompt_version(business_id)
+    key = PROMPT_CACHE_KEY.format(kind, business_id, version)
+
+    text = cache.get(key)
+    if text is None:
+        text = build() or ''
+        cache.set(key, text, prompt_ttl())
+    return CompiledPrompt(text, version)
+
+
+def format_lead_details(lead):
+    """The lead's details as given to the agent."""
+    proposed = lead.proposed_start_datetime.strftime('%B %d, %Y at %I:%M %p') if lead.proposed_start_datetime else 'Not provided'
+    return (
+        f"Here are the details about the lead:\n"
+        f"Name: {lead.name}\n"
+        f"Phone: {lead.phone_number}\n"
+        f"Email: {lead.email if lead.email else 'Not provided'}\n"
+        f"Address: {lead.address1 if lead.address1 else 'Not provided'}\n"
+        f"City: {lead.city if lead.city else 'Not provided'}\n"
+        f"State: {lead.state if lead.state else 'Not provided'}\n"
+        f"Zip Code: {lead.zipCode if lead.zipCode else 'Not provided'}\n"
+        f"Proposed Start Time: {proposed}\n"
+        f"Notes: {lead.notes if lead.notes else 'No additional notes'}\n"
+        f"Bedrooms: {lead.bedrooms if lead.bedrooms else 'Not provided'}\n"
+        f"Bathrooms: {lead.bathrooms if lead.bathrooms else 'Not provided'}\n"
+        f"Square Feet: {lead.squareFeet if lead.squareFeet else 'Not provided'}\n"
+        f"Type of Cleaning: {lead.type_of_cleaning if lead.type_of_cleaning else 'Not provided'}"
+    )
+
+
+def turn_context(chat=None, current_date=None, current_time=None):
+    """The per-turn part of the prompt: date and time, and lead details."""
+    now = timezone.now()
+    current_date = current_date or now.strftime("%Y-%m-%d")
+    current_time = current_time or now.strftime("%H:%M")
+
+    context = f"Today's date is {current_date} and the current time is {current_time}."
+    if chat is not None and chat.lead_id:
+        context += "\n\n##LEAD DETAILS\n" + format_lead_details(chat.lead)
+    return context
@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
-from .models import Chat, Messages
+from accounts.models import Business, BusinessSettings, CustomAddons
+from .models import Chat, Messages, AgentConfiguration
 from subscription.models import UsageTracker
 
 from datetime import datetime
@@ -44,3 +45,21 @@ def check_sms_limits(sender, instance, **kwargs):
     if check_limit.get('exceeded'):
         print("SMS Limit reached for your Plan")
         
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_save, sender=AgentConfiguration)
+@receiver(post_delete, sender=AgentConfiguration)
+@receiver(post_save, sender=BusinessSettings)
+@receiver(post_save, sender=CustomAddons)
+@receiver(post_delete, sender=CustomAddons)
+def invalidate_business_agent(sender, instance, **kwargs):
+    """Rebuild the cached prompts and LangChain agent when their inputs change."""
+    from .langchain_agent import agent_registry
+
+    try:
+        business = instance if sender is Business else instance.business
+    except Business.DoesNotExist:
+        # Deleted along with its business
+        return
+    agent_registry.invalidate(business.businessId)
@@ -0,0 +1,212 @@
+"""
+Inbound SMS pipeline.
+
+The Twilio webhook stores every text as an InboundSMS row before it acks
+Twilio, then calls enqueue(). Rows are processed on one bounded thread pool
+per process (SMS_PIPELINE_WORKERS threads), and texts from the same number
+to the same business are processed one at a time, oldest first - across
+processes too, since a row is only claimed while no earlier row of its
+conversation is being processed.
+
+When SMS_PIPELINE_MAX_CONVERSATIONS conversations are already in flight in
+this process, new rows are left pending for ai_agent.tasks.process_pending_sms,
+which also picks up rows lost to a worker restart.
+"""
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from leadsAutomation.pools import submit
+from .models import InboundSMS
+
+
+# (business_id, fromNumber) -> True when more rows arrived while draining
+_active = {}
+_active_lock = threading.Lock()
+
+_sweep_scheduled = False
+
+
+def enqueue(inbound):
+    """
+    Schedule processing of a saved InboundSMS. Returns False when this
+    process is at capacity and the row was left for the sweep task.
+    """
+    _ensure_sweep_scheduled()
+    key = (inbound.business_id, inbound.fromNumber)
+
+    with _active_lock:
+        if key in _active:
+            # The running drain for this conversation will pick it up
+            _active[key] = True
+            return True
+        if len(_active) >= getattr(settings, 'SMS_PIPELINE_MAX_CONVERSATIONS', 32):
+            print(f"[DEBUG] SMS pipeline at capacity; leaving message {inbound.id} for the sweep")
+            return False
+        _active[key] = False
+
+    submit('sms-pipeline', getattr(settings, 'SMS_PIPELINE_WORKERS', 4), _drain, key)
+    return True
+
+
+def _drain(key):
+    try:
+        while True:
+            while process_next(*key):
+                pass
+            with _active_lock:
+                if _active.get(key):
+                    _active[key] = False
+                    continue
+                _active.pop(key, None)
+                return
+    except Exception:
+        traceback.print_exc()
+        with _active_lock:
+            _active.pop(key, None)
+
+
+def claim_next(business_id, from_number):
+    """
+    Mark the oldest pending message of a conversation as processing and
+    return it, or return None if there is nothing to do or another worker is
+    still processing an earlier message of the same conversation.
+    """
+    with transaction.atomic():
+        queued = list(
+            InboundSMS.objects.select_for_update()
+            .filter(business_id=business_id, fromNumber=from_number, status__in=['pending', 'processing'])
+            .order_by('id')
+        )
+        if not queued or queued[0].status == 'processing':
+            return None
+
+        inbound = queued[0]
+        inbound.status = 'processing'
+        inbound.startedAt = timezone.now()
+        inbound.attempts += 1
+        inbound.save(update_fields=['status', 'startedAt', 'attempts'])
+        return inbound
+
+
+def process_next(business_id, from_number):
+    """
+    Claim and process one message. Returns True if one was processed and the
+    next message of the conversation may follow, False if there was nothing
+    to do or the message failed and was left pending for a later sweep.
+    """
+    inbound = claim_next(business_id, from_number)
+    if inbound is None:
+        return False
+
+    from .views import reply_to_sms, send_sms_apology
+
+    secret_key = None
+    try:
+        secret_key = inbound.business.apicredential.secretKey
+        reply_to_sms(secret_key, inbound.fromNumber, inbound.body, inbound.toNumber)
+    except Exception as e:
+        traceback.print_exc()
+        retry = inbound.attempts < getattr(settings, 'SMS_PIPELINE_MAX_ATTEMPTS', 3)
+        InboundSMS.objects.filter(pk=inbound.pk).update(
+            status='pending' if retry else 'failed',
+            error=str(e),
+            finishedAt=None if retry else timezone.now(),
+        )
+        if retry:
+            # Leave the retry to the next sweep rather than retrying at once
+            return False
+        if secret_key:
+            try:
+                send_sms_apology(secret_key, inbound.fromNumber)
+            except Exception:
+                traceback.print_exc()
+        # A message that is given up on must not hold up the rest of the conversation
+        return True
+
+    finished_at = timezone.now()
+    InboundSMS.objects.filter(pk=inbound.pk).update(status='done', finishedAt=finished_at, error=None)
+    print(
+        f"[DEBUG] SMS {inbound.id} processed: waited "
+        f"{(inbound.startedAt - inbound.receivedAt).total_seconds():.1f}s, "
+        f"total {(finished_at - inbound.receivedAt).total_seconds():.1f}s"
+    )
+    return True
+
+
+def recover_stale():
+    """
+    Return messages stuck in processing (their worker died) to the queue,
+    or fail them once they are out of attempts. Returns the number recovered.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'SMS_PIPELINE_PROCESSING_TIMEOUT', 300))
+    stale = InboundSMS.objects.filter(status='processing', startedAt__lt=cutoff)
+    max_attempts = getattr(settings, 'SMS_PIPELINE_MAX_ATTEMPTS', 3)
+
+    stale.filter(attempts__gte=max_attempts).update(
+        status='failed', error='Processing timed out', finishedAt=timezone.now()
+    )
+    return stale.filter(attempts__lt=max_attempts).update(status='pending')
+
+
+def pending_conversations():
+    return list(
+        InboundSMS.objects.filter(status='pending')
+        .order_by()
+        .values_list('business_id', 'fromNumber')
+        .distinct()
+    )
+
+
+def pipeline_stats(window_minutes=60):
+    """Queue depth and processing latency for monitoring."""
+    now = timezone.now()
+    since = now - timedelta(minutes=window_minutes)
+
+    oldest_pending = (
+        InboundSMS.objects.filter(status='pending').order_by('receivedAt').values_list('receivedAt', flat=True).first()
+    )
+    finished = list(
+        InboundSMS.objects.filter(status='done', finishedAt__gte=since)
+        .values_list('receivedAt', 'startedAt', 'finishedAt')
+    )
+    waits = sorted((started - received).total_seconds() for received, started, _ in finished)
+    totals = sorted((done - received).total_seconds() for received, _, done in finished)
+
+    with _active_lock:
+        active_conversations = len(_active)
+
+    return {
+        'pending': InboundSMS.objects.filter(status='pending').count(),
+        'processing': InboundSMS.objects.filter(status='processing').count(),
+        'failed_recently': InboundSMS.objects.filter(status='failed', finishedAt__gte=since).count(),
+        'oldest_pending_seconds': round((now - oldest_pending).total_seconds(), 1) if oldest_pending else 0,
+        'active_conversations_in_process': active_conversations,
+        'processed_recently': len(finished),
+        'queue_wait_seconds': _percentiles(waits),
+        'processing_latency_seconds': _percentiles(totals),
+        'window_minutes': window_minutes,
+    }
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'max': None}
+    return {
+        'p50': round(values[len(values) // 2], 2),
+        'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+        'max': round(values[-1], 2),
+    }
+
+
+def _ensure_sweep_scheduled():
+    global _sweep_scheduled
+    if _sweep_scheduled:
+        return
+    from .tasks import schedule_pending_sms_sweep
+    schedule_pending_sms_sweep()
+    _sweep_scheduled = True
@@ -0,0 +1,99 @@
+"""
+Streaming replies for the web chat.
+
+The agent runs on a worker thread with a callback handler that forwards
+model tokens and tool calls to a queue; the request thread reads the queue
+and yields the events as they arrive, so the widget can render the reply
+while it is being generated. Once the reply is complete the worker pushes
+the final event, ends the stream and only then saves the messages and
+updates the chat status, so the client never waits on those writes.
+"""
+import json
+import queue
+import threading
+import traceback
+
+from django.conf import settings
+from django.db import connection
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+_END = object()
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Puts (event, data) pairs for tokens and tool calls on a queue."""
+
+    def __init__(self, events):
+        self.events = events
+        self.tool_names = {}
+
+    def on_llm_new_token(self, token, **kwargs):
+        # Function-call chunks come through with no text
+        if token:
+            self.events.put(('token', {'text': token}))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get('name') or kwargs.get('name')
+        self.tool_names[run_id] = name
+        self.events.put(('tool_start', {'tool': name}))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self.events.put(('tool_end', {'tool': self.tool_names.pop(run_id, kwargs.get('name'))}))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.events.put(('tool_end', {'tool': self.tool_names.pop(run_id, kwargs.get('name')), 'error': True}))
+
+
+def stream_agent_reply(agent, executor, user_message, mode='live'):
+    """
+    Run `executor` for `agent` (a LangChainAgent) on a worker thread and
+    yield its (event, data) pairs until the reply is complete.
+    """
+    events = queue.Queue()
+    handler = QueueCallbackHandler(events)
+
+    def run():
+        response, error = None, None
+        try:
+            result = executor.invoke(
+                {'input': user_message, 'turn_context': agent._turn_context()},
+                config={'callbacks': [handler]},
+            )
+            response = result['output']
+            events.put(('done', {'response': response, 'status': 'success'}))
+        except Exception as e:
+            traceback.print_exc()
+            error = str(e)
+            events.put(('error', {'error': "I'm sorry, I encountered an error processing your request. Please try again later."}))
+        finally:
+            events.put(_END)
+
+        try:
+            agent.save_exchange(user_message, response, mode, error=error)
+            if error is None:
+                from .utils import get_chat_status
+                get_chat_status(agent.chat)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            # Not a request thread; Django won't close this connection for us
+            connection.close()
+
+    threading.Thread(target=run, name=f"chat-stream-{agent.chat.id}", daemon=True).start()
+
+    timeout = getattr(settings, 'AI_STREAM_TIMEOUT', 120)
+    while True:
+        try:
+            event = events.get(timeout=timeout)
+        except queue.Empty:
+            yield 'error', {'error': 'The response timed out. Please try again.'}
+            return
+        if event is _END:
+            return
+        yield event
+
+
+def sse(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
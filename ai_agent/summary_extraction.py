@@ -0,0 +1,196 @@
+"""
+Incremental booking-summary extraction.
+
+The booking details of a chat (name, address, property, service, add-ons,
+appointment time...) are extracted by a model into Chat.summary. Instead of
+sending the whole conversation every time a total or booking is needed,
+extract_booking_summary() sends the details extracted so far plus only the
+messages after Chat.summaryMessageId, and makes no model call at all when
+there are no new messages. A booking right after a price calculation
+therefore only pays for the messages in between.
+"""
+import json
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import CustomAddons
+from .memory import MEMORY_KEY
+from .models import Chat, Messages
+
+
+SUMMARY_FIELDS = [
+    'firstName', 'lastName', 'email', 'phoneNumber', 'address1', 'city', 'state', 'zipCode',
+    'squareFeet', 'bedrooms', 'bathrooms', 'serviceType', 'appointmentDateTime', 'convertedDateTime',
+    'otherRequests', 'detailSummary',
+    'addonDishes', 'addonLaundryLoads', 'addonWindowCleaning', 'addonPetsCleaning', 'addonFridgeCleaning',
+    'addonOvenCleaning', 'addonBaseboard', 'addonBlinds', 'addonGreenCleaning', 'addonCabinetsCleaning',
+    'addonPatioSweeping', 'addonGarageSweeping',
+    'bookingId',
+]
+
+EXTRACTION_PROMPT = """
+            You are an AI assistant for Cleaning Biz, a professional cleaning service. Your task is to extract specific customer booking information from this conversation.
+            You are given the booking details extracted so far and the newest messages of the conversation.
+
+            Respond ONLY with a valid JSON object containing the keys below that the new messages give or change.
+            Leave out every key the new messages do not mention; the details extracted so far are kept for those.
+            If the customer withdraws a detail, list its key in "removed" (a JSON list of key names, empty if nothing was withdrawn).
+            A removed addon may instead be returned with 0.
+            - firstName: Customer's first name
+            - lastName: Customer's last name empty if not found
+            - email: Customer's email address
+            - phoneNumber: Customer's phone number with country code without any spaces or dashes
+            - address1: Street address (just the street part, no city/state/zip)
+            - city: City name
+            - state: State
+            - zipCode: 5-digit or 9-digit zip code
+            - squareFeet: Square footage of the property as a Decimal string
+            - bedrooms: Number of bedrooms as a Decimal string
+            - bathrooms: Number of bathrooms as a Decimal string
+            - serviceType: Type of service requested (e.g., "regular cleaning", "deep cleaning", "move-in")
+            - appointmentDateTime: Appointment date and time in ANY format mentioned in the conversation
+            - convertedDateTime: Convert Appointment date and time to a standard format (YYYY-MM-DD HH:MM) Current Time is: {current_time}
+            - otherRequests: Any special requests or notes
+            - detailSummary: Summary of the Whole conversation
+            - addonDishes: Quantity of Dishes Addon
+            - addonLaundryLoads: Quantity of Laundry Loads Addon
+            - addonWindowCleaning: Quantity of Window Cleaning Addon
+            - addonPetsCleaning: Quantity of Pets Cleaning Addon
+            - addonFridgeCleaning: Quantity of Fridge Cleaning Addon
+            - addonOvenCleaning: Quantity of Oven Cleaning Addon
+            - addonBaseboard: Quantity of Baseboard Addon
+            - addonBlinds: Quantity of Blinds Addon
+            - addonGreenCleaning: Quantity of Green Cleaning Addon
+            - addonCabinetsCleaning: Quantity of Cabinets Cleaning Addon
+            - addonPatioSweeping: Quantity of Patio Sweeping Addon
+            - addonGarageSweeping: Quantity of Garage Sweeping Addon
+{custom_addon_fields}
+
+            - bookingId: Booking ID if available
+
+            ONLY return a valid JSON object. No explanations or additional text.
+            Do not include a key you cannot determine from the new messages.
+            An empty string is only treated as a removal when its key is listed in "removed".
+            """
+
+
+def empty_summary(custom_addons=()):
+    summary = {field: '' for field in SUMMARY_FIELDS}
+    for addon in custom_addons:
+        summary[addon.addonDataName] = ''
+    return summary
+
+
+def format_transcript(rows):
+    """rows of (role, content) as the text sent to the model."""
+    return "".join(f"{'Customer' if role == 'user' else 'Agent'}: {content}\n" for role, content in rows if role and content)
+
+
+def extract_changes(prior, transcript, custom_addons=()):
+    """
+    Ask the model which details `transcript` gives, changes or removes,
+    given `prior` (a summary dict, possibly empty). Returns only the keys the
+    model returned a value for, and '' for each key it listed in "removed".
+    A blank value for a key that is not listed is ignored, so a response
+    that echoes the whole schema cannot wipe earlier details. None if the
+    model call fails.
+    """
+    from .api_views import get_current_time
+    from .utils import client
+
+    fields = empty_summary(custom_addons)
+    custom_addon_fields = "\n".join(
+        f'            - {addon.addonDataName}: Quantity of {addon.addonName} Addon' for addon in custom_addons
+    )
+    known = {key: value for key, value in (prior or {}).items() if key in fields and value not in ('', None)}
+
+    try:
+        response = client.chat.completions.create(
+            model=getattr(settings, 'AI_SUMMARY_EXTRACTION_MODEL', 'gpt-4o'),
+            messages=[
+                {"role": "system", "content": EXTRACTION_PROMPT.format(current_time=get_current_time(), custom_addon_fields=custom_addon_fields)},
+                {"role": "user", "content": f"Booking details so far:\n{json.dumps(known)}\n\nNew messages:\n{transcript}"},
+            ],
+            temperature=0.1,
+            response_format={"type": "json_object"},
+        )
+        extracted = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        print(f"[ERROR] Error extracting conversation summary: {str(e)}")
+        traceback.print_exc()
+        return None
+
+    removed = extracted.pop('removed', None)
+    removed = {key for key in removed if isinstance(key, str) and key in fields} if isinstance(removed, list) else set()
+
+    # A null or blank is a key the model could not determine, not a removal
+    changes = {key: value for key, value in extracted.items() if key in fields and value not in (None, '')}
+    for key in removed:
+        changes.setdefault(key, '')
+    return changes
+
+
+def extract_fields(prior, transcript, custom_addons=()):
+    """
+    `prior` (a summary dict, possibly empty) updated with what `transcript`
+    gives, changes or removes. Returns the merged summary, or None if the
+    model call fails.
+    """
+    changes = extract_changes(prior, transcript, custom_addons)
+    if changes is None:
+        return None
+
+    summary = empty_summary(custom_addons)
+    summary.update({key: value for key, value in (prior or {}).items() if key in summary})
+    summary.update(changes)
+    return summary
+
+
+def extract_booking_summary(chat):
+    """
+    Bring the booking details in chat.summary up to date with the messages
+    added since the last extraction, save them, and return them. Updates
+    `chat` in place.
+    """
+    summary = chat.summary if isinstance(chat.summary, dict) else {}
+    prior = {key: value for key, value in summary.items() if key != MEMORY_KEY}
+
+    rows = list(
+        Messages.objects.filter(chat=chat, id__gt=chat.summaryMessageId or 0)
+        .order_by('id')
+        .values_list('id', 'role', 'message')
+    )
+    if not rows:
+        print(f"[DEBUG] No new messages in chat {chat.id} since the last summary extraction")
+        return prior
+    if not chat.summaryMessageId and len(rows) < 2:
+        print(f"[DEBUG] Conversation too short to extract summary: {len(rows)} messages")
+        return prior
+
+    custom_addons = list(CustomAddons.objects.filter(business_id=chat.business_id))
+    changes = extract_changes(prior, format_transcript((role, message) for _, role, message in rows), custom_addons)
+    if changes is None:
+        # Leave summaryMessageId alone so these messages are retried next time
+        return prior
+
+    save_booking_summary(chat, changes, rows[-1][0])
+    return {key: value for key, value in chat.summary.items() if key != MEMORY_KEY}
+
+
+def save_booking_summary(chat, changes, through_id):
+    """
+    Apply extracted changes to Chat.summary under a row lock, leaving every
+    other key (including ones written meanwhile) alone.
+    """
+    with transaction.atomic():
+        locked = Chat.objects.select_for_update().get(pk=chat.pk)
+        summary = dict(locked.summary) if isinstance(locked.summary, dict) else {}
+        summary.update(changes)
+        locked.summary = summary
+        locked.summaryMessageId = max(through_id, locked.summaryMessageId or 0)
+        locked.save(update_fields=['summary', 'summaryMessageId'])
+
+    chat.summary = locked.summary
+    chat.summaryMessageId = locked.summaryMessageId
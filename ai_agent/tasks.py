@@ -1,126 +1,18 @@
-from django.utils import timezone
-from datetime import timedelta
-from .models import Chat
-from retell import Retell
-from accounts.models import ApiCredential
 from django.conf import settings
-from retell_agent.models import RetellAgent
-from automation.models import Lead
-from subscription.models import UsageTracker
+import time
 import traceback
 
 def check_chat_status():
     """
     Task to check the status of pending chats and initiate calls if needed.
-    This function is called by Django-Q scheduler.
+    This function is called by Django-Q scheduler; the work is done by
+    ai_agent.follow_up_dialer.
     """
+    from . import follow_up_dialer
+
     try:
         print("[TASK] Starting check_chat_status task")
-        chats = Chat.objects.filter(status='pending', clientPhoneNumber__isnull=False, updatedAt__lte=(timezone.now() - timedelta(minutes=10)))
-        print(f"[TASK] Found {chats.count()} pending chats to process")
-        
-        results = {
-            'processed': 0,
-            'calls_made': 0,
-            'errors': 0,
-            'skipped': 0
-        }
-        
-        for chat in chats:
-            try:
-                print(f"[TASK] Processing chat ID: {chat.id}, Phone: {chat.clientPhoneNumber}")
-                
-                # Skip chats without phone numbers
-                if not chat.clientPhoneNumber:
-                    print(f"[TASK] Skipping chat ID: {chat.id} - Missing phone number")
-                    results['skipped'] += 1
-                    continue
-                
-                # Get API credentials for this business
-                try:
-                    business = chat.business
-                    retellAgent = RetellAgent.objects.get(business=business)
-                    print(f"[TASK] Using business: {business.businessName}")
-                except RetellAgent.DoesNotExist:
-                    print(f"[TASK] No Retell agent found for business ID: {chat.business.id}")
-                    results['errors'] += 1
-                    continue
-                
-                # Get lead information
-                
-                leads = Lead.objects.filter(phone_number=chat.clientPhoneNumber, business=business)
-                for lead in leads:
-                    print(f"[TASK] Found lead: {lead.name}")
-                    if not lead:
-                        print(f"[TASK] No lead found with phone number: {chat.clientPhoneNumber}")
-                        results['errors'] += 1
-                        continue
-                    
-                    # Process based on business settings
-                    if business.useCall:
-                        print(f"[TASK] Business uses call feature, attempting to make call")
-                        
-                        # Validate required credentials
-                        if not retellAgent.agent_number:
-                            print(f"[TASK] Missing voice agent number for business: {business.businessName}")
-                            results['errors'] += 1
-                            continue
-                        
-                        # Make the call
-                        try:
-                            client = Retell(api_key=settings.RETELL_API_KEY)
-                            print(f"[TASK] Making call from {retellAgent.agent_number} to {lead.phone_number}")
-
-                            if '+1' not in lead.phone_number and len(lead.phone_number) == 10:
-                                lead.phone_number = '+1' + lead.phone_number
-                            
-                            lead_details = f"Here are the details about the lead:\nName: {lead.name}\nPhone: {lead.phone_number}\nEmail: {lead.email if lead.email else 'Not provided'}\nAddress: {lead.address1 if lead.address1 else 'Not provided'}\nCity: {lead.city if lead.city else 'Not provided'}\nState: {lead.state if lead.state else 'Not provided'}\nZip Code: {lead.zipCode if lead.zipCode else 'Not provided'}\nProposed Start Time: {lead.proposed_start_datetime.strftime('%B %d, %Y at %I:%M %p') if lead.proposed_start_datetime else 'Not provided'}\nNotes: {lead.notes if lead.notes else 'No additional notes'}"
-                            
-                            try:
-                                call_response = client.call.create_phone_call(
-                                    from_number=retellAgent.agent_number,
-                                    to_number=lead.phone_number,
-                                    retell_llm_dynamic_variables={
-                                        'name': lead.name,
-                                        'details': lead_details,
-                                        'service': 'cleaning'
-                                    }
-                                )
-                            
-                            except Exception as e:
-                                print(f"[TASK] Error making call: {str(e)}")
-                                results['errors'] += 1
-                                continue
-                            
-                            # Update lead and chat status
-                            lead.follow_up_call_sent = True
-                            lead.follow_up_call_sent_at = timezone.now()
-                            lead.save()
-                            
-                            chat.status = 'follow_up_call_sent'
-                            chat.save()
-                            
-                            # Track usage for voice calls
-                            UsageTracker.increment_metric(business, 'voice_calls')
-                            
-                            print(f"[TASK] Call successfully made, response ID: {call_response}")
-                            results['calls_made'] += 1
-                        except Exception as e:
-                            print(f"[TASK] Error making call: {str(e)}")
-                            print(traceback.format_exc())
-                            results['errors'] += 1
-                            continue
-                    else:
-                        print(f"[TASK] Business does not use call feature, skipping")
-                    
-                    results['processed'] += 1
-                    print(f"[TASK] Successfully processed chat ID: {chat.id}")
-
-            except Exception as chat_error:
-                print(f"[TASK] Error processing chat ID: {chat.id}: {str(chat_error)}")
-                print(traceback.format_exc())
-                results['errors'] += 1
-        
+        results = follow_up_dialer.run()
         print(f"[TASK] Completed check_chat_status task. Results: {results}")
         return results
         
@@ -133,4 +25,49 @@ def check_chat_status():
             'errors': 1,
             'skipped': 0,
             'fatal_error': str(e)
-        }
\ No newline at end of file
+        }
+
+def process_pending_sms():
+    """
+    Sweep for the inbound SMS pipeline: requeue messages whose worker died
+    and process messages that were left pending, conversation by conversation,
+    for at most SMS_PIPELINE_SWEEP_TIME_BUDGET seconds. Whatever is left
+    waits for the next sweep.
+    """
+    from . import sms_pipeline
+
+    try:
+        recovered = sms_pipeline.recover_stale()
+        processed = 0
+        deadline = time.monotonic() + getattr(settings, 'SMS_PIPELINE_SWEEP_TIME_BUDGET', 180)
+        for business_id, from_number in sms_pipeline.pending_conversations():
+            while time.monotonic() < deadline and sms_pipeline.process_next(business_id, from_number):
+                processed += 1
+            if time.monotonic() >= deadline:
+                print(f"[TASK] process_pending_sms: time budget used after {processed} messages")
+                break
+
+        stats = sms_pipeline.pipeline_stats()
+        print(f"[TASK] process_pending_sms: recovered {recovered}, processed {processed}, stats {stats}")
+        return {'recovered': recovered, 'processed': processed}
+    except Exception as e:
+        print(f"[TASK] Error in process_pending_sms: {str(e)}")
+        print(traceback.format_exc())
+        return {'recovered': 0, 'processed': 0, 'error': str(e)}
+
+
+def schedule_pending_sms_sweep():
+    """Schedule process_pending_sms to run every SMS_PIPELINE_SWEEP_MINUTES, once."""
+    from django_q.models import Schedule
+    from django_q.tasks import schedule
+
+    try:
+        if not Schedule.objects.filter(func='ai_agent.tasks.process_pending_sms').exists():
+            schedule(
+                'ai_agent.tasks.process_pending_sms',
+                schedule_type=Schedule.MINUTES,
+                minutes=getattr(settings, 'SMS_PIPELINE_SWEEP_MINUTES', 1),
+                repeats=-1
+            )
+    except Exception as e:
+        print(f"Failed to schedule process_pending_sms task: {str(e)}")
@@ -1,3 +1,533 @@
-from django.test import TestCase
+import io
+import json
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import ApiCredential, Business
+from accounts.phone import backfill_phone_e164, find_by_phone
+from automation.models import Lead
+from bookings.models import Booking
+from retell_agent.models import RetellAgent
+from . import follow_up_dialer, sms_pipeline
+from .chat_status import booking_status, classify_chat_status, is_opt_out
+from .memory import MEMORY_KEY, ConversationMemory, preserve_memory, save_memory_state, update_chat_summary, update_summary
+from .langchain_agent import BusinessAgent, LangChainAgent
+from .models import AgentConfiguration, Chat, InboundSMS, Messages
+from .prompts import prompt_ttl
+from .streaming import sse, stream_agent_reply
+from .tasks import process_pending_sms
+from .summary_extraction import SUMMARY_FIELDS, extract_booking_summary
+from .tool_runner import ToolContext, run_tool_calls
+
+
+def add_messages(chat, count, start=0):
+    Messages.objects.bulk_create([
+        Messages(chat=chat, role='user' if i % 2 == 0 else 'assistant', message=f"message {i}")
+        for i in range(start, start + count)
+    ])
+
+
+def fake_summarize(summary, rows):
+    return (summary + ' ' if summary else '') + ','.join(message for _, _, message in rows)
+
+
+@override_settings(AI_MEMORY_WINDOW=6, AI_MEMORY_SUMMARY_BATCH=4, AI_MEMORY_TOKEN_BUDGET=3000)
+class ConversationMemoryTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        business = Business.objects.create(user=user, businessName='Sparkle')
+        self.chat = Chat.objects.create(business=business, clientPhoneNumber='+15550001111', status='pending')
+
+    def test_short_chat_is_sent_verbatim(self):
+        add_messages(self.chat, 5)
+        memory = ConversationMemory(self.chat).load()
+
+        self.assertEqual([msg['content'] for msg in memory.messages], [f"message {i}" for i in range(5)])
+        self.assertEqual(memory.summary, '')
+        self.assertFalse(memory.needs_summary)
+
+    @mock.patch('ai_agent.memory.summarize', side_effect=fake_summarize)
+    def test_old_messages_are_folded_into_the_summary(self, summarize):
+        add_messages(self.chat, 10)
+        memory = ConversationMemory(self.chat).load()
+        self.assertTrue(memory.needs_summary)
+
+        self.assertEqual(update_chat_summary(self.chat.id), 4)
+        self.chat.refresh_from_db()
+        memory = ConversationMemory(self.chat).load()
+
+        self.assertEqual(memory.summary, 'message 0,message 1,message 2,message 3')
+        self.assertEqual([msg['content'] for msg in memory.messages], [f"message {i}" for i in range(4, 10)])
+        self.assertFalse(memory.needs_summary)
+
+        # The next fold extends the existing summary
+        add_messages(self.chat, 4, start=10)
+        update_chat_summary(self.chat.id)
+        self.chat.refresh_from_db()
+        self.assertEqual(ConversationMemory(self.chat).summary, 'message 0,message 1,message 2,message 3 message 4,message 5,message 6,message 7')
+
+    @override_settings(AI_MEMORY_TOKEN_BUDGET=12)
+    def test_verbatim_messages_respect_the_token_budget(self):
+        add_messages(self.chat, 6)
+        memory = ConversationMemory(self.chat).load()
+
+        # Each message is estimated at 3 tokens; the newest always fit first
+        self.assertEqual([msg['content'] for msg in memory.messages], [f"message {i}" for i in range(2, 6)])
+
+    def test_history_sent_does_not_grow_with_the_chat(self):
+        sent = []
+        for size in (20, 200):
+            chat = Chat.objects.create(business=self.chat.business, clientPhoneNumber=f"+1555{size:07d}", status='pending')
+            add_messages(chat, size)
+            with CaptureQueriesContext(connection) as queries:
+                memory = ConversationMemory(chat).load()
+            self.assertEqual(len(queries), 1)
+            sent.append(len(memory.messages))
+
+        # Never more than window + batch, see benchmark_conversation_memory for timings
+        self.assertEqual(sent, [10, 10])
+
+    def test_replacing_the_chat_summary_keeps_the_memory(self):
+        old = {'firstName': 'Ann', MEMORY_KEY: {'text': 'earlier', 'throughId': 3}}
+        new = preserve_memory(old, {'firstName': 'Anna'})
+        self.assertEqual(new, {'firstName': 'Anna', MEMORY_KEY: {'text': 'earlier', 'throughId': 3}})
+
+    def test_summary_writes_keep_memory_stored_meanwhile(self):
+        stale = Chat.objects.get(pk=self.chat.pk)
+        save_memory_state(self.chat.id, 'earlier', 3)
+
+        update_summary(stale, {'bookingId': 'bk00001'})
+        update_summary(stale, {'firstName': 'Ann'}, replace=True)
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).summary, {'firstName': 'Ann', MEMORY_KEY: {'text': 'earlier', 'throughId': 3}})
+
+
+class PhoneLookupTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        self.chat = Chat.objects.create(business=self.business, clientPhoneNumber='(555) 000-1111', status='pending')
+
+    def test_lookup_ignores_formatting(self):
+        for phone in ('+15550001111', '5550001111', '1-555-000-1111', '555.000.1111'):
+            self.assertEqual(find_by_phone(Chat.objects.all(), phone, self.business), self.chat)
+        self.assertIsNone(find_by_phone(Chat.objects.all(), '+15550002222', self.business))
+        self.assertIsNone(find_by_phone(Chat.objects.all(), '', self.business))
+
+    def test_backfill_fills_missing_numbers(self):
+        Chat.objects.filter(pk=self.chat.pk).update(phone_e164=None)
+        self.assertEqual(backfill_phone_e164(Chat, 'clientPhoneNumber'), 1)
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).phone_e164, '+15550001111')
+        self.assertEqual(backfill_phone_e164(Chat, 'clientPhoneNumber'), 0)
+
+
+class SystemPromptCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        self.config = AgentConfiguration.objects.create(business=self.business, agent_name='Ava')
+
+    def test_static_prompt_is_built_once_per_version(self):
+        first = LangChainAgent.get_static_prompt(self.business)
+        with CaptureQueriesContext(connection) as queries:
+            second = LangChainAgent.get_static_prompt(self.business)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(first.digest, second.digest)
+
+        self.config.agent_name = 'Mia'
+        self.config.save()
+        rebuilt = LangChainAgent.get_static_prompt(self.business)
+        self.assertNotEqual(rebuilt.version, first.version)
+        self.assertIn('You are Mia', rebuilt.text)
+
+    @override_settings(AI_PROMPT_CACHE_TTL=86400, LANGCHAIN_AGENT_MAX_AGE=300)
+    def test_process_local_cache_keeps_prompts_briefly(self):
+        # Other processes never see a local invalidation, so the prompt must expire on its own
+        with mock.patch('ai_agent.prompts.cache.set') as cache_set:
+            LangChainAgent.get_static_prompt(self.business)
+        self.assertEqual(cache_set.call_args.args[2], 300)
+
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}):
+            self.assertEqual(prompt_ttl(), 86400)
+
+    def test_prompt_prefix_is_stable_across_turns(self):
+        prompt = BusinessAgent(self.business).prompt
+        turns = [
+            prompt.format_messages(chat_history=[], input='hi', agent_scratchpad=[], turn_context=f"Today's date is 2025-01-0{day}.")
+            for day in (1, 2)
+        ]
+        self.assertEqual(turns[0][0].content, turns[1][0].content)
+        self.assertNotIn("Today's date", turns[0][0].content)
+        self.assertEqual(turns[1][1].content, "Today's date is 2025-01-02.")
+
+
+class FakeExecutor:
+
+    def __init__(self, tokens, fail=False):
+        self.tokens = tokens
+        self.fail = fail
+
+    def invoke(self, inputs, config):
+        handler = config['callbacks'][0]
+        handler.on_tool_start({'name': 'check_availability'}, 'tomorrow', run_id=1)
+        handler.on_tool_end('available', run_id=1)
+        for token in self.tokens:
+            handler.on_llm_new_token(token)
+        if self.fail:
+            raise RuntimeError('model unavailable')
+        return {'output': ''.join(self.tokens)}
+
+
+class StreamingReplyTests(SimpleTestCase):
+
+    def setUp(self):
+        self.agent = mock.Mock()
+        self.agent.chat.id = 1
+        self.agent._turn_context.return_value = ''
+        self.saved = threading.Event()
+        self.agent.save_exchange.side_effect = lambda *args, **kwargs: self.saved.set()
+
+    @mock.patch('ai_agent.utils.get_chat_status')
+    def test_events_arrive_in_order_and_the_exchange_is_saved_after(self, get_chat_status):
+        events = list(stream_agent_reply(self.agent, FakeExecutor(['Yes', '', ', we are free']), 'hi', 'test'))
+
+        self.assertEqual(events, [
+            ('tool_start', {'tool': 'check_availability'}),
+            ('tool_end', {'tool': 'check_availability'}),
+            ('token', {'text': 'Yes'}),
+            ('token', {'text': ', we are free'}),
+            ('done', {'response': 'Yes, we are free', 'status': 'success'}),
+        ])
+        self.assertTrue(self.saved.wait(5))
+        self.agent.save_exchange.assert_called_once_with('hi', 'Yes, we are free', 'test', error=None)
+
+    def test_errors_end_the_stream(self):
+        events = list(stream_agent_reply(self.agent, FakeExecutor(['Yes'], fail=True), 'hi'))
+
+        self.assertEqual(events[-1][0], 'error')
+        self.assertTrue(self.saved.wait(5))
+        self.agent.save_exchange.assert_called_once_with('hi', None, 'live', error='model unavailable')
+
+    def test_sse_format(self):
+        self.assertEqual(sse('token', {'text': 'Hi'}), 'event: token\ndata: {"text": "Hi"}\n\n')
+
+
+def tool_call(call_id, name):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments='{}'))
+
+
+class ToolRunnerTests(SimpleTestCase):
+
+    def test_read_only_tools_overlap_and_writers_keep_their_order(self):
+        started = []
+        # Only passes once both read-only tools and the first writer are running at the same time
+        together = threading.Barrier(3, timeout=5)
+
+        def execute(name, arguments, context):
+            started.append(name)
+            if name != 'bookAppointment':
+                together.wait()
+            return f"{name} for {context.business}"
+
+        calls = [
+            tool_call('a', 'checkAvailability'),
+            tool_call('b', 'calculateTotal'),
+            tool_call('c', 'getCurrentTime'),
+            tool_call('d', 'bookAppointment'),
+        ]
+        results = run_tool_calls(calls, ToolContext('Sparkle'), execute)
+
+        self.assertEqual([result['tool_call_id'] for result in results], ['a', 'b', 'c', 'd'])
+        self.assertEqual([result['result'] for result in results], [f"{call.function.name} for Sparkle" for call in calls])
+        self.assertLess(started.index('calculateTotal'), started.index('bookAppointment'))
+
+    @override_settings(AI_TOOL_SLOW_SECONDS=5)
+    def test_each_call_is_timed_and_slow_calls_warn(self):
+        # Writers run one after the other, so the clock readings pair up in order
+        calls = [tool_call('a', 'bookAppointment'), tool_call('b', 'bookAppointment')]
+        with mock.patch('ai_agent.tool_runner.time') as clock, mock.patch('sys.stdout', new_callable=io.StringIO) as output:
+            clock.perf_counter.side_effect = [10.0, 10.25, 20.0, 27.5]
+            results = run_tool_calls(calls, ToolContext(None), lambda name, arguments, context: 'ok')
+
+        self.assertEqual([result['duration_ms'] for result in results], [250.0, 7500.0])
+        self.assertIn('[DEBUG] Tool call bookAppointment took 0.25s', output.getvalue())
+        self.assertIn('[WARNING] Slow tool call: bookAppointment took 7.50s', output.getvalue())
+        self.assertEqual(output.getvalue().count('[WARNING]'), 1)
+
+    def test_a_failing_tool_returns_an_error_result(self):
+        def execute(name, arguments, context):
+            raise RuntimeError('boom')
+
+        results = run_tool_calls([tool_call('a', 'checkAvailability')], ToolContext(None), execute)
+        self.assertIn('boom', results[0]['result'])
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class SummaryExtractionTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        self.chat = Chat.objects.create(business=self.business, clientPhoneNumber='+15550001111', status='pending')
+        add_messages(self.chat, 4)
+
+    @mock.patch('ai_agent.utils.client')
+    def test_only_new_messages_are_sent(self, client):
+        create = client.chat.completions.create
+        create.return_value = completion('{"firstName": "Ann", "bedrooms": "2", "city": ""}')
+
+        summary = extract_booking_summary(self.chat)
+        self.assertEqual(summary['firstName'], 'Ann')
+        self.assertEqual(create.call_count, 1)
+        self.assertIn('message 0', create.call_args.kwargs['messages'][1]['content'])
+
+        # Nothing new since the last extraction: no model call
+        self.assertEqual(extract_booking_summary(self.chat)['bedrooms'], '2')
+        self.assertEqual(create.call_count, 1)
+
+        add_messages(self.chat, 2, start=4)
+        create.return_value = completion('{"city": "Austin", "bedrooms": null}')
+        summary = extract_booking_summary(Chat.objects.get(pk=self.chat.pk))
+
+        sent = create.call_args.kwargs['messages'][1]['content']
+        self.assertIn('message 5', sent)
+        self.assertNotIn('message 3', sent)
+        self.assertIn('"firstName": "Ann"', sent)
+        # Omitted and null keys keep their earlier values
+        self.assertEqual((summary['firstName'], summary['bedrooms'], summary['city']), ('Ann', '2', 'Austin'))
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).summaryMessageId, Messages.objects.filter(chat=self.chat).latest('id').id)
+
+    @mock.patch('ai_agent.utils.client')
+    def test_returned_values_replace_earlier_ones(self, client):
+        create = client.chat.completions.create
+        create.return_value = completion('{"firstName": "Ann", "addonDishes": 2, "otherRequests": "Use the side door"}')
+        extract_booking_summary(self.chat)
+
+        # The customer drops the add-on and the request
+        add_messages(self.chat, 2, start=4)
+        create.return_value = completion('{"addonDishes": 0, "removed": ["otherRequests"]}')
+        summary = extract_booking_summary(Chat.objects.get(pk=self.chat.pk))
+        self.assertEqual((summary['firstName'], summary['addonDishes'], summary['otherRequests']), ('Ann', 0, ''))
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).summary['addonDishes'], 0)
+
+    @mock.patch('ai_agent.utils.client')
+    def test_blanks_outside_removed_keep_earlier_values(self, client):
+        create = client.chat.completions.create
+        create.return_value = completion(
+            '{"firstName": "Ann", "address1": "1 Main St", "convertedDateTime": "2026-10-20 10:00", "otherRequests": "Side door"}'
+        )
+        extract_booking_summary(self.chat)
+
+        # The model echoes the full schema with blanks and only drops the request
+        full_schema = {field: '' for field in SUMMARY_FIELDS}
+        full_schema.update({'city': 'Austin', 'removed': ['otherRequests', 'notAField']})
+        add_messages(self.chat, 2, start=4)
+        create.return_value = completion(json.dumps(full_schema))
+        summary = extract_booking_summary(Chat.objects.get(pk=self.chat.pk))
+
+        self.assertEqual(
+            (summary['firstName'], summary['address1'], summary['convertedDateTime'], summary['city']),
+            ('Ann', '1 Main St', '2026-10-20 10:00', 'Austin'),
+        )
+        self.assertEqual(summary['otherRequests'], '')
+        self.assertNotIn('removed', summary)
+        self.assertNotIn('notAField', summary)
+
+    @mock.patch('ai_agent.utils.client')
+    def test_failed_extraction_is_retried(self, client):
+        client.chat.completions.create.side_effect = RuntimeError('boom')
+        self.assertEqual(extract_booking_summary(self.chat), {})
+        self.assertIsNone(Chat.objects.get(pk=self.chat.pk).summaryMessageId)
+
+
+class ChatStatusTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        self.chat = Chat.objects.create(business=self.business, clientPhoneNumber='+15550001111', status='pending')
+
+    def say(self, *texts, role='user'):
+        Messages.objects.bulk_create([Messages(chat=self.chat, role=role, message=text) for text in texts])
+        return Messages.objects.filter(chat=self.chat).order_by('id').last().id
+
+    def test_opt_out_keywords_and_phrases(self):
+        for text in ('STOP', ' Stop. ', 'opt-out', 'Unsubscribe!', 'Please remove me from your list', "Don't text me again", 'wrong number'):
+            self.assertTrue(is_opt_out(text), text)
+        # Keywords only count as the whole message
+        for text in ('Can I cancel and rebook for Friday?', "Don't stop, I want a quote", 'When does the cleaning end?', '', None):
+            self.assertFalse(is_opt_out(text), text)
+
+    def test_booking_status(self):
+        self.assertIsNone(booking_status(self.chat))
+        Booking.objects.bulk_create([Booking(business=self.business, bookingId='bk00001')])
+
+        self.chat.summary = {'bookingId': 'bk00001'}
+        self.assertEqual(booking_status(self.chat), 'booked')
+        Booking.objects.filter(bookingId='bk00001').update(cancelled_at=timezone.now())
+        self.assertEqual(booking_status(self.chat), 'not_interested')
+
+    @mock.patch('ai_agent.chat_status.ask_model')
+    def test_signals_skip_the_model(self, ask_model):
+        last_id = self.say('Hi, how much for a 2 bedroom?', 'STOP')
+        self.assertEqual(classify_chat_status(self.chat), 'not_interested')
+        ask_model.assert_not_called()
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).statusMessageId, last_id)
+
+        update_summary(self.chat, {'bookingId': 'bk00001'})
+        Booking.objects.bulk_create([Booking(business=self.business, bookingId='bk00001')])
+        self.say('Thanks!')
+        self.assertEqual(classify_chat_status(self.chat), 'booked')
+        ask_model.assert_not_called()
+
+    @override_settings(CHAT_STATUS_DEBOUNCE_SECONDS=60)
+    @mock.patch('ai_agent.chat_status.ask_model', return_value='pending')
+    def test_model_calls_are_debounced(self, ask_model):
+        first_id = self.say('Hi, how much for a 2 bedroom?')
+        self.assertEqual(classify_chat_status(self.chat), 'pending')
+        self.assertEqual(ask_model.call_args.args, ('pending', [(first_id, 'user', 'Hi, how much for a 2 bedroom?')]))
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).statusMessageId, first_id)
+
+        # Within the debounce window the new messages wait for the next run
+        second_id = self.say('And a 3 bedroom?')
+        self.assertEqual(classify_chat_status(self.chat), 'pending')
+        self.assertEqual(ask_model.call_count, 1)
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).statusMessageId, first_id)
+
+        ask_model.return_value = 'not_interested'
+        self.assertEqual(classify_chat_status(self.chat, force=True), 'not_interested')
+        self.assertEqual(ask_model.call_args.args[1], [(second_id, 'user', 'And a 3 bedroom?')])
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).statusMessageId, second_id)
+
+    @mock.patch('ai_agent.chat_status.ask_model', return_value='pending')
+    def test_only_customer_messages_reach_the_model(self, ask_model):
+        Chat.objects.filter(pk=self.chat.pk).update(status='follow_up_call_sent')
+        self.chat.refresh_from_db()
+
+        assistant_id = self.say('Just checking in!', role='assistant')
+        self.assertEqual(classify_chat_status(self.chat), 'follow_up_call_sent')
+        ask_model.assert_not_called()
+        self.assertEqual(self.chat.statusMessageId, assistant_id)
+
+        # A pending verdict keeps the follow-up call on record
+        self.say('Maybe next week')
+        self.assertEqual(classify_chat_status(self.chat), 'follow_up_call_sent')
+        ask_model.assert_called_once()
+        self.assertEqual(classify_chat_status(self.chat), 'follow_up_call_sent')
+        ask_model.assert_called_once()
+
+
+class FollowUpDialerTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle', useCall=True)
+        # bulk_create skips the signal that registers the number with Retell
+        RetellAgent.objects.bulk_create([RetellAgent(business=self.business, agent_id='agent_1', agent_name='Sparkle', agent_number='+15559990000', voice_id='v')])
+        self.leads, self.chats = [], []
+        for i in range(5):
+            phone = f"555000{i:04d}"
+            self.leads.append(Lead.objects.create(business=self.business, name=f"Lead {i}", phone_number=phone, source='web'))
+            self.chats.append(Chat.objects.create(business=self.business, clientPhoneNumber=phone, status='pending'))
+        # A chat that is still active is left alone
+        Chat.objects.filter(pk=self.chats[4].pk).update(updatedAt=timezone.now())
+        Chat.objects.filter(pk__in=[chat.pk for chat in self.chats[:4]]).update(updatedAt=timezone.now() - timedelta(hours=1))
+
+    @override_settings(FOLLOW_UP_DIALER_BATCH=2)
+    @mock.patch('ai_agent.follow_up_dialer.get_client')
+    def test_calls_stale_chats_in_batches(self, get_client):
+        create_call = get_client.return_value.call.create_phone_call
+        create_call.side_effect = lambda **kwargs: self.fail_for(kwargs['to_number'])
+
+        results = follow_up_dialer.run()
+
+        self.assertEqual(results, {'processed': 4, 'calls_made': 3, 'errors': 1, 'skipped': 0})
+        self.assertEqual(
+            sorted(call.kwargs['to_number'] for call in create_call.call_args_list),
+            ['+15550000000', '+15550000001', '+15550000002', '+15550000003'],
+        )
+        statuses = dict(Chat.objects.values_list('clientPhoneNumber', 'status'))
+        self.assertEqual(statuses['5550000000'], 'follow_up_call_sent')
+        self.assertEqual(statuses['5550000002'], 'pending')
+        self.assertEqual(statuses['5550000004'], 'pending')
+
+        failed = Lead.objects.get(pk=self.leads[2].pk)
+        self.assertEqual((failed.follow_up_call_sent, failed.follow_up_call_status), (False, 'failed'))
+        self.assertTrue(Lead.objects.get(pk=self.leads[0].pk).follow_up_call_sent)
+
+        # Called leads are not called again
+        create_call.reset_mock()
+        follow_up_dialer.run()
+        self.assertEqual([call.kwargs['to_number'] for call in create_call.call_args_list], ['+15550000002'])
+
+    def fail_for(self, to_number):
+        if to_number == '+15550000002':
+            raise RuntimeError('busy')
+
+
+class SmsPipelineTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        ApiCredential.objects.update_or_create(business=self.business, defaults={'secretKey': 'secret'})
+        self.inbound = InboundSMS.objects.create(business=self.business, fromNumber='+15550001111', toNumber='+15559990000', body='Hi')
+
+    @override_settings(SMS_PIPELINE_MAX_ATTEMPTS=2)
+    @mock.patch('ai_agent.views.send_sms_response')
+    @mock.patch('ai_agent.views.LangChainAgent')
+    def test_failed_message_is_retried_then_failed(self, agent, send_sms_response):
+        agent.return_value.process_message.side_effect = RuntimeError('model unavailable')
+
+        # The drain stops instead of retrying straight away
+        self.assertFalse(sms_pipeline.process_next(self.business.id, '+15550001111'))
+        self.inbound.refresh_from_db()
+        self.assertEqual((self.inbound.status, self.inbound.attempts, self.inbound.error), ('pending', 1, 'model unavailable'))
+        send_sms_response.assert_not_called()
+
+        self.assertTrue(sms_pipeline.process_next(self.business.id, '+15550001111'))
+        self.inbound.refresh_from_db()
+        self.assertEqual((self.inbound.status, self.inbound.attempts), ('failed', 2))
+        # The customer hears about it once, after the last attempt
+        send_sms_response.assert_called_once()
+        self.assertFalse(sms_pipeline.process_next(self.business.id, '+15550001111'))
+
+    @mock.patch('ai_agent.views.send_sms_response')
+    @mock.patch('ai_agent.views.LangChainAgent')
+    def test_sweep_stops_at_its_time_budget(self, agent, send_sms_response):
+        agent.return_value.process_message.return_value = 'Hello!'
+        InboundSMS.objects.create(business=self.business, fromNumber='+15550002222', toNumber='+15559990000', body='Hi')
+
+        with override_settings(SMS_PIPELINE_SWEEP_TIME_BUDGET=0):
+            self.assertEqual(process_pending_sms()['processed'], 0)
+        self.assertEqual(InboundSMS.objects.filter(status='pending').count(), 2)
+
+        self.assertEqual(process_pending_sms()['processed'], 2)
+        self.assertFalse(InboundSMS.objects.exclude(status='done').exists())
+
+    @mock.patch('ai_agent.views.send_sms_response')
+    @mock.patch('ai_agent.views.LangChainAgent')
+    def test_replied_message_is_done(self, agent, send_sms_response):
+        agent.return_value.process_message.return_value = 'Hello!'
+
+        sms_pipeline.process_next(self.business.id, '+15550001111')
+        self.inbound.refresh_from_db()
+        self.assertEqual(self.inbound.status, 'done')
+        agent.return_value.process_message.assert_called_once_with('Hi', raise_errors=True)
+        self.assertEqual(send_sms_response.call_args.args[1], 'Hello!')
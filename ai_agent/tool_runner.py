@@ -0,0 +1,89 @@
+"""
+Concurrent execution of the tool calls from one model turn.
+
+When the model asks for several tools at once, the read-only ones
+(availability, current time) run concurrently on a shared bounded pool.
+The ones that write to the chat or to bookings run one after another, in
+the order the model asked for them, alongside the read-only ones. Every call
+gets the same ToolContext, so the chat and business are resolved once per
+turn instead of once per tool.
+
+Each result records how long its tool took; calls slower than
+AI_TOOL_SLOW_SECONDS are logged as warnings.
+"""
+import json
+import time
+import traceback
+
+from django.conf import settings
+
+from leadsAutomation.pools import submit
+
+
+# Tools that only read, and so may run at the same time as anything else
+READ_ONLY_TOOLS = {'checkAvailability', 'getCurrentTime'}
+
+class ToolContext:
+    """What every tool call of one turn shares: the business and the chat."""
+
+    def __init__(self, business, chat=None, client_phone_number=None, session_key=None):
+        self.business = business
+        self.chat = chat
+        self.client_phone_number = client_phone_number
+        self.session_key = session_key
+
+
+def run_tool_calls(tool_calls, context, execute):
+    """
+    Run `tool_calls` (OpenAI tool call objects) with
+    execute(name, arguments, context) and return one result dict per call,
+    in the order of `tool_calls`:
+    {'tool_call_id', 'tool_name', 'result', 'duration_ms'}.
+    """
+    if not tool_calls:
+        return []
+
+    timed = lambda tool_call: _run_timed(tool_call, context, execute)
+    writers = [tool_call for tool_call in tool_calls if tool_call.function.name not in READ_ONLY_TOOLS]
+
+    if len(tool_calls) == 1:
+        # Nothing to overlap with; skip the pool
+        results = {tool_calls[0].id: timed(tool_calls[0])}
+    else:
+        workers = getattr(settings, 'AI_TOOL_WORKERS', 8)
+        futures = {
+            tool_call.id: submit('ai-tools', workers, timed, tool_call)
+            for tool_call in tool_calls
+            if tool_call.function.name in READ_ONLY_TOOLS
+        }
+        writer_future = submit('ai-tools', workers, lambda calls: [timed(tool_call) for tool_call in calls], writers) if writers else None
+
+        results = {tool_call_id: future.result() for tool_call_id, future in futures.items()}
+        if writer_future is not None:
+            results.update({result['tool_call_id']: result for result in writer_future.result()})
+
+    return [results[tool_call.id] for tool_call in tool_calls]
+
+
+def _run_timed(tool_call, context, execute):
+    name = tool_call.function.name
+    started = time.perf_counter()
+    try:
+        result = execute(name, tool_call.function.arguments, context)
+    except Exception as e:
+        print(f"[ERROR] Error executing tool call: {str(e)}")
+        traceback.print_exc()
+        result = json.dumps({"error": f"Error executing tool call: {str(e)}"})
+    duration = time.perf_counter() - started
+
+    if duration > getattr(settings, 'AI_TOOL_SLOW_SECONDS', 5):
+        print(f"[WARNING] Slow tool call: {name} took {duration:.2f}s")
+    else:
+        print(f"[DEBUG] Tool call {name} took {duration:.2f}s")
+
+    return {
+        'tool_call_id': tool_call.id,
+        'tool_name': name,
+        'result': result,
+        'duration_ms': round(duration * 1000, 1),
+    }
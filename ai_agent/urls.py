@@ -6,11 +6,13 @@ app_name = 'ai_agent'
 urlpatterns = [
     # OpenAI-based chatbot endpoints (primary endpoints)
     path('api/chat/', views.chat_api, name='chat_api'),
+    path('api/chat/stream/', views.chat_stream_api, name='chat_stream_api'),
     path('api/chat/<str:client_phone_number>/delete/', views.delete_chat, name='delete_chat'),
     
     
     # Twilio webhook URL
     path('api/twilio/webhook/<str:secretKey>/', views.twilio_webhook, name='twilio_webhook'),
+    path('api/twilio/pipeline-stats/', views.sms_pipeline_stats, name='sms_pipeline_stats'),
 
     # New unified agent configuration pages
     path('agent-config/', views.agent_config_unified, name='agent_config'),
@@ -1,12 +1,11 @@
-from django.db.models import Q
 from datetime import datetime
 import pytz
 from dotenv import load_dotenv
 from accounts.models import Business, BusinessSettings, CustomAddons
+from accounts.phone import find_by_phone
 import os
 from openai import OpenAI
 import traceback
-import re
 
 load_dotenv()
 
@@ -17,16 +16,9 @@ current_time = datetime.now().astimezone(pytz.timezone('America/Chicago'))
 
 
 def find_by_phone_number(model, field_name, phone, business):
-    """Find a record by trying different phone number formats."""
-
-    # Extract only the last 10 digits for a more reliable comparison
-    phone_digits = re.sub(r'\D', '', phone)  # Remove all non-numeric characters
-    phone_last_10 = phone_digits[-10:]  # Get the last 10 digits
-    
-    # Build query to check different formats in a single database hit
-    query = Q(**{field_name: phone}) | Q(**{field_name: phone_digits}) | Q(**{field_name: phone_last_10})
-    
-    return model.objects.filter(business=business).filter(query).first()
+    """Find a record of a phone-indexed model by phone number, in any format."""
+    # field_name is kept for existing callers; the match uses the model's phone_e164 column
+    return find_by_phone(model.objects.all(), phone, business)
 
 
 def default_custom_instructions(business):
@@ -256,69 +248,12 @@ def format_messages_for_openai(messages, system_prompt):
 
 def get_chat_status(chat):
     """
-    Use OpenAI to analyze a chat and determine its status
+    Determine and save the chat's status (see ai_agent.chat_status)
     """
     try:
-        # Get chat messages directly from database
-        from .models import Messages
-        messages = Messages.objects.filter(chat=chat).order_by('createdAt')
-        
-        if not messages.exists():
-            return "pending"
-        
-        # Format messages for OpenAI
-        SYSTEM_PROMPT = """
-        You are an AI assistant that analyzes conversations and returns their status using a single-word response.
-
-        Instructions:
-        Analyze the conversation and determine its current status.
-        Respond with only one word from the predefined list below.
-        Do not add any extra text, explanations, or formatting.
-        Allowed Responses:
-        pending → Conversation is ongoing, and not respondeded.
-        booked → If the user has confirmed a booking no matter conversation is ongoing or not.
-        not_interested → The user is not interested.
-       
-        Example Outputs:
-        If the conversation is unresolved → pending
-        If the user confirms a booking → booked
-        If the user expresses disinterest → not_interested
-        If booking is confirmed → booked
-        
-        Important Rules:
-        ✅ Return only one word from the list.
-        ❌ Do not generate full sentences, explanations, or additional text.
-        """
-        
-        formatted_messages = format_messages_for_openai(messages, SYSTEM_PROMPT)
-
-        
-        # Call OpenAI API
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=formatted_messages
-            )
-            
-            response_text = response.choices[0].message.content.strip().lower()
-            
-            # Validate the response is one of the expected values
-            valid_statuses = ["pending", "booked", "not_interested"]
-            if response_text not in valid_statuses:
-                response_text = "pending"
-                
-            chat.status = response_text
-            chat.save()
-            return response_text
-            
-        except Exception as e:
-            print(f"[UTIL] Error getting chat status from OpenAI: {str(e)}")
-            print(traceback.format_exc())
-            return "error"
-            
+        from .chat_status import classify_chat_status
+        return classify_chat_status(chat)
     except Exception as e:
         print(f"[UTIL] Error in get_chat_status: {str(e)}")
         print(traceback.format_exc())
-        return "error"
\ No newline at end of file
+        return "error"
@@ -1,12 +1,16 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST, require_http_methods
 from datetime import datetime
 
 from accounts.models import Business, ApiCredential
-from .models import AgentConfiguration, Chat, Messages
+from accounts.phone import filter_by_phone, find_by_phone
+from .models import AgentConfiguration, Chat, Messages, InboundSMS
+from . import sms_pipeline
+from .streaming import sse
 from automation.models import Lead
 from bookings.models import Booking
 
@@ -17,7 +21,6 @@ from .langchain_agent import LangChainAgent
 import os
 import traceback
 from openai import OpenAI
-import threading
 from twilio.rest import Client
 import json
 
@@ -52,7 +55,7 @@ def all_chats(request):
             chat.last_message_time = last_message.createdAt if last_message else chat.createdAt
             
             # Get lead name if available
-            lead = Lead.objects.filter(phone_number=chat.clientPhoneNumber).first()
+            lead = find_by_phone(Lead.objects.all(), chat.clientPhoneNumber, business)
             chat.lead_name = lead.name if lead else chat.clientPhoneNumber or f"WebChat: {chat.sessionKey}"
         
         # Get business timezone for template use
@@ -316,14 +319,26 @@ def twilio_webhook(request, secretKey):
     twiml_response = MessagingResponse()
     
     try:
-        # Immediately acknowledge receipt to avoid Twilio timeout
-        # Start processing in background thread without sending an acknowledgment message
-        print("[DEBUG] Starting background thread for async processing")
-        threading.Thread(
-            target=process_sms_async,
-            args=(secretKey, from_number, body, to_number),
-            daemon=True
-        ).start()
+        # Persist the message before acknowledging Twilio so it survives a
+        # worker restart; the SMS pipeline processes it in the background
+        message_sid = request.POST.get('MessageSid') or None
+        fields = {
+            'business': business,
+            'fromNumber': from_number,
+            'toNumber': to_number,
+            'body': body,
+        }
+        if message_sid:
+            # Twilio retries deliveries; the MessageSid keeps them from queueing twice
+            inbound, created = InboundSMS.objects.get_or_create(messageSid=message_sid, defaults=fields)
+        else:
+            inbound, created = InboundSMS.objects.create(**fields), True
+
+        if created:
+            print(f"[DEBUG] Queued inbound SMS {inbound.id} for processing")
+            transaction.on_commit(lambda: sms_pipeline.enqueue(inbound))
+        else:
+            print(f"[DEBUG] Duplicate delivery of {message_sid}, already queued")
         
         # Return an empty TwiML response to acknowledge the webhook without sending a message
         print("[DEBUG] Returning empty TwiML response to Twilio")
@@ -338,65 +353,71 @@ def twilio_webhook(request, secretKey):
         twiml_response.message("Sorry, we encountered an error processing your request. Please try again later.")
         return HttpResponse(str(twiml_response), content_type='text/xml')
 
-def process_sms_async(secretKey, from_number, body, to_number):
-    """Process SMS message asynchronously and send response when ready"""
+def reply_to_sms(secretKey, from_number, body, to_number):
+    """
+    Run an inbound SMS through the agent and text back the reply. Errors
+    are raised so ai_agent.sms_pipeline can retry the message.
+    """
     print(f"\n[DEBUG] Starting async processing for {from_number}")
     print(f"[DEBUG] Async process timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    try:
-        # Clean the phone number (remove any + prefix)
-        client_phone_number = from_number
-        
-        print(f"[DEBUG] Using client phone number: {client_phone_number}")
-        
-        print(f"[DEBUG] Fetching API credentials with secretKey: {secretKey}")
-        apiCred = ApiCredential.objects.filter(secretKey=secretKey).first()
-        
-        if not apiCred:
-            print("[DEBUG] API credentials not found")
-            send_sms_response(from_number, "Sorry, we couldn't process your request at this time.", apiCred)
-            return
-        
-        business = apiCred.business
-        print(f"[DEBUG] Business found: {business.businessName} (ID: {business.businessId})")
-        
-        # Create LangChain agent for this conversation
-        print(f"[DEBUG] Creating LangChain agent for business ID {business.businessId} and phone {client_phone_number}")
-        
-        try:
-            agent = LangChainAgent(
-                business_id=business.businessId,
-                client_phone_number=client_phone_number
-            )
-            print(f"[DEBUG] LangChain agent created successfully")
-            
-            # Process the message with the agent
-            print("[DEBUG] Processing message with LangChain agent")
-            print(f"[DEBUG] Processing timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-            ai_response = agent.process_message(body)
-            
-            print(f"[DEBUG] Agent response received at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"[DEBUG] Response: {ai_response}")
-            
-            # Truncate if necessary to fit SMS length limits
-            original_length = len(ai_response)
-            if len(ai_response) > 1500:
-                print(f"[DEBUG] Truncating response from {original_length} to 1500 characters")
-                ai_response = ai_response[:1497] + "..."
-            
-            print("[DEBUG] Sending final response to user")
-            send_sms_response(from_number, ai_response, apiCred)
-            print(f"[DEBUG] Async processing completed for {from_number} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            
-        except Exception as e:
-            print(f"[DEBUG] Error with LangChain agent: {str(e)}")
-            traceback.print_exc()
-            send_sms_response(from_number, "Sorry, we're experiencing technical difficulties. Please try again later.", apiCred)
-        
-    except Exception as e:
-        print(f"[DEBUG] Error in async SMS processing: {str(e)}")
-        traceback.print_exc()
-        send_sms_response(from_number, "Sorry, we encountered an error processing your request. Please try again later.", apiCred)
+    
+    # Clean the phone number (remove any + prefix)
+    client_phone_number = from_number
+    
+    print(f"[DEBUG] Using client phone number: {client_phone_number}")
+    
+    print(f"[DEBUG] Fetching API credentials with secretKey: {secretKey}")
+    apiCred = ApiCredential.objects.filter(secretKey=secretKey).first()
+    
+    if not apiCred:
+        # Nothing to reply with, and retrying won't change that
+        print("[DEBUG] API credentials not found")
+        return
+    
+    business = apiCred.business
+    print(f"[DEBUG] Business found: {business.businessName} (ID: {business.businessId})")
+    
+    # Create LangChain agent for this conversation
+    print(f"[DEBUG] Creating LangChain agent for business ID {business.businessId} and phone {client_phone_number}")
+    
+    agent = LangChainAgent(
+        business_id=business.businessId,
+        client_phone_number=client_phone_number
+    )
+    print(f"[DEBUG] LangChain agent created successfully")
+    
+    # Process the message with the agent
+    print("[DEBUG] Processing message with LangChain agent")
+    print(f"[DEBUG] Processing timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    
+    ai_response = agent.process_message(body, raise_errors=True)
+    
+    print(f"[DEBUG] Agent response received at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"[DEBUG] Response: {ai_response}")
+    
+    # Truncate if necessary to fit SMS length limits
+    original_length = len(ai_response)
+    if len(ai_response) > 1500:
+        print(f"[DEBUG] Truncating response from {original_length} to 1500 characters")
+        ai_response = ai_response[:1497] + "..."
+    
+    print("[DEBUG] Sending final response to user")
+    send_sms_response(from_number, ai_response, apiCred)
+    print(f"[DEBUG] Async processing completed for {from_number} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+
+def send_sms_apology(secretKey, from_number):
+    """Tell the customer their text could not be answered."""
+    apiCred = ApiCredential.objects.filter(secretKey=secretKey).first()
+    if apiCred:
+        send_sms_response(from_number, "Sorry, we're experiencing technical difficulties. Please try again later.", apiCred)
+
+
+@login_required
+@user_passes_test(lambda user: user.is_staff or user.is_superuser)
+def sms_pipeline_stats(request):
+    """Queue depth and latency of the inbound SMS pipeline"""
+    return JsonResponse(sms_pipeline.pipeline_stats())
 
 
 def send_sms_response(to_number, message, apiCred):
@@ -515,7 +536,7 @@ def get_chat_data(request, chat_id):
         messages = Messages.objects.filter(chat=chat).order_by('createdAt')
         
         # Get lead information
-        lead = Lead.objects.filter(phone_number=chat.clientPhoneNumber).first()
+        lead = find_by_phone(Lead.objects.all(), chat.clientPhoneNumber, chat.business)
         lead_name = lead.name if lead else "Unknown"
 
         # Get booking details if available
@@ -728,6 +749,66 @@ def chat_api(request):
         }, status=500)
 
 
+@csrf_exempt
+@require_POST
+def chat_stream_api(request):
+    """Streaming variant of chat_api for the web chat widget
+    
+    Takes the same JSON body as a chat_api POST and answers with
+    server-sent events: 'token' events carry the reply text as it is
+    generated, 'tool_start' / 'tool_end' report tool calls, and the stream
+    ends with 'done' (the full response) or 'error'.
+    
+    Args:
+        request: Django request object
+        
+    Returns:
+        StreamingHttpResponse of text/event-stream, or JsonResponse on invalid input
+    """
+    try:
+        data = json.loads(request.body)
+        business_id = data.get('business_id')
+        client_phone_number = data.get('client_phone_number')
+        session_key = data.get('session_key')
+        message_text = data.get('message')
+        mode = data.get('mode', 'live')
+        
+        if not business_id or not (client_phone_number or session_key) or not message_text:
+            return JsonResponse({
+                'error': 'Missing required fields'
+            }, status=400)
+        
+        from usage_analytics.services.usage_service import UsageService
+        check_limit = UsageService.check_sms_messages_limit(Business.objects.get(businessId=business_id))
+        if check_limit.get('exceeded'):
+            print("SMS Limit reached for your Plan")
+            return JsonResponse({
+                'error': 'SMS limit exceeded'
+            }, status=400)
+        
+        agent = LangChainAgent(
+            business_id=business_id,
+            client_phone_number=client_phone_number,
+            session_key=session_key
+        )
+    except Business.DoesNotExist:
+        return JsonResponse({
+            'error': 'Business not found'
+        }, status=404)
+    except Exception as e:
+        print(f"Error in chat_stream_api: {str(e)}")
+        traceback.print_exc()
+        return JsonResponse({
+            'error': str(e)
+        }, status=500)
+    
+    events = (sse(event, payload) for event, payload in agent.stream_message(message_text, mode))
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @csrf_exempt
 def delete_chat(request, client_phone_number):
     """API endpoint to delete a chat
@@ -741,7 +822,7 @@ def delete_chat(request, client_phone_number):
     """
     try:
         # Get the chat object
-        chat = Chat.objects.get(clientPhoneNumber=client_phone_number)
+        chat = filter_by_phone(Chat.objects.all(), client_phone_number).get()
         
         # Delete all messages for this chat
         Messages.objects.filter(chat=chat).delete()
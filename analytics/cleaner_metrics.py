@@ -0,0 +1,77 @@
+"""
+Per-cleaner booking metrics for the cleaner analytics charts.
+
+Every number the charts show for every cleaner comes from one grouped query
+over the bookings in the range, plus one for the split by service type,
+however many cleaners the business has. All chart types read from the same
+result.
+"""
+from django.db.models import Avg, Count, Q, Sum
+
+
+SERVICE_DISPLAY_NAMES = {
+    'standard': 'Standard Cleaning',
+    'deep': 'Deep Cleaning',
+    'moveinmoveout': 'Move In/Move Out',
+    'airbnb': 'Airbnb Cleaning',
+    None: 'Not Specified'
+}
+
+
+def empty_metrics():
+    return {
+        'total_bookings': 0,
+        'completed_bookings': 0,
+        'total_revenue': 0,
+        'paid_revenue': 0,
+        'avg_square_footage': 0,
+        'avg_bedrooms': 0,
+        'avg_bathrooms': 0,
+        'service_types': {},
+    }
+
+
+def cleaner_metrics(bookings):
+    """
+    {cleaner id: metrics} for the cleaners with bookings in `bookings` (a
+    Booking queryset). Cleaners without bookings are missing; use
+    empty_metrics() for them.
+    """
+    metrics = {}
+    grouped = bookings.filter(cleaner__isnull=False).values('cleaner').annotate(
+        total_bookings=Count('id'),
+        completed_bookings=Count('id', filter=Q(isCompleted=True)),
+        total_revenue=Sum('totalPrice'),
+        paid_revenue=Sum('invoice__amount', filter=Q(invoice__isPaid=True)),
+        avg_square_footage=Avg('squareFeet'),
+        avg_bedrooms=Avg('bedrooms'),
+        avg_bathrooms=Avg('bathrooms'),
+    ).order_by()
+    for item in grouped:
+        cleaner_id = item.pop('cleaner')
+        metrics[cleaner_id] = {key: value or 0 for key, value in item.items()}
+        metrics[cleaner_id]['service_types'] = {}
+
+    service_types = bookings.filter(cleaner__isnull=False).values('cleaner', 'serviceType').annotate(count=Count('id')).order_by('-count')
+    for item in service_types:
+        metrics[item['cleaner']]['service_types'][item['serviceType']] = item['count']
+
+    return metrics
+
+
+def service_type_breakdown(metrics):
+    """The service types of one cleaner's metrics, most booked first, as the charts show them."""
+    total = metrics['total_bookings']
+    return [
+        {
+            'type': SERVICE_DISPLAY_NAMES.get(service_type, 'Other'),
+            'count': count,
+            'percentage': round((count / total) * 100, 1) if total > 0 else 0,
+        }
+        for service_type, count in metrics['service_types'].items()
+    ]
+
+
+def pending_revenue(metrics):
+    """Total minus paid revenue, never negative."""
+    return max(0, float(metrics['total_revenue']) - float(metrics['paid_revenue']))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Business
+from analytics.rollup import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the BusinessDailyMetrics rows the analytics dashboard reads, from bookings and invoices'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only rebuild this many most recent days (default: all history)')
+        parser.add_argument('--business', help='Only rebuild this businessId')
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.all()
+        if options['business']:
+            businesses = businesses.filter(businessId=options['business'])
+
+        for business in businesses:
+            days = backfill(business.id, options['days'])
+            self.stdout.write(f'{business.businessName}: {days} days with activity')
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
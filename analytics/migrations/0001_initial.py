@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0045_thumbtackprofile_business_info_last_refresh_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessDailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bookings_total', models.IntegerField(default=0)),
+                ('bookings_completed', models.IntegerField(default=0)),
+                ('bookings_cancelled', models.IntegerField(default=0)),
+                ('booking_value', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('service_types', models.JSONField(default=dict)),
+                ('cleaners', models.JSONField(default=dict)),
+                ('addons', models.JSONField(default=dict)),
+                ('new_customers', models.IntegerField(default=0)),
+                ('repeat_customers', models.IntegerField(default=0)),
+                ('invoices_total', models.IntegerField(default=0)),
+                ('invoices_paid', models.IntegerField(default=0)),
+                ('revenue_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('revenue_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='accounts.business')),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('business', 'date'), name='unique_business_daily_metrics')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-17 23:55
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def schedule_daily_metrics_backfill(apps, schema_editor):
+    # The dashboard only reads BusinessDailyMetrics; without a backfill,
+    # installs with existing bookings would show empty charts and the
+    # nightly reconciliation only covers the last few days
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Booking = apps.get_model('bookings', 'Booking')
+    Invoice = apps.get_model('invoice', 'Invoice')
+    if not (Booking.objects.exists() or Invoice.objects.exists()):
+        return
+    if not Schedule.objects.filter(func='analytics.tasks.backfill_daily_metrics').exists():
+        Schedule.objects.create(
+            func='analytics.tasks.backfill_daily_metrics',
+            schedule_type='O',  # Schedule.ONCE
+            repeats=-1,
+            next_run=timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        ('bookings', '0027_booking_list_keyset_index'),
+        ('django_q', '0018_task_success_index'),
+        ('invoice', '0011_alter_payment_amount'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_daily_metrics_backfill, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,47 @@
 from django.db import models
 
-# Create your models here.
+from accounts.models import Business
+
+
+class BusinessDailyMetrics(models.Model):
+    """
+    One day of a business's bookings and invoices, pre-aggregated for the
+    analytics dashboard. Kept up to date by analytics.signals and rebuilt
+    nightly by analytics.tasks.reconcile_daily_metrics; see analytics.rollup.
+
+    Bookings count on the day they were created, invoices on the day they
+    were issued, the same days the dashboard charts used to group by. Days
+    are in the business's time zone.
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='daily_metrics')
+    date = models.DateField()
+
+    # Bookings
+    bookings_total = models.IntegerField(default=0)
+    bookings_completed = models.IntegerField(default=0)
+    bookings_cancelled = models.IntegerField(default=0)
+    booking_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    service_types = models.JSONField(default=dict)  # serviceType ('' when unset) -> bookings
+    cleaners = models.JSONField(default=dict)  # cleaner id -> bookings
+    addons = models.JSONField(default=dict)  # add-on key -> {'count', 'revenue', 'bookings'}; custom add-ons as 'custom:<name>'
+
+    # Customers who booked that day, by whether it was their first booking with the business
+    new_customers = models.IntegerField(default=0)
+    repeat_customers = models.IntegerField(default=0)
+
+    # Invoices
+    invoices_total = models.IntegerField(default=0)
+    invoices_paid = models.IntegerField(default=0)
+    revenue_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    revenue_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['business', 'date'], name='unique_business_daily_metrics'),
+        ]
+
+    def __str__(self):
+        return f"{self.business_id} {self.date}"
@@ -0,0 +1,325 @@
+"""
+Daily rollup of bookings and invoices for the analytics dashboard.
+
+Chart requests read BusinessDailyMetrics rows instead of scanning every
+booking and invoice in the range, so a five-year chart costs about 1,800
+rows per business however many bookings there are.
+
+Days are the business's local days (Business.timezone), whatever time zone
+is active where the rollup runs: a web request, a django-q task or a
+webhook all key the same booking to the same day.
+
+The rows are kept up to date from the booking, invoice and payment signals:
+mark_dirty() records the business and moment a change touches and, once the
+transaction commits, rebuild() recomputes those days from the source rows
+with a few grouped queries. analytics.tasks.reconcile_daily_metrics rebuilds
+the last ANALYTICS_RECONCILE_DAYS days nightly to catch anything the signals
+missed (queryset updates, add-on price changes...). History from before
+the rollup existed is filled in by backfill(): the 0002 migration schedules
+analytics.tasks.backfill_daily_metrics once, and the rebuild_daily_metrics
+command runs it, or any recent range, by hand.
+"""
+import threading
+import time as time_module
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from accounts.models import Business, BusinessSettings
+from bookings.models import Booking
+from invoice.models import Invoice
+from .models import BusinessDailyMetrics
+
+
+# key, display name, Booking field, BusinessSettings price field
+STANDARD_ADDONS = [
+    ('dishes', 'Dishes', 'addonDishes', 'addonPriceDishes'),
+    ('laundry', 'Laundry', 'addonLaundryLoads', 'addonPriceLaundry'),
+    ('window', 'Window Cleaning', 'addonWindowCleaning', 'addonPriceWindow'),
+    ('pets', 'Pets Cleaning', 'addonPetsCleaning', 'addonPricePets'),
+    ('fridge', 'Fridge Cleaning', 'addonFridgeCleaning', 'addonPriceFridge'),
+    ('oven', 'Oven Cleaning', 'addonOvenCleaning', 'addonPriceOven'),
+    ('baseboard', 'Baseboard', 'addonBaseboard', 'addonPriceBaseboard'),
+    ('blinds', 'Blinds', 'addonBlinds', 'addonPriceBlinds'),
+    ('green', 'Green Cleaning', 'addonGreenCleaning', 'addonPriceGreen'),
+    ('cabinets', 'Cabinets Cleaning', 'addonCabinetsCleaning', 'addonPriceCabinets'),
+    ('patio', 'Patio Sweeping', 'addonPatioSweeping', 'addonPricePatio'),
+    ('garage', 'Garage Sweeping', 'addonGarageSweeping', 'addonPriceGarage'),
+]
+
+CUSTOM_ADDON_PREFIX = 'custom:'
+
+_rebuilt = threading.local()
+
+
+def business_timezone(business_id):
+    """The time zone the rows of a business are keyed in."""
+    name = Business.objects.filter(pk=business_id).values_list('timezone', flat=True).first()
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def local_day(moment, tz=None):
+    """The day `moment` falls on in `tz` (default: the current time zone), as TruncDate sees it."""
+    return timezone.localtime(moment, tz).date() if moment else None
+
+
+def mark_dirty(business_id, moment):
+    """
+    Rebuild the day of a business that `moment` falls on once the current
+    transaction commits. A day marked several times in one transaction is
+    rebuilt once.
+    """
+    if not business_id or not moment:
+        return
+
+    marked_at = time_module.monotonic()
+    transaction.on_commit(lambda: _rebuild_marked(business_id, moment, marked_at))
+
+
+def _rebuild_marked(business_id, moment, marked_at):
+    try:
+        day = local_day(moment, business_timezone(business_id))
+    except Exception as e:
+        print(f"[ERROR] Error rebuilding daily metrics for business {business_id}: {str(e)}")
+        return
+
+    rebuilt = getattr(_rebuilt, 'days', None)
+    if rebuilt is None or len(rebuilt) > 1000:
+        rebuilt = _rebuilt.days = {}
+    if rebuilt.get((business_id, day), -1) >= marked_at:
+        # Already rebuilt since this mark
+        return
+
+    rebuilt[(business_id, day)] = time_module.monotonic()
+    try:
+        rebuild(business_id, day, day)
+    except Exception as e:
+        # The nightly reconciliation repairs whatever this missed
+        print(f"[ERROR] Error rebuilding daily metrics for business {business_id} on {day}: {str(e)}")
+
+
+def _bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def rebuild(business_id, start, end):
+    """
+    Recompute the rows of a business for the days `start`..`end` (inclusive,
+    in the business's time zone) from its bookings and invoices. Days with
+    no activity lose their row.
+    """
+    with timezone.override(business_timezone(business_id)):
+        return _rebuild(business_id, start, end)
+
+
+def backfill(business_id, days=None):
+    """
+    Rebuild the last `days` days of a business, or its whole history from
+    its first booking or invoice if `days` is None. Returns the number of
+    days with activity.
+    """
+    tz = business_timezone(business_id)
+    end = timezone.localdate(timezone=tz)
+    if days:
+        start = end - timedelta(days=days - 1)
+    else:
+        first = [
+            Booking.objects.filter(business_id=business_id).aggregate(first=Min('createdAt'))['first'],
+            Invoice.objects.filter(booking__business_id=business_id).aggregate(first=Min('createdAt'))['first'],
+        ]
+        first = [moment for moment in first if moment]
+        if not first:
+            return 0
+        start = local_day(min(first), tz)
+
+    # A year at a time keeps each rebuild's queries small
+    rebuilt = 0
+    while start <= end:
+        chunk_end = min(end, start + timedelta(days=365))
+        rebuilt += rebuild(business_id, start, chunk_end)
+        start = chunk_end + timedelta(days=1)
+    return rebuilt
+
+
+def _rebuild(business_id, start, end):
+    since, until = _bounds(start, end)
+    bookings = Booking.objects.filter(business_id=business_id, createdAt__gte=since, createdAt__lt=until).annotate(day=TruncDate('createdAt'))
+    invoices = Invoice.objects.filter(booking__business_id=business_id, createdAt__gte=since, createdAt__lt=until).annotate(day=TruncDate('createdAt'))
+
+    rows = defaultdict(lambda: BusinessDailyMetrics(business_id=business_id))
+
+    addon_prices = _addon_prices(business_id)
+    booking_totals = bookings.values('day').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(isCompleted=True)),
+        cancelled=Count('id', filter=Q(cancelled_at__isnull=False)),
+        value=Sum('totalPrice'),
+        **{key: Sum(field) for key, _, field, _ in STANDARD_ADDONS},
+        **{f"{key}_bookings": Count('id', filter=Q(**{f"{field}__gt": 0})) for key, _, field, _ in STANDARD_ADDONS},
+    )
+    for item in booking_totals:
+        row = rows[item['day']]
+        row.bookings_total = item['total']
+        row.bookings_completed = item['completed']
+        row.bookings_cancelled = item['cancelled']
+        row.booking_value = item['value'] or 0
+        row.addons = {
+            key: {'count': item[key], 'revenue': float(item[key] * addon_prices[key]), 'bookings': item[f"{key}_bookings"]}
+            for key, _, _, _ in STANDARD_ADDONS
+            if item[key] and item[key] > 0
+        }
+
+    for item in bookings.values('day', 'serviceType').annotate(count=Count('id')):
+        rows[item['day']].service_types[item['serviceType'] or ''] = item['count']
+
+    for item in bookings.filter(cleaner__isnull=False).values('day', 'cleaner_id').annotate(count=Count('id')):
+        rows[item['day']].cleaners[str(item['cleaner_id'])] = item['count']
+
+    _count_custom_addons(bookings, rows)
+
+    _count_customers(business_id, bookings, rows)
+
+    invoice_totals = invoices.values('day').annotate(
+        total=Count('id'),
+        paid=Count('id', filter=Q(isPaid=True)),
+        revenue=Sum('amount'),
+        paid_revenue=Sum('amount', filter=Q(isPaid=True)),
+    )
+    for item in invoice_totals:
+        row = rows[item['day']]
+        row.invoices_total = item['total']
+        row.invoices_paid = item['paid']
+        row.revenue_total = item['revenue'] or 0
+        row.revenue_paid = item['paid_revenue'] or 0
+
+    for day, row in rows.items():
+        row.date = day
+        row.updated_at = timezone.now()
+
+    with transaction.atomic():
+        BusinessDailyMetrics.objects.filter(business_id=business_id, date__gte=start, date__lte=end).exclude(date__in=list(rows)).delete()
+        if rows:
+            BusinessDailyMetrics.objects.bulk_create(
+                list(rows.values()),
+                update_conflicts=True,
+                unique_fields=['business', 'date'],
+                update_fields=[
+                    field.name for field in BusinessDailyMetrics._meta.concrete_fields
+                    if field.name not in ('id', 'business', 'date')
+                ],
+            )
+    return len(rows)
+
+
+def _addon_prices(business_id):
+    prices = BusinessSettings.objects.filter(business_id=business_id).values(*(price for _, _, _, price in STANDARD_ADDONS)).first() or {}
+    return {key: prices.get(price) or Decimal('0') for key, _, _, price in STANDARD_ADDONS}
+
+
+def _snapshot_prices(snapshot):
+    """{custom add-on id: price} as recorded in a booking's pricing_snapshot."""
+    try:
+        return {
+            addon['addon_id']: Decimal(str(addon['price']))
+            for addon in snapshot['custom_addons']['bookingCustomAddonsData']
+            if addon.get('price') is not None
+        }
+    except (KeyError, TypeError):
+        return {}
+
+
+def _count_custom_addons(bookings, rows):
+    """
+    Custom add-on counts and revenue per day, from one query over the
+    bookings' add-on lines. Revenue uses the price in the booking's
+    pricing_snapshot when it recorded one, the add-on's current price
+    otherwise.
+    """
+    lines = bookings.filter(customAddons__isnull=False).values(
+        'day',
+        'pricing_snapshot',
+        addon_id=F('customAddons__addon_id'),
+        name=F('customAddons__addon__addonName'),
+        qty=F('customAddons__qty'),
+        price=F('customAddons__addon__addonPrice'),
+    ).order_by()
+    for item in lines:
+        if not item['name'] or not item['qty']:
+            continue
+        price = _snapshot_prices(item['pricing_snapshot']).get(item['addon_id'], item['price'] or Decimal('0'))
+        addon = rows[item['day']].addons.setdefault(CUSTOM_ADDON_PREFIX + item['name'], {'count': 0, 'revenue': 0, 'bookings': 0})
+        addon['count'] += item['qty']
+        addon['revenue'] += float(item['qty'] * price)
+        addon['bookings'] += 1
+
+
+def _count_customers(business_id, bookings, rows):
+    """New and repeat customers per day, by each customer's first booking with the business."""
+    customers_by_day = defaultdict(set)
+    for item in bookings.filter(customer__isnull=False).values('day', 'customer_id').distinct():
+        customers_by_day[item['day']].add(item['customer_id'])
+    if not customers_by_day:
+        return
+
+    customer_ids = set().union(*customers_by_day.values())
+    first_day = {
+        item['customer_id']: local_day(item['first'])
+        for item in Booking.objects.filter(business_id=business_id, customer_id__in=customer_ids)
+        .values('customer_id').annotate(first=Min('createdAt'))
+    }
+    for day, customers in customers_by_day.items():
+        new = sum(1 for customer_id in customers if first_day.get(customer_id) == day)
+        rows[day].new_customers = new
+        rows[day].repeat_customers = len(customers) - new
+
+
+def merge_counts(rows, field):
+    """Sum a {key: count} JSON field over `rows`."""
+    totals = defaultdict(int)
+    for value in rows.values_list(field, flat=True):
+        for key, count in (value or {}).items():
+            totals[key] += count
+    return totals
+
+
+def _add_addons(totals, value):
+    for key, addon in (value or {}).items():
+        totals[key]['count'] += addon['count']
+        totals[key]['revenue'] += addon['revenue']
+        totals[key]['bookings'] += addon.get('bookings', 0)
+
+
+def _empty_addon():
+    return {'count': 0, 'revenue': 0, 'bookings': 0}
+
+
+def merge_addons(rows):
+    """Sum the add-on counts, revenue and bookings over `rows`."""
+    totals = defaultdict(_empty_addon)
+    for value in rows.values_list('addons', flat=True):
+        _add_addons(totals, value)
+    return totals
+
+
+def merge_addons_by_period(rows, period_of):
+    """
+    merge_addons() per period: {period: {key: totals}}, where `period_of`
+    maps a row's date to its period (e.g. the first day of its month).
+    """
+    periods = defaultdict(lambda: defaultdict(_empty_addon))
+    for day, value in rows.values_list('date', 'addons'):
+        _add_addons(periods[period_of(day)], value)
+    return periods
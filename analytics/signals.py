@@ -0,0 +1,43 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from bookings.models import Booking
+from invoice.models import Invoice, Payment
+from .rollup import mark_dirty
+from .tasks import schedule_daily_metrics_reconcile
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    mark_dirty(instance.business_id, instance.createdAt)
+    if kwargs.get('created'):
+        schedule_daily_metrics_reconcile()
+
+
+@receiver(m2m_changed, sender=Booking.customAddons.through)
+def booking_addons_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Booking):
+        mark_dirty(instance.business_id, instance.createdAt)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invoice_changed(sender, instance, **kwargs):
+    mark_invoice_dirty(instance)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    try:
+        invoice = instance.invoice
+    except Invoice.DoesNotExist:
+        return
+    mark_invoice_dirty(invoice)
+
+
+def mark_invoice_dirty(invoice):
+    if invoice.booking_id:
+        business_id = Booking.objects.filter(pk=invoice.booking_id).values_list('business_id', flat=True).first()
+        mark_dirty(business_id, invoice.createdAt)
@@ -0,0 +1,76 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django_q.models import Schedule
+from django_q.tasks import async_task, schedule
+
+from bookings.models import Booking
+from invoice.models import Invoice
+from .models import BusinessDailyMetrics
+from .rollup import backfill, business_timezone, rebuild
+
+
+def reconcile_daily_metrics(days=None):
+    """
+    Rebuild the last `days` days (ANALYTICS_RECONCILE_DAYS by default) of
+    daily metrics for every business with activity in them.
+    """
+    days = days or getattr(settings, 'ANALYTICS_RECONCILE_DAYS', 7)
+    # A day of slack either side covers every business's time zone
+    since = timezone.now() - timedelta(days=days + 1)
+
+    business_ids = set(Booking.objects.filter(createdAt__gte=since, business__isnull=False).values_list('business_id', flat=True).distinct())
+    business_ids |= set(Invoice.objects.filter(createdAt__gte=since, booking__business__isnull=False).values_list('booking__business_id', flat=True).distinct())
+    business_ids |= set(BusinessDailyMetrics.objects.filter(date__gte=since.date()).values_list('business_id', flat=True).distinct())
+
+    rebuilt = 0
+    for business_id in business_ids:
+        try:
+            end = timezone.localdate(timezone=business_timezone(business_id))
+            rebuild(business_id, end - timedelta(days=days - 1), end)
+            rebuilt += 1
+        except Exception as e:
+            print(f"[ERROR] Error reconciling daily metrics for business {business_id}: {str(e)}")
+    print(f"[TASK] reconcile_daily_metrics: rebuilt the last {days} days for {rebuilt} businesses")
+    return rebuilt
+
+
+def backfill_daily_metrics():
+    """
+    Rebuild the whole history of every business with bookings or invoices,
+    one task per business so each stays within the django-q timeout.
+    Scheduled once by the analytics 0002 migration.
+    """
+    business_ids = set(Booking.objects.filter(business__isnull=False).values_list('business_id', flat=True).distinct())
+    business_ids |= set(Invoice.objects.filter(booking__business__isnull=False).values_list('booking__business_id', flat=True).distinct())
+    for business_id in business_ids:
+        async_task('analytics.tasks.backfill_business_daily_metrics', business_id)
+    print(f"[TASK] backfill_daily_metrics: queued {len(business_ids)} businesses")
+    return len(business_ids)
+
+
+def backfill_business_daily_metrics(business_id):
+    """Rebuild the whole history of one business's daily metrics."""
+    try:
+        days = backfill(business_id)
+        print(f"[TASK] backfill_business_daily_metrics: {days} days with activity for business {business_id}")
+        return days
+    except Exception as e:
+        print(f"[ERROR] Error backfilling daily metrics for business {business_id}: {str(e)}")
+        return 0
+
+
+def schedule_daily_metrics_reconcile():
+    """Schedule reconcile_daily_metrics to run nightly, once."""
+    try:
+        if not Schedule.objects.filter(func='analytics.tasks.reconcile_daily_metrics').exists():
+            tomorrow = timezone.localdate() + timedelta(days=1)
+            schedule(
+                'analytics.tasks.reconcile_daily_metrics',
+                schedule_type=Schedule.DAILY,
+                next_run=timezone.make_aware(datetime.combine(tomorrow, time(3))),
+                repeats=-1
+            )
+    except Exception as e:
+        print(f"Failed to schedule reconcile_daily_metrics task: {str(e)}")
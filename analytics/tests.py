@@ -1,3 +1,265 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_q.models import Schedule
+
+from accounts.models import Business, BusinessSettings, CustomAddons
+from automation.models import Cleaners
+from bookings.models import Booking, BookingCustomAddons
+from customer.models import Customer
+from invoice.models import Invoice
+from .customer_metrics import cohort_retention
+from .models import BusinessDailyMetrics
+from .tasks import backfill_business_daily_metrics, backfill_daily_metrics, reconcile_daily_metrics
+from .views import addon_data_api, booking_data_api, cleaner_data_api, customer_data_api, revenue_data_api
+
+
+def get_json(view, user, **params):
+    request = RequestFactory().get('/', params)
+    request.user = user
+    return json.loads(view(request).content)
+
+
+class DailyMetricsRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=self.user, businessName='Sparkle')
+        BusinessSettings.objects.create(business=self.business, addonPriceDishes=Decimal('10'))
+        self.customer = Customer.objects.create(first_name='Ann', last_name='Lee', phone_number='5550001111')
+
+    def book(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(business=self.business, customer=self.customer, totalPrice=Decimal('100'), **fields)
+
+    def today(self):
+        return BusinessDailyMetrics.objects.get(business=self.business, date=timezone.localdate())
+
+    def test_rollup_follows_bookings_and_invoices(self):
+        self.book(serviceType='deep', addonDishes=2)
+        second = self.book(serviceType='standard')
+        with self.captureOnCommitCallbacks(execute=True):
+            second.isCompleted = True
+            second.save()
+            invoice = Invoice.objects.get(booking=second)
+            invoice.isPaid = True
+            invoice.save()
+
+        row = self.today()
+        self.assertEqual((row.bookings_total, row.bookings_completed), (2, 1))
+        self.assertEqual(row.service_types, {'deep': 1, 'standard': 1})
+        self.assertEqual(row.addons, {'dishes': {'count': 2, 'revenue': 20.0, 'bookings': 1}})
+        self.assertEqual((row.invoices_total, row.invoices_paid), (2, 1))
+        self.assertEqual((row.revenue_total, row.revenue_paid), (Decimal('200'), Decimal('100')))
+        self.assertEqual((row.new_customers, row.repeat_customers), (1, 0))
+
+        response = get_json(revenue_data_api, self.user, period='daily')
+        self.assertEqual((Decimal(response['totalRevenue']), Decimal(response['pendingRevenue'])), (Decimal('200'), Decimal('100')))
+        self.assertEqual(response['datasets'][1]['invoice_counts'][-2], 1)
+
+        response = get_json(booking_data_api, self.user, period='monthly')
+        self.assertEqual(response['datasets'][0]['data'][-1], 2)
+
+    def test_addon_revenue_uses_snapshot_prices(self):
+        fridge = CustomAddons.objects.create(business=self.business, addonName='Fridge Deep Clean', addonPrice=Decimal('40'))
+        snapshot = {'custom_addons': {'bookingCustomAddonsData': [{'addon_id': fridge.id, 'qty': 1, 'price': 30.0}]}}
+        for pricing_snapshot in (snapshot, None):
+            booking = self.book(addonDishes=1, pricing_snapshot=pricing_snapshot)
+            with self.captureOnCommitCallbacks(execute=True):
+                booking.customAddons.add(BookingCustomAddons.objects.create(addon=fridge, qty=1))
+
+        self.assertEqual(self.today().addons, {
+            'dishes': {'count': 2, 'revenue': 20.0, 'bookings': 2},
+            'custom:Fridge Deep Clean': {'count': 2, 'revenue': 70.0, 'bookings': 2},
+        })
+
+        response = get_json(addon_data_api, self.user, period='monthly')
+        self.assertEqual(response['total_addon_revenue'], 90.0)
+        self.assertEqual(response['addons_by_revenue'][0]['name'], 'Fridge Deep Clean')
+        self.assertEqual(len(response['trend']['labels']), 6)
+        dishes = next(dataset for dataset in response['trend']['datasets'] if dataset['label'] == 'Dishes')
+        self.assertEqual((sum(dishes['counts']), sum(dishes['revenue'])), (2, 20.0))
+
+    def test_days_are_the_business_local_days(self):
+        Business.objects.filter(pk=self.business.pk).update(timezone='America/New_York')
+        booking = self.book()
+        # 02:00 UTC is still the previous day in New York
+        created = timezone.now().replace(hour=2, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        Booking.objects.filter(pk=booking.pk).update(createdAt=created)
+        Invoice.objects.filter(booking=booking).update(createdAt=created)
+        new_york_day = created.date() - timedelta(days=1)
+
+        # Signal rebuilds run under whatever time zone is active
+        booking.refresh_from_db()
+        with timezone.override('Asia/Tokyo'), self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        row = BusinessDailyMetrics.objects.get(business=self.business, date=new_york_day)
+        self.assertEqual((row.bookings_total, row.invoices_total), (1, 1))
+        self.assertFalse(BusinessDailyMetrics.objects.filter(date=created.date()).exists())
+
+        reconcile_daily_metrics()
+        self.assertEqual(list(BusinessDailyMetrics.objects.values_list('date', 'bookings_total', 'invoices_total')), [(new_york_day, 1, 1)])
+
+    def test_deleting_the_last_booking_removes_the_day(self):
+        booking = self.book()
+        with self.captureOnCommitCallbacks(execute=True):
+            Invoice.objects.filter(booking=booking).delete()
+            booking.delete()
+        self.assertFalse(BusinessDailyMetrics.objects.exists())
+
+    def test_reconciliation_catches_queryset_updates(self):
+        booking = self.book()
+        Booking.objects.filter(pk=booking.pk).update(isCompleted=True)
+        self.assertEqual(self.today().bookings_completed, 0)
+
+        reconcile_daily_metrics()
+        self.assertEqual(self.today().bookings_completed, 1)
+
+    def test_backfill_rebuilds_history_older_than_the_reconciliation(self):
+        booking = self.book()
+        long_ago = timezone.now() - timedelta(days=400)
+        Booking.objects.filter(pk=booking.pk).update(createdAt=long_ago)
+        Invoice.objects.filter(booking=booking).update(createdAt=long_ago)
+        BusinessDailyMetrics.objects.all().delete()
+
+        reconcile_daily_metrics()
+        self.assertFalse(BusinessDailyMetrics.objects.exists())
+
+        with mock.patch('analytics.tasks.async_task', side_effect=lambda func, *args: backfill_business_daily_metrics(*args)) as queue:
+            self.assertEqual(backfill_daily_metrics(), 1)
+        queue.assert_called_once_with('analytics.tasks.backfill_business_daily_metrics', self.business.id)
+        row = BusinessDailyMetrics.objects.get()
+        self.assertEqual((row.date, row.bookings_total), (timezone.localdate(long_ago), 1))
+
+    def test_migration_schedules_the_backfill_once(self):
+        migration = import_module('analytics.migrations.0002_schedule_daily_metrics_backfill')
+        migration.schedule_daily_metrics_backfill(apps, None)
+        self.assertFalse(Schedule.objects.filter(func='analytics.tasks.backfill_daily_metrics').exists())
+
+        self.book()
+        migration.schedule_daily_metrics_backfill(apps, None)
+        migration.schedule_daily_metrics_backfill(apps, None)
+        scheduled = Schedule.objects.get(func='analytics.tasks.backfill_daily_metrics')
+        self.assertEqual((scheduled.schedule_type, scheduled.repeats), (Schedule.ONCE, -1))
+
+
+class CleanerAnalyticsTests(TestCase):
+    CHART_TYPES = ('bookings', 'performance', 'revenue', 'service_types', 'detailed')
+
+    def setUp(self):
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=self.user, businessName='Sparkle')
+
+    def add_cleaners(self, count):
+        # bulk_create skips the booking signals (invoices, reminders, emails)
+        cleaners = Cleaners.objects.bulk_create([
+            Cleaners(business=self.business, name=f"Cleaner {i}", phoneNumber='5550001111') for i in range(count)
+        ])
+        Booking.objects.bulk_create([
+            Booking(business=self.business, cleaner=cleaner, totalPrice=Decimal('100'), isCompleted=i == 0, serviceType='deep' if i == 0 else 'standard')
+            for cleaner in cleaners for i in range(2)
+        ])
+        return cleaners
+
+    def test_query_count_does_not_grow_with_cleaners(self):
+        self.add_cleaners(2)
+        counts = {}
+        for chart_type in self.CHART_TYPES:
+            with CaptureQueriesContext(connection) as queries:
+                get_json(cleaner_data_api, self.user, chart_type=chart_type)
+            counts[chart_type] = len(queries)
+
+        self.add_cleaners(20)
+        for chart_type in self.CHART_TYPES:
+            with self.assertNumQueries(counts[chart_type]):
+                get_json(cleaner_data_api, self.user, chart_type=chart_type)
+        self.assertLessEqual(max(counts.values()), 3)
+
+    def test_detailed_metrics(self):
+        cleaner = self.add_cleaners(1)[0]
+        Invoice.objects.create(booking=Booking.objects.filter(cleaner=cleaner).first(), amount=Decimal('100'), isPaid=True)
+
+        row = get_json(cleaner_data_api, self.user, chart_type='detailed')['detailed_data'][0]
+        self.assertEqual((row['total_bookings'], row['completed_bookings'], row['completion_rate']), (2, 1, 50.0))
+        self.assertEqual((row['total_revenue'], row['paid_revenue'], row['pending_revenue']), (200.0, 100.0, 100.0))
+        self.assertEqual(
+            [(service['type'], service['percentage']) for service in row['service_types']],
+            [('Deep Cleaning', 50.0), ('Standard Cleaning', 50.0)],
+        )
+
+
+class CustomerAnalyticsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=self.user, businessName='Sparkle')
+
+    def add_bookings(self, counts, created_at=None):
+        """`counts` bookings for each of len(counts) new customers; returns the customers."""
+        first = Customer.objects.count()
+        customers = Customer.objects.bulk_create([
+            Customer(first_name=f"Customer {i}", email=f"Customer{i}@Example.com") for i in range(first, first + len(counts))
+        ])
+        bookings = Booking.objects.bulk_create([
+            Booking(business=self.business, customer=customer, totalPrice=Decimal('100'))
+            for customer, count in zip(customers, counts) for _ in range(count)
+        ])
+        if created_at:
+            Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).update(createdAt=created_at)
+        return customers
+
+    def test_summary_and_paging(self):
+        self.add_bookings([1, 3, 2, 1, 7])
+        Customer.objects.bulk_create([Customer(first_name='No email')])
+        Booking.objects.create(business=self.business, customer=Customer.objects.get(first_name='No email'))
+
+        response = get_json(customer_data_api, self.user, page_size=2)
+        self.assertEqual(response['metrics']['unique_customers'], 5)
+        self.assertEqual(response['metrics']['repeat_customers'], 3)
+        self.assertEqual(response['metrics']['repeat_customer_percentage'], 60.0)
+        self.assertEqual([bucket['count'] for bucket in response['booking_distribution']], [2, 2, 0, 1])
+        self.assertEqual(response['pagination'], {'page': 1, 'page_size': 2, 'total': 5, 'pages': 3})
+        self.assertEqual([(c['email'], c['count']) for c in response['customer_list']], [('customer4@example.com', 7), ('customer1@example.com', 3)])
+        self.assertEqual(response['customer_list'][0]['total_spent'], 700.0)
+
+        response = get_json(customer_data_api, self.user, page_size=2, page=3)
+        self.assertEqual([c['email'] for c in response['customer_list']], ['customer3@example.com'])
+
+    def test_cohort_retention(self):
+        now = timezone.now()
+        last_month = now - timedelta(days=31)
+        returning = self.add_bookings([1, 1], created_at=last_month)
+        Booking.objects.bulk_create([Booking(business=self.business, customer=returning[0], totalPrice=Decimal('100'))])
+        self.add_bookings([1])
+
+        cohorts = get_json(customer_data_api, self.user)['cohorts']
+        self.assertEqual([(cohort['size'], cohort['customers'], cohort['retention']) for cohort in cohorts], [
+            (2, [2, 1], [100.0, 50.0]),
+            (1, [1], [100.0]),
+        ])
+
+    def test_cohort_queries_do_not_grow_with_bookings(self):
+        now = timezone.now()
+        bookings = Booking.objects.filter(business=self.business)
+        start = (now - timedelta(days=90)).date()
+        self.add_bookings([2, 1], created_at=now - timedelta(days=62))
+        self.add_bookings([3])
+
+        def run():
+            with CaptureQueriesContext(connection) as queries:
+                cohort_retention(bookings, start, now.date())
+            # Grouped queries only, no per-row subquery
+            self.assertEqual([query['sql'].count('SELECT') for query in queries], [1, 1])
+
+        run()
+        self.add_bookings([4] * 20, created_at=now - timedelta(days=31))
+        run()
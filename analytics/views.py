@@ -5,8 +5,11 @@ from django.db.models import Sum, Count, Q, F, Value, Avg
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay, TruncYear, ExtractMonth
 from invoice.models import Invoice, Payment
 from bookings.models import Booking
-from accounts.models import Business
 from automation.models import Cleaners
+from .customer_metrics import cohort_retention, customer_summary, top_customers
+from .cleaner_metrics import cleaner_metrics, empty_metrics, pending_revenue, service_type_breakdown
+from .models import BusinessDailyMetrics
+from .rollup import CUSTOM_ADDON_PREFIX, STANDARD_ADDONS, merge_addons, merge_addons_by_period, merge_counts
 from datetime import datetime, timedelta, date
 from django.utils import timezone
 import json
@@ -20,20 +23,20 @@ def analytics_dashboard(request):
     if not request.user.business_set.first():
         return redirect('accounts:register_business')
         
-    # Get basic metrics for the dashboard
-    total_revenue = Invoice.objects.filter(
-        booking__business__user=request.user,
-        isPaid=True
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_invoices = Invoice.objects.filter(
-        booking__business__user=request.user
-    ).count()
+    # Get basic metrics for the dashboard from the daily rollup
+    totals = BusinessDailyMetrics.objects.filter(
+        business__user=request.user
+    ).aggregate(
+        revenue=Sum('revenue_paid'),
+        invoices=Sum('invoices_total'),
+        paid_invoices=Sum('invoices_paid'),
+        bookings=Sum('bookings_total'),
+        completed_bookings=Sum('bookings_completed'),
+    )
     
-    paid_invoices = Invoice.objects.filter(
-        booking__business__user=request.user,
-        isPaid=True
-    ).count()
+    total_revenue = totals['revenue'] or 0
+    total_invoices = totals['invoices'] or 0
+    paid_invoices = totals['paid_invoices'] or 0
     
     # Calculate payment rate
     payment_rate = 0
@@ -41,14 +44,8 @@ def analytics_dashboard(request):
         payment_rate = (paid_invoices / total_invoices) * 100
     
     # Get booking metrics
-    total_bookings = Booking.objects.filter(
-        business__user=request.user
-    ).count()
-    
-    completed_bookings = Booking.objects.filter(
-        business__user=request.user,
-        isCompleted=True
-    ).count()
+    total_bookings = totals['bookings'] or 0
+    completed_bookings = totals['completed_bookings'] or 0
     
     # Calculate completion rate
     completion_rate = 0
@@ -93,15 +90,12 @@ def revenue_data_api(request):
     period = request.GET.get('period', 'monthly')
     months = int(request.GET.get('months', 6))
 
-    totalRevenue = Invoice.objects.filter(
-        booking__business__user=request.user
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    pendingRevenue = Invoice.objects.filter(
-        booking__business__user=request.user,
-        isPaid=False
-    ).aggregate(total=Sum('amount'))['total'] or 0
-
-    receivedRevenue = totalRevenue - pendingRevenue
+    revenue_totals = BusinessDailyMetrics.objects.filter(
+        business__user=request.user
+    ).aggregate(total=Sum('revenue_total'), paid=Sum('revenue_paid'))
+    totalRevenue = revenue_totals['total'] or 0
+    receivedRevenue = revenue_totals['paid'] or 0
+    pendingRevenue = totalRevenue - receivedRevenue
     
     # Calculate date range based on period
     end_date = timezone.now().date() + timedelta(days=1)
@@ -119,11 +113,11 @@ def revenue_data_api(request):
         days_to_show = 30
         start_date = end_date - timedelta(days=days_to_show-1)  # Show last 30 days including today
     
-    # Query invoices within date range
-    invoices = Invoice.objects.filter(
-        booking__business__user=request.user,
-        createdAt__gte=start_date,
-        createdAt__lte=end_date
+    # Daily invoice totals within date range
+    metrics = BusinessDailyMetrics.objects.filter(
+        business__user=request.user,
+        date__gte=start_date,
+        date__lte=end_date
     )
     
     # Create a complete list of time periods
@@ -142,17 +136,17 @@ def revenue_data_api(request):
             all_years.append(date(year, 1, 1))
         
         # Group by year
-        revenue_data = invoices.annotate(
-            period=TruncYear('createdAt')
+        revenue_data = metrics.annotate(
+            period=TruncYear('date')
         ).values('period').annotate(
-            total=Sum('amount'),
-            count=Count('invoiceId'),
-            paid_total=Sum('amount', filter=Q(isPaid=True)),
-            paid_count=Count('invoiceId', filter=Q(isPaid=True))
+            total=Sum('revenue_total'),
+            count=Sum('invoices_total'),
+            paid_total=Sum('revenue_paid'),
+            paid_count=Sum('invoices_paid')
         ).order_by('period')
         
         # Convert to dictionary for easier lookup
-        revenue_dict = {item['period'].date(): item for item in revenue_data}
+        revenue_dict = {item['period']: item for item in revenue_data}
         
         # Fill in all years with data or zeros
         for year_date in all_years:
@@ -192,17 +186,17 @@ def revenue_data_api(request):
             current_date = current_date + relativedelta(months=1)
         
         # Group by month
-        revenue_data = invoices.annotate(
-            period=TruncMonth('createdAt')
+        revenue_data = metrics.annotate(
+            period=TruncMonth('date')
         ).values('period').annotate(
-            total=Sum('amount'),
-            count=Count('invoiceId'),
-            paid_total=Sum('amount', filter=Q(isPaid=True)),
-            paid_count=Count('invoiceId', filter=Q(isPaid=True))
+            total=Sum('revenue_total'),
+            count=Sum('invoices_total'),
+            paid_total=Sum('revenue_paid'),
+            paid_count=Sum('invoices_paid')
         ).order_by('period')
         
         # Convert to dictionary for easier lookup
-        revenue_dict = {item['period'].date().replace(day=1): item for item in revenue_data}
+        revenue_dict = {item['period']: item for item in revenue_data}
         
         # Fill in all months with data or zeros
         for month_date in all_months:
@@ -241,17 +235,17 @@ def revenue_data_api(request):
             current_date = current_date + timedelta(days=1)
         
         # Group by day
-        revenue_data = invoices.annotate(
-            period=TruncDay('createdAt')
+        revenue_data = metrics.annotate(
+            period=F('date')
         ).values('period').annotate(
-            total=Sum('amount'),
-            count=Count('invoiceId'),
-            paid_total=Sum('amount', filter=Q(isPaid=True)),
-            paid_count=Count('invoiceId', filter=Q(isPaid=True))
+            total=Sum('revenue_total'),
+            count=Sum('invoices_total'),
+            paid_total=Sum('revenue_paid'),
+            paid_count=Sum('invoices_paid')
         ).order_by('period')
         
         # Convert to dictionary for easier lookup
-        revenue_dict = {item['period'].date(): item for item in revenue_data}
+        revenue_dict = {item['period']: item for item in revenue_data}
         
         # Fill in all days with data or zeros
         for day_date in all_days:
@@ -341,11 +335,11 @@ def booking_data_api(request):
         days_to_show = 30
         start_date = end_date - timedelta(days=days_to_show-1)  # Show last 30 days including today
     
-    # Query bookings within date range
-    bookings = Booking.objects.filter(
+    # Daily booking totals within date range
+    metrics = BusinessDailyMetrics.objects.filter(
         business__user=request.user,
-        createdAt__gte=start_date,
-        createdAt__lte=end_date
+        date__gte=start_date,
+        date__lte=end_date
     )
     
     if chart_type == 'trend':
@@ -362,16 +356,16 @@ def booking_data_api(request):
                 all_years.append(date(year, 1, 1))
             
             # Group by year
-            booking_data = bookings.annotate(
-                period=TruncYear('createdAt')
+            booking_data = metrics.annotate(
+                period=TruncYear('date')
             ).values('period').annotate(
-                total=Count('bookingId'),
-                completed=Count('bookingId', filter=Q(isCompleted=True)),
-                pending=Count('bookingId', filter=Q(isCompleted=False))
+                total=Sum('bookings_total'),
+                completed=Sum('bookings_completed'),
+                pending=Sum('bookings_total') - Sum('bookings_completed')
             ).order_by('period')
             
             # Convert to dictionary for easier lookup
-            booking_dict = {item['period'].date(): item for item in booking_data}
+            booking_dict = {item['period']: item for item in booking_data}
             
             # Fill in all years with data or zeros
             for year_date in all_years:
@@ -395,16 +389,16 @@ def booking_data_api(request):
                 current_date = current_date + relativedelta(months=1)
             
             # Group by month
-            booking_data = bookings.annotate(
-                period=TruncMonth('createdAt')
+            booking_data = metrics.annotate(
+                period=TruncMonth('date')
             ).values('period').annotate(
-                total=Count('bookingId'),
-                completed=Count('bookingId', filter=Q(isCompleted=True)),
-                pending=Count('bookingId', filter=Q(isCompleted=False))
+                total=Sum('bookings_total'),
+                completed=Sum('bookings_completed'),
+                pending=Sum('bookings_total') - Sum('bookings_completed')
             ).order_by('period')
             
             # Convert to dictionary for easier lookup
-            booking_dict = {item['period'].date().replace(day=1): item for item in booking_data}
+            booking_dict = {item['period']: item for item in booking_data}
             
             # Fill in all months with data or zeros
             for month_date in all_months:
@@ -427,16 +421,16 @@ def booking_data_api(request):
                 current_date = current_date + timedelta(days=1)
             
             # Group by day
-            booking_data = bookings.annotate(
-                period=TruncDay('createdAt')
+            booking_data = metrics.annotate(
+                period=F('date')
             ).values('period').annotate(
-                total=Count('bookingId'),
-                completed=Count('bookingId', filter=Q(isCompleted=True)),
-                pending=Count('bookingId', filter=Q(isCompleted=False))
+                total=Sum('bookings_total'),
+                completed=Sum('bookings_completed'),
+                pending=Sum('bookings_total') - Sum('bookings_completed')
             ).order_by('period')
             
             # Convert to dictionary for easier lookup
-            booking_dict = {item['period'].date(): item for item in booking_data}
+            booking_dict = {item['period']: item for item in booking_data}
             
             # Fill in all days with data or zeros
             for day_date in all_days:
@@ -481,7 +475,11 @@ def booking_data_api(request):
     else:
         # Service Type distribution chart (pie/doughnut chart)
         # Count bookings by service type
-        service_data = bookings.values('serviceType').annotate(count=Count('bookingId')).order_by('serviceType')
+        service_counts = merge_counts(metrics, 'service_types')
+        service_data = [
+            {'serviceType': service_type or None, 'count': count}
+            for service_type, count in sorted(service_counts.items())
+        ]
         
         # Prepare data for chart
         labels = []
@@ -580,14 +578,15 @@ def cleaner_data_api(request):
             ['rgba(0, 204, 150, 0.6)', 'rgba(0, 204, 150, 1)'],       # Teal
         ]
         
-        # Get bookings count for each cleaner
+        # Get bookings count for each cleaner from the daily rollup
+        cleaner_counts = merge_counts(BusinessDailyMetrics.objects.filter(
+            business__user=request.user,
+            date__gte=start_date,
+            date__lte=end_date
+        ), 'cleaners')
+        
         for i, cleaner in enumerate(cleaners):
-            booking_count = Booking.objects.filter(
-                business__user=request.user,
-                cleaner=cleaner,
-                createdAt__gte=start_date,
-                createdAt__lte=end_date
-            ).count()
+            booking_count = cleaner_counts.get(str(cleaner.id), 0)
             
             cleaner_bookings.append(booking_count)
             cleaner_names.append(cleaner.name)
@@ -606,7 +605,14 @@ def cleaner_data_api(request):
             }]
         })
     
-    elif chart_type == 'performance':
+    # Every other chart reads per-cleaner metrics from one grouped query
+    metrics = cleaner_metrics(Booking.objects.filter(
+        business__user=request.user,
+        createdAt__gte=start_date,
+        createdAt__lte=end_date
+    ))
+    
+    if chart_type == 'performance':
         # For each cleaner, calculate:
         # 1. Average bookings per month
         # 2. Completion rate (completed bookings / total bookings)
@@ -615,52 +621,38 @@ def cleaner_data_api(request):
         
         cleaner_data = []
         
+        # Calculate months in the date range
+        if period == 'yearly':
+            months_in_range = (end_date.year - start_date.year) * 12
+        elif period == 'monthly':
+            months_in_range = months
+        else:  # daily
+            months_in_range = 1  # For daily view, just use 1 month to get bookings per month
+        
         for cleaner in cleaners:
-            # Get all bookings for this cleaner in the date range
-            cleaner_bookings = Booking.objects.filter(
-                business__user=request.user,
-                cleaner=cleaner,
-                createdAt__gte=start_date,
-                createdAt__lte=end_date
-            )
-            
-            total_bookings = cleaner_bookings.count()
-            completed_bookings = cleaner_bookings.filter(isCompleted=True).count()
+            cleaner_metric = metrics.get(cleaner.id) or empty_metrics()
+            total_bookings = cleaner_metric['total_bookings']
+            completed_bookings = cleaner_metric['completed_bookings']
             
             # Calculate completion rate
             completion_rate = 0
             if total_bookings > 0:
                 completion_rate = (completed_bookings / total_bookings) * 100
             
-            # Calculate months in the date range
-            if period == 'yearly':
-                months_in_range = (end_date.year - start_date.year) * 12
-            elif period == 'monthly':
-                months_in_range = months
-            else:  # daily
-                months_in_range = 1  # For daily view, just use 1 month to get bookings per month
-            
             # Calculate average bookings per month
             avg_bookings_per_month = 0
             if months_in_range > 0:
                 avg_bookings_per_month = total_bookings / months_in_range
             
-            # Calculate average square footage
-            avg_square_footage = cleaner_bookings.aggregate(avg=Avg('squareFeet'))['avg'] or 0
-            
-            # Calculate average number of bedrooms and bathrooms
-            avg_bedrooms = cleaner_bookings.aggregate(avg=Avg('bedrooms'))['avg'] or 0
-            avg_bathrooms = cleaner_bookings.aggregate(avg=Avg('bathrooms'))['avg'] or 0
-            
             cleaner_data.append({
                 'name': cleaner.name,
                 'total_bookings': total_bookings,
                 'completed_bookings': completed_bookings,
                 'completion_rate': round(completion_rate, 1),
                 'avg_bookings_per_month': round(avg_bookings_per_month, 1),
-                'avg_square_footage': round(avg_square_footage, 1),
-                'avg_bedrooms': round(avg_bedrooms, 1),
-                'avg_bathrooms': round(avg_bathrooms, 1)
+                'avg_square_footage': round(cleaner_metric['avg_square_footage'], 1),
+                'avg_bedrooms': round(cleaner_metric['avg_bedrooms'], 1),
+                'avg_bathrooms': round(cleaner_metric['avg_bathrooms'], 1)
             })
         
         # Sort by total bookings (descending)
@@ -703,38 +695,16 @@ def cleaner_data_api(request):
         pending_revenue_data = []
         
         for cleaner in cleaners:
-            # Get all bookings for this cleaner in the date range
-            cleaner_bookings = Booking.objects.filter(
-                business__user=request.user,
-                cleaner=cleaner,
-                createdAt__gte=start_date,
-                createdAt__lte=end_date
-            )
-            
             # Skip cleaners with no bookings
-            if cleaner_bookings.count() == 0:
+            if cleaner.id not in metrics:
                 continue
-            
-            # Get total revenue
-            total_revenue = cleaner_bookings.aggregate(total=Sum('totalPrice'))['total'] or 0
-            
-            # Get paid revenue (from invoices related to these bookings)
-            booking_ids = cleaner_bookings.values_list('id', flat=True)
-            paid_revenue = Invoice.objects.filter(
-                booking__id__in=booking_ids,
-                isPaid=True
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Get pending revenue (total minus paid)
-            pending_revenue = float(total_revenue) - float(paid_revenue)
-            if pending_revenue < 0:
-                pending_revenue = 0  # Ensure we don't have negative pending revenue
+            cleaner_metric = metrics[cleaner.id]
             
             # Add to datasets
             labels.append(cleaner.name)
-            total_revenue_data.append(float(total_revenue))
-            paid_revenue_data.append(float(paid_revenue))
-            pending_revenue_data.append(float(pending_revenue))
+            total_revenue_data.append(float(cleaner_metric['total_revenue']))
+            paid_revenue_data.append(float(cleaner_metric['paid_revenue']))
+            pending_revenue_data.append(pending_revenue(cleaner_metric))
         
         # Create datasets for Chart.js
         datasets = [
@@ -770,51 +740,12 @@ def cleaner_data_api(request):
         # For each cleaner, analyze what service types they handle most
         service_type_data = []
         
-        # Service type display names
-        service_display_names = {
-            'standard': 'Standard Cleaning',
-            'deep': 'Deep Cleaning',
-            'moveinmoveout': 'Move In/Move Out',
-            'airbnb': 'Airbnb Cleaning',
-            None: 'Not Specified'
-        }
-        
         for cleaner in cleaners:
-            # Get service type distribution for this cleaner
-            cleaner_service_types = Booking.objects.filter(
-                business__user=request.user,
-                cleaner=cleaner,
-                createdAt__gte=start_date,
-                createdAt__lte=end_date
-            ).values('serviceType').annotate(count=Count('id')).order_by('-count')
-            
-            # Get total bookings for this cleaner
-            total_cleaner_bookings = Booking.objects.filter(
-                business__user=request.user,
-                cleaner=cleaner,
-                createdAt__gte=start_date,
-                createdAt__lte=end_date
-            ).count()
-            
-            # Format service type data
-            service_types = []
-            for service in cleaner_service_types:
-                service_type = service['serviceType']
-                count = service['count']
-                percentage = 0
-                if total_cleaner_bookings > 0:
-                    percentage = (count / total_cleaner_bookings) * 100
-                
-                service_types.append({
-                    'type': service_display_names.get(service_type, 'Other'),
-                    'count': count,
-                    'percentage': round(percentage, 1)
-                })
-            
+            cleaner_metric = metrics.get(cleaner.id) or empty_metrics()
             service_type_data.append({
                 'name': cleaner.name,
-                'service_types': service_types,
-                'total_bookings': total_cleaner_bookings
+                'service_types': service_type_breakdown(cleaner_metric),
+                'total_bookings': cleaner_metric['total_bookings']
             })
         
         # Sort by total bookings (descending)
@@ -828,91 +759,34 @@ def cleaner_data_api(request):
         # Provide detailed data for all cleaners
         detailed_data = []
         
-        # Service type display names
-        service_display_names = {
-            'standard': 'Standard Cleaning',
-            'deep': 'Deep Cleaning',
-            'moveinmoveout': 'Move In/Move Out',
-            'airbnb': 'Airbnb Cleaning',
-            None: 'Not Specified'
-        }
+        # Calculate average bookings per month
+        months_in_range = max(1, (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1)
         
         for cleaner in cleaners:
-            # Get all bookings for this cleaner in the date range
-            cleaner_bookings = Booking.objects.filter(
-                business__user=request.user,
-                cleaner=cleaner,
-                createdAt__gte=start_date,
-                createdAt__lte=end_date
-            )
-            
-            total_bookings = cleaner_bookings.count()
-            completed_bookings = cleaner_bookings.filter(isCompleted=True).count()
-            
             # Skip cleaners with no bookings
-            if total_bookings == 0:
+            if cleaner.id not in metrics:
                 continue
+            cleaner_metric = metrics[cleaner.id]
             
-            # Calculate completion rate
-            completion_rate = 0
-            if total_bookings > 0:
-                completion_rate = (completed_bookings / total_bookings) * 100
-            
-            # Get total revenue from these bookings
-            total_revenue = cleaner_bookings.aggregate(total=Sum('totalPrice'))['total'] or 0
-            
-            # Get paid revenue (from invoices related to these bookings)
-            booking_ids = cleaner_bookings.values_list('id', flat=True)
-            paid_revenue = Invoice.objects.filter(
-                booking__id__in=booking_ids,
-                isPaid=True
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Get pending revenue (total minus paid)
-            pending_revenue = float(total_revenue) - float(paid_revenue)
-            if pending_revenue < 0:
-                pending_revenue = 0  # Ensure we don't have negative pending revenue
-            
-            # Calculate average metrics
-            avg_square_footage = cleaner_bookings.aggregate(avg=Avg('squareFeet'))['avg'] or 0
-            avg_bedrooms = cleaner_bookings.aggregate(avg=Avg('bedrooms'))['avg'] or 0
-            avg_bathrooms = cleaner_bookings.aggregate(avg=Avg('bathrooms'))['avg'] or 0
-            
-            # Calculate average bookings per month
-            months_in_range = max(1, (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1)
-            avg_bookings_per_month = total_bookings / months_in_range
-            
-            # Get service type distribution
-            service_type_counts = cleaner_bookings.values('serviceType').annotate(count=Count('id'))
-            service_types = []
-            for service in service_type_counts:
-                service_type = service['serviceType']
-                count = service['count']
-                percentage = 0
-                if total_bookings > 0:
-                    percentage = (count / total_bookings) * 100
-                
-                service_types.append({
-                    'type': service_display_names.get(service_type, 'Other'),
-                    'count': count,
-                    'percentage': round(percentage, 1)
-                })
+            total_bookings = cleaner_metric['total_bookings']
+            completed_bookings = cleaner_metric['completed_bookings']
+            total_revenue = cleaner_metric['total_revenue']
             
             # Add to detailed data
             detailed_data.append({
                 'name': cleaner.name,
                 'total_bookings': total_bookings,
                 'completed_bookings': completed_bookings,
-                'completion_rate': round(completion_rate, 1),
+                'completion_rate': round((completed_bookings / total_bookings) * 100, 1),
                 'total_revenue': float(total_revenue),
-                'paid_revenue': float(paid_revenue),
-                'pending_revenue': float(pending_revenue),
-                'avg_revenue_per_booking': float(total_revenue / total_bookings) if total_bookings > 0 else 0,
-                'avg_square_footage': round(avg_square_footage, 1),
-                'avg_bedrooms': round(avg_bedrooms, 1),
-                'avg_bathrooms': round(avg_bathrooms, 1),
-                'avg_bookings_per_month': round(avg_bookings_per_month, 1),
-                'service_types': service_types
+                'paid_revenue': float(cleaner_metric['paid_revenue']),
+                'pending_revenue': pending_revenue(cleaner_metric),
+                'avg_revenue_per_booking': float(total_revenue / total_bookings),
+                'avg_square_footage': round(cleaner_metric['avg_square_footage'], 1),
+                'avg_bedrooms': round(cleaner_metric['avg_bedrooms'], 1),
+                'avg_bathrooms': round(cleaner_metric['avg_bathrooms'], 1),
+                'avg_bookings_per_month': round(total_bookings / months_in_range, 1),
+                'service_types': service_type_breakdown(cleaner_metric)
             })
         
         # Sort by total bookings (descending)
@@ -950,71 +824,48 @@ def customer_data_api(request):
         days_to_show = 30
         start_date = end_date - timedelta(days=days_to_show-1)  # Show last 30 days including today
     
+    # Customer list paging
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = min(100, max(1, int(request.GET.get('page_size', 25))))
+    except ValueError:
+        page, page_size = 1, 25
+    
+    all_bookings = Booking.objects.filter(business__user=request.user)
+    
     # Get all bookings for this business in the date range
-    bookings = Booking.objects.filter(
-        business__user=request.user,
+    bookings = all_bookings.filter(
         createdAt__gte=start_date,
         createdAt__lte=end_date
     )
     
-    # Get total number of bookings
-    total_bookings = bookings.count()
-    
-    # Group bookings by customer email to find repeat customers
-    customer_bookings = {}
-    for booking in bookings:
-        if not booking.customer.email:  # Skip bookings without email
-            continue
-            
-        email = booking.customer.email.lower()  # Normalize email to lowercase
-        if email in customer_bookings:
-            customer_bookings[email]['count'] += 1
-            customer_bookings[email]['total_spent'] += float(booking.totalPrice or 0)
-            customer_bookings[email]['last_booking'] = max(customer_bookings[email]['last_booking'], booking.createdAt)
-        else:
-            customer_bookings[email] = {
-                'email': email,
-                'name': f"{booking.customer.first_name or ''} {booking.customer.last_name or ''}".strip(),
-                'count': 1,
-                'total_spent': float(booking.totalPrice or 0),
-                'first_booking': booking.createdAt,
-                'last_booking': booking.createdAt,
-                'phone': booking.customer.phone_number
-            }
-    
-    # Calculate customer metrics
-    unique_customers = len(customer_bookings)
-    repeat_customers = sum(1 for email, data in customer_bookings.items() if data['count'] > 1)
-    repeat_customer_percentage = (repeat_customers / unique_customers * 100) if unique_customers > 0 else 0
-    
-    # Convert customer_bookings dictionary to a list for the response
-    customer_list = list(customer_bookings.values())
-    
-    # Sort by booking count (descending)
-    customer_list.sort(key=lambda x: x['count'], reverse=True)
-    
-    # Format dates for JSON serialization
-    for customer in customer_list:
-        customer['first_booking'] = customer['first_booking'].strftime('%Y-%m-%d')
-        customer['last_booking'] = customer['last_booking'].strftime('%Y-%m-%d')
+    # First-time customers in the range, from the daily rollup
+    new_customers = BusinessDailyMetrics.objects.filter(
+        business__user=request.user,
+        date__gte=start_date,
+        date__lte=end_date
+    ).aggregate(total=Sum('new_customers'))['total'] or 0
     
-    # Prepare data for charts
-    booking_distribution = [
-        {'label': '1 Booking', 'count': sum(1 for c in customer_list if c['count'] == 1)},
-        {'label': '2-3 Bookings', 'count': sum(1 for c in customer_list if 2 <= c['count'] <= 3)},
-        {'label': '4-6 Bookings', 'count': sum(1 for c in customer_list if 4 <= c['count'] <= 6)},
-        {'label': '7+ Bookings', 'count': sum(1 for c in customer_list if c['count'] >= 7)}
-    ]
+    summary = customer_summary(bookings)
+    customer_page = top_customers(bookings, all_bookings, page=page, page_size=page_size)
     
     return JsonResponse({
-        'customer_list': customer_list,
+        'customer_list': customer_page['customers'],
+        'pagination': {
+            'page': customer_page['page'],
+            'page_size': customer_page['page_size'],
+            'total': customer_page['total'],
+            'pages': customer_page['pages']
+        },
         'metrics': {
-            'total_bookings': total_bookings,
-            'unique_customers': unique_customers,
-            'repeat_customers': repeat_customers,
-            'repeat_customer_percentage': round(repeat_customer_percentage, 1)
+            'total_bookings': bookings.count(),
+            'unique_customers': summary['unique_customers'],
+            'repeat_customers': summary['repeat_customers'],
+            'repeat_customer_percentage': summary['repeat_customer_percentage'],
+            'new_customers': new_customers
         },
-        'booking_distribution': booking_distribution
+        'booking_distribution': summary['booking_distribution'],
+        'cohorts': cohort_retention(all_bookings, start_date, end_date)
     })
 
 
@@ -1041,130 +892,33 @@ def addon_data_api(request):
         days_to_show = 30
         start_date = end_date - timedelta(days=days_to_show-1)  # Show last 30 days including today
     
-    # Get all bookings for this business in the date range
-    bookings = Booking.objects.filter(
+    # Add-on counts and revenue from the daily rollup
+    metrics = BusinessDailyMetrics.objects.filter(
         business__user=request.user,
-        createdAt__gte=start_date,
-        createdAt__lte=end_date
+        date__gte=start_date,
+        date__lte=end_date
     )
+    addon_totals = merge_addons(metrics)
     
-    # Initialize addon counters and revenue
+    # Standard addons
     addon_counts = {
-        'dishes': {'count': 0, 'revenue': 0, 'name': 'Dishes'},
-        'laundry': {'count': 0, 'revenue': 0, 'name': 'Laundry'},
-        'window': {'count': 0, 'revenue': 0, 'name': 'Window Cleaning'},
-        'pets': {'count': 0, 'revenue': 0, 'name': 'Pets Cleaning'},
-        'fridge': {'count': 0, 'revenue': 0, 'name': 'Fridge Cleaning'},
-        'oven': {'count': 0, 'revenue': 0, 'name': 'Oven Cleaning'},
-        'baseboard': {'count': 0, 'revenue': 0, 'name': 'Baseboard'},
-        'blinds': {'count': 0, 'revenue': 0, 'name': 'Blinds'},
-        'green': {'count': 0, 'revenue': 0, 'name': 'Green Cleaning'},
-        'cabinets': {'count': 0, 'revenue': 0, 'name': 'Cabinets Cleaning'},
-        'patio': {'count': 0, 'revenue': 0, 'name': 'Patio Sweeping'},
-        'garage': {'count': 0, 'revenue': 0, 'name': 'Garage Sweeping'},
+        key: {'key': key, 'count': addon_totals[key]['count'], 'revenue': addon_totals[key]['revenue'], 'bookings': addon_totals[key]['bookings'], 'name': name}
+        for key, name, _, _ in STANDARD_ADDONS
     }
     
-    # Get business settings to find addon prices
-    try:
-        business = Business.objects.get(user=request.user)
-        settings = business.settings
-        
-        # Get addon prices from settings
-        addon_prices = {
-            'dishes': float(settings.addonPriceDishes or 0),
-            'laundry': float(settings.addonPriceLaundry or 0),
-            'window': float(settings.addonPriceWindow or 0),
-            'pets': float(settings.addonPricePets or 0),
-            'fridge': float(settings.addonPriceFridge or 0),
-            'oven': float(settings.addonPriceOven or 0),
-            'baseboard': float(settings.addonPriceBaseboard or 0),
-            'blinds': float(settings.addonPriceBlinds or 0),
-            'green': float(settings.addonPriceGreen or 0),
-            'cabinets': float(settings.addonPriceCabinets or 0),
-            'patio': float(settings.addonPricePatio or 0),
-            'garage': float(settings.addonPriceGarage or 0),
-        }
-    except (Business.DoesNotExist, AttributeError):
-        addon_prices = {key: 0 for key in addon_counts.keys()}
-    
     # Custom addons data
     custom_addons = {}
-    
-    # Process bookings to count addons and calculate revenue
-    for booking in bookings:
-        # Standard addons
-        if booking.addonDishes and booking.addonDishes > 0:
-            addon_counts['dishes']['count'] += booking.addonDishes
-            addon_counts['dishes']['revenue'] += booking.addonDishes * addon_prices['dishes']
-            
-        if booking.addonLaundryLoads and booking.addonLaundryLoads > 0:
-            addon_counts['laundry']['count'] += booking.addonLaundryLoads
-            addon_counts['laundry']['revenue'] += booking.addonLaundryLoads * addon_prices['laundry']
-            
-        if booking.addonWindowCleaning and booking.addonWindowCleaning > 0:
-            addon_counts['window']['count'] += booking.addonWindowCleaning
-            addon_counts['window']['revenue'] += booking.addonWindowCleaning * addon_prices['window']
-            
-        if booking.addonPetsCleaning and booking.addonPetsCleaning > 0:
-            addon_counts['pets']['count'] += booking.addonPetsCleaning
-            addon_counts['pets']['revenue'] += booking.addonPetsCleaning * addon_prices['pets']
-            
-        if booking.addonFridgeCleaning and booking.addonFridgeCleaning > 0:
-            addon_counts['fridge']['count'] += booking.addonFridgeCleaning
-            addon_counts['fridge']['revenue'] += booking.addonFridgeCleaning * addon_prices['fridge']
-            
-        if booking.addonOvenCleaning and booking.addonOvenCleaning > 0:
-            addon_counts['oven']['count'] += booking.addonOvenCleaning
-            addon_counts['oven']['revenue'] += booking.addonOvenCleaning * addon_prices['oven']
-            
-        if booking.addonBaseboard and booking.addonBaseboard > 0:
-            addon_counts['baseboard']['count'] += booking.addonBaseboard
-            addon_counts['baseboard']['revenue'] += booking.addonBaseboard * addon_prices['baseboard']
-            
-        if booking.addonBlinds and booking.addonBlinds > 0:
-            addon_counts['blinds']['count'] += booking.addonBlinds
-            addon_counts['blinds']['revenue'] += booking.addonBlinds * addon_prices['blinds']
-            
-        if booking.addonGreenCleaning and booking.addonGreenCleaning > 0:
-            addon_counts['green']['count'] += booking.addonGreenCleaning
-            addon_counts['green']['revenue'] += booking.addonGreenCleaning * addon_prices['green']
-            
-        if booking.addonCabinetsCleaning and booking.addonCabinetsCleaning > 0:
-            addon_counts['cabinets']['count'] += booking.addonCabinetsCleaning
-            addon_counts['cabinets']['revenue'] += booking.addonCabinetsCleaning * addon_prices['cabinets']
-            
-        if booking.addonPatioSweeping and booking.addonPatioSweeping > 0:
-            addon_counts['patio']['count'] += booking.addonPatioSweeping
-            addon_counts['patio']['revenue'] += booking.addonPatioSweeping * addon_prices['patio']
-            
-        if booking.addonGarageSweeping and booking.addonGarageSweeping > 0:
-            addon_counts['garage']['count'] += booking.addonGarageSweeping
-            addon_counts['garage']['revenue'] += booking.addonGarageSweeping * addon_prices['garage']
-        
-        # Custom addons
-        try:
-            for custom_addon in booking.customAddons.all():
-                try:
-                    addon_name = custom_addon.addon.addonName
-                    addon_price = float(custom_addon.addon.addonPrice or 0)
-                    addon_qty = custom_addon.qty or 0
-                    
-                    if addon_name in custom_addons:
-                        custom_addons[addon_name]['count'] += addon_qty
-                        custom_addons[addon_name]['revenue'] += addon_qty * addon_price
-                    else:
-                        custom_addons[addon_name] = {
-                            'count': addon_qty,
-                            'revenue': addon_qty * addon_price,
-                            'name': addon_name,
-                            'is_custom': True
-                        }
-                except (AttributeError, TypeError):
-                    # Skip this custom addon if there's an issue accessing its properties
-                    continue
-        except (AttributeError, TypeError):
-            # Skip custom addons for this booking if there's an issue
-            pass
+    for key, addon in addon_totals.items():
+        if key.startswith(CUSTOM_ADDON_PREFIX):
+            addon_name = key[len(CUSTOM_ADDON_PREFIX):]
+            custom_addons[addon_name] = {
+                'key': key,
+                'count': addon['count'],
+                'revenue': addon['revenue'],
+                'bookings': addon['bookings'],
+                'name': addon_name,
+                'is_custom': True
+            }
     
     # Filter out addons with zero count
     standard_addons = [addon for addon in addon_counts.values() if addon['count'] > 0]
@@ -1195,8 +949,39 @@ def addon_data_api(request):
         else:
             addon['percentage'] = 0
     
+    # Add-on counts and revenue per period, for trend charts
+    if period == 'yearly':
+        period_of = lambda day: date(day.year, 1, 1)
+        step, label_format = relativedelta(years=1), '%Y'
+    elif period == 'monthly':
+        period_of = lambda day: date(day.year, day.month, 1)
+        step, label_format = relativedelta(months=1), '%b %Y'
+    else:
+        period_of = lambda day: day
+        step, label_format = timedelta(days=1), '%d %b'
+    
+    periods = []
+    current_date = period_of(start_date)
+    while current_date <= end_date:
+        periods.append(current_date)
+        current_date = current_date + step
+    
+    addons_by_period = merge_addons_by_period(metrics, period_of)
+    trend = {
+        'labels': [period_date.strftime(label_format) for period_date in periods],
+        'datasets': [
+            {
+                'label': addon['name'],
+                'counts': [addons_by_period[period_date][addon['key']]['count'] for period_date in periods],
+                'revenue': [addons_by_period[period_date][addon['key']]['revenue'] for period_date in periods]
+            }
+            for addon in addons_by_count
+        ]
+    }
+    
     return JsonResponse({
         'pie_chart': pie_chart_data,
         'addons_by_revenue': addons_by_revenue,
-        'total_addon_revenue': total_addon_revenue
+        'total_addon_revenue': total_addon_revenue,
+        'trend': trend
     })
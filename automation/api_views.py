@@ -10,6 +10,7 @@ from accounts.models import Business, ApiCredential, BusinessSettings, CustomAdd
 from bookings.models import Booking, BookingCustomAddons
 from invoice.models import Invoice
 from .models import Cleaners, CleanerAvailability
+from .availability import AvailabilityEngine, FreeTimeIndex
 from django.conf import settings
 from leadsAutomation.utils import send_email
 from customer.models import Customer
@@ -52,21 +53,26 @@ def get_cleaners_for_business(business, exclude_ids=None, assignment_check_null=
 
     return cleaners
 
+def _parse_datetime_to_check(date_to_check):
+    try:
+        # Try to parse the string as a datetime
+        return datetime.strptime(date_to_check, "%Y-%m-%d %H:%M")
+    except ValueError:
+        # If it fails, it might be just a date string
+        try:
+            return datetime.strptime(date_to_check, "%Y-%m-%d")
+        except ValueError:
+            # If all parsing fails, return None
+            return None
+
+
 # Function to get cleaner availabilities for a specific day
 def get_cleaner_availabilities(cleaner, date_to_check):
     # Ensure date_to_check is a datetime object
-    from datetime import datetime
     if isinstance(date_to_check, str):
-        try:
-            # Try to parse the string as a datetime
-            date_to_check = datetime.strptime(date_to_check, "%Y-%m-%d %H:%M")
-        except ValueError:
-            # If it fails, it might be just a date string
-            try:
-                date_to_check = datetime.strptime(date_to_check, "%Y-%m-%d")
-            except ValueError:
-                # If all parsing fails, return None
-                return None
+        date_to_check = _parse_datetime_to_check(date_to_check)
+        if date_to_check is None:
+            return None
     
     specific_availability = CleanerAvailability.objects.filter(
         cleaner=cleaner,
@@ -95,103 +101,45 @@ def get_cleaner_availabilities(cleaner, date_to_check):
     return weekly_availability
 
 # Function to check if a timeslot is available
-def is_slot_available(cleaners, time_to_check, available_cleaners=None):
+def is_slot_available(cleaners, time_to_check, available_cleaners=None, engine=None):
     if available_cleaners is None:
         available_cleaners = []
     
     available_cleaners.clear()
     
     logs = []
-    for cleaner in cleaners:        
-        # Get availability for this date/time
-        cleaner_availability = get_cleaner_availabilities(cleaner, time_to_check)
-        
-        if cleaner_availability is None:
-            continue
-
-        # Check if time is within cleaner's working hours
-        if not (cleaner_availability.startTime <= time_to_check.time() <= cleaner_availability.endTime):
-            continue
-
-        # Check for conflicting bookings
-        conflicting_booking = Booking.objects.filter(
-            cleaner=cleaner,
-            cleaningDate=time_to_check.date(),
-            startTime__lte=time_to_check.time(),
-            endTime__gt=time_to_check.time()
-        ).exists()
-
-        if conflicting_booking:
-            continue
-
-        # If we get here, the cleaner is available
-        available_cleaners.append(cleaner)
+    if engine is None:
+        engine = AvailabilityEngine(cleaners, time_to_check.date())
 
+    available_cleaners.extend(engine.available_cleaners(time_to_check))
 
     # Return True if we found any available cleaners, along with the logs
     return len(available_cleaners) > 0, logs
 
 
 # FUnction to Find All Available Cleaners for a given time slot
-def find_all_available_cleaners(cleaners, time_to_check):
-    print(f"Finding available cleaners at time: {time_to_check}")
-    print(f"Number of cleaners to check: {cleaners.count() if hasattr(cleaners, 'count') else len(cleaners)}")
-    
-    available_cleaners = []
-    for cleaner in cleaners:
-        print(f"Checking availability for cleaner ID: {cleaner.id}")
-        availability = get_cleaner_availabilities(cleaner, time_to_check)
-        print(f"Cleaner {cleaner.id} availability result: {availability}")
-        
-        if availability is None:
-            print(f"Cleaner {cleaner.id} is not available at {time_to_check}")
-            continue
-        
-        print(f"Cleaner {cleaner.id} is available at {time_to_check}")
-        available_cleaners.append(cleaner.id)
+def find_all_available_cleaners(cleaners, time_to_check, engine=None):
+    if isinstance(time_to_check, str):
+        time_to_check = _parse_datetime_to_check(time_to_check)
+        if time_to_check is None:
+            return []
+
+    if engine is None:
+        engine = AvailabilityEngine(cleaners, time_to_check.date())
+
+    available_cleaners = [cleaner.id for cleaner in engine.cleaners_working_on(time_to_check.date())]
     
-    print(f"Total available cleaners found: {len(available_cleaners)}")
+    print(f"Total available cleaners found at {time_to_check}: {len(available_cleaners)}")
     return available_cleaners
 
 
 # Function to find an available cleaner
-def find_available_cleaner(cleaners, time_to_check):
+def find_available_cleaner(cleaners, time_to_check, engine=None):
     """Find the best available cleaner for the given time slot based on rating."""
-    print("\nFinding available cleaner for time:", time_to_check)
-    print("Number of cleaners to check:", len(cleaners))
-    
-    available_cleaners = []
-    
-    for cleaner in cleaners:
-        print("\nChecking cleaner:", cleaner.name)
-        
-        # Check cleaner's availability for the requested date/time
-        availability = get_cleaner_availabilities(cleaner, time_to_check)
-
-        if not availability:
-            print(f"No availability found for {cleaner.name} on {time_to_check.strftime('%A')} {time_to_check.strftime('%Y-%m-%d')}")
-            continue  # Skip if the cleaner is not available that day
-
-        print(f"Found availability for {cleaner.name}: {availability.startTime} - {availability.endTime}")
-
-        if not (availability.startTime <= time_to_check.time() <= availability.endTime):
-            print(f"Time {time_to_check.time()} is outside {cleaner.name}'s working hours")
-            continue
-
-        # Check for conflicting bookings
-        conflicting_booking = Booking.objects.filter(
-            cleaner=cleaner,
-            cleaningDate=time_to_check.date(),
-            startTime__lte=time_to_check.time(),
-            endTime__gte=time_to_check.time()
-        ).exists()
+    if engine is None:
+        engine = AvailabilityEngine(cleaners, time_to_check.date())
 
-        if conflicting_booking:
-            print(f"{cleaner.name} has a conflicting booking")
-            continue
-
-        print(f"✓ {cleaner.name} is available (Rating: {cleaner.rating}/5)")
-        available_cleaners.append(cleaner)
+    available_cleaners = engine.available_cleaners(time_to_check)
 
     if not available_cleaners:
         print("No available cleaners found for this time slot")
@@ -203,71 +151,35 @@ def find_available_cleaner(cleaners, time_to_check):
     return best_cleaner
 
 # Function to find alternate available slots
-def find_alternate_slots(cleaners, datetimeToCheck, max_alternates=3):
+def find_alternate_slots(cleaners, datetimeToCheck, max_alternates=3, engine=None, duration=timedelta(hours=1), granularity=60, horizon_days=7):
     """
     Find up to `max_alternates` alternate available timeslots.
-    If no slots exist on the requested day, search the next available day.
+    If no slots exist on the requested day, search the following days up to
+    `horizon_days` ahead.
+
+    Slots are aligned to `granularity` minutes and a cleaner must be free for
+    the whole `duration` within their working hours.
     
-    Note: datetimeToCheck should already be in the business's timezone.
+    Note: datetimeToCheck should be in UTC; slots are returned in the
+    business's timezone.
     """
     logs = []
     
-    if not cleaners:
+    if engine is None:
+        engine = AvailabilityEngine(cleaners, datetimeToCheck.date(), datetimeToCheck.date() + timedelta(days=horizon_days - 1))
+
+    if not engine.cleaners:
         return [], []
-    business = cleaners.first().business
-    
-    alternate_slots = []
-    time_increment = timedelta(hours=1)
-    max_attempts = 24  # Increased to search more slots
-    
-    # Start from the next hour
-    next_time = datetimeToCheck.replace(minute=0, second=0, microsecond=0) + time_increment
-    
-    # Define business hours (9 AM to 5 PM by default)
-    business_start_hour = 9
-    business_end_hour = 17
-    
-    # Track days we've already checked to avoid checking the same day multiple times
-    checked_days = set()
-    
-    while len(alternate_slots) < max_alternates and max_attempts > 0:
-        available_cleaners = []
-        
-        # Skip times outside of business hours (9 AM - 5 PM)
-        current_hour = next_time.hour
-        current_date = next_time.date()
-        date_str = current_date.strftime('%Y-%m-%d')
-        
-        # If we've already checked this day and found no slots, skip to next day
-        if date_str in checked_days and current_hour >= business_end_hour:
-            # Move to 9 AM the next day
-            next_time = (next_time + timedelta(days=1)).replace(hour=business_start_hour, minute=0, second=0, microsecond=0)
-            continue
-        
-        # If outside business hours, adjust time
-        if current_hour < business_start_hour:
-            # Move to start of business hours
-            next_time = next_time.replace(hour=business_start_hour, minute=0, second=0, microsecond=0)
-        elif current_hour >= business_end_hour:
-            # Move to start of business hours the next day
-            next_time = (next_time + timedelta(days=1)).replace(hour=business_start_hour, minute=0, second=0, microsecond=0)
-            
-        # Check if this slot is available
-        is_available, slot_logs = is_slot_available(cleaners, next_time, available_cleaners)
-        
-        # Add the date to checked days
-        checked_days.add(date_str)
-        
-        if is_available and len(available_cleaners) > 0:
-            # Format the datetime in ISO format for consistency
-            next_time = convert_from_utc(next_time, business.get_timezone())
-            alternate_slots.append(next_time.strftime("%Y-%m-%d %I:%M %p"))
-            logs.append(f"✅ Found alternate slot at {next_time.strftime('%Y-%m-%d %I:%M %p')} with {len(available_cleaners)} cleaner(s)")
-        
-        # Move to the next time slot
-        next_time += time_increment
-        max_attempts -= 1
+    business = engine.cleaners[0].business
 
+    index = FreeTimeIndex(engine, datetimeToCheck.date(), days=horizon_days)
+    openings = index.openings(datetimeToCheck, duration=duration, granularity=granularity, limit=max_alternates)
+
+    alternate_slots = []
+    for opening in openings:
+        local_time = convert_from_utc(opening, business.get_timezone())
+        alternate_slots.append(local_time.strftime("%Y-%m-%d %I:%M %p"))
+        logs.append(f"✅ Found alternate slot at {local_time.strftime('%Y-%m-%d %I:%M %p')}")
 
     return alternate_slots, logs
 
@@ -303,16 +215,29 @@ def check_availability_retell(request, secretKey):
 
         # Extract timezone if provided, default to UTC
         timezone_str = args.get('timezone', 'UTC')
+
+        # Optional alternate-slot tuning: booking length, slot size and count
+        try:
+            duration = timedelta(hours=float(args.get('durationHours') or 1))
+            granularity = int(args.get('slotGranularity') or 60)
+            max_alternates = int(args.get('maxAlternates') or 3)
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "Invalid durationHours, slotGranularity or maxAlternates"}, status=400)
+
+        if granularity not in (15, 30, 60):
+            return JsonResponse({"error": "slotGranularity must be 15, 30 or 60"}, status=400)
         
         
         res = parse_business_datetime(cleaningDateTime, business)
         
       
         cleaners = get_cleaners_for_business(business, assignment_check_null=True)
+        requested_date = res['data']['utc_datetime'].date()
+        engine = AvailabilityEngine(cleaners, requested_date, requested_date + timedelta(days=6))
         available_cleaners = []
 
         # Check if the requested time is available
-        is_available, availability_logs = is_slot_available(cleaners, res['data']['utc_datetime'], available_cleaners)
+        is_available, availability_logs = is_slot_available(cleaners, res['data']['utc_datetime'], available_cleaners, engine=engine)
         
         # Base response with common fields
         response = {
@@ -323,7 +248,14 @@ def check_availability_retell(request, secretKey):
 
         # If not available, find alternate slots
         if not is_available:
-            alternate_slots, alternate_logs = find_alternate_slots(cleaners, res['data']['utc_datetime'])
+            alternate_slots, alternate_logs = find_alternate_slots(
+                cleaners,
+                res['data']['utc_datetime'],
+                max_alternates=max_alternates,
+                engine=engine,
+                duration=duration,
+                granularity=granularity,
+            )
             response["alternates"] = alternate_slots
 
         return JsonResponse(response, status=200)
@@ -360,15 +292,16 @@ def check_availability_for_booking(request):
         
 
         cleaners = get_cleaners_for_business(current_business, assignment_check_null=True)
+        engine = AvailabilityEngine(cleaners, res['data']['utc_datetime'].date())
         
         # Check availability
         available_cleaners = []
-        is_available, _ = is_slot_available(cleaners, res['data']['utc_datetime'], available_cleaners)
+        is_available, _ = is_slot_available(cleaners, res['data']['utc_datetime'], available_cleaners, engine=engine)
         
         # Find alternative slots if not available
         alternative_slots = []
         if not is_available:
-            alt_slots, _ = find_alternate_slots(cleaners, res['data']['utc_datetime'], max_alternates=3)
+            alt_slots, _ = find_alternate_slots(cleaners, res['data']['utc_datetime'], max_alternates=3, engine=engine)
             
             # Convert alternative slots back to business timezone for display
             formatted_alt_slots = []
@@ -450,6 +383,11 @@ def fetch_available_time_slots(request):
         
         # Check availability for each time slot
         business_tz = pytz.timezone(current_business.timezone)
+
+        # Load availability and bookings for the requested date plus the
+        # 7-day alternative search window up front; slots are local times, so
+        # their UTC dates can spill one day either side.
+        engine = AvailabilityEngine(cleaners, date_obj - timedelta(days=1), date_obj + timedelta(days=8))
         
         for slot in time_slots:
             # Create datetime object for this slot
@@ -466,8 +404,7 @@ def fetch_available_time_slots(request):
             slot_datetime_utc = slot_datetime.astimezone(pytz.UTC)
             
             # Check if any cleaner is available at this time
-            available_cleaners = []
-            is_available, _ = is_slot_available(cleaners, slot_datetime_utc, available_cleaners)
+            is_available = engine.is_available(slot_datetime_utc)
             
             # Update availability in the slot
             slot['available'] = is_available
@@ -501,10 +438,7 @@ def fetch_available_time_slots(request):
                     slot_datetime_utc = slot_datetime.astimezone(pytz.UTC)
                     
                     # Check if any cleaner is available at this time
-                    available_cleaners = []
-                    is_available, _ = is_slot_available(cleaners, slot_datetime_utc, available_cleaners)
-                    
-                    if is_available:
+                    if engine.is_available(slot_datetime_utc):
                         has_available_slot = True
                         break
                 
@@ -550,11 +484,12 @@ def create_booking(request):
         
         # Find an available cleaner
         cleaners = get_cleaners_for_business(business, assignment_check_null=True)
-        available_cleaner = find_available_cleaner(cleaners, res['data']['utc_datetime'])
+        engine = AvailabilityEngine(cleaners, res['data']['utc_datetime'].date())
+        available_cleaner = find_available_cleaner(cleaners, res['data']['utc_datetime'], engine=engine)
         
         if not available_cleaner:
             # Find alternate slots
-            alternate_slots, _ = find_alternate_slots(cleaners, res['data']['utc_datetime'])
+            alternate_slots, _ = find_alternate_slots(cleaners, res['data']['utc_datetime'], engine=engine)
             return JsonResponse({
                 'success': False,
                 'message': 'No cleaners available for the requested time',
@@ -0,0 +1,288 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from bookings.models import Booking
+from .models import CleanerAvailability
+
+
+class AvailabilityEngine:
+    """
+    In-memory view of cleaner availability for one set of cleaners.
+
+    Weekly schedules, specific-date overrides and booked intervals are loaded
+    with a handful of bulk queries for a date window, after which "who is free
+    at T" and "which slots are free between d1 and d2" are answered without
+    touching the database. Dates outside the loaded window are fetched on
+    demand, so callers never see stale or missing data.
+
+    Times are compared exactly like the original per-cleaner checks: the date
+    and time of the datetime passed in are matched against the stored
+    availability and booking fields as-is.
+    """
+
+    def __init__(self, cleaners, start_date=None, end_date=None):
+        self.cleaners = list(cleaners)
+        self._cleaners_by_id = {cleaner.id: cleaner for cleaner in self.cleaners}
+
+        # cleaner_id -> weekday name -> CleanerAvailability
+        self._weekly = defaultdict(dict)
+        # cleaner_id -> date -> CleanerAvailability
+        self._specific = defaultdict(dict)
+        # cleaner_id -> date -> [(startTime, endTime), ...]
+        self._booked = defaultdict(lambda: defaultdict(list))
+
+        self._start_date = None
+        self._end_date = None
+
+        self._load_weekly()
+        if start_date is not None:
+            self.ensure_loaded(start_date, end_date or start_date)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _load_weekly(self):
+        if not self.cleaners:
+            return
+
+        weekly = CleanerAvailability.objects.filter(
+            cleaner_id__in=self._cleaners_by_id.keys(),
+            availability_type='weekly',
+        ).order_by('id')
+
+        for availability in weekly:
+            # Keep the first row per day, matching the previous `.first()` lookup
+            self._weekly[availability.cleaner_id].setdefault(availability.dayOfWeek, availability)
+
+    def _load_range(self, start_date, end_date):
+        if not self.cleaners:
+            return
+
+        cleaner_ids = self._cleaners_by_id.keys()
+
+        specific = CleanerAvailability.objects.filter(
+            cleaner_id__in=cleaner_ids,
+            availability_type='specific',
+            specific_date__range=(start_date, end_date),
+        ).order_by('id')
+
+        for availability in specific:
+            self._specific[availability.cleaner_id].setdefault(availability.specific_date, availability)
+
+        bookings = Booking.objects.filter(
+            cleaner_id__in=cleaner_ids,
+            cleaningDate__range=(start_date, end_date),
+            startTime__isnull=False,
+            endTime__isnull=False,
+        ).values_list('cleaner_id', 'cleaningDate', 'startTime', 'endTime')
+
+        for cleaner_id, cleaning_date, start_time, end_time in bookings:
+            self._booked[cleaner_id][cleaning_date].append((start_time, end_time))
+
+        for days in self._booked.values():
+            for intervals in days.values():
+                intervals.sort()
+
+    def ensure_loaded(self, start_date, end_date=None):
+        """Make sure availability and bookings for [start_date, end_date] are in memory."""
+        start_date = _as_date(start_date)
+        end_date = _as_date(end_date) if end_date is not None else start_date
+        if end_date < start_date:
+            start_date, end_date = end_date, start_date
+
+        if self._start_date is None:
+            self._load_range(start_date, end_date)
+            self._start_date, self._end_date = start_date, end_date
+            return
+
+        if start_date < self._start_date:
+            self._load_range(start_date, self._start_date - timedelta(days=1))
+            self._start_date = start_date
+
+        if end_date > self._end_date:
+            self._load_range(self._end_date + timedelta(days=1), end_date)
+            self._end_date = end_date
+
+    # ------------------------------------------------------------------
+    # Per-cleaner lookups
+    # ------------------------------------------------------------------
+
+    def get_availability(self, cleaner_id, day):
+        """
+        Return the CleanerAvailability that applies to `day`, or None when the
+        cleaner is off. A specific-date entry overrides the weekly schedule.
+        """
+        day = _as_date(day)
+        self.ensure_loaded(day)
+
+        specific = self._specific[cleaner_id].get(day)
+        if specific:
+            return None if specific.offDay else specific
+
+        weekly = self._weekly[cleaner_id].get(day.strftime('%A'))
+        if weekly and weekly.offDay:
+            return None
+        return weekly
+
+    def booked_intervals(self, cleaner_id, day):
+        """Sorted (startTime, endTime) tuples booked for the cleaner on `day`."""
+        day = _as_date(day)
+        self.ensure_loaded(day)
+        return self._booked[cleaner_id].get(day, [])
+
+    def is_working(self, cleaner_id, time_to_check):
+        """True if `time_to_check` falls inside the cleaner's working hours."""
+        availability = self.get_availability(cleaner_id, time_to_check.date())
+        if availability is None or availability.startTime is None or availability.endTime is None:
+            return False
+        return availability.startTime <= time_to_check.time() <= availability.endTime
+
+    def has_conflict(self, cleaner_id, time_to_check):
+        """True if the cleaner already has a booking running at `time_to_check`."""
+        check_time = time_to_check.time()
+        for start_time, end_time in self.booked_intervals(cleaner_id, time_to_check.date()):
+            if start_time > check_time:
+                break
+            if check_time < end_time:
+                return True
+        return False
+
+    def is_cleaner_free(self, cleaner_id, time_to_check):
+        return self.is_working(cleaner_id, time_to_check) and not self.has_conflict(cleaner_id, time_to_check)
+
+    # ------------------------------------------------------------------
+    # Business-wide queries
+    # ------------------------------------------------------------------
+
+    def available_cleaners(self, time_to_check):
+        """Cleaners that are working and not booked at `time_to_check`."""
+        return [cleaner for cleaner in self.cleaners if self.is_cleaner_free(cleaner.id, time_to_check)]
+
+    def is_available(self, time_to_check):
+        return any(self.is_cleaner_free(cleaner.id, time_to_check) for cleaner in self.cleaners)
+
+    def cleaners_working_on(self, day):
+        """Cleaners that have a non-off availability entry for `day`."""
+        return [cleaner for cleaner in self.cleaners if self.get_availability(cleaner.id, day) is not None]
+
+    def free_slots(self, start, end, step=timedelta(hours=1)):
+        """
+        Return every datetime from `start` to `end` (inclusive), stepping by
+        `step`, at which at least one cleaner is free.
+        """
+        self.ensure_loaded(start.date(), end.date())
+
+        slots = []
+        current = start
+        while current <= end:
+            if self.is_available(current):
+                slots.append(current)
+            current += step
+        return slots
+
+
+class FreeTimeIndex:
+    """
+    Free-time gaps for every cleaner over a multi-day horizon.
+
+    Each cleaner's working hours for a day minus their booked intervals are
+    computed once into sorted minute-resolution (start, end) gaps. Openings of
+    any duration can then be enumerated at 15/30/60-minute (or any other)
+    granularity without re-checking availability slot by slot.
+    """
+
+    def __init__(self, engine, start_date, days=7):
+        self.engine = engine
+        self.start_date = _as_date(start_date)
+        self.days = days
+
+        end_date = self.start_date + timedelta(days=days - 1)
+        engine.ensure_loaded(self.start_date, end_date)
+
+        # date -> [(start_minute, end_minute, cleaner_id), ...] sorted by start
+        self._gaps = {}
+        for offset in range(days):
+            day = self.start_date + timedelta(days=offset)
+            gaps = []
+            for cleaner in engine.cleaners:
+                gaps.extend(
+                    (start, end, cleaner.id)
+                    for start, end in self._cleaner_gaps(cleaner.id, day)
+                )
+            gaps.sort()
+            self._gaps[day] = gaps
+
+    def _cleaner_gaps(self, cleaner_id, day):
+        availability = self.engine.get_availability(cleaner_id, day)
+        if availability is None or availability.startTime is None or availability.endTime is None:
+            return []
+
+        cursor = _minutes(availability.startTime)
+        day_end = _minutes(availability.endTime)
+
+        gaps = []
+        for start_time, end_time in self.engine.booked_intervals(cleaner_id, day):
+            booked_start, booked_end = _minutes(start_time), _minutes(end_time)
+            if booked_end <= cursor:
+                continue
+            if booked_start >= day_end:
+                break
+            if booked_start > cursor:
+                gaps.append((cursor, booked_start))
+            cursor = max(cursor, booked_end)
+
+        if cursor < day_end:
+            gaps.append((cursor, day_end))
+        return gaps
+
+    def gaps(self, day):
+        """Sorted (start_minute, end_minute, cleaner_id) gaps for `day`."""
+        return self._gaps.get(_as_date(day), [])
+
+    def openings(self, after, duration=timedelta(hours=1), granularity=60, limit=3):
+        """
+        Return up to `limit` start datetimes strictly after `after`, aligned to
+        `granularity` minutes, at which at least one cleaner is free for the
+        whole of `duration`. Results keep the tzinfo of `after`.
+        """
+        if limit <= 0:
+            return []
+
+        duration_minutes = max(int(duration.total_seconds() // 60), 1)
+        after_date = after.date()
+        after_minute = after.hour * 60 + after.minute
+
+        openings = []
+        for offset in range(self.days):
+            day = self.start_date + timedelta(days=offset)
+            if day < after_date:
+                continue
+
+            starts = set()
+            for gap_start, gap_end, _ in self._gaps[day]:
+                # First aligned start inside the gap
+                start = -(-gap_start // granularity) * granularity
+                if day == after_date and start <= after_minute:
+                    start = (after_minute // granularity + 1) * granularity
+                while start + duration_minutes <= gap_end:
+                    starts.add(start)
+                    start += granularity
+
+            midnight = datetime.combine(day, datetime.min.time(), tzinfo=after.tzinfo)
+            for start in sorted(starts):
+                openings.append(midnight + timedelta(minutes=start))
+                if len(openings) >= limit:
+                    return openings
+
+        return openings
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    return value
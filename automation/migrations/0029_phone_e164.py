@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+def backfill_phone_e164(apps, schema_editor):
+    from accounts.phone import backfill_phone_e164
+    backfill_phone_e164(apps.get_model('automation', 'Lead'), 'phone_number')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0045_thumbtackprofile_business_info_last_refresh_and_more'),
+        ('automation', '0028_leadswebhooklog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='phone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['business', 'phone_e164'], name='automation__busines_865462_idx'),
+        ),
+        migrations.RunPython(backfill_phone_e164, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,8 @@ import random
 import string
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from accounts.phone import PhoneIndexedModel
+
 User = get_user_model()
 
 
@@ -26,7 +28,9 @@ serviceTypes = [
 ]
 
 
-class Lead(models.Model):
+class Lead(PhoneIndexedModel):
+    PHONE_FIELD = 'phone_number'
+
     business = models.ForeignKey('accounts.Business', on_delete=models.CASCADE, null=True, blank=True)
     leadId = models.CharField(max_length=255)
     name = models.CharField(max_length=255)
@@ -112,6 +116,11 @@ class Lead(models.Model):
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'phone_e164']),
+        ]
+
     def __str__(self):
         return f"{self.name} - {self.email if self.email else self.phone_number}"
     
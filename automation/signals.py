@@ -10,7 +10,9 @@ import requests
 import traceback
 from django.core.mail import send_mail
 from accounts.models import ApiCredential
+from accounts.phone import find_by_phone
 from ai_agent.models import AgentConfiguration, Messages, Chat
+from ai_agent.prompts import format_lead_details
 from subscription.models import BusinessSubscription, SubscriptionPlan, UsageTracker
 from .tasks import send_call_to_lead
 from django_q.tasks import schedule
@@ -65,7 +67,7 @@ def set_status_and_send_email(sender, instance, created, **kwargs):
                 return
             
 
-            lead_details = f"Here are the details about the lead:\nName: {instance.name}\nPhone: {instance.phone_number}\nEmail: {instance.email if instance.email else 'Not provided'}\nAddress: {instance.address1 if instance.address1 else 'Not provided'}\nCity: {instance.city if instance.city else 'Not provided'}\nState: {instance.state if instance.state else 'Not provided'}\nZip Code: {instance.zipCode if instance.zipCode else 'Not provided'}\nProposed Start Time: {instance.proposed_start_datetime.strftime('%B %d, %Y at %I:%M %p') if instance.proposed_start_datetime else 'Not provided'}\nNotes: {instance.notes if instance.notes else 'No additional notes'}\nBedrooms: {instance.bedrooms if instance.bedrooms else 'Not provided'}\nBathrooms: {instance.bathrooms if instance.bathrooms else 'Not provided'}\nSquare Feet: {instance.squareFeet if instance.squareFeet else 'Not provided'}\nType of Cleaning: {instance.type_of_cleaning if instance.type_of_cleaning else 'Not provided'}"
+            lead_details = format_lead_details(instance)
                 
    
 
@@ -161,7 +163,7 @@ def set_status_and_send_email(sender, instance, created, **kwargs):
 
                 # Only create chat if SMS was sent successfully
                 if instance.sms_sent and instance.sms_status == 'sent':
-                    chat = Chat.objects.filter(clientPhoneNumber=instance.phone_number).first()
+                    chat = find_by_phone(Chat.objects.all(), instance.phone_number, instance.business)
                     if chat:
                         chat.delete()
                         
@@ -0,0 +1,267 @@
+import json
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, TestCase
+
+from accounts.models import ApiCredential, Business
+from automation.api_views import (
+    check_availability_retell, find_all_available_cleaners, find_available_cleaner, get_cleaner_availabilities, is_slot_available,
+)
+from automation.availability import AvailabilityEngine, FreeTimeIndex
+from automation.models import CleanerAvailability, Cleaners
+from bookings.models import Booking
+
+
+MONDAY = date(2026, 3, 2)
+TUESDAY = MONDAY + timedelta(days=1)
+
+
+def at(day, hour, minute=0):
+    return datetime.combine(day, time(hour, minute), tzinfo=dt_timezone.utc)
+
+
+def weekly(cleaner, day_of_week, start=None, end=None, off=False):
+    return CleanerAvailability(
+        cleaner=cleaner, availability_type='weekly', dayOfWeek=day_of_week,
+        startTime=start and time(start), endTime=end and time(end), offDay=off,
+    )
+
+
+def specific(cleaner, day, start=None, end=None, off=False):
+    return CleanerAvailability(
+        cleaner=cleaner, availability_type='specific', specific_date=day,
+        startTime=start and time(start), endTime=end and time(end), offDay=off,
+    )
+
+
+class AvailabilityEngineTests(TestCase):
+    """The engine against the per-cleaner checks it replaced."""
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        # bulk_create skips the booking signals (invoices, reminders, emails)
+        self.weekly_cleaner, self.override_cleaner, self.unscheduled_cleaner, self.duplicate_cleaner = Cleaners.objects.bulk_create([
+            Cleaners(business=self.business, name='Weekly', phoneNumber='5550000001', rating=3),
+            Cleaners(business=self.business, name='Override', phoneNumber='5550000002', rating=5),
+            Cleaners(business=self.business, name='Unscheduled', phoneNumber='5550000003', rating=4),
+            Cleaners(business=self.business, name='Duplicate', phoneNumber='5550000004', rating=2),
+        ])
+        CleanerAvailability.objects.bulk_create([
+            weekly(self.weekly_cleaner, 'Monday', 9, 17),
+            weekly(self.weekly_cleaner, 'Tuesday', off=True),
+            # The specific dates win over the weekly schedule
+            weekly(self.override_cleaner, 'Monday', 8, 12),
+            weekly(self.override_cleaner, 'Tuesday', 8, 12),
+            specific(self.override_cleaner, MONDAY, 13, 18),
+            specific(self.override_cleaner, TUESDAY, off=True),
+            # Only the first row for a day counts
+            weekly(self.duplicate_cleaner, 'Tuesday', 9, 17),
+            weekly(self.duplicate_cleaner, 'Tuesday', 6, 8),
+        ])
+        Booking.objects.bulk_create([
+            Booking(business=self.business, cleaner=self.weekly_cleaner, bookingId=f"bk{i:05d}", cleaningDate=day, startTime=time(start), endTime=time(end))
+            for i, (day, start, end) in enumerate([
+                (MONDAY, 10, 12), (MONDAY, 12, 13), (MONDAY, 15, 16),
+            ])
+        ] + [
+            Booking(business=self.business, cleaner=self.duplicate_cleaner, bookingId='bk00010', cleaningDate=TUESDAY, startTime=time(11), endTime=time(14)),
+        ])
+        self.cleaners = Cleaners.objects.filter(business=self.business).order_by('id')
+
+    def was_free(self, cleaner, moment):
+        """The pre-engine rule: working hours (inclusive), minus bookings running at `moment`."""
+        availability = get_cleaner_availabilities(cleaner, moment)
+        if availability is None or not (availability.startTime <= moment.time() <= availability.endTime):
+            return False
+        return not Booking.objects.filter(
+            cleaner=cleaner, cleaningDate=moment.date(), startTime__lte=moment.time(), endTime__gt=moment.time()
+        ).exists()
+
+    def test_matches_the_per_cleaner_checks(self):
+        engine = AvailabilityEngine(self.cleaners, MONDAY, TUESDAY)
+        for day in (MONDAY, TUESDAY):
+            for minute in range(6 * 60, 20 * 60, 30):
+                moment = at(day, minute // 60, minute % 60)
+                for cleaner in self.cleaners:
+                    self.assertEqual(
+                        engine.is_cleaner_free(cleaner.id, moment), self.was_free(cleaner, moment), f"{cleaner.name} at {moment}"
+                    )
+                    self.assertEqual(engine.get_availability(cleaner.id, day), get_cleaner_availabilities(cleaner, moment))
+
+    def test_weekly_specific_and_off_days(self):
+        engine = AvailabilityEngine(self.cleaners, MONDAY, TUESDAY)
+        self.assertTrue(engine.is_cleaner_free(self.weekly_cleaner.id, at(MONDAY, 9)))
+        self.assertTrue(engine.is_cleaner_free(self.weekly_cleaner.id, at(MONDAY, 17)))
+        self.assertFalse(engine.is_cleaner_free(self.weekly_cleaner.id, at(TUESDAY, 10)))
+        self.assertFalse(engine.is_cleaner_free(self.override_cleaner.id, at(MONDAY, 9)))
+        self.assertTrue(engine.is_cleaner_free(self.override_cleaner.id, at(MONDAY, 14)))
+        self.assertIsNone(engine.get_availability(self.override_cleaner.id, TUESDAY))
+        self.assertIsNone(engine.get_availability(self.unscheduled_cleaner.id, MONDAY))
+        self.assertEqual(engine.get_availability(self.duplicate_cleaner.id, TUESDAY).startTime, time(9))
+        self.assertEqual(
+            [cleaner.name for cleaner in engine.cleaners_working_on(TUESDAY)], ['Duplicate']
+        )
+
+    def test_bookings_touching_a_slot(self):
+        engine = AvailabilityEngine(self.cleaners, MONDAY)
+        free = lambda hour, minute=0: engine.is_cleaner_free(self.weekly_cleaner.id, at(MONDAY, hour, minute))
+
+        self.assertTrue(free(9, 59))
+        self.assertFalse(free(10))
+        self.assertFalse(free(11, 59))
+        # 10-12 ends and 12-13 starts at noon
+        self.assertFalse(free(12))
+        # A booking that ends at the requested time does not conflict
+        self.assertTrue(free(13))
+        self.assertFalse(free(15, 30))
+        self.assertTrue(free(16))
+
+    def test_api_helpers(self):
+        available = []
+        self.assertEqual(is_slot_available(self.cleaners, at(MONDAY, 14), available), (True, []))
+        self.assertEqual({cleaner.name for cleaner in available}, {'Weekly', 'Override'})
+        self.assertEqual(is_slot_available(self.cleaners, at(MONDAY, 15, 30), available), (True, []))
+        self.assertEqual([cleaner.name for cleaner in available], ['Override'])
+        self.assertEqual(is_slot_available(self.cleaners, at(MONDAY, 12), available), (False, []))
+        self.assertEqual(is_slot_available(self.cleaners, at(MONDAY, 19), available), (False, []))
+        self.assertEqual(available, [])
+
+        # The highest rated of the free cleaners
+        self.assertEqual(find_available_cleaner(self.cleaners, at(MONDAY, 14)), self.override_cleaner)
+        self.assertEqual(find_available_cleaner(self.cleaners, at(MONDAY, 10)), None)
+        self.assertEqual(find_available_cleaner(self.cleaners, at(TUESDAY, 10)), self.duplicate_cleaner)
+        self.assertIsNone(find_available_cleaner(self.cleaners, at(TUESDAY, 12)))
+
+        # Working that day, booked or not
+        self.assertEqual(find_all_available_cleaners(self.cleaners, at(MONDAY, 10)), [self.weekly_cleaner.id, self.override_cleaner.id])
+        self.assertEqual(find_all_available_cleaners(self.cleaners, '2026-03-03 10:00'), [self.duplicate_cleaner.id])
+        self.assertEqual(find_all_available_cleaners(self.cleaners, 'not a date'), [])
+
+    def test_a_shared_engine_answers_without_queries(self):
+        engine = AvailabilityEngine(self.cleaners, MONDAY, TUESDAY)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_slot_available(self.cleaners, at(MONDAY, 14), engine=engine)[0])
+            self.assertEqual(find_available_cleaner(self.cleaners, at(TUESDAY, 10), engine=engine), self.duplicate_cleaner)
+            self.assertEqual(find_all_available_cleaners(self.cleaners, at(MONDAY, 10), engine=engine), [self.weekly_cleaner.id, self.override_cleaner.id])
+            self.assertEqual(
+                [slot.hour for slot in engine.free_slots(at(MONDAY, 6), at(TUESDAY, 20)) if slot.date() == TUESDAY],
+                [9, 10, 14, 15, 16, 17],
+            )
+
+        # A day outside the loaded window is fetched on demand, once
+        CleanerAvailability.objects.bulk_create([specific(self.weekly_cleaner, MONDAY + timedelta(days=7), 9, 10)])
+        with self.assertNumQueries(2):
+            self.assertTrue(engine.is_cleaner_free(self.weekly_cleaner.id, at(MONDAY + timedelta(days=7), 9)))
+        with self.assertNumQueries(0):
+            self.assertFalse(engine.is_cleaner_free(self.weekly_cleaner.id, at(MONDAY + timedelta(days=7), 11)))
+
+
+class FreeTimeIndexTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        self.late, self.early = Cleaners.objects.bulk_create([
+            Cleaners(business=self.business, name='Late', phoneNumber='5550000001'),
+            Cleaners(business=self.business, name='Early', phoneNumber='5550000002'),
+        ])
+        CleanerAvailability.objects.bulk_create([
+            weekly(self.late, 'Monday', 9, 17),
+            weekly(self.early, 'Monday', 8, 11),
+            weekly(self.early, 'Tuesday', 9, 10),
+        ])
+        Booking.objects.bulk_create([
+            Booking(business=self.business, cleaner=cleaner, bookingId=f"bk{i:05d}", cleaningDate=MONDAY, startTime=start, endTime=end)
+            for i, (cleaner, start, end) in enumerate([
+                # Starts before the working day and runs into it
+                (self.late, time(8, 30), time(10, 15)),
+                (self.late, time(12), time(13)),
+                # After the working day; ignored
+                (self.late, time(18), time(19)),
+                (self.early, time(10), time(11)),
+            ])
+        ])
+        cleaners = Cleaners.objects.filter(business=self.business).order_by('id')
+        self.index = FreeTimeIndex(AvailabilityEngine(cleaners), MONDAY, days=2)
+
+    def openings(self, after, hours=1, granularity=60, limit=10):
+        return [
+            opening.strftime('%a %H:%M')
+            for opening in self.index.openings(after, duration=timedelta(hours=hours), granularity=granularity, limit=limit)
+        ]
+
+    def test_gaps_run_to_the_day_start_and_end(self):
+        self.assertEqual(self.index.gaps(MONDAY), [
+            (8 * 60, 10 * 60, self.early.id),
+            (10 * 60 + 15, 12 * 60, self.late.id),
+            (13 * 60, 17 * 60, self.late.id),
+        ])
+        self.assertEqual(self.index.gaps(TUESDAY), [(9 * 60, 10 * 60, self.early.id)])
+        self.assertEqual(self.index.gaps(TUESDAY + timedelta(days=1)), [])
+
+    def test_openings_are_aligned_to_the_granularity(self):
+        self.assertEqual(
+            self.openings(at(MONDAY, 7)),
+            ['Mon 08:00', 'Mon 09:00', 'Mon 11:00', 'Mon 13:00', 'Mon 14:00', 'Mon 15:00', 'Mon 16:00', 'Tue 09:00'],
+        )
+        self.assertEqual(self.openings(at(MONDAY, 10), granularity=30, limit=3), ['Mon 10:30', 'Mon 11:00', 'Mon 13:00'])
+        self.assertEqual(
+            self.openings(at(MONDAY, 10), granularity=15, limit=5), ['Mon 10:15', 'Mon 10:30', 'Mon 10:45', 'Mon 11:00', 'Mon 13:00']
+        )
+
+    def test_openings_start_strictly_after_the_requested_time(self):
+        self.assertEqual(self.openings(at(MONDAY, 13)), ['Mon 14:00', 'Mon 15:00', 'Mon 16:00', 'Tue 09:00'])
+        self.assertEqual(self.openings(at(MONDAY, 13, 10), granularity=15, limit=1), ['Mon 13:15'])
+        self.assertEqual(self.index.openings(at(MONDAY, 16, 30))[0].tzinfo, dt_timezone.utc)
+
+    def test_duration_must_fit_in_one_gap(self):
+        self.assertEqual(self.openings(at(MONDAY, 7), hours=4), ['Mon 13:00'])
+        self.assertEqual(self.openings(at(MONDAY, 7), hours=4.5), [])
+        self.assertEqual(self.openings(at(MONDAY, 7), hours=1.75, granularity=15, limit=20), ['Mon 08:00', 'Mon 08:15', 'Mon 10:15'] + [
+            f"Mon {minute // 60}:{minute % 60:02d}" for minute in range(13 * 60, 15 * 60 + 15 + 1, 15)
+        ])
+
+    def test_limit(self):
+        self.assertEqual(self.openings(at(MONDAY, 7), limit=2), ['Mon 08:00', 'Mon 09:00'])
+        self.assertEqual(self.openings(at(MONDAY, 7), granularity=15, limit=0), [])
+
+
+@mock.patch('accounts.timezone_utils.convert_date_str_to_date', lambda date_str, business: date_str)
+class CheckAvailabilityRetellTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        ApiCredential.objects.update_or_create(business=self.business, defaults={'secretKey': 'secret'})
+        cleaner = Cleaners.objects.bulk_create([Cleaners(business=self.business, name='Ann', phoneNumber='5550000001')])[0]
+        CleanerAvailability.objects.bulk_create([weekly(cleaner, 'Monday', 9, 17)])
+        Booking.objects.bulk_create([
+            Booking(business=self.business, cleaner=cleaner, bookingId='bk00001', cleaningDate=MONDAY, startTime=time(9), endTime=time(12)),
+        ])
+
+    def post(self, **args):
+        request = RequestFactory().post(
+            '/', json.dumps({'args': {'cleaningDateTime': '2026-03-02 10:00:00', **args}}), content_type='application/json'
+        )
+        response = check_availability_retell(request, 'secret')
+        return response.status_code, json.loads(response.content)
+
+    def test_invalid_tuning_is_rejected(self):
+        for args in ({'durationHours': 'two'}, {'slotGranularity': '1h'}, {'maxAlternates': 'three'}):
+            status, body = self.post(**args)
+            self.assertEqual(status, 400, args)
+            self.assertIn('Invalid durationHours', body['error'])
+
+        status, body = self.post(slotGranularity=20)
+        self.assertEqual((status, body['error']), (400, 'slotGranularity must be 15, 30 or 60'))
+
+    def test_alternates_follow_the_tuning(self):
+        status, body = self.post()
+        self.assertEqual((status, body['available']), (200, False))
+        self.assertEqual(body['alternates'], ['2026-03-02 12:00 PM', '2026-03-02 01:00 PM', '2026-03-02 02:00 PM'])
+
+        status, body = self.post(durationHours='4.5', slotGranularity='30', maxAlternates='2')
+        self.assertEqual(body['alternates'], ['2026-03-02 12:00 PM', '2026-03-02 12:30 PM'])
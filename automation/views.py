@@ -10,6 +10,7 @@ import logging
 from .models import Lead, Cleaners, CleanerAvailability, NotificationLog
 from bookings.models import Booking
 from accounts.models import ApiCredential, Business, CleanerProfile
+from accounts.phone import filter_by_phone
 from invoice.models import Invoice, Payment
 from subscription.models import UsageTracker
 from django.db import transaction
@@ -344,7 +345,7 @@ def create_lead(request):
                 messages.error(request, 'Please enter a valid phone number.')
                 return redirect('create_lead')
 
-            previous_leads = Lead.objects.filter(phone_number=phone_number)
+            previous_leads = filter_by_phone(Lead.objects.filter(business=business), phone_number)
             if previous_leads.exists():
                 previous_leads.delete()
                 
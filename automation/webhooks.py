@@ -21,6 +21,7 @@ from integrations.models import PlatformIntegration, DataMapping, IntegrationLog
 from integrations.utils import log_integration_activity
 from retell_agent.models import RetellAgent
 from subscription.models import UsageTracker
+from usage_analytics.models import RetellCall
 from retell import Retell
 from django.conf import settings
 from openai import OpenAI
@@ -289,6 +290,14 @@ def process_webhook_data(webhook_data):
         event = post_data.get("event")
         call_data = post_data.get("call", {})
         call_id = call_data.get("call_id") or call_data.get("id", "")
+
+        if event in ('call_ended', 'call_analyzed') and call_data.get("call_id"):
+            # Keep the local call history current between scheduled syncs
+            try:
+                with transaction.atomic():
+                    RetellCall.upsert_from_api([call_data], business=businessObj)
+            except Exception as e:
+                print(f"Error storing Retell call {call_id}: {str(e)}")
       
         if event == 'call_ended':
             print(f"Call ended: {call_id}")
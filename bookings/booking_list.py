@@ -0,0 +1,172 @@
+"""
+Booking list queries for the bookings page and the booking list API.
+
+Every status tab is a filter on one annotated queryset, so the tab counts
+come from a single conditional aggregate and no tab joins payments in a
+way that repeats bookings. Lists are read a page at a time with keyset
+pagination on (cleaningDate, startTime, id), the columns of the
+(business, cleaningDate, startTime, id) index: a page costs the same
+however many bookings the business has, and the cursor is the last row's
+key. A missing date or time sorts after every other value, as in that
+index on PostgreSQL.
+"""
+from datetime import date, time
+
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Q
+
+from invoice.models import Payment
+from .models import Booking
+
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+PAID_PAYMENT_STATUSES = ['COMPLETED', 'AUTHORIZED', 'APPROVED']
+
+# Tab key -> list order; the filters need today's date, see tab_filters()
+TAB_ORDER = {
+    'all': 'desc',
+    'upcoming': 'asc',
+    'awaiting': 'asc',
+    'past': 'desc',
+    'completed': 'desc',
+    'cancelled': 'desc',
+}
+
+
+def tab_filters(today):
+    """{tab: Q} over a queryset from annotated_bookings()."""
+    return {
+        'all': Q(),
+        'upcoming': Q(isCompleted=False, cleaningDate__gte=today, has_paid_payment=True),
+        'awaiting': Q(isCompleted=False, cancelled_at__isnull=True, invoice__isPaid=False, has_pending_payment=True),
+        'past': Q(cleaningDate__lt=today, invoice__isPaid=True),
+        'completed': Q(isCompleted=True),
+        'cancelled': Q(cancelled_at__isnull=False),
+    }
+
+
+def annotated_bookings(bookings):
+    """
+    `bookings` with what the tabs filter on: whether the invoice has a
+    paid or a pending payment.
+    """
+    payments = Payment.objects.filter(invoice__booking=OuterRef('pk'))
+    return bookings.annotate(
+        has_paid_payment=Exists(payments.filter(status__in=PAID_PAYMENT_STATUSES)),
+        has_pending_payment=Exists(payments.filter(status='PENDING')),
+    )
+
+
+def search_bookings(bookings, params):
+    """
+    Apply the search and filters in `params` (a QueryDict or dict):
+    q (booking ID, customer name, email or phone), date_from and date_to
+    (cleaning date, YYYY-MM-DD), cleaner (id), service_type and recurring.
+    Raises ValueError for a malformed date.
+    """
+    term = (params.get('q') or '').strip()
+    if term:
+        bookings = bookings.filter(
+            Q(bookingId__icontains=term)
+            | Q(customer__first_name__icontains=term)
+            | Q(customer__last_name__icontains=term)
+            | Q(customer__email__icontains=term)
+            | Q(customer__phone_number__icontains=term)
+        )
+    if params.get('date_from'):
+        bookings = bookings.filter(cleaningDate__gte=date.fromisoformat(params['date_from']))
+    if params.get('date_to'):
+        bookings = bookings.filter(cleaningDate__lte=date.fromisoformat(params['date_to']))
+    if params.get('cleaner'):
+        bookings = bookings.filter(cleaner_id=params['cleaner'])
+    if params.get('service_type'):
+        bookings = bookings.filter(serviceType=params['service_type'])
+    if params.get('recurring'):
+        bookings = bookings.filter(recurring=params['recurring'])
+    return bookings
+
+
+def tab_counts(bookings, today):
+    """{tab: bookings in it} for an annotated queryset, in one query."""
+    return bookings.aggregate(**{
+        tab: Count('id', filter=condition) for tab, condition in tab_filters(today).items()
+    })
+
+
+def encode_cursor(booking):
+    """The keyset key of `booking`; a missing date or time is left empty."""
+    cleaning_date = booking.cleaningDate.isoformat() if booking.cleaningDate else ''
+    start_time = booking.startTime.isoformat() if booking.startTime else ''
+    return f"{cleaning_date}|{start_time}|{booking.id}"
+
+
+def decode_cursor(cursor):
+    """(date, time, id) from encode_cursor(); raises ValueError if malformed."""
+    cleaning_date, start_time, booking_id = cursor.split('|')
+    return (
+        date.fromisoformat(cleaning_date) if cleaning_date else None,
+        time.fromisoformat(start_time) if start_time else None,
+        int(booking_id),
+    )
+
+
+def beyond(field, value, descending):
+    """
+    Q for rows whose `field` comes after `value` in the list order, where
+    NULL sorts last ascending and first descending; None if no row can.
+    """
+    if descending:
+        return Q(**{f"{field}__isnull": False}) if value is None else Q(**{f"{field}__lt": value})
+    if value is None:
+        return None
+    return Q(**{f"{field}__gt": value}) | Q(**{f"{field}__isnull": True})
+
+
+def same(field, value):
+    return Q(**{f"{field}__isnull": True}) if value is None else Q(**{field: value})
+
+
+def page(bookings, tab, today, after=None, limit=PAGE_SIZE):
+    """
+    One page of a tab of an annotated queryset: (bookings, next cursor or
+    None). `after` is the cursor of the previous page.
+    """
+    descending = TAB_ORDER[tab] == 'desc'
+    bookings = bookings.filter(tab_filters(today)[tab])
+
+    if after:
+        key = list(zip(['cleaningDate', 'startTime', 'id'], decode_cursor(after)))
+        # Later in the first column, or equal up to some column and later in it
+        condition = Q(pk__in=[])
+        for i, (field, value) in enumerate(key):
+            later = beyond(field, value, descending)
+            if later is not None:
+                for prior_field, prior_value in key[:i]:
+                    later &= same(prior_field, prior_value)
+                condition |= later
+        bookings = bookings.filter(condition)
+
+    if descending:
+        order = [F('cleaningDate').desc(nulls_first=True), F('startTime').desc(nulls_first=True), '-id']
+    else:
+        order = [F('cleaningDate').asc(nulls_last=True), F('startTime').asc(nulls_last=True), 'id']
+    rows = list(
+        bookings.select_related('customer', 'cleaner', 'invoice')
+        .prefetch_related(Prefetch('invoice__payments', queryset=Payment.objects.order_by('-createdAt')))
+        .order_by(*order)[:limit + 1]
+    )
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def status_label(booking, today):
+    """The status the bookings page shows for `booking`."""
+    if booking.cancelled_at:
+        return 'Cancelled'
+    if booking.isCompleted:
+        return 'Completed'
+    if booking.is_paid():
+        return 'Past' if booking.cleaningDate and booking.cleaningDate < today else 'Upcoming'
+    return 'Pending Payment'
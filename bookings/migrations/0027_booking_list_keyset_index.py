@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-17 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0045_thumbtackprofile_business_info_last_refresh_and_more'),
+        ('automation', '0029_phone_e164'),
+        ('bookings', '0026_booking_applied_coupon_and_more'),
+        ('customer', '0011_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['business', 'cleaningDate', 'startTime', 'id'], name='bookings_bo_busines_19dacb_idx'),
+        ),
+    ]
@@ -143,6 +143,12 @@ class Booking(models.Model):
     arrival_confirmed_at = models.DateTimeField(null=True, blank=True)
     arrived_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset order of the booking list, see bookings.booking_list
+            models.Index(fields=['business', 'cleaningDate', 'startTime', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.bookingId}"
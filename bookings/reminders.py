@@ -0,0 +1,109 @@
+"""
+Bulk reminder pipeline used by the day-before, hour-before and post-service
+follow-up tasks.
+
+Due bookings are selected in one query with everything the templates need
+joined in and the paid status computed in SQL. Bookings are then handled
+REMINDER_CHUNK_SIZE at a time: their messages are rendered, handed to
+NotificationService.send_many to be delivered in parallel, and the chunk is
+stamped with one bulk_update before the next chunk is sent, so a run cut
+short by the task timeout doesn't remind the same people again.
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from invoice.models import Payment
+from notification.services import NotificationService
+from .models import Booking
+
+
+def select_due_bookings(queryset, paid_only=True):
+    """
+    Join in business, customer, cleaner and invoice for `queryset` and, with
+    `paid_only`, keep only bookings that Booking.is_paid() would accept.
+    """
+    queryset = queryset.select_related(
+        'business__user',
+        'business__apicredential',
+        'customer__user',
+        'cleaner__user_profile__user',
+        'invoice',
+    )
+
+    if paid_only:
+        # Same rule as Booking.is_paid(): a paid invoice, or a latest payment
+        # that is neither pending nor failed
+        latest_payment_status = Payment.objects.filter(
+            invoice=OuterRef('invoice')
+        ).order_by('-createdAt').values('status')[:1]
+
+        queryset = queryset.annotate(
+            latest_payment_status=Subquery(latest_payment_status)
+        ).filter(
+            Q(invoice__isPaid=True)
+            | (
+                Q(latest_payment_status__isnull=False)
+                & ~Q(latest_payment_status__in=['PENDING', 'FAILED'])
+            )
+        )
+
+    return queryset
+
+
+def client_message(booking, subject, content):
+    business = booking.business
+    return {
+        'recipient': booking.customer.user if booking.customer.user else None,
+        'notification_type': ['email', 'sms'],
+        'from_email': f"{business.businessName} <{business.user.email}>",
+        'subject': subject,
+        'content': content,
+        'sender': business,
+        'email_to': booking.customer.email,
+        'sms_to': booking.customer.phone_number,
+    }
+
+
+def cleaner_message(booking, subject, content):
+    business = booking.business
+    cleaner = booking.cleaner
+    profile = getattr(cleaner, 'user_profile', None)
+    return {
+        'recipient': profile.user if profile else None,
+        'notification_type': ['email', 'sms'],
+        'from_email': f"{business.businessName} <{business.user.email}>",
+        'subject': subject,
+        'content': content,
+        'sender': business,
+        'email_to': cleaner.email,
+        'sms_to': cleaner.phoneNumber,
+    }
+
+
+def dispatch(bookings, build_messages, stamp_field):
+    """
+    Render messages for each booking with `build_messages(booking)`, send
+    them in parallel with NotificationService.send_many and stamp
+    `stamp_field`, one chunk of bookings at a time. Returns the number of
+    bookings stamped.
+    """
+    bookings = list(bookings)
+    chunk_size = max(1, getattr(settings, 'REMINDER_CHUNK_SIZE', 100))
+
+    for start in range(0, len(bookings), chunk_size):
+        chunk = bookings[start:start + chunk_size]
+        messages = []
+        for booking in chunk:
+            messages.extend(build_messages(booking))
+
+        # Delivery failures are recorded on each Notification; like the old
+        # per-booking loop, they don't hold back the stamp
+        NotificationService.send_many(messages)
+
+        sent_at = timezone.now()
+        for booking in chunk:
+            setattr(booking, stamp_field, sent_at)
+        Booking.objects.bulk_update(chunk, [stamp_field])
+
+    return len(bookings)
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.utils import timezone
 from twilio.rest import Client
 from notification.services import NotificationService
+from .reminders import select_due_bookings, client_message, cleaner_message, dispatch
 
 
 from .email_template import get_email_template
@@ -176,68 +177,25 @@ def send_day_before_reminder():
     """
     try:
         # Calculate the date for bookings scheduled for tomorrow
-        tomorrow = timezone.now().date() + datetime.timedelta(days=1)
+        today = timezone.now().date()
+        tomorrow = today + datetime.timedelta(days=1)
         
         # Get all confirmed paid bookings scheduled for tomorrow
-        bookings = Booking.objects.filter(
-            Q(cleaningDate=tomorrow) | Q(cleaningDate=timezone.now().date()),
+        bookings = select_due_bookings(Booking.objects.filter(
+            Q(cleaningDate=tomorrow) | Q(cleaningDate=today),
             cancelled_at__isnull=True,
-            isCompleted=False
-        )
-
-       
-        
-        reminder_count = 0
-        for booking in bookings:
-            # Skip if a day-before reminder has already been sent
-            if hasattr(booking, 'dayBeforeReminderSentAt') and booking.dayBeforeReminderSentAt:
-                continue
-                
-            # Check if booking is paid
-            if not booking.is_paid():
-                continue
-                
-            business = booking.business
-            to_whom = ['client', 'cleaner']
-            # Prepare email content
-            email_subject = f"Reminder: Your Cleaning Service with {business.businessName} Tomorrow"
-            for to in to_whom:
-                email_text = get_email_template(booking, to=to, when='tomorrow')
-                recipient_email = booking.customer.email if to == 'client' else booking.cleaner.email
-
-                from_email = f"{business.businessName} <{business.user.email}>"
-
-                # Send email using the new utility
+            isCompleted=False,
+            dayBeforeReminderSentAt__isnull=True
+        ))
 
-                if to == 'client':
-                    NotificationService.send_notification(
-                        recipient=booking.customer.user if booking.customer.user else None,
-                        notification_type=['email', 'sms'],
-                        from_email=from_email,
-                        subject=email_subject,
-                        content=email_text,
-                      
-                        sender=business,
-                        email_to=recipient_email,
-                        sms_to=booking.customer.phone_number,
-                    )
-                
-                if to == 'cleaner':
-                    NotificationService.send_notification(
-                        recipient=booking.cleaner.user if booking.cleaner.user else None,
-                        notification_type=['email', 'sms'],
-                        from_email=from_email,
-                        subject=email_subject,
-                        content=email_text,
-                      
-                        sender=business,
-                        email_to=recipient_email,
-                        sms_to=booking.cleaner.phone_number,
-                    )
+        def build_messages(booking):
+            email_subject = f"Reminder: Your Cleaning Service with {booking.business.businessName} Tomorrow"
+            messages = [client_message(booking, email_subject, get_email_template(booking, to='client', when='tomorrow'))]
+            if booking.cleaner:
+                messages.append(cleaner_message(booking, email_subject, get_email_template(booking, to='cleaner', when='tomorrow')))
+            return messages
 
-            booking.dayBeforeReminderSentAt = timezone.now()
-            booking.save()
-            reminder_count += 1
+        reminder_count = dispatch(bookings, build_messages, 'dayBeforeReminderSentAt')
 
         print(f"[INFO] Sent {reminder_count} day-before reminders (client & cleaner)")
         return reminder_count
@@ -259,70 +217,25 @@ def send_hour_before_reminder():
         current_date = now.date()
         
         # Find bookings for today where the start time is between 1-2 hours from now
-        bookings = Booking.objects.filter(
+        bookings = select_due_bookings(Booking.objects.filter(
             cleaningDate=current_date,
             startTime__gte=one_hour_from_now.time(),
             startTime__lt=two_hours_from_now.time(),
             cancelled_at__isnull=True,
             isCompleted=False,
             hourBeforeReminderSentAt__isnull=True
-        )
+        ))
 
-        
-        reminder_count = 0
-        for booking in bookings:
-            # Skip if an hour-before reminder has already been sent
-            if hasattr(booking, 'hourBeforeReminderSentAt') and booking.hourBeforeReminderSentAt:
-                continue
-                
-            # Check if booking is paid
-            if not booking.is_paid():
-                continue
-                
-            business = booking.business
-            
-            # Prepare email content
-            to_whom = ['client', 'cleaner'] 
-            for to in to_whom:
-                email_subject = f"Your {business.businessName} Cleaning Service Is Coming Soon"
-                email_text = get_email_template(booking, to=to, when='in one hour')
-                recipient_email = booking.customer.email if to == 'client' else booking.cleaner.email
-             
+        def build_messages(booking):
+            email_subject = f"Your {booking.business.businessName} Cleaning Service Is Coming Soon"
+            messages = [client_message(booking, email_subject, get_email_template(booking, to='client', when='in one hour'))]
+            if booking.cleaner:
+                messages.append(cleaner_message(booking, email_subject, get_email_template(booking, to='cleaner', when='in one hour')))
+            return messages
 
-                from_email = f"{business.businessName} <{business.user.email}>"
+        reminder_count = dispatch(bookings, build_messages, 'hourBeforeReminderSentAt')
 
-                if to == 'client':
-                    NotificationService.send_notification(
-                        recipient=booking.customer.user if booking.customer.user else None,
-                        notification_type=['email', 'sms'],
-                        from_email=from_email,
-                        subject=email_subject,
-                        content=email_text,
-                       
-                        sender=business,
-                        email_to=recipient_email,
-                        sms_to=booking.customer.phone_number,
-                    )
-                
-                if to == 'cleaner':
-                    NotificationService.send_notification(
-                        recipient=booking.cleaner.user if booking.cleaner.user else None,
-                        notification_type=['email', 'sms'],
-                        from_email=from_email,
-                        subject=email_subject,
-                        content=email_text,
-                      
-                        sender=business,
-                        email_to=recipient_email,
-                        sms_to=booking.cleaner.phone_number,
-                    )
-
-            booking.hourBeforeReminderSentAt = timezone.now()
-            booking.save()
-            
-            reminder_count += 1
-            
-      
+        print(f"[INFO] Sent {reminder_count} hour-before reminders (client & cleaner)")
         return reminder_count
         
     except Exception as e:
@@ -339,22 +252,16 @@ def send_post_service_followup():
         # Calculate the date for bookings that were completed yesterday
         yesterday = timezone.now().date() - datetime.timedelta(days=1)
         
-        # Get all completed bookings from yesterday
-        bookings = Booking.objects.filter(
+        # Get all completed bookings from yesterday that haven't been followed up yet
+        bookings = select_due_bookings(Booking.objects.filter(
             cleaningDate=yesterday,
             isCompleted=True,
-            cancelled_at__isnull=True
-        )
-        
-        followup_count = 0
-        for booking in bookings:
-            # Skip if a post-service followup has already been sent
-            if hasattr(booking, 'postServiceFollowupSent') and booking.postServiceFollowupSent:
-                continue
-                
+            cancelled_at__isnull=True,
+            postServiceFollowupSentAt__isnull=True
+        ), paid_only=False)
+
+        def build_messages(booking):
             business = booking.business
-            
-            # Prepare email content
             email_subject = f"How was your experience with {business.businessName}?"
             
             # Create plain text email body
@@ -381,34 +288,9 @@ If you have any questions or special requests for future services, please don't
 
 This is an automated message from {business.businessName}.
             """
-            
-            # Send email
-            try:
-                from_email = f"{business.businessName} <{business.user.email}>"
-                recipient_email = booking.customer.email
-
-                NotificationService.send_notification(
-                    recipient=booking.customer.user if booking.customer.user else None,
-                    notification_type=['email', 'sms'],
-                    from_email=from_email,
-                    subject=email_subject,
-                    content=text_body,
-                 
-                    sender=business,
-                    email_to=recipient_email,
-                    sms_to=booking.customer.phone_number,
-                )
+            return [client_message(booking, email_subject, text_body)]
 
-            except Exception as e:
-                print(f"[ERROR] Failed to send post-service followup email: {str(e)}")
-            
-   
-            
-            # Update the booking to record that the post-service followup was sent
-            booking.postServiceFollowupSentAt = timezone.now()
-            booking.save()
-            
-            followup_count += 1
+        followup_count = dispatch(bookings, build_messages, 'postServiceFollowupSentAt')
             
         print(f"[INFO] Sent {followup_count} post-service followups")
         return followup_count
@@ -1,3 +1,162 @@
-from django.test import TestCase
+import json
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Business
+from customer.models import Customer
+from invoice.models import Invoice, Payment
+from .booking_list import annotated_bookings, page, tab_counts
+from .models import Booking
+from .reminders import dispatch
+from .views import all_bookings, booking_list_api
+
+
+class BookingListTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=self.user, businessName='Sparkle')
+        self.customer = Customer.objects.create(first_name='Ann', last_name='Lee', email='ann@example.com', phone_number='5550001111')
+        self.today = self.business.get_local_time().date()
+
+    def add_bookings(self, days, payment_statuses=(), **fields):
+        """One booking per day offset in `days`, with an invoice holding `payment_statuses`."""
+        # bulk_create skips the booking signals (invoices, reminders, emails)
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                business=self.business, customer=self.customer, bookingId=f"bk{Booking.objects.count() + i:05d}",
+                cleaningDate=self.today + timedelta(days=day), startTime=time(9), totalPrice=Decimal('100'), **fields
+            )
+            for i, day in enumerate(days)
+        ])
+        invoices = Invoice.objects.bulk_create([Invoice(booking=booking, amount=Decimal('100')) for booking in bookings])
+        Payment.objects.bulk_create([
+            Payment(invoice=invoice, status=status) for invoice in invoices for status in payment_statuses
+        ])
+        return bookings
+
+    def get_json(self, **params):
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        return json.loads(booking_list_api(request).content)
+
+    def test_pages_cover_a_tab_once_in_order(self):
+        # Two paid payments per invoice used to list each booking twice
+        self.add_bookings(range(1, 8), payment_statuses=['COMPLETED', 'APPROVED'])
+        self.add_bookings([2, 3], payment_statuses=['PENDING'])
+
+        seen, cursor = [], None
+        while True:
+            response = self.get_json(tab='upcoming', limit=3, **({'after': cursor} if cursor else {}))
+            seen += [(booking['cleaningDate'], booking['bookingId']) for booking in response['bookings']]
+            cursor = response['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(response['counts']['upcoming'], 7)
+        self.assertEqual(response['counts']['awaiting'], 2)
+        self.assertEqual(response['counts']['all'], 9)
+
+    def test_bookings_without_a_date_or_time_are_paged_once(self):
+        bookings = self.add_bookings([1, 1, 2, 3, 3], payment_statuses=['PENDING'])
+        Booking.objects.filter(pk__in=[bookings[0].pk, bookings[3].pk]).update(startTime=None)
+        Booking.objects.filter(pk__in=[bookings[3].pk, bookings[4].pk]).update(cleaningDate=None)
+        bookings = annotated_bookings(Booking.objects.filter(business=self.business))
+
+        # 'all' lists newest first, 'awaiting' oldest first
+        for tab in ('all', 'awaiting'):
+            seen, cursor = [], None
+            while True:
+                rows, cursor = page(bookings, tab, self.today, after=cursor, limit=1)
+                seen += [booking.id for booking in rows]
+                if not cursor:
+                    break
+            self.assertEqual(seen, [booking.id for booking in page(bookings, tab, self.today, limit=10)[0]])
+            self.assertEqual(len(set(seen)), 5)
+
+        # Oldest first, a missing date or time sorts last
+        rows, _ = page(bookings, 'awaiting', self.today, limit=10)
+        self.assertEqual(
+            [(booking.cleaningDate, booking.startTime) for booking in rows],
+            [(self.today + timedelta(days=1), time(9)), (self.today + timedelta(days=1), None),
+             (self.today + timedelta(days=2), time(9)), (None, time(9)), (None, None)],
+        )
+
+    def test_page_and_counts_queries_do_not_grow(self):
+        self.add_bookings(range(3), payment_statuses=['COMPLETED'])
+        bookings = annotated_bookings(Booking.objects.filter(business=self.business))
+        with self.assertNumQueries(1):
+            tab_counts(bookings, self.today)
+        with self.assertNumQueries(2):
+            rows, _ = page(bookings, 'all', self.today)
+            [(booking.customer.get_full_name(), booking.get_payment_status()) for booking in rows]
+
+        self.add_bookings(range(40), payment_statuses=['COMPLETED'])
+        with self.assertNumQueries(2):
+            rows, _ = page(bookings, 'all', self.today)
+            [(booking.customer.get_full_name(), booking.get_payment_status()) for booking in rows]
+
+    def test_search_and_filters(self):
+        self.add_bookings([1])
+        other = Customer.objects.create(first_name='Bob', last_name='Ray', email='bob@example.com', phone_number='5550002222')
+        Booking.objects.bulk_create([Booking(business=self.business, customer=other, bookingId='bk99999', cleaningDate=self.today + timedelta(days=20))])
+
+        self.assertEqual([booking['customer'] for booking in self.get_json(q='bob')['bookings']], ['Bob Ray'])
+        self.assertEqual(self.get_json(q='bk99999')['counts']['all'], 1)
+        self.assertEqual(self.get_json(date_to=(self.today + timedelta(days=5)).isoformat())['counts']['all'], 1)
+        self.assertEqual(self.get_json(date_from='not-a-date')['success'], False)
+        self.assertEqual(self.get_json(after='garbage')['success'], False)
+
+    def render_page(self, **params):
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        return all_bookings(request).content.decode()
+
+    def test_bookings_page_is_paged(self):
+        self.add_bookings(range(1, 3), payment_statuses=['COMPLETED'])
+        with CaptureQueriesContext(connection) as queries:
+            self.render_page(tab='upcoming')
+
+        self.add_bookings(range(3, 60), payment_statuses=['COMPLETED'])
+        with CaptureQueriesContext(connection) as more_queries:
+            content = self.render_page(tab='upcoming')
+        self.assertLessEqual(len(more_queries), len(queries))
+        self.assertIn('?tab=upcoming&after=', content)
+        self.assertEqual(content.count('data-tab="upcoming"'), 50)
+
+
+class ReminderDispatchTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        business = Business.objects.create(user=user, businessName='Sparkle')
+        customer = Customer.objects.create(first_name='Ann', last_name='Lee', email='ann@example.com', phone_number='5550001111')
+        Booking.objects.bulk_create([
+            Booking(business=business, customer=customer, bookingId=f"bk{i:05d}") for i in range(5)
+        ])
+
+    @override_settings(REMINDER_CHUNK_SIZE=2)
+    @mock.patch('bookings.reminders.NotificationService.send_many')
+    def test_sent_chunks_are_stamped_before_the_next_one(self, send_many):
+        # The run dies while sending the second chunk
+        send_many.side_effect = [[], RuntimeError('timeout')]
+        bookings = Booking.objects.order_by('id')
+
+        with self.assertRaises(RuntimeError):
+            dispatch(bookings, lambda booking: [{'booking': booking.bookingId}], 'dayBeforeReminderSentAt')
+
+        stamped = Booking.objects.filter(dayBeforeReminderSentAt__isnull=False).order_by('id')
+        self.assertEqual([booking.bookingId for booking in stamped], ['bk00000', 'bk00001'])
+        self.assertEqual(send_many.call_args_list[0].args[0], [{'booking': 'bk00000'}, {'booking': 'bk00001'}])
+
+        send_many.side_effect = None
+        self.assertEqual(dispatch(bookings.filter(dayBeforeReminderSentAt__isnull=True), lambda booking: [], 'dayBeforeReminderSentAt'), 3)
+        self.assertFalse(Booking.objects.filter(dayBeforeReminderSentAt__isnull=True).exists())
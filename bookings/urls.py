@@ -19,6 +19,7 @@ urlpatterns = [
     path('calendar/', views.booking_calendar, name='booking_calendar'),
     path('embed-widget/', views.embed_booking_widget, name='embed_booking_widget'),
     path('api/booking-history-data/', views.booking_history_data, name='booking_history_data'),
+    path('api/bookings/', views.booking_list_api, name='booking_list_api'),
 
     path('api/reschedule-booking/', views.reschedule_booking, name='reschedule_booking'),
     path('api/cancel-booking/', views.cancel_booking, name='cancel_booking'),
@@ -1,5 +1,6 @@
 
 from automation.api_views import get_cleaners_for_business, find_all_available_cleaners
+from automation.availability import AvailabilityEngine
 from accounts.models import CleanerProfile
 from django.contrib import messages
 from django.shortcuts import redirect
@@ -34,20 +35,28 @@ def send_jobs_to_cleaners(business, booking, exclude_ids=None, assignment_check_
             from datetime import datetime as dt
             time_to_check = dt.combine(booking.cleaningDate, booking.startTime)
     
-    available_cleaners = find_all_available_cleaners(cleaners, time_to_check)
+    engine = AvailabilityEngine(cleaners, time_to_check.date())
+    available_cleaners = find_all_available_cleaners(cleaners, time_to_check, engine=engine)
     
     if not available_cleaners:
         print("No available cleaners found")
         return False
 
     print("Available cleaners found, creating jobs")
-    jobs_created = 0
+
+    # Resolve profiles and existing jobs for all available cleaners up front
+    cleaner_profiles = {}
+    for profile in CleanerProfile.objects.filter(cleaner__id__in=available_cleaners).select_related('cleaner', 'user').order_by('id'):
+        cleaner_profiles.setdefault(profile.cleaner_id, profile)
+    existing_job_cleaner_ids = set(
+        OpenJob.objects.filter(booking=booking, cleaner__in=cleaner_profiles.values()).values_list('cleaner_id', flat=True)
+    )
+
+    messages = []
     for cleaner_id in available_cleaners:
-        cleaner = CleanerProfile.objects.filter(cleaner__id=cleaner_id).first()
+        cleaner = cleaner_profiles.get(cleaner_id)
         if cleaner:
-            cleaner_open_job = OpenJob.objects.filter(booking=booking, cleaner=cleaner)
-            
-            if not cleaner_open_job.exists():
+            if cleaner.id not in existing_job_cleaner_ids:
                 OpenJob.objects.create(
                     booking=booking,
                     cleaner=cleaner,
@@ -67,22 +76,25 @@ def send_jobs_to_cleaners(business, booking, exclude_ids=None, assignment_check_
                 text_body += f"You can view the full booking details in your dashboard.\n\n"
                 text_body += f"Thank you,\nCleaningBiz AI"
 
-                NotificationService.send_notification(
-                    recipient=cleaner.user,
-                    notification_type=['email', 'sms'],
-                    from_email=from_email,
-                    subject=subject,
-                    content=text_body,
-                    sender=business,
-                    email_to=cleaner.cleaner.email,
-                    sms_to=cleaner.cleaner.phoneNumber,
-                )
-                jobs_created += 1
+                messages.append({
+                    'recipient': cleaner.user,
+                    'notification_type': ['email', 'sms'],
+                    'from_email': from_email,
+                    'subject': subject,
+                    'content': text_body,
+                    'sender': business,
+                    'email_to': cleaner.cleaner.email,
+                    'sms_to': cleaner.cleaner.phoneNumber,
+                })
             else:
                 print("Job already exists for cleaner", cleaner.cleaner.name)
 
         else:
             print("No available cleaners found")
+
+    # Notify every cleaner in parallel rather than one round trip at a time
+    NotificationService.send_many(messages)
+    jobs_created = len(messages)
     
     return jobs_created > 0
 
@@ -7,6 +7,9 @@ from django.db import transaction
 
 from bookings.utils import send_jobs_to_cleaners
 from .models import Booking, BookingCustomAddons, Coupon, CouponUsage
+from .booking_list import (
+    MAX_PAGE_SIZE, PAGE_SIZE, TAB_ORDER, annotated_bookings, page as booking_page, search_bookings, status_label, tab_counts
+)
 from .coupon_utils import apply_coupon_to_booking, validate_coupon, get_coupon_by_code
 from invoice.models import Invoice, Payment
 from accounts.models import Business, BusinessSettings, CustomAddons
@@ -39,81 +42,107 @@ def all_bookings(request):
     # Get the business and its timezone
     business = request.user.business_set.first()
     
-    # Get all bookings for the user's business
-    all_bookings = Booking.objects.filter(business__user=request.user)
-
-    cancelled_bookings = all_bookings.filter(cancelled_at__isnull=False)
-    
     # Get current date in business's timezone
     today = business.get_local_time().date()
     
-    # Upcoming bookings (not completed and future date)
-    upcoming_bookings = all_bookings.filter(
-        isCompleted=False,
-        cleaningDate__gte=today,
-        invoice__payments__status__in=["COMPLETED", "AUTHORIZED", 'APPROVED']
-    ).order_by('cleaningDate', 'startTime')
-    
-    # Upcoming paid bookings (not completed, future date, with paid invoice)
-    upcoming_paid_bookings = all_bookings.filter(
-        isCompleted=False,
-        cleaningDate__gte=today,
-        invoice__isnull=False,
-        invoice__payments__status__in=["COMPLETED", "AUTHORIZED", 'APPROVED']
-    ).order_by('cleaningDate', 'startTime')
-    
-    # Completed bookings (isCompleted=True and past date)
-    completed_bookings = all_bookings.filter(
-        isCompleted=True,
-    ).order_by('-cleaningDate', '-startTime')
-    
-    # Past bookings (past date and paid)
-    past_bookings = all_bookings.filter(
-        cleaningDate__lt=today,
-        invoice__isnull=False,
-        invoice__isPaid=True
-    ).order_by('-cleaningDate', '-startTime')
-    
-    # Pending bookings (unpaid invoices)
-    pending_bookings = all_bookings.filter(
-        isCompleted=False,
-        invoice__isnull=False,
-        invoice__isPaid=False,
-        cancelled_at__isnull=True,
-        invoice__payments__status__in=["PENDING",]
-    ).order_by('cleaningDate', 'startTime')
-    
-    # Counts for the dashboard cards
-    total_bookings = all_bookings.count()
-    pending_count = pending_bookings.count()
-    completed_count = completed_bookings.count()
-    upcoming_paid_count = upcoming_paid_bookings.count()
-    
-    # Count for past bookings
-    past_bookings_count = past_bookings.count()
-    
-    # Count for cancelled bookings
-    cancelled_bookings_count = cancelled_bookings.count()
+    # Bookings matching the search and filters, with what the tabs need
+    try:
+        bookings = annotated_bookings(search_bookings(Booking.objects.filter(business__user=request.user), request.GET))
+    except ValueError:
+        messages.error(request, 'Invalid date filter')
+        bookings = annotated_bookings(Booking.objects.filter(business__user=request.user))
+    
+    # One page per tab; the active tab may be on a later page
+    active_tab = request.GET.get('tab') if request.GET.get('tab') in TAB_ORDER else 'all'
+    pages = {}
+    next_cursors = {}
+    for tab in ('all', 'upcoming', 'awaiting', 'past', 'cancelled'):
+        after = request.GET.get('after') if tab == active_tab else None
+        try:
+            pages[tab], next_cursors[tab] = booking_page(bookings, tab, today, after=after)
+        except ValueError:
+            pages[tab], next_cursors[tab] = booking_page(bookings, tab, today)
+    
+    # Counts for the dashboard cards and tabs, in one query
+    counts = tab_counts(bookings, today)
+    
+    # Search and filters to keep in the pager links
+    filters = request.GET.copy()
+    filters.pop('tab', None)
+    filters.pop('after', None)
     
     context = {
-        'all_bookings': all_bookings,
-        'upcoming_bookings': upcoming_bookings,
-        'upcoming_paid_bookings': upcoming_paid_bookings,
-        'completed_bookings': completed_bookings,
-        'pending_bookings': pending_bookings,
-        'past_bookings': past_bookings,
-        'total_bookings': total_bookings,
-        'pending_count': pending_count,
-        'completed_count': completed_count,
-        'upcoming_paid_count': upcoming_paid_count,
-        'past_bookings_count': past_bookings_count,
-        'cancelled_bookings_count': cancelled_bookings_count,
-        'cancelled_bookings': cancelled_bookings,
+        'all_bookings': pages['all'],
+        'upcoming_bookings': pages['upcoming'],
+        'pending_bookings': pages['awaiting'],
+        'past_bookings': pages['past'],
+        'cancelled_bookings': pages['cancelled'],
+        'next_cursors': next_cursors,
+        'active_tab': active_tab,
+        'is_paged': bool(request.GET.get('after')),
+        'filter_query': filters.urlencode(),
+        'search': request.GET.get('q', ''),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+        'total_bookings': counts['all'],
+        'pending_count': counts['awaiting'],
+        'completed_count': counts['completed'],
+        'upcoming_paid_count': counts['upcoming'],
+        'past_bookings_count': counts['past'],
+        'cancelled_bookings_count': counts['cancelled'],
         'today': today,
         'business': business  # Add business to context for template filters
     }
     return render(request, 'bookings/bookings.html', context)
 
+
+@login_required(login_url='accounts:signup')
+def booking_list_api(request):
+    """
+    One page of a booking list tab as JSON.
+    
+    Query parameters: tab (all, upcoming, awaiting, past, completed,
+    cancelled), after (the next_cursor of the previous page), limit, and the
+    search and filters of booking_list.search_bookings.
+    """
+    business = request.user.business_set.first()
+    if not business:
+        return JsonResponse({'success': False, 'error': 'Business not found'}, status=404)
+    
+    tab = request.GET.get('tab', 'all')
+    if tab not in TAB_ORDER:
+        return JsonResponse({'success': False, 'error': f'Unknown tab: {tab}'}, status=400)
+    
+    today = business.get_local_time().date()
+    try:
+        limit = min(MAX_PAGE_SIZE, max(1, int(request.GET.get('limit', PAGE_SIZE))))
+        bookings = annotated_bookings(search_bookings(Booking.objects.filter(business=business), request.GET))
+        rows, next_cursor = booking_page(bookings, tab, today, after=request.GET.get('after'), limit=limit)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid filter or cursor'}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'tab': tab,
+        'bookings': [
+            {
+                'bookingId': booking.bookingId,
+                'customer': booking.customer.get_full_name() if booking.customer else None,
+                'cleaner': booking.cleaner.name if booking.cleaner else None,
+                'cleaningDate': booking.cleaningDate.isoformat() if booking.cleaningDate else None,
+                'startTime': booking.startTime.strftime('%H:%M') if booking.startTime else None,
+                'serviceType': booking.serviceType,
+                'totalPrice': float(booking.totalPrice or 0),
+                'status': status_label(booking, today),
+                'paymentStatus': booking.get_payment_status(),
+                'recurring': booking.recurring,
+            }
+            for booking in rows
+        ],
+        'next_cursor': next_cursor,
+        'counts': tab_counts(bookings, today),
+    })
+
 @login_required(login_url='accounts:signup')
 def customers(request):
     if not Business.objects.filter(user=request.user).exists():
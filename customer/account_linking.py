@@ -9,6 +9,7 @@ from django.contrib.auth.models import User, Group
 
 from customer.models import Customer
 from accounts.models import Business
+from accounts.phone import find_by_phone
 
 
 @transaction.atomic
@@ -38,10 +39,7 @@ def link_customer_account(request):
         
         if not matching_customer and phone_number:
             # Try to find by phone number if email search failed
-            matching_customer = Customer.objects.filter(
-                phone_number=phone_number,
-                user__isnull=True
-            ).first()
+            matching_customer = find_by_phone(Customer.objects.filter(user__isnull=True), phone_number)
         
         if not matching_customer:
             messages.error(request, 'No matching customer record found. Please contact the business owner.')
@@ -104,7 +102,7 @@ def check_existing_customer(request):
     customer = Customer.objects.filter(email=email, user__isnull=True).first()
     
     if not customer and phone:
-        customer = Customer.objects.filter(phone_number=phone, user__isnull=True).first()
+        customer = find_by_phone(Customer.objects.filter(user__isnull=True), phone)
     
     customer_exists = customer is not None
     
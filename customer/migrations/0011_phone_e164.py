@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_phone_e164(apps, schema_editor):
+    from accounts.phone import backfill_phone_e164
+    backfill_phone_e164(apps.get_model('customer', 'Customer'), 'phone_number')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0045_thumbtackprofile_business_info_last_refresh_and_more'),
+        ('customer', '0010_alter_customerpricing_is_active'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='phone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_e164'], name='customer_cu_phone_e_cf3dc1_idx'),
+        ),
+        migrations.RunPython(backfill_phone_e164, migrations.RunPython.noop),
+    ]
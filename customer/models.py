@@ -2,9 +2,13 @@ from django.db import models
 from django.contrib.auth.models import User
 import uuid
 
+from accounts.phone import PhoneIndexedModel
+
 # Create your models here.
 
-class Customer(models.Model):
+class Customer(PhoneIndexedModel):
+    PHONE_FIELD = 'phone_number'
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     businesses = models.ManyToManyField('accounts.Business', related_name='customers', blank=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='customer')
@@ -27,6 +31,10 @@ class Customer(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Customer'
         verbose_name_plural = 'Customers'
+        indexes = [
+            # Customers belong to businesses through an M2M, so phone alone
+            models.Index(fields=['phone_e164']),
+        ]
 
     
     def get_full_name(self):
@@ -0,0 +1,42 @@
+"""
+Process-wide thread pools.
+
+Each pool is created on first use and shared by every caller that asks for
+the same name, so background work (tool calls, SMS replies, notification
+delivery, follow-up dials) runs on a bounded number of threads per process.
+Work submitted with submit() closes its database connection when it is
+done, since pool threads outlive the job.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, workers):
+    """
+    The pool called `name`, created with `workers` threads the first time it
+    is asked for.
+    """
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        return _pools[name]
+
+
+def run_in_pool(func, *args, **kwargs):
+    """Call `func` on a pool thread, then release that thread's database connection."""
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool threads outlive the job; don't hold a database connection open
+        connection.close()
+
+
+def submit(name, workers, func, *args, **kwargs):
+    """Run `func` on the pool called `name` and return its Future."""
+    return get_pool(name, workers).submit(run_in_pool, func, *args, **kwargs)
@@ -101,6 +101,7 @@ INSTALLED_APPS = [
     'integrations',
     'ai_agent',
     'usage_analytics',
+    'analytics',
     'subscription',
     'retell_agent',
     'admin_dashbaord',
@@ -341,4 +342,78 @@ THUMBTACK_CLIENT_SECRET = os.getenv('THUMBTACK_CLIENT_SECRET')
 THUMBTACK_REDIRECT_URI = os.getenv('THUMBTACK_REDIRECT_URI')
 
 
-EMAILIT_API_KEY = os.getenv('EMAILIT_API_KEY')
\ No newline at end of file
+EMAILIT_API_KEY = os.getenv('EMAILIT_API_KEY')
+EMAILIT_TIMEOUT = 15  # seconds
+
+# Retell call history (usage_analytics.tasks.sync_retell_calls)
+RETELL_CALL_SYNC_MINUTES = 10
+RETELL_CALL_SYNC_OVERLAP_MINUTES = 60
+RETELL_CALL_SYNC_INITIAL_DAYS = None  # None backfills the full history
+
+# Notification delivery (notification.delivery)
+NOTIFICATION_DELIVERY_MODE = os.getenv('NOTIFICATION_DELIVERY_MODE', 'sync')  # or 'background'
+NOTIFICATION_DELIVERY_WORKERS = 8
+REMINDER_CHUNK_SIZE = 100  # bookings sent and stamped together (bookings.reminders.dispatch)
+
+# Cached per-business LangChain agents (ai_agent.langchain_agent.agent_registry)
+LANGCHAIN_AGENT_CACHE_SIZE = 64
+LANGCHAIN_AGENT_MAX_AGE = 300  # seconds
+
+# Compiled system prompts (ai_agent.prompts)
+AI_PROMPT_CACHE_TTL = 60 * 60 * 24  # seconds, with a shared cache; capped at LANGCHAIN_AGENT_MAX_AGE with the per-process default
+
+# Streaming web chat replies (ai_agent.streaming)
+AI_STREAM_TIMEOUT = 120  # seconds to wait for the next event before giving up
+
+# Concurrent tool calls (ai_agent.tool_runner)
+AI_TOOL_WORKERS = 8
+AI_TOOL_SLOW_SECONDS = 5  # tool calls slower than this are logged as warnings
+
+# Incremental booking-summary extraction (ai_agent.summary_extraction)
+AI_SUMMARY_EXTRACTION_MODEL = 'gpt-4o'
+
+# Follow-up calls to quiet leads (ai_agent.follow_up_dialer)
+FOLLOW_UP_STALE_MINUTES = 10  # pending this long before a follow-up call
+FOLLOW_UP_DIALER_BATCH = 200
+FOLLOW_UP_DIALER_WORKERS = 8
+FOLLOW_UP_CALLS_PER_BUSINESS = 2  # calls in flight at once for one business
+FOLLOW_UP_DIALER_TIME_BUDGET = 240  # seconds per run; the django-q timeout is 300
+
+# Daily analytics rollup (analytics.rollup)
+ANALYTICS_RECONCILE_DAYS = 7  # days rebuilt by the nightly reconciliation
+
+# Conversation memory (ai_agent.memory)
+AI_MEMORY_WINDOW = 20  # most recent messages sent verbatim
+AI_MEMORY_SUMMARY_BATCH = 10  # older messages folded into the summary at a time
+AI_MEMORY_TOKEN_BUDGET = 3000  # summary + verbatim messages per request
+AI_MEMORY_SUMMARY_MODEL = 'gpt-4o-mini'
+
+# Chat status engine (ai_agent.chat_status)
+CHAT_STATUS_MODEL = 'gpt-4o-mini'
+CHAT_STATUS_DEBOUNCE_SECONDS = 60  # at most one model call per chat per window
+
+# Inbound SMS pipeline (ai_agent.sms_pipeline)
+SMS_PIPELINE_WORKERS = 4
+SMS_PIPELINE_MAX_CONVERSATIONS = 32  # in flight per process; the rest wait for the sweep
+SMS_PIPELINE_MAX_ATTEMPTS = 3
+SMS_PIPELINE_PROCESSING_TIMEOUT = 300  # seconds before a processing message counts as lost
+SMS_PIPELINE_SWEEP_MINUTES = 1
+SMS_PIPELINE_SWEEP_TIME_BUDGET = 180  # seconds per sweep; each message is a full agent turn and the django-q timeout is 300
+
+# Usage limits (subscription.models.UsageTracker)
+# Limit checks read a cached monthly summary, invalidated by every increment;
+# counters are updated in place.
+USAGE_SUMMARY_CACHE_TTL = 60  # seconds
+
+# Activity logging (admin_dashbaord.activity_buffer)
+# Page visits and tracked model changes are buffered and written in batches.
+ACTIVITY_LOG_BUFFERED = True
+ACTIVITY_LOG_BATCH_SIZE = 100
+ACTIVITY_LOG_FLUSH_INTERVAL = 5  # seconds
+ACTIVITY_LOG_FLUSH_MODE = 'thread'  # or 'django_q'
+ACTIVITY_LOG_SAMPLE_RATE = 1.0
+# (path regex, sample rate) pairs, first match wins
+ACTIVITY_LOG_PATH_RULES = [
+    (r'^/notification/api/', 0.0),  # notification polling
+    (r'^/[\w-]+/api/', 0.1),  # dashboard chart/data endpoints
+]
@@ -1,8 +1,35 @@
 import re
+import threading
+
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 
 EMAILIT_API_KEY = settings.EMAILIT_API_KEY
+EMAILIT_TIMEOUT = getattr(settings, 'EMAILIT_TIMEOUT', 15)
+
+_emailit_session = None
+_emailit_session_lock = threading.Lock()
+
+
+def get_emailit_session():
+    """
+    Shared requests.Session for the EmailIt API, so every email reuses a
+    pooled keep-alive connection instead of opening a new one.
+    """
+    global _emailit_session
+    with _emailit_session_lock:
+        if _emailit_session is None:
+            session = requests.Session()
+            pool_size = getattr(settings, 'NOTIFICATION_DELIVERY_WORKERS', 8)
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            session.headers.update({
+                "Authorization": f"Bearer {EMAILIT_API_KEY}",
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            })
+            _emailit_session = session
+        return _emailit_session
 
 def send_email(from_email, to_email, subject, reply_to=None, text_content='', attachments=None, html_content=None):
     """
@@ -18,11 +45,6 @@ def send_email(from_email, to_email, subject, reply_to=None, text_content='', at
     """
 
     url = "https://api.emailit.com/v1/emails"
-    req_headers = {
-        "Authorization": f"Bearer {EMAILIT_API_KEY}",
-        "Content-Type": "application/json",
-        "Accept": "application/json"
-    }
 
     # Normalize from_email
     default_domain = "cleaningbizai.com"
@@ -54,12 +76,18 @@ def send_email(from_email, to_email, subject, reply_to=None, text_content='', at
 
     # if settings.DEBUG == False:
     try:
-        response = requests.post(url, json=data, headers=req_headers)
+        response = get_emailit_session().post(url, json=data, timeout=EMAILIT_TIMEOUT)
 
         if response.status_code in [200, 201]:
             return {"success": True, "response": response.json()}
         else:
             print(response.text)
+            return {
+                "success": False,
+                "error": f"EmailIt returned {response.status_code}",
+                "status_code": response.status_code,
+                "response_text": response.text
+            }
 
     except requests.exceptions.RequestException as e:
         print(f"Failed to send email: {str(e)}")
@@ -0,0 +1,43 @@
+"""
+Shared transport state for NotificationService.
+
+Twilio clients are cached per business and rebuilt only when the business'
+credentials change, and outbound deliveries run on one process-wide thread
+pool (NOTIFICATION_DELIVERY_WORKERS threads) so fan-out callers and
+background sends never block on each other's network round trips.
+"""
+import threading
+
+from django.conf import settings
+from twilio.rest import Client
+
+from leadsAutomation import pools
+
+
+_twilio_clients = {}
+_twilio_lock = threading.Lock()
+
+
+def get_twilio_client(business):
+    """Return a cached Twilio Client for the business' ApiCredential."""
+    api_cred = business.apicredential
+    key = (api_cred.twilioAccountSid, api_cred.twilioAuthToken)
+
+    with _twilio_lock:
+        cached = _twilio_clients.get(business.pk)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        client = Client(
+            api_cred.twilioAccountSid.encode('utf-8'),
+            api_cred.twilioAuthToken.encode('utf-8'),
+        )
+        _twilio_clients[business.pk] = (key, client)
+        return client
+
+
+def submit(func, *args, **kwargs):
+    """Run `func` on the delivery pool and return its Future."""
+    return pools.submit(
+        'notification-delivery', getattr(settings, 'NOTIFICATION_DELIVERY_WORKERS', 8), func, *args, **kwargs
+    )
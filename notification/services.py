@@ -1,11 +1,13 @@
 import json
+from concurrent.futures import as_completed
 from datetime import datetime
 from django.utils import timezone
 from django.template.loader import render_to_string
 from django.contrib.contenttypes.models import ContentType
 from django.conf import settings
-from twilio.rest import Client
+from django.db import transaction
 
+from . import delivery
 from .models import Notification
 from leadsAutomation.utils import send_email as send_email_util
 
@@ -15,7 +17,7 @@ class NotificationService:
     """
     
     @classmethod
-    def send_notification(cls, recipient, from_email, notification_type, subject, to_email=None, email_to=None, to_sms=None, sms_to=None, content=None, sender=None):
+    def send_notification(cls, recipient, from_email, notification_type, subject, to_email=None, email_to=None, to_sms=None, sms_to=None, content=None, sender=None, background=None):
         """
         Central method to send any type of notification
         
@@ -25,42 +27,137 @@ class NotificationService:
         - subject: Subject line for the notification
         - content: Plain text content (optional if template is provided)
         - template_name: Path to template for rendering content (optional)
+        - background: Send on the delivery pool and return immediately; the
+          outcome is recorded on the Notification later. Defaults to
+          settings.NOTIFICATION_DELIVERY_MODE == 'background'.
         """
         
-        # Create notification record
+        notification = cls._build_notification(
+            recipient=recipient, subject=subject, content=content, sender=sender,
+            email_to=to_email or email_to, sms_to=to_sms or sms_to,
+        )
+
+        if cls._use_background(background):
+            notification.save()
+            # Don't let a worker look for the row before the caller's transaction commits
+            transaction.on_commit(
+                lambda: delivery.submit(cls._deliver_and_record, notification, notification_type, from_email)
+            )
+            return {'success': True, 'queued': True, 'notification_id': str(notification.id)}
+
+        # Send first so the notification is written once, with its outcome
+        result = cls._deliver(notification, notification_type, from_email)
+        notification.save()
+        return result
+
+    @classmethod
+    def send_many(cls, messages, background=None):
+        """
+        Send several notifications in parallel on the delivery pool.
+
+        `messages` is a list of dicts of send_notification keyword arguments.
+        Returns one result per message, in order. Each notification is saved
+        as soon as its delivery finishes, so a run cut short still records
+        what went out. In background mode the notifications are saved and
+        queued, and the call returns at once.
+        """
+        if not messages:
+            return []
+
+        jobs = []
+        for message in messages:
+            message = dict(message)
+            notification_type = message.pop('notification_type')
+            from_email = message.pop('from_email')
+            notification = cls._build_notification(
+                recipient=message.get('recipient'),
+                subject=message['subject'],
+                content=message.get('content'),
+                sender=message.get('sender'),
+                email_to=message.get('to_email') or message.get('email_to'),
+                sms_to=message.get('to_sms') or message.get('sms_to'),
+            )
+            jobs.append((notification, notification_type, from_email))
+
+        if cls._use_background(background):
+            Notification.objects.bulk_create([notification for notification, _, _ in jobs])
+            transaction.on_commit(
+                lambda: [delivery.submit(cls._deliver_and_record, *job) for job in jobs]
+            )
+            return [
+                {'success': True, 'queued': True, 'notification_id': str(notification.id)}
+                for notification, _, _ in jobs
+            ]
+
+        futures = {delivery.submit(cls._deliver, *job): i for i, job in enumerate(jobs)}
+        results = [None] * len(jobs)
+        for future in as_completed(futures):
+            i = futures[future]
+            notification = jobs[i][0]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"Failed to deliver notification to {notification.email_to or notification.sms_to}: {e}")
+                notification.context_data = {'delivery': {'error': str(e)}}
+                results[i] = {'success': False, 'error': str(e)}
+            notification.save()
+
+        return results
+
+    @classmethod
+    def _build_notification(cls, recipient, subject, content, sender, email_to=None, sms_to=None):
         notification = Notification(
             sender=sender,
             recipient=recipient,
             notification_type='in_app',
             subject=subject,
             content=content,
-
         )
+        if email_to:
+            notification.email_to = email_to
+        if sms_to:
+            notification.sms_to = sms_to
+        return notification
 
-        if to_email or email_to:
-            notification.email_to = to_email or email_to
-        if to_sms or sms_to:
-            notification.sms_to = to_sms or sms_to
-        
-       
-        
-        # Save notification
-        notification.save()
-        
-        # Send notification based on type
+    @classmethod
+    def _use_background(cls, background):
+        if background is None:
+            return getattr(settings, 'NOTIFICATION_DELIVERY_MODE', 'sync') == 'background'
+        return background
+
+    @classmethod
+    def _deliver(cls, notification, notification_type, from_email):
+        """
+        Send the notification over each channel and record the per-channel
+        outcome and sent_at on the (unsaved) instance. Returns the result of
+        the last channel, as send_notification always has.
+        """
         result = None
+        outcome = {}
 
         for n_type in notification_type:
             if n_type == 'email':
                 result = cls._send_email_notification(notification, from_email)
             elif n_type == 'sms':
                 result = cls._send_sms_notification(notification)
-        
-                
-            
-        
+            else:
+                continue
+            outcome[n_type] = {
+                'success': bool(result and result.get('success')),
+                'error': result.get('error') if result else None,
+            }
+
         notification.sent_at = timezone.now()
-        notification.save()
+        notification.context_data = {**notification.context_data, 'delivery': outcome}
+        return result
+
+    @classmethod
+    def _deliver_and_record(cls, notification, notification_type, from_email):
+        result = cls._deliver(notification, notification_type, from_email)
+        Notification.objects.filter(pk=notification.pk).update(
+            sent_at=notification.sent_at,
+            context_data=notification.context_data,
+        )
         return result
             
     @classmethod
@@ -91,10 +188,8 @@ class NotificationService:
             api_cred = notification.sender.apicredential
                         
             if api_cred.twilioAccountSid and api_cred.twilioAuthToken and api_cred.twilioSmsNumber:
-                # Initialize Twilio client
-                twilioAccountSid = api_cred.twilioAccountSid.encode('utf-8')
-                twilioAuthToken = api_cred.twilioAuthToken.encode('utf-8')
-                client = Client(twilioAccountSid, twilioAuthToken)
+                # Reuse the business' cached Twilio client
+                client = delivery.get_twilio_client(notification.sender)
                 
                 # Send SMS
                 message = client.messages.create(
@@ -103,7 +198,9 @@ class NotificationService:
                     to=notification.sms_to,
                 )
             
-                return {'success': True, 'message': 'SMS notification would be sent (not implemented)'}
+                return {'success': True, 'sid': message.sid}
+
+            return {'success': False, 'error': 'Twilio credentials are not configured'}
     
         except Exception as e:
             print(e)
@@ -1,3 +1,60 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import Business
+from .models import Notification
+from .services import NotificationService
+
+
+class Killed(BaseException):
+    """Stands in for the worker being killed mid-run."""
+
+
+class SendManyTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+
+    def message(self, email):
+        return {
+            'notification_type': ['email'], 'from_email': 'Sparkle <owner@example.com>',
+            'subject': 'Reminder', 'content': 'See you tomorrow', 'sender': self.business, 'email_to': email,
+        }
+
+    def test_delivered_notifications_are_saved_before_the_run_ends(self):
+        saved = threading.Event()
+        real_save = Notification.save
+
+        def save(notification, *args, **kwargs):
+            real_save(notification, *args, **kwargs)
+            saved.set()
+
+        def send_email(notification, from_email):
+            if notification.email_to == 'late@example.com':
+                saved.wait(5)
+                raise Killed()
+            return {'success': True}
+
+        with mock.patch.object(Notification, 'save', save), \
+                mock.patch.object(NotificationService, '_send_email_notification', side_effect=send_email):
+            with self.assertRaises(Killed):
+                NotificationService.send_many([self.message('early@example.com'), self.message('late@example.com')], background=False)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.email_to, 'early@example.com')
+        self.assertTrue(notification.context_data['delivery']['email']['success'])
+        self.assertIsNotNone(notification.sent_at)
+
+    @mock.patch.object(NotificationService, '_send_email_notification')
+    def test_results_keep_the_message_order(self, send_email):
+        send_email.side_effect = lambda notification, from_email: (
+            {'success': True} if notification.email_to == 'a@example.com' else {'success': False, 'error': 'bounced'}
+        )
+        results = NotificationService.send_many([self.message('a@example.com'), self.message('b@example.com')], background=False)
+
+        self.assertEqual(results, [{'success': True}, {'success': False, 'error': 'bounced'}])
+        self.assertEqual(Notification.objects.count(), 2)
@@ -13,12 +13,7 @@ class MaintenanceModeMiddleware:
 
     def __call__(self, request):
         # Check if we're in maintenance mode
-        try:
-            settings = PlatformSettings.objects.get(pk=1)
-            maintenance_mode = settings.maintenance_mode
-        except PlatformSettings.DoesNotExist:
-            PlatformSettings.objects.create(maintenance_mode=False)
-            maintenance_mode = False
+        maintenance_mode = PlatformSettings.get_cached().maintenance_mode
         
        
 
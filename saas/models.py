@@ -1,6 +1,10 @@
+import threading
+import time
+
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.cache import cache
 # Here SaaS Platform Related Mdoels like Platform Settings will be Created to Give More Control to Admin to Enable or Disable 
 
 class PlatformSettings(models.Model):
@@ -30,6 +34,61 @@ class PlatformSettings(models.Model):
     def __str__(self):
         return f"Platform Settings"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        PlatformSettings.bump_version()
+
+    # Process-local copy, revalidated against a version stamp in the shared
+    # Django cache every CACHE_TTL seconds and reloaded from the database at
+    # least every CACHE_MAX_AGE seconds in case the shared cache is per-process.
+    CACHE_TTL = 5
+    CACHE_MAX_AGE = 60
+    VERSION_CACHE_KEY = 'platform_settings:version'
+
+    _cached = None
+    _cached_version = None
+    _checked_at = 0.0
+    _loaded_at = 0.0
+    _cache_lock = threading.RLock()
+
+    @classmethod
+    def bump_version(cls):
+        """Invalidate the cached settings in every worker."""
+        cache.set(cls.VERSION_CACHE_KEY, time.time_ns(), None)
+        with cls._cache_lock:
+            cls._cached = None
+
+    @classmethod
+    def get_cached(cls):
+        """
+        Return the platform settings row (pk=1), creating it if missing.
+
+        Served from memory in steady state, so per-request checks such as
+        maintenance mode cost no queries.
+        """
+        now = time.monotonic()
+        cached = cls._cached
+        if cached is not None and now - cls._checked_at < cls.CACHE_TTL:
+            return cached
+
+        with cls._cache_lock:
+            version = cache.get(cls.VERSION_CACHE_KEY)
+            if version is None:
+                cache.add(cls.VERSION_CACHE_KEY, time.time_ns(), None)
+                version = cache.get(cls.VERSION_CACHE_KEY)
+
+            stale = (
+                cls._cached is None
+                or version != cls._cached_version
+                or now - cls._loaded_at >= cls.CACHE_MAX_AGE
+            )
+            if stale:
+                cls._cached, _ = cls.objects.get_or_create(pk=1)
+                cls._cached_version = version
+                cls._loaded_at = now
+            cls._checked_at = now
+            return cls._cached
+
 
 class SupportTicket(models.Model):
     STATUS_CHOICES = (
@@ -14,11 +14,8 @@ def maintenance_view(request):
     """
     View to display maintenance page when the site is in maintenance mode.
     """
-    try:
-        settings = PlatformSettings.objects.get(pk=1)
-        maintenance_message = settings.maintenance_message
-    except PlatformSettings.DoesNotExist:
-        maintenance_message = "Site is under maintenance. Please check back later."
+    settings = PlatformSettings.get_cached()
+    maintenance_message = settings.maintenance_message or "Site is under maintenance. Please check back later."
     
     maintenance_mode = settings.maintenance_mode
     
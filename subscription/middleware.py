@@ -1,6 +1,6 @@
 from django.shortcuts import redirect
 from django.contrib import messages
-from django.urls import resolve
+from accounts.principal import get_request_principal, get_url_name
 
 class SubscriptionRequiredMiddleware:
     """
@@ -44,15 +44,14 @@ class SubscriptionRequiredMiddleware:
         if request.user.is_superuser:
             return self.get_response(request)
             
+        principal = get_request_principal(request)
+
         # Skip for users in the 'Cleaner' group - allow all access
-        if request.user.groups.filter(name='Cleaner').exists():
+        if principal.is_cleaner:
             return self.get_response(request)
         
         # Get current URL name and path
-        try:
-            current_url = resolve(request.path_info).url_name
-        except:
-            current_url = None
+        current_url = get_url_name(request)
         
         current_path = request.path
         
@@ -80,16 +79,11 @@ class SubscriptionRequiredMiddleware:
             return self.get_response(request)
             
         # Only users in the Owner group need to be checked for subscription
-        if request.user.groups.filter(name='Owner').exists():
+        if principal.is_owner:
             # Check if user has a business
-            if hasattr(request.user, 'business_set') and request.user.business_set.exists():
-                business = request.user.business_set.first()
-                
-                # Get active subscription
-                subscription = business.active_subscription()
-                
+            if principal.has_business:
                 # If no active subscription or subscription is not active, redirect to subscription page
-                if not subscription:
+                if not principal.has_active_subscription:
                     messages.warning(request, 'You need an active subscription to access this page.')
                     return redirect('subscription:subscription_management')
             else:
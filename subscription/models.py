@@ -1,8 +1,10 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import IntegrityError, NotSupportedError, connection, models, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from accounts.models import Business
 from django.conf import settings
+import time
 import uuid
 import json
 from datetime import datetime, timedelta
@@ -339,6 +341,36 @@ class BusinessSubscription(models.Model):
                     subscription=self
                 )
 
+class JSONIncrement(models.Func):
+    """
+    Database-side `metrics[key] += amount` on a JSON column, so counters
+    can be bumped with a single UPDATE instead of read-modify-write.
+    """
+    output_field = models.JSONField()
+
+    def __init__(self, field, key, amount):
+        super().__init__(models.F(field))
+        self.key = key
+        self.amount = amount
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        field_sql, field_params = compiler.compile(self.get_source_expressions()[0])
+        sql = (
+            f"jsonb_set(COALESCE({field_sql}, '{{}}'::jsonb), ARRAY[%s]::text[], "
+            f"to_jsonb(COALESCE(({field_sql} ->> %s)::numeric, 0) + %s))"
+        )
+        return sql, (*field_params, self.key, *field_params, self.key, self.amount)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        field_sql, field_params = compiler.compile(self.get_source_expressions()[0])
+        path = '$."%s"' % self.key
+        sql = f"json_set(COALESCE({field_sql}, '{{}}'), %s, COALESCE(json_extract({field_sql}, %s), 0) + %s)"
+        return sql, (*field_params, path, *field_params, path, self.amount)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"JSONIncrement is not supported on {connection.vendor}")
+
+
 class UsageTracker(models.Model):
     """Model for tracking usage metrics for a business."""
     business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='usage_metrics')
@@ -346,6 +378,10 @@ class UsageTracker(models.Model):
     metrics = models.JSONField(default=dict)  # Stores voice_minutes, voice_calls, sms_messages
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Limit checks read a cached summary; every increment invalidates it, and
+    # it expires after this many seconds in any case
+    SUMMARY_CACHE_TTL = getattr(settings, 'USAGE_SUMMARY_CACHE_TTL', 60)
     
     class Meta:
         unique_together = ('business', 'date')
@@ -355,21 +391,44 @@ class UsageTracker(models.Model):
     
     @classmethod
     def increment_metric(cls, business, metric_name, increment_by=1):
-        """Increment a specific usage metric for the business on the current date."""
+        """
+        Atomically increment a specific usage metric for the business on the
+        current date. Concurrent increments for the same business never lose
+        updates: the counter is bumped inside the database in one UPDATE, and
+        the day's row is created on first use.
+        """
         today = timezone.now().date()
-        usage, created = cls.objects.get_or_create(
-            business=business,
-            date=today,
-            defaults={'metrics': {}}
+
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            cls._increment_locked(business, today, metric_name, increment_by)
+        elif not cls._increment_existing(business, today, metric_name, increment_by):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(business=business, date=today, metrics={metric_name: increment_by})
+            except IntegrityError:
+                # Another worker created today's row first
+                cls._increment_existing(business, today, metric_name, increment_by)
+
+        cls.invalidate_usage_summary(business)
+
+    @classmethod
+    def _increment_existing(cls, business, day, metric_name, increment_by):
+        return cls.objects.filter(business=business, date=day).update(
+            metrics=JSONIncrement('metrics', metric_name, increment_by),
+            updated_at=timezone.now(),
         )
-        
-        metrics = usage.metrics
-        current_value = metrics.get(metric_name, 0)
-        metrics[metric_name] = current_value + increment_by
-        usage.metrics = metrics
-        usage.save()
-        
-        return usage
+
+    @classmethod
+    def _increment_locked(cls, business, day, metric_name, increment_by):
+        # Fallback for databases without JSON update support
+        with transaction.atomic():
+            usage, created = cls.objects.select_for_update().get_or_create(
+                business=business,
+                date=day,
+                defaults={'metrics': {}}
+            )
+            usage.metrics[metric_name] = usage.metrics.get(metric_name, 0) + increment_by
+            usage.save(update_fields=['metrics', 'updated_at'])
     
     @classmethod
     def increment_minutes(cls, business, increment_by=1):
@@ -483,6 +542,26 @@ class UsageTracker(models.Model):
         
         return summary
 
+    @classmethod
+    def get_cached_usage_summary(cls, business, start_date=None, end_date=None):
+        """
+        get_usage_summary() served from the cache until the next increment
+        (or for SUMMARY_CACHE_TTL seconds), for hot paths such as per-message
+        limit checks.
+        """
+        version = cache.get(f"usage_summary_version:{business.pk}", 0)
+        key = f"usage_summary:{business.pk}:{version}:{start_date}:{end_date}"
+        summary = cache.get(key)
+        if summary is None:
+            summary = cls.get_usage_summary(business, start_date=start_date, end_date=end_date)
+            cache.set(key, summary, cls.SUMMARY_CACHE_TTL)
+        return summary
+
+    @classmethod
+    def invalidate_usage_summary(cls, business):
+        """Make every cached summary of the business stale, whatever its date range."""
+        cache.set(f"usage_summary_version:{business.pk}", time.time_ns(), None)
+
 class BillingHistory(models.Model):
     """Model for tracking billing history and invoices."""
     STATUS_CHOICES = [
@@ -1,3 +1,78 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Business
+from .models import UsageTracker
+
+
+class UsageTrackerTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        self.today = timezone.now().date()
+
+    def metrics(self):
+        return UsageTracker.objects.get(business=self.business, date=self.today).metrics
+
+    def test_first_increment_creates_the_row(self):
+        UsageTracker.increment_sms(self.business)
+        self.assertEqual(self.metrics(), {'sms_messages': 1})
+
+    def test_increments_existing_and_missing_keys(self):
+        UsageTracker.objects.create(business=self.business, date=self.today, metrics={'sms_messages': 2})
+
+        UsageTracker.increment_sms(self.business, 3)
+        UsageTracker.increment_minutes(self.business, 1.5)
+        UsageTracker.increment_minutes(self.business, 2.25)
+
+        self.assertEqual(self.metrics(), {'sms_messages': 5, 'voice_minutes': 3.75})
+        self.assertIsInstance(self.metrics()['sms_messages'], int)
+        self.assertEqual(UsageTracker.objects.count(), 1)
+
+    def test_losing_the_race_to_create_the_row(self):
+        real_increment = UsageTracker._increment_existing
+        calls = []
+
+        def racing(business, day, metric_name, increment_by):
+            calls.append(metric_name)
+            if len(calls) == 1:
+                # Another worker creates today's row between our UPDATE and INSERT
+                UsageTracker.objects.create(business=business, date=day, metrics={metric_name: 5})
+                return 0
+            return real_increment(business, day, metric_name, increment_by)
+
+        with mock.patch.object(UsageTracker, '_increment_existing', side_effect=racing):
+            UsageTracker.increment_leads(self.business, 2)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.metrics(), {'leads_generated': 7})
+
+    @mock.patch('subscription.models.connection', SimpleNamespace(vendor='mysql'))
+    def test_locked_fallback_for_other_databases(self):
+        UsageTracker.increment_sms(self.business)
+        UsageTracker.increment_minutes(self.business, 0.5)
+        UsageTracker.increment_sms(self.business, 2)
+        self.assertEqual(self.metrics(), {'sms_messages': 3, 'voice_minutes': 0.5})
+
+    def test_increments_invalidate_the_cached_summary(self):
+        UsageTracker.increment_sms(self.business, 2)
+        self.assertEqual(UsageTracker.get_cached_usage_summary(self.business)['total']['sms_messages'], 2)
+
+        # Served from the cache
+        UsageTracker.objects.filter(business=self.business).update(metrics={'sms_messages': 10})
+        with self.assertNumQueries(0):
+            self.assertEqual(UsageTracker.get_cached_usage_summary(self.business)['total']['sms_messages'], 2)
 
-# Create your tests here.
+        UsageTracker.increment_sms(self.business)
+        self.assertEqual(UsageTracker.get_cached_usage_summary(self.business)['total']['sms_messages'], 11)
+        start = self.today.replace(day=1)
+        self.assertEqual(UsageTracker.get_cached_usage_summary(self.business, start, self.today)['total']['sms_messages'], 11)
+        UsageTracker.increment_sms(self.business)
+        self.assertEqual(UsageTracker.get_cached_usage_summary(self.business, start, self.today)['total']['sms_messages'], 12)
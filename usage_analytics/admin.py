@@ -1,10 +1,10 @@
 from django.contrib import admin
-# When models are created for this app, register them here
-# Example:
-# from .models import UsageMetric
-# 
-# @admin.register(UsageMetric)
-# class UsageMetricAdmin(admin.ModelAdmin):
-#     list_display = ('name', 'value', 'date')
-#     list_filter = ('date',)
-#     search_fields = ('name',)
+from .models import RetellCall
+
+
+@admin.register(RetellCall)
+class RetellCallAdmin(admin.ModelAdmin):
+    list_display = ('call_id', 'business', 'agent_id', 'call_status', 'disconnection_reason', 'start_timestamp', 'synced_at')
+    list_filter = ('call_status', 'user_sentiment', 'call_successful')
+    search_fields = ('call_id', 'agent_id', 'business__businessName')
+    readonly_fields = ('synced_at',)
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-17 20:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0045_thumbtackprofile_business_info_last_refresh_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetellCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_id', models.CharField(max_length=255, unique=True)),
+                ('agent_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('call_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('call_status', models.CharField(blank=True, max_length=50, null=True)),
+                ('disconnection_reason', models.CharField(blank=True, max_length=100, null=True)),
+                ('user_sentiment', models.CharField(blank=True, max_length=50, null=True)),
+                ('call_successful', models.BooleanField(blank=True, null=True)),
+                ('start_timestamp', models.BigIntegerField(blank=True, null=True)),
+                ('end_timestamp', models.BigIntegerField(blank=True, null=True)),
+                ('duration_ms', models.BigIntegerField(blank=True, null=True)),
+                ('raw', models.JSONField(default=dict)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='retell_calls', to='accounts.business')),
+            ],
+            options={
+                'ordering': ['-start_timestamp'],
+                'indexes': [models.Index(fields=['business', 'start_timestamp'], name='usage_analy_busines_533352_idx'), models.Index(fields=['start_timestamp'], name='usage_analy_start_t_5ce540_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-17 23:40
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+def schedule_retell_call_sync(apps, schema_editor):
+    # Installs that already had their Retell agents never fire the
+    # RetellAgent post_save that schedules the sync
+    Schedule = apps.get_model('django_q', 'Schedule')
+    RetellAgent = apps.get_model('retell_agent', 'RetellAgent')
+    if RetellAgent.objects.exists() and not Schedule.objects.filter(func='usage_analytics.tasks.sync_retell_calls').exists():
+        Schedule.objects.create(
+            func='usage_analytics.tasks.sync_retell_calls',
+            schedule_type='I',  # Schedule.MINUTES
+            minutes=getattr(settings, 'RETELL_CALL_SYNC_MINUTES', 10),
+            repeats=-1,
+            next_run=timezone.now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_q', '0018_task_success_index'),
+        ('retell_agent', '0002_retellagent_agent_number'),
+        ('usage_analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(schedule_retell_call_sync, migrations.RunPython.noop),
+    ]
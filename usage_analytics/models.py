@@ -1,3 +1,110 @@
+from datetime import datetime, timezone as dt_timezone
+
 from django.db import models
+from accounts.models import Business
+
+
+class RetellCall(models.Model):
+    """
+    Local copy of a Retell call, kept up to date by the
+    usage_analytics.tasks.sync_retell_calls job and the Retell webhook.
+
+    Analytics read from this table instead of hitting the list-calls API on
+    every dashboard request. The columns used for filtering and charting are
+    stored individually; the full API payload is kept in `raw`.
+    """
+    call_id = models.CharField(max_length=255, unique=True)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='retell_calls', null=True, blank=True)
+    agent_id = models.CharField(max_length=255, null=True, blank=True)
+
+    call_type = models.CharField(max_length=50, null=True, blank=True)
+    call_status = models.CharField(max_length=50, null=True, blank=True)
+    disconnection_reason = models.CharField(max_length=100, null=True, blank=True)
+    user_sentiment = models.CharField(max_length=50, null=True, blank=True)
+    call_successful = models.BooleanField(null=True, blank=True)
+
+    # Milliseconds since the epoch, as returned by Retell
+    start_timestamp = models.BigIntegerField(null=True, blank=True)
+    end_timestamp = models.BigIntegerField(null=True, blank=True)
+    duration_ms = models.BigIntegerField(null=True, blank=True)
+
+    raw = models.JSONField(default=dict)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-start_timestamp']
+        indexes = [
+            models.Index(fields=['business', 'start_timestamp']),
+            models.Index(fields=['start_timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.call_id} ({self.call_status})"
+
+    @property
+    def start_time(self):
+        if self.start_timestamp is None:
+            return None
+        return datetime.fromtimestamp(self.start_timestamp / 1000, tz=dt_timezone.utc)
+
+    @classmethod
+    def from_api(cls, call, business_id=None):
+        """Build an unsaved RetellCall from a list-calls / webhook call dict."""
+        call_analysis = call.get('call_analysis') or {}
+        start_timestamp = call.get('start_timestamp')
+        end_timestamp = call.get('end_timestamp')
+
+        duration_ms = call.get('duration_ms')
+        if duration_ms is None and start_timestamp and end_timestamp:
+            duration_ms = end_timestamp - start_timestamp
+
+        return cls(
+            call_id=call.get('call_id'),
+            business_id=business_id,
+            agent_id=call.get('agent_id'),
+            call_type=call.get('call_type'),
+            call_status=call.get('call_status'),
+            disconnection_reason=call.get('disconnection_reason'),
+            user_sentiment=call_analysis.get('user_sentiment'),
+            call_successful=call_analysis.get('call_successful'),
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            duration_ms=duration_ms,
+            raw=call,
+        )
+
+    @classmethod
+    def upsert_from_api(cls, calls, business=None):
+        """
+        Insert or update calls from the Retell API in one statement per batch.
+        Calls are attributed to a business through their agent, falling back
+        to `business` when the agent is unknown.
+        """
+        from retell_agent.models import RetellAgent
+
+        calls = [call for call in calls if call.get('call_id')]
+        if not calls:
+            return 0
+
+        agent_ids = {call.get('agent_id') for call in calls if call.get('agent_id')}
+        agent_businesses = dict(
+            RetellAgent.objects.filter(agent_id__in=agent_ids).values_list('agent_id', 'business_id')
+        )
+        default_business_id = business.id if business else None
 
-# Create your models here.
+        rows = [
+            cls.from_api(call, agent_businesses.get(call.get('agent_id'), default_business_id))
+            for call in calls
+        ]
+        cls.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['call_id'],
+            update_fields=[
+                'business', 'agent_id', 'call_type', 'call_status', 'disconnection_reason',
+                'user_sentiment', 'call_successful', 'start_timestamp', 'end_timestamp',
+                'duration_ms', 'raw', 'synced_at',
+            ],
+        )
+        return len(rows)
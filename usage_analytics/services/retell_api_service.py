@@ -1,103 +1,153 @@
 import requests
 import logging
 from django.conf import settings
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.utils.timezone import make_aware
 from retell_agent.models import RetellAgent
+from usage_analytics.models import RetellCall
 
 logger = logging.getLogger(__name__)
 
+RETELL_LIST_CALLS_URL = 'https://api.retellai.com/v2/list-calls'
+
+# Calls that can still change (status, analysis) are re-fetched for this long
+UNFINISHED_CALL_STATUSES = ['registered', 'ongoing']
+
+
 class RetellAPIService:
-    """Service for interacting with the Retell API."""
+    """
+    Service for interacting with the Retell API.
+
+    Call history is read from the local RetellCall store, which sync_calls()
+    keeps up to date incrementally; the analytics helpers below aggregate a
+    RetellCall queryset in the database.
+    """
     
     @staticmethod
-    def list_calls(business=None, start_date=None, end_date=None, limit=10000):
-        
-        if business is not None:
-            agents = RetellAgent.objects.filter(business=business)
-            
-            if not agents.exists():
-                logger.warning(f"No Retell agents found for business {business.id}")
-                return []
-            
-            # Collect all agent IDs
-            agent_ids = [agent.agent_id for agent in agents if agent.agent_id]
-            
-            if not agent_ids:
-                logger.warning(f"No valid agent IDs found for business {business.id}")
-                return []
-            
-            # Prepare filter criteria
-            filter_criteria = {
-                "agent_id": agent_ids,
-            }
-        
-        else:
-            all_agents = RetellAgent.objects.all()
-            agent_ids = [agent.agent_id for agent in all_agents if agent.agent_id]
-            filter_criteria = {
-                'agent_id': agent_ids
-            }
-  
-     
-        if start_date or end_date:
-            timestamp_filter = {}
-            
-            if start_date:
+    def iter_call_pages(agent_ids, start_timestamp=None, page_size=1000):
+        """
+        Yield the calls for `agent_ids` from the list-calls API that started
+        at or after `start_timestamp` (ms), a page at a time, oldest first.
+        """
+        if not agent_ids:
+            return
 
-                start_datetime = datetime.combine(start_date, datetime.min.time())
-                start_timestamp = int(start_datetime.timestamp() * 1000)
-                timestamp_filter["lower_threshold"] = start_timestamp
-                
-            if end_date:
-         
-                end_datetime = datetime.combine(end_date, datetime.min.time())
-                end_timestamp = int(end_datetime.timestamp() * 1000)
-                timestamp_filter["upper_threshold"] = end_timestamp
-                
-            if timestamp_filter:
-                filter_criteria["start_timestamp"] = timestamp_filter
-        
-        # Prepare the API request
-        retell_api_key = settings.RETELL_API_KEY
-        print(retell_api_key)
         headers = {
             'Content-Type': 'application/json',
-            'Authorization': f'Bearer {retell_api_key}'
-        }
-        
-        payload = {
-            "filter_criteria": filter_criteria,
-            "sort_order": "descending",
-            "limit": limit
+            'Authorization': f'Bearer {settings.RETELL_API_KEY}'
         }
-        
-        try:
-            response = requests.post(
-                'https://api.retellai.com/v2/list-calls',
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                call_data = response.json()
-                
-           
-                calls = []
-                if isinstance(call_data, list):
-                    calls = call_data
-                else:
-                    calls = call_data.get('calls', [])
-                
-                return calls
+        filter_criteria = {'agent_id': list(agent_ids)}
+        if start_timestamp:
+            filter_criteria['start_timestamp'] = {'lower_threshold': start_timestamp}
+
+        pagination_key = None
+        while True:
+            payload = {
+                "filter_criteria": filter_criteria,
+                "sort_order": "ascending",
+                "limit": page_size
+            }
+            if pagination_key:
+                payload["pagination_key"] = pagination_key
+
+            response = requests.post(RETELL_LIST_CALLS_URL, headers=headers, json=payload, timeout=30)
+            if response.status_code != 200:
+                raise requests.exceptions.HTTPError(
+                    f"Error retrieving calls from Retell API: {response.text}", response=response
+                )
+
+            call_data = response.json()
+            page = call_data if isinstance(call_data, list) else call_data.get('calls', [])
+            yield page
+
+            if len(page) < page_size:
+                return
+            pagination_key = page[-1].get('call_id')
+
+    @staticmethod
+    def fetch_calls(agent_ids, start_timestamp=None, page_size=1000):
+        """Every call iter_call_pages() yields, as one list."""
+        return [
+            call
+            for page in RetellAPIService.iter_call_pages(agent_ids, start_timestamp, page_size)
+            for call in page
+        ]
+
+    @staticmethod
+    def sync_start_timestamp():
+        """
+        Lower start_timestamp threshold for the next incremental sync: a short
+        overlap before the newest stored call, reaching back further for any
+        recent call that hadn't finished when it was last synced.
+        """
+        overlap_ms = getattr(settings, 'RETELL_CALL_SYNC_OVERLAP_MINUTES', 60) * 60 * 1000
+
+        latest = RetellCall.objects.aggregate(latest=Max('start_timestamp'))['latest']
+        if latest is None:
+            initial_days = getattr(settings, 'RETELL_CALL_SYNC_INITIAL_DAYS', None)
+            if initial_days is None:
+                return None
+            return int((timezone.now() - timedelta(days=initial_days)).timestamp() * 1000)
+
+        threshold = latest - overlap_ms
+
+        one_day_ago = int((timezone.now() - timedelta(days=1)).timestamp() * 1000)
+        oldest_unfinished = RetellCall.objects.filter(
+            call_status__in=UNFINISHED_CALL_STATUSES,
+            start_timestamp__gte=one_day_ago,
+        ).aggregate(oldest=Min('start_timestamp'))['oldest']
+        if oldest_unfinished is not None:
+            threshold = min(threshold, oldest_unfinished)
+
+        return threshold
+
+    @staticmethod
+    def sync_calls(page_size=1000):
+        """
+        Pull new and updated calls for every known agent into RetellCall.
+        Each page is stored as it arrives, so a sync cut short by the task
+        timeout (a long first backfill) resumes where it stopped.
+        """
+        agent_ids = [agent_id for agent_id in RetellAgent.objects.values_list('agent_id', flat=True) if agent_id]
+        synced = 0
+        for page in RetellAPIService.iter_call_pages(agent_ids, RetellAPIService.sync_start_timestamp(), page_size):
+            synced += RetellCall.upsert_from_api(page)
+        logger.info(f"Synced {synced} Retell calls")
+        return synced
+
+    @staticmethod
+    def calls_queryset(business=None, start_date=None, end_date=None):
+        """
+        Stored calls, newest first, for `business` (or every business) that
+        started between `start_date` and `end_date`. Dates cover whole days;
+        datetimes are used as-is.
+        """
+        calls = RetellCall.objects.all()
+        if business is not None:
+            calls = calls.filter(business=business)
+
+        if start_date:
+            if not isinstance(start_date, datetime):
+                start_date = datetime.combine(start_date, datetime.min.time())
+            calls = calls.filter(start_timestamp__gte=int(start_date.timestamp() * 1000))
+
+        if end_date:
+            if not isinstance(end_date, datetime):
+                end_date = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+                calls = calls.filter(start_timestamp__lt=int(end_date.timestamp() * 1000))
             else:
-                logger.error(f"Error retrieving calls from Retell API: {response.text}")
-                return []
-                
-        except requests.exceptions.RequestException as e:
-            logger.exception(f"Request exception when calling Retell API: {str(e)}")
-            return []
+                calls = calls.filter(start_timestamp__lte=int(end_date.timestamp() * 1000))
+
+        return calls.order_by('-start_timestamp')
+
+    @staticmethod
+    def list_calls(business=None, start_date=None, end_date=None, limit=10000):
+        """Stored calls as Retell API call dicts, newest first."""
+        calls = RetellAPIService.calls_queryset(business=business, start_date=start_date, end_date=end_date)
+        return list(calls.values_list('raw', flat=True)[:limit])
     
     @staticmethod
     def get_call_outcomes(calls):
@@ -105,7 +155,7 @@ class RetellAPIService:
         Analyze call data to extract call outcomes distribution.
         
         Args:
-            calls: List of call data from Retell API
+            calls: RetellCall queryset
             
         Returns:
             Dictionary with call outcome counts
@@ -117,21 +167,13 @@ class RetellAPIService:
             "error": 0
         }
         
-        for call in calls:
-            # Get the call status directly
-            call_status = call.get('call_status', '').lower()
-            
-            if call_status == 'registered':
-                outcomes['registered'] += 1
-            elif call_status == 'ongoing':
-                outcomes['ongoing'] += 1
-            elif call_status == 'ended':
-                outcomes['ended'] += 1
-            elif call_status == 'error':
-                outcomes['error'] += 1
+        counts = calls.order_by().annotate(status=Lower('call_status')).values('status').annotate(count=Count('id'))
+        for row in counts:
+            if row['status'] in outcomes:
+                outcomes[row['status']] += row['count']
             else:
                 # For any unknown status, count as error
-                outcomes['error'] += 1
+                outcomes['error'] += row['count']
         
         return outcomes
     
@@ -141,7 +183,7 @@ class RetellAPIService:
         Analyze call data to extract disconnection reason distribution.
         
         Args:
-            calls: List of call data from Retell API
+            calls: RetellCall queryset
             
         Returns:
             Dictionary with disconnection reason counts
@@ -170,14 +212,14 @@ class RetellAPIService:
             "user_declined": 0
         }
         
-        for call in calls:
-            # Get the disconnection reason
-            reason = call.get('disconnection_reason', '').lower()
-            
-            if reason in reasons:
-                reasons[reason] += 1
-            elif reason:
-                reasons['other'] += 1
+        counts = calls.order_by().exclude(
+            Q(disconnection_reason__isnull=True) | Q(disconnection_reason='')
+        ).annotate(reason=Lower('disconnection_reason')).values('reason').annotate(count=Count('id'))
+        for row in counts:
+            if row['reason'] in reasons:
+                reasons[row['reason']] += row['count']
+            else:
+                reasons['other'] += row['count']
         
         # Remove reasons with zero counts to keep the chart clean
         return {k: v for k, v in reasons.items() if v > 0}
@@ -188,28 +230,27 @@ class RetellAPIService:
         Calculate call success rate based on call data.
         
         Args:
-            calls: List of call data from Retell API
+            calls: RetellCall queryset
             
         Returns:
             Success rate as a percentage
         """
-        if not calls:
+        # A call is considered successful if it has call_successful=true or if it ended normally
+        totals = calls.order_by().annotate(
+            status=Lower('call_status'),
+            reason=Lower('disconnection_reason'),
+        ).aggregate(
+            total=Count('id'),
+            successful=Count('id', filter=(
+                Q(call_successful=True)
+                | Q(status='ended', reason__in=['user_hangup', 'agent_hangup', 'call_transfer'])
+            )),
+        )
+        if not totals['total']:
             return 0
         
-        successful_calls = 0
-        for call in calls:
-            # A call is considered successful if it has call_successful=true or if it ended normally
-            call_analysis = call.get('call_analysis', {})
-            call_successful = call_analysis.get('call_successful', False)
-            call_status = call.get('call_status', '').lower()
-            disconnection_reason = call.get('disconnection_reason', '').lower()
-            
-            # Count as successful if explicitly marked as successful or ended with normal reasons
-            if call_successful or (call_status == 'ended' and disconnection_reason in ['user_hangup', 'agent_hangup', 'call_transfer']):
-                successful_calls += 1
-        
         # Calculate success rate as a percentage
-        success_rate = (successful_calls / len(calls)) * 100
+        success_rate = (totals['successful'] / totals['total']) * 100
         return round(success_rate, 1)
     
     @staticmethod
@@ -218,44 +259,30 @@ class RetellAPIService:
         Analyze call data to extract call duration distribution.
         
         Args:
-            calls: List of call data from Retell API
+            calls: RetellCall queryset
             
         Returns:
             Dictionary with duration ranges and counts
         """
-        duration_distribution = {
-            '< 1m': 0,
-            '1-2m': 0,
-            '2-3m': 0,
-            '3-5m': 0,
-            '5-10m': 0,
-            '> 10m': 0
-        }
-        
-        for call in calls:
-            # Calculate call duration if timestamps are available
-            start_timestamp = call.get('start_timestamp')
-            end_timestamp = call.get('end_timestamp')
-            
-            if start_timestamp and end_timestamp:
-                duration_seconds = (end_timestamp - start_timestamp) // 1000
-                duration_minutes = duration_seconds / 60
-                
-                # Categorize by duration
-                if duration_minutes < 1:
-                    duration_distribution['< 1m'] += 1
-                elif duration_minutes < 2:
-                    duration_distribution['1-2m'] += 1
-                elif duration_minutes < 3:
-                    duration_distribution['2-3m'] += 1
-                elif duration_minutes < 5:
-                    duration_distribution['3-5m'] += 1
-                elif duration_minutes < 10:
-                    duration_distribution['5-10m'] += 1
-                else:
-                    duration_distribution['> 10m'] += 1
+        minute = 60 * 1000
+        timed = Q(start_timestamp__isnull=False, end_timestamp__isnull=False, duration_ms__isnull=False)
+        buckets = calls.order_by().aggregate(
+            under_1=Count('id', filter=timed & Q(duration_ms__lt=minute)),
+            under_2=Count('id', filter=timed & Q(duration_ms__gte=minute, duration_ms__lt=2 * minute)),
+            under_3=Count('id', filter=timed & Q(duration_ms__gte=2 * minute, duration_ms__lt=3 * minute)),
+            under_5=Count('id', filter=timed & Q(duration_ms__gte=3 * minute, duration_ms__lt=5 * minute)),
+            under_10=Count('id', filter=timed & Q(duration_ms__gte=5 * minute, duration_ms__lt=10 * minute)),
+            over_10=Count('id', filter=timed & Q(duration_ms__gte=10 * minute)),
+        )
         
-        return duration_distribution
+        return {
+            '< 1m': buckets['under_1'],
+            '1-2m': buckets['under_2'],
+            '2-3m': buckets['under_3'],
+            '3-5m': buckets['under_5'],
+            '5-10m': buckets['under_10'],
+            '> 10m': buckets['over_10']
+        }
     
     @staticmethod
     def get_call_details(calls):
@@ -327,36 +354,27 @@ class RetellAPIService:
             'Unknown': 0
         }
         
-        for call in calls:
-            call_analysis = call.get('call_analysis', {})
-            sentiment = call_analysis.get('user_sentiment', 'Unknown')
-            
+        counts = calls.order_by().values('user_sentiment').annotate(count=Count('id'))
+        for row in counts:
             # Map sentiment to our categories
-            if sentiment in sentiment_counts:
-                sentiment_counts[sentiment] += 1
+            if row['user_sentiment'] in sentiment_counts:
+                sentiment_counts[row['user_sentiment']] += row['count']
             else:
-                sentiment_counts['Unknown'] += 1
+                sentiment_counts['Unknown'] += row['count']
         
         return sentiment_counts
     
     @staticmethod
     def get_call_success_distribution(calls):
         """Analyze calls to extract call success distribution."""
-        success_counts = {
-            'Successful': 0,
-            'Unsuccessful': 0,
-            'Unknown': 0
-        }
+        counts = calls.order_by().aggregate(
+            successful=Count('id', filter=Q(call_successful=True)),
+            unsuccessful=Count('id', filter=Q(call_successful=False)),
+            unknown=Count('id', filter=Q(call_successful__isnull=True)),
+        )
         
-        for call in calls:
-            call_analysis = call.get('call_analysis', {})
-            call_successful = call_analysis.get('call_successful')
-         
-            if call_successful is True:
-                success_counts['Successful'] += 1
-            elif call_successful is False:
-                success_counts['Unsuccessful'] += 1
-            else:
-                success_counts['Unknown'] += 1
-        
-        return success_counts
+        return {
+            'Successful': counts['successful'],
+            'Unsuccessful': counts['unsuccessful'],
+            'Unknown': counts['unknown']
+        }
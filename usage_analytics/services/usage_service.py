@@ -129,7 +129,7 @@ class UsageService:
             # Get usage data
             start_date = active_subscription.start_date
             end_date = active_subscription.end_date
-            usage = UsageTracker.get_usage_summary(
+            usage = UsageTracker.get_cached_usage_summary(
                 business=business,
                 start_date=start_date,
                 end_date=end_date
@@ -197,7 +197,7 @@ class UsageService:
             # Get usage data
             start_date = active_subscription.start_date
             end_date = active_subscription.end_date
-            usage = UsageTracker.get_usage_summary(
+            usage = UsageTracker.get_cached_usage_summary(
                 business=business,
                 start_date=start_date,
                 end_date=end_date
@@ -325,7 +325,7 @@ class UsageService:
             # Get usage data
             start_date = active_subscription.start_date
             end_date = active_subscription.end_date
-            usage = UsageTracker.get_usage_summary(
+            usage = UsageTracker.get_cached_usage_summary(
                 business=business,
                 start_date=start_date,
                 end_date=end_date
@@ -645,7 +645,7 @@ class UsageService:
                 }
             
             # Get current usage
-            current_usage = UsageTracker.get_usage_summary(business=business)
+            current_usage = UsageTracker.get_cached_usage_summary(business=business)
             
             # Check limits
             voice_minutes_exceeded = current_usage['voice_minutes'] > subscription.plan.voice_minutes
@@ -2,6 +2,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
 from .services.usage_service import UsageService
+from .tasks import schedule_retell_call_sync
+from retell_agent.models import RetellAgent
 
 # Example signal handlers - these need to be connected to actual models
 # that handle SMS and Voice communications in your application
@@ -33,4 +35,11 @@ def track_voice_call_usage(sender, instance, created, **kwargs):
 """
 
 # You would need to uncomment and adapt these signal handlers
-# based on your actual model structure for SMS and voice communications 
\ No newline at end of file
+# based on your actual model structure for SMS and voice communications 
+
+
+@receiver(post_save, sender=RetellAgent)
+def ensure_retell_call_sync(sender, instance, created, **kwargs):
+    """Start syncing call history once the first Retell agent exists."""
+    if created:
+        schedule_retell_call_sync()
@@ -0,0 +1,28 @@
+from django_q.models import Schedule
+from django_q.tasks import schedule
+from django.conf import settings
+
+from .services.retell_api_service import RetellAPIService
+
+
+def sync_retell_calls():
+    """Incrementally copy new and updated Retell calls into the RetellCall store."""
+    try:
+        return RetellAPIService.sync_calls()
+    except Exception as e:
+        print(f"[ERROR] Error in sync_retell_calls: {str(e)}")
+        return 0
+
+
+def schedule_retell_call_sync():
+    """Schedule sync_retell_calls to run every RETELL_CALL_SYNC_MINUTES, once."""
+    try:
+        if not Schedule.objects.filter(func='usage_analytics.tasks.sync_retell_calls').exists():
+            schedule(
+                'usage_analytics.tasks.sync_retell_calls',
+                schedule_type=Schedule.MINUTES,
+                minutes=getattr(settings, 'RETELL_CALL_SYNC_MINUTES', 10),
+                repeats=-1
+            )
+    except Exception as e:
+        print(f"Failed to schedule sync_retell_calls task: {str(e)}")
@@ -1,3 +1,200 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from accounts.models import Business
+from retell_agent.models import RetellAgent
+from .models import RetellCall
+from .services.call_metrics import CallMetrics
+from .services.retell_api_service import RetellAPIService
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = str(payload)
+
+    def json(self):
+        return self._payload
+
+
+class FakeRetellListCalls:
+    """
+    Stand-in for POST https://api.retellai.com/v2/list-calls.
+
+    Serves `calls` in ascending start_timestamp order, honouring the agent
+    filter, the start_timestamp lower threshold, limit and pagination_key.
+    """
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.requests = []
+
+    def __call__(self, url, headers=None, json=None, timeout=None):
+        self.requests.append(json)
+        criteria = json.get('filter_criteria', {})
+        lower = criteria.get('start_timestamp', {}).get('lower_threshold')
+
+        calls = sorted(
+            (
+                call for call in self.calls
+                if call['agent_id'] in criteria.get('agent_id', [])
+                and (lower is None or call['start_timestamp'] >= lower)
+            ),
+            key=lambda call: call['start_timestamp'],
+        )
+        if json.get('pagination_key'):
+            ids = [call['call_id'] for call in calls]
+            calls = calls[ids.index(json['pagination_key']) + 1:]
+        return FakeResponse(calls[:json['limit']])
+
+
+def make_call(call_id, agent_id, start, minutes, status='ended', reason='user_hangup', sentiment='Positive', successful=True):
+    start_timestamp = int(start.timestamp() * 1000)
+    return {
+        'call_id': call_id,
+        'agent_id': agent_id,
+        'call_type': 'phone_call',
+        'call_status': status,
+        'disconnection_reason': reason,
+        'start_timestamp': start_timestamp,
+        'end_timestamp': start_timestamp + int(minutes * 60 * 1000),
+        'call_analysis': {'user_sentiment': sentiment, 'call_successful': successful},
+    }
+
+
+@override_settings(RETELL_API_KEY='test-key')
+class RetellCallStoreTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        self.business = Business.objects.create(user=user, businessName='Sparkle')
+        other = Business.objects.create(user=user, businessName='Other')
+
+        with mock.patch('retell_agent.signals.client') as retell_client:
+            retell_client.phone_number.create.return_value.phone_number = '+15550000000'
+            RetellAgent.objects.create(business=self.business, agent_id='agent-1', agent_name='A', voice_id='v')
+            RetellAgent.objects.create(business=other, agent_id='agent-2', agent_name='B', voice_id='v')
+
+        self.day = datetime(2025, 3, 10, 12, 0)
+        self.calls = [
+            make_call('c1', 'agent-1', self.day, 0.5, reason='agent_hangup', sentiment='Neutral'),
+            make_call('c2', 'agent-1', self.day + timedelta(minutes=10), 4, successful=False),
+            make_call('c3', 'agent-1', self.day + timedelta(days=1), 12, status='error', reason='dial_failed', sentiment='Negative', successful=False),
+            make_call('c4', 'agent-2', self.day + timedelta(minutes=5), 2),
+            make_call('c5', 'agent-1', self.day + timedelta(days=2), 1.5, status='ongoing', reason='', sentiment=None, successful=None),
+        ]
+        self.api = FakeRetellListCalls(self.calls)
+
+    def sync(self, page_size=2):
+        with mock.patch('usage_analytics.services.retell_api_service.requests.post', self.api):
+            agent_ids = list(RetellAgent.objects.values_list('agent_id', flat=True))
+            calls = RetellAPIService.fetch_calls(agent_ids, RetellAPIService.sync_start_timestamp(), page_size=page_size)
+            return RetellCall.upsert_from_api(calls)
+
+    def test_sync_follows_pagination_and_attributes_calls_to_businesses(self):
+        self.assertEqual(self.sync(), 5)
+
+        self.assertEqual(len(self.api.requests), 3)
+        self.assertEqual(self.api.requests[1]['pagination_key'], 'c4')
+        self.assertEqual(
+            set(RetellCall.objects.filter(business=self.business).values_list('call_id', flat=True)),
+            {'c1', 'c2', 'c3', 'c5'},
+        )
+        self.assertEqual(RetellCall.objects.get(call_id='c2').duration_ms, 4 * 60 * 1000)
+
+    def test_incremental_sync_uses_lower_threshold_and_refreshes_unfinished_calls(self):
+        self.sync()
+        self.api.requests.clear()
+
+        self.calls[4].update(call_status='ended', disconnection_reason='user_hangup')
+        self.calls.append(make_call('c6', 'agent-1', self.day + timedelta(days=3), 3))
+        with mock.patch('usage_analytics.services.retell_api_service.timezone.now', return_value=(self.day + timedelta(days=2, hours=1)).replace(tzinfo=dt_timezone.utc)):
+            self.sync(page_size=1000)
+
+        lower = self.api.requests[0]['filter_criteria']['start_timestamp']['lower_threshold']
+        self.assertEqual(lower, self.calls[4]['start_timestamp'] - 60 * 60 * 1000)
+        self.assertEqual(RetellCall.objects.count(), 6)
+        self.assertEqual(RetellCall.objects.get(call_id='c5').call_status, 'ended')
+
+    def test_interrupted_sync_keeps_the_pages_it_stored(self):
+        api = self.api
+
+        def timeout_on_third_page(url, headers=None, json=None, timeout=None):
+            if len(api.requests) == 2:
+                raise TimeoutError('task timed out')
+            return api(url, headers=headers, json=json, timeout=timeout)
+
+        with mock.patch('usage_analytics.services.retell_api_service.requests.post', timeout_on_third_page):
+            with self.assertRaises(TimeoutError):
+                RetellAPIService.sync_calls(page_size=2)
+        self.assertEqual(RetellCall.objects.count(), 4)
+
+        # The next run starts from the newest stored call, not from scratch
+        api.requests.clear()
+        with mock.patch('usage_analytics.services.retell_api_service.requests.post', api):
+            RetellAPIService.sync_calls(page_size=2)
+        self.assertEqual(RetellCall.objects.count(), 5)
+        self.assertIn('start_timestamp', api.requests[0]['filter_criteria'])
+
+    def test_aggregations_run_against_the_store(self):
+        self.sync()
+        calls = RetellAPIService.calls_queryset(business=self.business)
+
+        self.assertEqual(
+            RetellAPIService.get_call_outcomes(calls),
+            {'registered': 0, 'ongoing': 1, 'ended': 2, 'error': 1},
+        )
+        self.assertEqual(
+            RetellAPIService.get_disconnection_reasons(calls),
+            {'user_hangup': 1, 'agent_hangup': 1, 'dial_failed': 1},
+        )
+        self.assertEqual(RetellAPIService.calculate_success_rate(calls), 50.0)
+        self.assertEqual(
+            RetellAPIService.get_call_duration_distribution(calls),
+            {'< 1m': 1, '1-2m': 1, '2-3m': 0, '3-5m': 1, '5-10m': 0, '> 10m': 1},
+        )
+        self.assertEqual(
+            RetellAPIService.get_sentiment_distribution(calls),
+            {'Positive': 1, 'Neutral': 1, 'Negative': 1, 'Unknown': 1},
+        )
+        self.assertEqual(
+            RetellAPIService.get_call_success_distribution(calls),
+            {'Successful': 1, 'Unsuccessful': 2, 'Unknown': 1},
+        )
+
+    def test_date_range_covers_whole_days(self):
+        self.sync()
+        calls = RetellAPIService.calls_queryset(
+            business=self.business, start_date=self.day.date(), end_date=self.day.date()
+        )
+        self.assertEqual(list(calls.values_list('call_id', flat=True)), ['c2', 'c1'])
+        self.assertEqual(
+            [call['call_id'] for call in RetellAPIService.list_calls(business=self.business, limit=2)],
+            ['c5', 'c3'],
+        )
+
+    def test_call_metrics_match_store_aggregations(self):
+        self.sync()
+        calls = RetellAPIService.calls_queryset(business=self.business)
+        summary = CallMetrics.from_queryset(calls).summary(self.day.date(), self.day.date() + timedelta(days=2))
+
+        self.assertEqual(summary['total_calls'], 4)
+        self.assertEqual(summary['call_outcomes'], RetellAPIService.get_call_outcomes(calls))
+        self.assertEqual(summary['disconnection_reasons'], RetellAPIService.get_disconnection_reasons(calls))
+        self.assertEqual(summary['success_rate'], RetellAPIService.calculate_success_rate(calls))
+        self.assertEqual(summary['call_duration_distribution'], RetellAPIService.get_call_duration_distribution(calls))
+        self.assertEqual(summary['sentiment_distribution'], RetellAPIService.get_sentiment_distribution(calls))
+        self.assertEqual(summary['success_distribution'], RetellAPIService.get_call_success_distribution(calls))
+        self.assertEqual(summary['call_volume'], {
+            'dates': ['2025-03-10', '2025-03-11', '2025-03-12'],
+            'call_volume': [2, 1, 1],
+            'voice_minutes': [4, 12, 2],
+        })
+
+        from_api = CallMetrics.from_calls(call for call in self.calls if call['agent_id'] == 'agent-1').summary()
+        self.assertEqual(from_api['call_outcomes'], summary['call_outcomes'])
+        self.assertEqual(from_api['success_distribution'], summary['success_distribution'])
@@ -10,6 +10,7 @@ urlpatterns = [
     path('api/usage-data/', views.get_usage_data, name='get_usage_data'),
     path('api/voice-analytics/', views.get_voice_analytics, name='get_voice_analytics'),
     path('api/call-volume/', views.get_call_volume, name='get_call_volume'),
+    path('api/call-metrics/', views.get_call_metrics, name='get_call_metrics'),
     path('api/call-outcomes/', views.get_call_outcomes, name='get_call_outcomes'),
     path('api/call-duration-distribution/', views.get_call_duration_distribution, name='get_call_duration_distribution'),
     path('api/call-success-rate/', views.get_call_success_rate, name='get_call_success_rate'),
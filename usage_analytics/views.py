@@ -9,6 +9,7 @@ import random
 from subscription.models import BusinessSubscription, UsageTracker
 from .services.usage_service import UsageService
 from .services.retell_api_service import RetellAPIService
+from .services.call_metrics import CallMetrics
 
 # Create your views here.
 
@@ -72,8 +73,7 @@ def usage_overview(request):
     recent_activities = UsageService.get_recent_activities(business, limit=10)
     
     # Calculate average call duration properly
-    total_calls = RetellAPIService.list_calls(business=business, limit=100)
-    total_calls_count = len(total_calls)
+    total_calls_count = RetellAPIService.calls_queryset(business=business).count()
     total_minutes = usage_summary.get('total', {}).get('voice_minutes', 0)
     avg_duration = f"{round(total_minutes / total_calls_count, 1)}m" if total_calls_count > 0 else "0m"
     
@@ -188,17 +188,15 @@ def get_voice_analytics(request):
         end_date=end_date
     )
     
-    # Get call data from Retell API
-    from .services.retell_api_service import RetellAPIService
-    calls = RetellAPIService.list_calls(
+    # Get stored call history
+    calls = RetellAPIService.calls_queryset(
         business=business, 
         start_date=start_date, 
-        end_date=end_date,
-        limit=100
+        end_date=end_date
     )
     
     # Calculate metrics
-    total_calls = len(calls)
+    total_calls = calls.count()
     total_data = usage_summary.get('total', {})
     total_voice_minutes = int(total_data.get('voice_minutes', 0))  # Convert to integer to remove decimal points
     
@@ -253,12 +251,11 @@ def get_call_outcomes(request):
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
     
-    # Get call data from Retell API
-    calls = RetellAPIService.list_calls(
+    # Get stored call history
+    calls = RetellAPIService.calls_queryset(
         business=business,
         start_date=start_datetime,
-        end_date=end_datetime,
-        limit=200  # Increase limit to get more accurate statistics
+        end_date=end_datetime
     )
     
     # Get call outcomes distribution
@@ -325,12 +322,11 @@ def get_call_duration_distribution(request):
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
     
-    # Get call data from Retell API
-    calls = RetellAPIService.list_calls(
+    # Get stored call history
+    calls = RetellAPIService.calls_queryset(
         business=business,
         start_date=start_datetime,
-        end_date=end_datetime,
-        limit=200  # Increase limit to get more accurate statistics
+        end_date=end_datetime
     )
     
     # Get call duration distribution
@@ -339,7 +335,7 @@ def get_call_duration_distribution(request):
     # Return the data
     return JsonResponse({
         'call_duration_distribution': duration_distribution,
-        'total_calls': len(calls),
+        'total_calls': calls.count(),
         'date_range': {
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d')
@@ -381,12 +377,11 @@ def get_call_success_rate(request):
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
     
-    # Get call data from Retell API
-    calls = RetellAPIService.list_calls(
+    # Get stored call history
+    calls = RetellAPIService.calls_queryset(
         business=business,
         start_date=start_datetime,
-        end_date=end_datetime,
-        limit=200  # Increase limit to get more accurate statistics
+        end_date=end_datetime
     )
     
     # Calculate success rate
@@ -395,7 +390,7 @@ def get_call_success_rate(request):
     # Return the data
     return JsonResponse({
         'success_rate': success_rate,
-        'total_calls': len(calls),
+        'total_calls': calls.count(),
         'date_range': {
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': end_date.strftime('%Y-%m-%d')
@@ -437,12 +432,11 @@ def get_disconnection_reasons(request):
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
     
-    # Get call data from Retell API
-    calls = RetellAPIService.list_calls(
+    # Get stored call history
+    calls = RetellAPIService.calls_queryset(
         business=business,
         start_date=start_datetime,
-        end_date=end_datetime,
-        limit=200  # Increase limit to get more accurate statistics
+        end_date=end_datetime
     )
     
     # Get disconnection reason distribution
@@ -460,7 +454,7 @@ def get_disconnection_reasons(request):
     return JsonResponse({
         'disconnection_reasons': disconnection_reasons,
         'disconnection_reasons_percentage': disconnection_reasons_percentage,
-        'total_calls': len(calls),
+        'total_calls': calls.count(),
         'total_calls_with_reasons': total_calls_with_reasons,
         'date_range': {
             'start_date': start_date.strftime('%Y-%m-%d'),
@@ -700,8 +694,7 @@ def get_usage_data(request):
     
     # Get call data from Retell API
     from .services.retell_api_service import RetellAPIService
-    total_calls = RetellAPIService.list_calls(business=business, limit=100, start_date=start_date, end_date=end_date)
-    total_calls_count = len(total_calls)
+    total_calls_count = RetellAPIService.calls_queryset(business=business, start_date=start_date, end_date=end_date).count()
     
     # Calculate metrics
     total_data = usage_summary.get('total', {})
@@ -791,19 +784,18 @@ def get_sentiment_distribution(request):
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
     
-    # Get call data from Retell API
-    calls = RetellAPIService.list_calls(
+    # Get stored call history
+    calls = RetellAPIService.calls_queryset(
         business=business,
         start_date=start_datetime,
-        end_date=end_datetime,
-        limit=200  # Increase limit to get more accurate statistics
+        end_date=end_datetime
     )
     
     # Get sentiment distribution
     sentiment_distribution = RetellAPIService.get_sentiment_distribution(calls)
     
     # Calculate percentages for the frontend
-    total_calls = len(calls)
+    total_calls = calls.count()
     sentiment_distribution_percentage = {}
     
     if total_calls > 0:
@@ -856,19 +848,18 @@ def get_call_success_distribution(request):
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_date, datetime.max.time())
     
-    # Get call data from Retell API
-    calls = RetellAPIService.list_calls(
+    # Get stored call history
+    calls = RetellAPIService.calls_queryset(
         business=business,
         start_date=start_datetime,
-        end_date=end_datetime,
-        limit=200  # Increase limit to get more accurate statistics
+        end_date=end_datetime
     )
     
     # Get call success distribution
     success_distribution = RetellAPIService.get_call_success_distribution(calls)
     
     # Calculate percentages for the frontend
-    total_calls = len(calls)
+    total_calls = calls.count()
     success_distribution_percentage = {}
     
     if total_calls > 0:
@@ -976,14 +967,12 @@ def get_call_volume(request):
         print(f"Date parsing error: {str(e)}")
         return JsonResponse({'error': 'Invalid date format'}, status=400)
     
-    # Get call data from Retell API
-    from .services.retell_api_service import RetellAPIService
-    calls = RetellAPIService.list_calls(
+    # Get stored call history; only the two columns charted here are loaded
+    calls = RetellAPIService.calls_queryset(
         business=business, 
         start_date=start_date, 
-        end_date=end_date,
-        limit=100
-    )
+        end_date=end_date
+    ).values_list('start_timestamp', 'duration_ms')
     
     # Calculate daily call volume
     dates = []
@@ -995,8 +984,8 @@ def get_call_volume(request):
     daily_minutes = {}
     
     # Group calls by date
-    for call in calls:
-        call_date = datetime.fromtimestamp(call.get('start_timestamp', 0) / 1000).date()
+    for start_timestamp, duration_ms in calls:
+        call_date = datetime.fromtimestamp((start_timestamp or 0) / 1000).date()
         date_str = call_date.strftime('%Y-%m-%d')
         
         # Count calls
@@ -1006,8 +995,7 @@ def get_call_volume(request):
             daily_calls[date_str] = 1
         
         # Sum minutes
-        duration_ms = call.get('duration', 0)  # Duration in milliseconds
-        duration_min = duration_ms / (1000 * 60)  # Convert to minutes
+        duration_min = (duration_ms or 0) / (1000 * 60)  # Convert to minutes
         
         if date_str in daily_minutes:
             daily_minutes[date_str] += duration_min
@@ -1035,6 +1023,44 @@ def get_call_volume(request):
     
     return JsonResponse(response_data)
 
+@login_required(login_url='accounts:signup')
+def get_call_metrics(request):
+    """API endpoint returning every voice analytics chart in one response."""
+    business = request.user.business_set.first()
+    
+    # Parse date range from request
+    start_date_str = request.GET.get('start_date')
+    end_date_str = request.GET.get('end_date')
+    
+    try:
+        if start_date_str:
+            start_date = datetime.strptime(start_date_str.split(' ')[0], '%Y-%m-%d').date()
+        else:
+            # Default to last 30 days
+            start_date = (timezone.now() - timedelta(days=30)).date()
+            
+        if end_date_str:
+            end_date = datetime.strptime(end_date_str.split(' ')[0], '%Y-%m-%d').date()
+        else:
+            end_date = timezone.now().date()
+    except ValueError as e:
+        print(f"Date parsing error: {str(e)}")
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    
+    # Load the call columns once and compute all charts from them
+    calls = RetellAPIService.calls_queryset(
+        business=business,
+        start_date=start_date,
+        end_date=end_date
+    )
+    response_data = CallMetrics.from_queryset(calls).summary(start_date, end_date)
+    response_data['date_range'] = {
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d')
+    }
+    
+    return JsonResponse(response_data)
+
 @login_required(login_url='accounts:signup')
 def get_sms_volume(request):
     """API endpoint to retrieve SMS message volume data for the chart."""